@@ -26,7 +26,7 @@ interface Message {
   content: string;
   timestamp: Date;
   isRead: boolean;
-  status: 'sent' | 'delivered' | 'read';
+  status: 'sent' | 'delivered' | 'read' | 'failed';
   isDeleted?: boolean;
   deletedAt?: string;
 }
@@ -47,17 +47,29 @@ interface ChatUser {
   avatar?: string;
 }
 
+const DIRECTORY_PAGE_SIZE = 50;
+
+interface RiskAlert {
+  student_id: number;
+  student_name: string;
+  kind: 'attendance' | 'marks';
+  content: string;
+  timestamp: string;
+}
+
 export default function AdminMessaging() {
   const [activeChat, setActiveChat] = useState<string | null>(null);
   const [messages, setMessages] = useState<Message[]>([]);
   const [chatUsers, setChatUsers] = useState<ChatUser[]>([]);
   const [newMessage, setNewMessage] = useState('');
   const [searchQuery, setSearchQuery] = useState('');
+  const [directoryCursor, setDirectoryCursor] = useState<string | null>(null);
+  const [directoryLoading, setDirectoryLoading] = useState(false);
   const [filterType, setFilterType] = useState<'all' | 'student' | 'principal'>('all');
   const [sortBy, setSortBy] = useState<'name' | 'class' | 'lastMessage' | 'unread'>('lastMessage');
   const [messagesLoading, setMessagesLoading] = useState(false);
   const [hasMoreMessages, setHasMoreMessages] = useState(true);
-  const [currentPage, setCurrentPage] = useState(1);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [isTyping, setIsTyping] = useState(false);
   const [otherUserTyping, setOtherUserTyping] = useState(false);
   const [typingUser, setTypingUser] = useState<string>('');
@@ -70,13 +82,15 @@ export default function AdminMessaging() {
   const heartbeatIntervalRef = useRef<NodeJS.Timeout | null>(null);
   const reconnectTimeoutRef = useRef<NodeJS.Timeout | null>(null);
   const typingTimeoutRef = useRef<NodeJS.Timeout | null>(null);
+  const alertsSocketRef = useRef<WebSocket | null>(null);
+  const directoryRequestRef = useRef(0);
+  const [riskAlerts, setRiskAlerts] = useState<RiskAlert[]>([]);
   
   // Disable WebSocket completely for now
   const [wsDisabled] = useState(true);
 
   // Load chat data and initialize WebSocket
   useEffect(() => {
-    loadChatRooms();
     loadNotifications();
 
     return () => {
@@ -96,16 +110,49 @@ export default function AdminMessaging() {
     };
   }, []);
 
-  const loadChatRooms = async () => {
+  // Search runs on the server; reload the first page once typing pauses
+  useEffect(() => {
+    const search = searchQuery.trim();
+    const timeout = setTimeout(() => loadChatRooms(search), search ? 300 : 0);
+    return () => clearTimeout(timeout);
+  }, [searchQuery]);
+
+  // At-risk alerts are pushed to staff only, on their own socket
+  useEffect(() => {
+    const socket = new WebSocket('ws://127.0.0.1:8000/ws/staff/alerts/');
+    alertsSocketRef.current = socket;
+    socket.onmessage = (event) => {
+      try {
+        const data = JSON.parse(event.data);
+        if (data.type === 'risk_alert') {
+          setRiskAlerts(prev => [data.alert, ...prev].slice(0, 5));
+        }
+      } catch (error) {
+        console.error('Error parsing risk alert:', error);
+      }
+    };
+    return () => {
+      socket.close();
+      alertsSocketRef.current = null;
+    };
+  }, []);
+
+  // The student directory is paginated: one page on load, more as the list is scrolled
+  const loadChatRooms = async (search = '', after: string | null = null) => {
+    const request = ++directoryRequestRef.current;
+    setDirectoryLoading(true);
     try {
-      console.log('🔄 Loading all registered students...');
-      const response = await fetch('http://127.0.0.1:8000/api/chat/students/', {
+      const params = new URLSearchParams({ page_size: String(DIRECTORY_PAGE_SIZE) });
+      if (search) params.set('search', search);
+      if (after) params.set('after', after);
+      const response = await fetch(`http://127.0.0.1:8000/api/chat/students/?${params}`, {
         credentials: 'include',
       });
       const data = await response.json();
+      // A newer search has been sent since; drop this page
+      if (request !== directoryRequestRef.current) return;
       
       if (data.success) {
-        console.log(`✅ Loaded ${data.total_count} students`);
         const users: ChatUser[] = data.students.map((student: any) => ({
           id: student.room_id ? student.room_id.toString() : `new_${student.id}`,
           name: student.name,
@@ -121,24 +168,22 @@ export default function AdminMessaging() {
           isOnline: Math.random() > 0.5, // Mock online status for now
         }));
         
-        // Sort users: those with unread messages first, then by last message time, then by name
-        users.sort((a, b) => {
-          if (a.unreadCount > 0 && b.unreadCount === 0) return -1;
-          if (a.unreadCount === 0 && b.unreadCount > 0) return 1;
-          if (a.lastMessageTime && b.lastMessageTime) {
-            return b.lastMessageTime.getTime() - a.lastMessageTime.getTime();
-          }
-          if (a.lastMessageTime && !b.lastMessageTime) return -1;
-          if (!a.lastMessageTime && b.lastMessageTime) return 1;
-          return a.name.localeCompare(b.name);
-        });
-        
-        setChatUsers(users);
+        setChatUsers(prev => after ? [...prev, ...users] : users);
+        setDirectoryCursor(data.pagination.next_cursor);
       }
     } catch (error) {
       console.error('❌ Error loading students:', error);
-      // Show error message to user
-      setChatUsers([]);
+      if (!after) setChatUsers([]);
+    } finally {
+      if (request === directoryRequestRef.current) setDirectoryLoading(false);
+    }
+  };
+
+  const handleDirectoryScroll = (event: React.UIEvent<HTMLDivElement>) => {
+    const list = event.currentTarget;
+    if (directoryCursor && !directoryLoading &&
+        list.scrollTop + list.clientHeight >= list.scrollHeight - 100) {
+      loadChatRooms(searchQuery.trim(), directoryCursor);
     }
   };
 
@@ -302,7 +347,8 @@ export default function AdminMessaging() {
   const handleIncomingMessage = (data: any) => {
     if (data.type === 'chat_message') {
       const newMessage: Message = {
-        id: data.message.id.toString(),
+        // Messages are broadcast before they are stored, keyed until messages_saved
+        id: String(data.message.id ?? data.message.key),
         senderId: data.message.sender_id.toString(),
         senderName: data.message.sender_name,
         senderType: data.message.sender_type,
@@ -327,9 +373,20 @@ export default function AdminMessaging() {
             }
           : user
       ));
+    } else if (data.type === 'messages_saved') {
+      const ids = new Map(data.messages.map((saved: any) => [saved.key, saved.id.toString()]));
+      setMessages(prev => prev.map(msg =>
+        ids.has(msg.id) ? { ...msg, id: ids.get(msg.id) as string } : msg
+      ));
+    } else if (data.type === 'messages_failed') {
+      // The server could not store these messages; they were never delivered
+      const failed = new Set(data.keys);
+      setMessages(prev => prev.map(msg =>
+        failed.has(msg.id) ? { ...msg, status: 'failed' } : msg
+      ));
     } else if (data.type === 'recent_messages') {
       const recentMessages: Message[] = data.messages.map((msg: any) => ({
-        id: msg.id.toString(),
+        id: String(msg.id ?? msg.key),
         senderId: msg.sender_id.toString(),
         senderName: msg.sender_name,
         senderType: msg.sender_type,
@@ -580,13 +637,14 @@ export default function AdminMessaging() {
     }
     
     // Load messages for this chat room
-    await loadMessages(roomId, 1, true);
+    await loadMessages(roomId, null, true);
   };
 
-  const loadMessages = async (roomId: string, page: number = 1, reset: boolean = false) => {
+  const loadMessages = async (roomId: string, before: string | null = null, reset: boolean = false) => {
     setMessagesLoading(true);
     try {
-      const response = await fetch(`http://127.0.0.1:8000/api/chat/rooms/${roomId}/?page=${page}&page_size=50`, {
+      const cursor = before ? `&before=${encodeURIComponent(before)}` : '';
+      const response = await fetch(`http://127.0.0.1:8000/api/chat/rooms/${roomId}/?page_size=50${cursor}`, {
         credentials: 'include',
       });
       const data = await response.json();
@@ -607,15 +665,14 @@ export default function AdminMessaging() {
         
         if (reset) {
           setMessages(roomMessages);
-          setCurrentPage(1);
         } else {
           // Prepend older messages to the beginning
           setMessages(prev => [...roomMessages, ...prev]);
         }
         
-        setHasMoreMessages(data.pagination?.has_previous || false);
-        setCurrentPage(page);
-        console.log(`✅ Loaded ${roomMessages.length} messages for room ${roomId} (page ${page})`);
+        setHasMoreMessages(data.pagination?.has_more || false);
+        setNextCursor(data.pagination?.next_cursor || null);
+        console.log(`✅ Loaded ${roomMessages.length} messages for room ${roomId}`);
       }
     } catch (error) {
       console.error('❌ Error loading chat messages:', error);
@@ -630,19 +687,12 @@ export default function AdminMessaging() {
   const loadMoreMessages = async () => {
     if (!activeChat || !hasMoreMessages || messagesLoading) return;
     
-    const nextPage = currentPage + 1;
-    await loadMessages(activeChat, nextPage, false);
+    await loadMessages(activeChat, nextCursor, false);
   };
 
   const filteredUsers = chatUsers
-    .filter(user => {
-      const matchesSearch = user.name.toLowerCase().includes(searchQuery.toLowerCase()) ||
-                           user.email.toLowerCase().includes(searchQuery.toLowerCase()) ||
-                           user.rollId?.toLowerCase().includes(searchQuery.toLowerCase()) ||
-                           user.className?.toLowerCase().includes(searchQuery.toLowerCase());
-      const matchesFilter = filterType === 'all' || user.type === filterType;
-      return matchesSearch && matchesFilter;
-    })
+    // Search is applied by the server (see loadChatRooms)
+    .filter(user => filterType === 'all' || user.type === filterType)
     .sort((a, b) => {
       switch (sortBy) {
         case 'name':
@@ -720,6 +770,27 @@ export default function AdminMessaging() {
             </div>
           </div>
 
+          {/* At-risk alerts */}
+          {riskAlerts.length > 0 && (
+            <div className="mb-3 space-y-1">
+              {riskAlerts.map((alert, index) => (
+                <div
+                  key={`${alert.student_id}-${alert.kind}-${alert.timestamp}`}
+                  className="flex items-start p-2 bg-red-50 border border-red-200 rounded-lg text-xs text-red-700"
+                >
+                  <Bell className="h-3 w-3 mr-2 mt-0.5 flex-shrink-0" />
+                  <span className="flex-1">{alert.content}</span>
+                  <button
+                    onClick={() => setRiskAlerts(prev => prev.filter((_, i) => i !== index))}
+                    className="ml-2 text-red-400 hover:text-red-600"
+                  >
+                    <X className="h-3 w-3" />
+                  </button>
+                </div>
+              ))}
+            </div>
+          )}
+
           {/* Search */}
           <div className="relative mb-3">
             <Search className="absolute left-3 top-1/2 transform -translate-y-1/2 h-4 w-4 text-gray-400" />
@@ -801,7 +872,7 @@ export default function AdminMessaging() {
         </div>
 
         {/* Chat List */}
-        <div className="flex-1 overflow-y-auto">
+        <div className="flex-1 overflow-y-auto" onScroll={handleDirectoryScroll}>
           {filteredUsers.map((user) => (
             <div
               key={user.id}
@@ -863,6 +934,9 @@ export default function AdminMessaging() {
               </div>
             </div>
           ))}
+          {directoryLoading && (
+            <div className="p-3 text-center text-xs text-gray-500">Loading students...</div>
+          )}
         </div>
       </div>
 
@@ -957,6 +1031,7 @@ export default function AdminMessaging() {
                             {message.status === 'sent' && <Clock className="h-3 w-3 text-orange-200" />}
                             {message.status === 'delivered' && <CheckCircle className="h-3 w-3 text-orange-200" />}
                             {message.status === 'read' && <CheckCircle className="h-3 w-3 text-orange-200 fill-current" />}
+                            {message.status === 'failed' && <AlertCircle className="h-3 w-3 text-red-200" />}
                           </div>
                         )}
                       </div>
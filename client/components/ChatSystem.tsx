@@ -17,6 +17,8 @@ import { Badge } from '@/components/ui/badge';
 
 interface Message {
   id: number;
+  key?: string;  // Set until the server sends the stored id
+  failed?: boolean;  // The server dropped it before storing it
   content: string;
   sender_type: 'student' | 'admin';
   sender_id: number;
@@ -100,11 +102,30 @@ export default function ChatSystem({ userType, userId, userName }: ChatSystemPro
         case 'recent_messages':
           setMessages(data.messages);
           break;
+        case 'messages_saved':
+          // Messages are broadcast before they are stored; swap in their ids
+          setMessages(prev => prev.map(msg => {
+            const saved = data.messages.find((s: any) => msg.key && s.key === msg.key);
+            return saved ? { ...msg, id: saved.id, timestamp: saved.timestamp } : msg;
+          }));
+          break;
+        case 'messages_failed':
+          // The server could not store these messages; they were never delivered
+          setMessages(prev => prev.map(msg =>
+            msg.key && data.keys.includes(msg.key) ? { ...msg, failed: true } : msg
+          ));
+          break;
         case 'messages_read':
-          setMessages(prev => prev.map(msg => 
-            data.message_ids.includes(msg.id) ? { ...msg, is_read: true } : msg
+          // The reader has read every message sent to it up to last_read_message_id
+          setMessages(prev => prev.map(msg =>
+            msg.id && msg.id <= data.last_read_message_id && data.sender_types.includes(msg.sender_type)
+              ? { ...msg, is_read: true } : msg
           ));
           break;
+        case 'heartbeat':
+          // Reply so the server does not close the connection as idle
+          newSocket.send(JSON.stringify({ type: 'heartbeat', timestamp: new Date().toISOString() }));
+          break;
         case 'typing_indicator':
           if (data.sender_name !== userName) {
             setOtherUserTyping(data.is_typing);
@@ -397,7 +418,9 @@ export default function ChatSystem({ userType, userId, userName }: ChatSystemPro
                                 {new Date(message.timestamp).toLocaleTimeString()}
                                 {message.sender_type === userType && (
                                   <span className="ml-1">
-                                    {message.is_read ? '✓✓' : '✓'}
+                                    {message.failed ? (
+                                      <span className="text-red-300" title="Not sent">!</span>
+                                    ) : message.is_read ? '✓✓' : '✓'}
                                   </span>
                                 )}
                               </div>
@@ -19,6 +19,8 @@ import { Textarea } from '@/components/ui/textarea';
 
 interface Message {
   id: number;
+  key?: string;  // Set until the server sends the stored id
+  failed?: boolean;  // The server dropped it before storing it
   content: string;
   sender_type: 'student' | 'admin' | 'faculty' | 'principal';
   sender_id: number;
@@ -204,11 +206,30 @@ export default function StudentMessages({ studentId, studentName }: StudentMessa
         case 'recent_messages':
           setMessages(data.messages);
           break;
+        case 'messages_saved':
+          // Messages are broadcast before they are stored; swap in their ids
+          setMessages(prev => prev.map(msg => {
+            const saved = data.messages.find((s: any) => msg.key && s.key === msg.key);
+            return saved ? { ...msg, id: saved.id, timestamp: saved.timestamp } : msg;
+          }));
+          break;
+        case 'messages_failed':
+          // The server could not store these messages; they were never delivered
+          setMessages(prev => prev.map(msg =>
+            msg.key && data.keys.includes(msg.key) ? { ...msg, failed: true } : msg
+          ));
+          break;
         case 'messages_read':
-          setMessages(prev => prev.map(msg => 
-            data.message_ids.includes(msg.id) ? { ...msg, is_read: true } : msg
+          // The reader has read every message sent to it up to last_read_message_id
+          setMessages(prev => prev.map(msg =>
+            msg.id && msg.id <= data.last_read_message_id && data.sender_types.includes(msg.sender_type)
+              ? { ...msg, is_read: true } : msg
           ));
           break;
+        case 'heartbeat':
+          // Reply so the server does not close the connection as idle
+          newSocket.send(JSON.stringify({ type: 'heartbeat', timestamp: new Date().toISOString() }));
+          break;
         case 'typing_indicator':
           if (data.sender_name !== studentName) {
             setOtherUserTyping(data.is_typing);
@@ -586,7 +607,9 @@ export default function StudentMessages({ studentId, studentName }: StudentMessa
                             )}
                             {message.sender_type === 'student' && !message.is_deleted && (
                               <span className="ml-1">
-                                {message.is_read ? <CheckCheck className="h-3 w-3" /> : '✓'}
+                                {message.failed ? (
+                                  <span className="text-red-300" title="Not sent">!</span>
+                                ) : message.is_read ? <CheckCheck className="h-3 w-3" /> : '✓'}
                               </span>
                             )}
                           </div>
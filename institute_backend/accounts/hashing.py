@@ -0,0 +1,124 @@
+"""
+Password hashing off the request thread.
+
+PBKDF2 burns hundreds of milliseconds of CPU per call. hashlib releases the
+GIL while it runs, so a small thread pool gives real parallelism while capping
+how many logins can hash at once; callers beyond the pending limit are refused
+with HashingPoolBusy instead of queueing behind each other.
+"""
+import asyncio
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.utils.crypto import constant_time_compare
+
+# Prefixes of the hashers we store; anything else is a legacy raw password
+HASHED_PREFIXES = ('pbkdf2_', 'bcrypt', 'argon2')
+
+PasswordCheck = namedtuple('PasswordCheck', ['matches', 'needs_rehash'])
+
+
+class HashingPoolBusy(Exception):
+    """Raised when the hashing pool has no free slot for another job"""
+
+
+class BoundedExecutor:
+    """ThreadPoolExecutor with a hard cap on running + queued jobs"""
+
+    def __init__(self, max_workers, max_pending):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='password-hash'
+        )
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingPoolBusy('Password hashing pool is saturated')
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_hashing_pool():
+    """Return the process-wide hashing pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = BoundedExecutor(
+                    max_workers=getattr(settings, 'PASSWORD_HASH_WORKERS', 4),
+                    max_pending=getattr(settings, 'PASSWORD_HASH_MAX_PENDING', 32),
+                )
+    return _pool
+
+
+def is_hashed(encoded):
+    return bool(encoded) and encoded.startswith(HASHED_PREFIXES)
+
+
+def _verify(raw_password, encoded):
+    if not is_hashed(encoded):
+        # Legacy row holding the raw password: compare in constant time and
+        # ask the caller to store a proper hash on success.
+        matches = constant_time_compare(raw_password or '', encoded or '')
+        return PasswordCheck(matches, matches)
+
+    upgrades = []
+    matches = check_password(raw_password, encoded, setter=upgrades.append)
+    return PasswordCheck(matches, bool(upgrades))
+
+
+def _timeout():
+    return getattr(settings, 'PASSWORD_HASH_TIMEOUT', 10)
+
+
+def verify_password(raw_password, encoded):
+    """Check a password on the hashing pool, blocking until it finishes"""
+    future = get_hashing_pool().submit(_verify, raw_password, encoded)
+    try:
+        return future.result(timeout=_timeout())
+    except FutureTimeoutError:
+        future.cancel()
+        raise HashingPoolBusy('Password check timed out')
+
+
+async def averify_password(raw_password, encoded):
+    """Awaitable variant of verify_password for async views and consumers"""
+    future = get_hashing_pool().submit(_verify, raw_password, encoded)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), _timeout())
+    except asyncio.TimeoutError:
+        raise HashingPoolBusy('Password check timed out')
+
+
+def hash_password(raw_password):
+    """make_password() on the hashing pool"""
+    future = get_hashing_pool().submit(make_password, raw_password)
+    try:
+        return future.result(timeout=_timeout())
+    except FutureTimeoutError:
+        future.cancel()
+        raise HashingPoolBusy('Password hashing timed out')
+
+
+async def ahash_password(raw_password):
+    future = get_hashing_pool().submit(make_password, raw_password)
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), _timeout())
+    except asyncio.TimeoutError:
+        raise HashingPoolBusy('Password hashing timed out')
@@ -0,0 +1,302 @@
+import datetime
+import random
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from accounts.models import AdminUser, Class, Student, Subject
+from attendance.models import Attendance
+from attendance.rollup import rebuild as rebuild_attendance_rollup
+from chat.counters import reconcile as reconcile_chat_counters
+from chat.models import ChatMessage, ChatRoom
+from marks.models import Exam, Marks
+from marks.unified import backfill as backfill_unified_marks
+from students.models import StudentMark
+from students.risk import rebuild as rebuild_risk_state
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk_create keep the timestamps we set instead of auto_now(_add)"""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a large synthetic dataset (classes, subjects, students, exams, marks, "
+        "attendance, chat) with bulk inserts for scale testing. Rows are tagged with "
+        "--prefix so they can be removed again with --flush."
+    )
+
+    SECTIONS = 'ABCDEFGH'
+    EXAM_NAMES = ['Unit Test 1', 'Unit Test 2', 'Midterm', 'Unit Test 3', 'Unit Test 4', 'Final']
+    CHAT_LINES = [
+        'Hello, I have a question about the last test.',
+        'Can you share the notes from today?',
+        'When is the next exam scheduled?',
+        'Thank you, that helps.',
+        'Please check your email for the updated schedule.',
+        'Sure, I will look into it.',
+    ]
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=10000)
+        parser.add_argument('--grades', default='9,10,11,12', help='Comma-separated grade levels')
+        parser.add_argument('--sections', type=int, default=2, help='Class sections per grade')
+        parser.add_argument('--subjects', type=int, default=6)
+        parser.add_argument('--subjects-per-student', type=int, default=4)
+        parser.add_argument('--exams-per-class', type=int, default=6)
+        parser.add_argument('--student-marks-per-subject', type=int, default=3)
+        parser.add_argument('--attendance-days', type=int, default=120, help='School days of attendance')
+        parser.add_argument('--chat-fraction', type=float, default=0.2,
+                            help='Share of students that get chat rooms')
+        parser.add_argument('--messages-per-room', type=int, default=20)
+        parser.add_argument('--end-date', type=datetime.date.fromisoformat, default=None,
+                            help='Last attendance/exam date (YYYY-MM-DD), defaults to today')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='scale', help='Tag for generated rows (max 6 chars)')
+        parser.add_argument('--flush', action='store_true', help='Only delete rows previously generated with --prefix')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix'].lower()
+        if not prefix.isalnum() or len(prefix) > 6:
+            raise CommandError('--prefix must be alphanumeric and at most 6 characters')
+        self.prefix = prefix
+        self.email_domain = f'@{prefix}.example.com'
+        self.chunk_size = options['chunk_size']
+        self.rng = random.Random(options['seed'])
+        self.end_date = options['end_date'] or timezone.localdate()
+        self.verbosity = options['verbosity']
+
+        self.flush()
+        if options['flush']:
+            return
+
+        started = time.perf_counter()
+        grades = [int(g) for g in options['grades'].split(',') if g.strip()]
+        subjects = self.create_subjects(options['subjects'], grades)
+        classes = self.create_classes(grades, options['sections'])
+        students = self.create_students(options['students'], classes)
+        selected = self.assign_subjects(students, subjects, options['subjects_per_student'])
+        exams = self.create_exams(classes, options['exams_per_class'])
+        ability = {sid: self.rng.gauss(0.68, 0.12) for sid, _ in students}
+
+        self.create_marks(students, exams, selected, ability)
+        self.create_student_marks(students, selected, ability, options['student_marks_per_subject'])
+        self.create_attendance(students, options['attendance_days'])
+        self.create_chat(students, options['chat_fraction'], options['messages_per_room'])
+        self.build_read_models()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Scale data generated in {time.perf_counter() - started:.1f}s (prefix "{prefix}").'
+        ))
+
+    def log(self, message):
+        if self.verbosity:
+            self.stdout.write(message)
+
+    def bulk_insert(self, model, rows, label):
+        """Insert rows from an iterator in chunked transactions; return the count"""
+        started = time.perf_counter()
+        total = 0
+        for chunk in chunked(rows, self.chunk_size):
+            with transaction.atomic():
+                model.objects.bulk_create(chunk, batch_size=self.chunk_size)
+            total += len(chunk)
+        self.log(f'  {label}: {total} rows in {time.perf_counter() - started:.1f}s')
+        return total
+
+    def flush(self):
+        students = Student.objects.filter(email__endswith=self.email_domain)
+        if students.exists():
+            # Cascades to marks, attendance, student marks and chat rooms/messages
+            with transaction.atomic():
+                deleted, _ = students.delete()
+            self.log(f'Removed {deleted} rows from a previous "{self.prefix}" run')
+        Class.objects.filter(name__startswith=f'{self.prefix}-').delete()
+        Subject.objects.filter(code__startswith=self.prefix.upper()).delete()
+
+    def create_subjects(self, count, grades):
+        grade_levels = ','.join(str(g) for g in grades)
+        self.bulk_insert(Subject, (
+            Subject(name=f'{self.prefix.title()} Subject {i + 1}',
+                    code=f'{self.prefix.upper()}{i + 1:02d}', grade_levels=grade_levels)
+            for i in range(count)
+        ), 'subjects')
+        return list(Subject.objects.filter(code__startswith=self.prefix.upper())
+                    .order_by('id').values_list('id', flat=True))
+
+    def create_classes(self, grades, sections):
+        self.bulk_insert(Class, (
+            Class(name=f'{self.prefix}-{grade}{self.SECTIONS[s]}', grade_level=grade,
+                  section=self.SECTIONS[s])
+            for grade in grades for s in range(sections)
+        ), 'classes')
+        return list(Class.objects.filter(name__startswith=f'{self.prefix}-')
+                    .order_by('id').values_list('id', flat=True))
+
+    def create_students(self, count, classes):
+        # Hashing is deliberately slow; every generated student shares one hash
+        password = make_password('password123')
+        self.bulk_insert(Student, (
+            Student(name=f'Student {i:05d}', email=f'student{i}{self.email_domain}',
+                    password=password, roll_id=f'{self.prefix.upper()}{i:05d}',
+                    student_class_id=classes[i % len(classes)])
+            for i in range(count)
+        ), 'students')
+        return list(Student.objects.filter(email__endswith=self.email_domain)
+                    .order_by('id').values_list('id', 'student_class_id'))
+
+    def assign_subjects(self, students, subjects, per_student):
+        per_student = min(per_student, len(subjects))
+        selected = {sid: sorted(self.rng.sample(subjects, per_student)) for sid, _ in students}
+        through = Student.subjects_selected.through
+        self.bulk_insert(through, (
+            through(student_id=sid, subject_id=subject_id)
+            for sid, subject_ids in selected.items() for subject_id in subject_ids
+        ), 'subject selections')
+        return selected
+
+    def create_exams(self, classes, per_class):
+        names = [self.EXAM_NAMES[i % len(self.EXAM_NAMES)] + (f' ({i // len(self.EXAM_NAMES) + 1})'
+                                                              if i >= len(self.EXAM_NAMES) else '')
+                 for i in range(per_class)]
+        spacing = max(1, 180 // max(per_class, 1))
+        self.bulk_insert(Exam, (
+            Exam(name=name, student_class_id=class_id,
+                 exam_date=self.end_date - datetime.timedelta(days=spacing * (per_class - i)))
+            for class_id in classes for i, name in enumerate(names)
+        ), 'exams')
+        exams = {}
+        for exam_id, class_id in (Exam.objects.filter(student_class_id__in=classes)
+                                  .order_by('id').values_list('id', 'student_class_id')):
+            exams.setdefault(class_id, []).append(exam_id)
+        return exams
+
+    def score(self, ability, total):
+        ratio = min(1.0, max(0.0, self.rng.gauss(ability, 0.1)))
+        return Decimal(round(ratio * total * 2) / 2).quantize(Decimal('0.01'))
+
+    def create_marks(self, students, exams, selected, ability):
+        total = Decimal('100.00')
+        self.bulk_insert(Marks, (
+            Marks(student_id=sid, exam_id=exam_id, subject_id=subject_id,
+                  marks_obtained=self.score(ability[sid], 100), total_marks=total)
+            for sid, class_id in students
+            for exam_id in exams.get(class_id, [])
+            for subject_id in selected[sid]
+        ), 'exam marks')
+
+    def create_student_marks(self, students, selected, ability, per_subject):
+        exam_types = [choice for choice, _ in StudentMark.EXAM_TYPE_CHOICES]
+        self.bulk_insert(StudentMark, (
+            StudentMark(student_id=sid, subject_id=subject_id, exam_type=exam_types[i % len(exam_types)],
+                        marks_obtained=self.score(ability[sid], 50), total_marks=Decimal('50.00'),
+                        exam_date=self.end_date - datetime.timedelta(days=30 * (per_subject - i)))
+            for sid, _ in students
+            for subject_id in selected[sid]
+            for i in range(per_subject)
+        ), 'student marks')
+
+    def build_read_models(self):
+        # bulk_create sends no signals, so derived tables are built in one pass at the end
+        students = Student.objects.filter(email__endswith=self.email_domain)
+        started = time.perf_counter()
+        exam_rows, legacy_rows = backfill_unified_marks(students=students, chunk_size=self.chunk_size)
+        self.log(f'  unified marks: {exam_rows + legacy_rows} rows in {time.perf_counter() - started:.1f}s')
+        started = time.perf_counter()
+        months = rebuild_attendance_rollup(students=students, batch_size=self.chunk_size)
+        self.log(f'  monthly attendance: {months} rows in {time.perf_counter() - started:.1f}s')
+        started = time.perf_counter()
+        states = rebuild_risk_state(students=students)
+        self.log(f'  risk state: {states} students in {time.perf_counter() - started:.1f}s')
+        started = time.perf_counter()
+        rooms = reconcile_chat_counters(ChatRoom.objects.filter(student__in=students), chunk_size=self.chunk_size)
+        self.log(f'  chat counters: {rooms} rooms in {time.perf_counter() - started:.1f}s')
+
+    def school_days(self, count):
+        days = []
+        day = self.end_date
+        while len(days) < count:
+            if day.weekday() < 5:
+                days.append(day)
+            day -= datetime.timedelta(days=1)
+        return days[::-1]
+
+    def create_attendance(self, students, day_count):
+        days = self.school_days(day_count)
+        rates = {sid: min(0.99, max(0.4, self.rng.betavariate(9, 1.5))) for sid, _ in students}
+        random_value = self.rng.random
+        self.bulk_insert(Attendance, (
+            Attendance(student_id=sid, date=day, present=random_value() < rates[sid])
+            for sid, _ in students
+            for day in days
+        ), 'attendance')
+
+    def create_chat(self, students, fraction, per_room):
+        admin = AdminUser.objects.order_by('id').first()
+        chatting = [sid for sid, _ in students if self.rng.random() < fraction]
+        recipient_types = [choice for choice, _ in ChatRoom.RECIPIENT_TYPES]
+        rooms = {sid: self.rng.sample(recipient_types, self.rng.randint(1, len(recipient_types)))
+                 for sid in chatting}
+        self.bulk_insert(ChatRoom, (
+            ChatRoom(student_id=sid, recipient_type=recipient_type, admin=admin)
+            for sid, types in rooms.items() for recipient_type in types
+        ), 'chat rooms')
+
+        room_rows = (ChatRoom.objects.filter(student__email__endswith=self.email_domain)
+                     .order_by('id').values_list('id', 'student_id', 'recipient_type'))
+        now = timezone.now()
+        timestamp = ChatMessage._meta.get_field('timestamp')
+
+        def messages():
+            for room_id, sid, recipient_type in room_rows:
+                sent = now - datetime.timedelta(days=self.rng.randint(1, 60))
+                for i in range(per_room):
+                    sent += datetime.timedelta(minutes=self.rng.randint(1, 240))
+                    from_student = i % 2 == 0
+                    yield ChatMessage(
+                        room_id=room_id,
+                        sender_type='student' if from_student else recipient_type,
+                        sender_id=sid if from_student else (admin.id if admin else 0),
+                        sender_name=f'Student {sid}' if from_student else recipient_type.title(),
+                        content=self.rng.choice(self.CHAT_LINES),
+                        timestamp=min(sent, now),
+                    )
+
+        with explicit_timestamps(timestamp):
+            self.bulk_insert(ChatMessage, messages(), 'chat messages')
+
+        # Both sides have read everything older than a day
+        read_upto = Subquery(
+            ChatMessage.objects.filter(room=OuterRef('pk'), timestamp__lt=now - datetime.timedelta(days=1))
+            .order_by().values('room').annotate(last=Max('id')).values('last')
+        )
+        ChatRoom.objects.filter(student__email__endswith=self.email_domain).update(
+            student_last_read_id=Coalesce(read_upto, 0), staff_last_read_id=Coalesce(read_upto, 0)
+        )
@@ -1,5 +1,35 @@
 from django.db import models
-from django.contrib.auth.hashers import make_password, check_password
+from .hashing import (
+    HASHED_PREFIXES, ahash_password, averify_password, hash_password, verify_password
+)
+
+
+class PasswordMixin:
+    """
+    Password helpers shared by the login models. Hashing and verification run
+    on the bounded hashing pool (see accounts.hashing), and a successful check
+    against a legacy raw password or an outdated hash stores a fresh hash.
+    """
+
+    def set_password(self, raw_password):
+        self.password = hash_password(raw_password)
+
+    def check_password(self, raw_password):
+        result = verify_password(raw_password, self.password)
+        if result.matches and result.needs_rehash:
+            self.password = hash_password(raw_password)
+            if self.pk:
+                self.save(update_fields=['password'])
+        return result.matches
+
+    async def acheck_password(self, raw_password):
+        result = await averify_password(raw_password, self.password)
+        if result.matches and result.needs_rehash:
+            self.password = await ahash_password(raw_password)
+            if self.pk:
+                await self.asave(update_fields=['password'])
+        return result.matches
+
 
 class Subject(models.Model):
     name = models.CharField(max_length=50, unique=True)
@@ -25,18 +55,24 @@ class Class(models.Model):
     def __str__(self):
         return self.name
 
-class Student(models.Model):
+class Student(PasswordMixin, models.Model):
     name = models.CharField(max_length=100)
     email = models.EmailField(unique=True)
-    password = models.CharField(max_length=100)
+    password = models.CharField(max_length=100)  # Hashed; legacy rows are rehashed on next login
     roll_id = models.CharField(max_length=50)
     student_class = models.ForeignKey(Class, on_delete=models.CASCADE)
     subjects_selected = models.ManyToManyField(Subject, blank=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of the chat student directory on (name, id)
+            models.Index(fields=['name', 'id']),
+        ]
+
     def __str__(self):
         return self.name
 
-class Faculty(models.Model):
+class Faculty(PasswordMixin, models.Model):
     name = models.CharField(max_length=100)
     email = models.EmailField(unique=True)
     password = models.CharField(max_length=100)
@@ -44,14 +80,8 @@ class Faculty(models.Model):
     classes = models.ManyToManyField(Class, blank=True)
     subjects = models.ManyToManyField(Subject, blank=True)
 
-    def set_password(self, raw_password):
-        self.password = make_password(raw_password)
-
-    def check_password(self, raw_password):
-        return check_password(raw_password, self.password)
-
     def save(self, *args, **kwargs):
-        if self.password and not self.password.startswith(('pbkdf2_', 'bcrypt', 'argon2')):
+        if self.password and not self.password.startswith(HASHED_PREFIXES):
             self.set_password(self.password)
         super().save(*args, **kwargs)
 
@@ -61,19 +91,13 @@ class Faculty(models.Model):
     def __str__(self):
         return self.name
 
-class Principal(models.Model):
+class Principal(PasswordMixin, models.Model):
     name = models.CharField(max_length=100)
     email = models.EmailField(unique=True)
     password = models.CharField(max_length=100)
 
-    def set_password(self, raw_password):
-        self.password = make_password(raw_password)
-
-    def check_password(self, raw_password):
-        return check_password(raw_password, self.password)
-
     def save(self, *args, **kwargs):
-        if self.password and not self.password.startswith(('pbkdf2_', 'bcrypt', 'argon2')):
+        if self.password and not self.password.startswith(HASHED_PREFIXES):
             self.set_password(self.password)
         super().save(*args, **kwargs)
 
@@ -81,7 +105,7 @@ class Principal(models.Model):
         return self.name
 
 
-class AdminUser(models.Model):
+class AdminUser(PasswordMixin, models.Model):
     username = models.CharField(max_length=50, unique=True)
     password = models.CharField(max_length=128)  # Hashed password
     is_active = models.BooleanField(default=True)
@@ -95,16 +119,8 @@ class AdminUser(models.Model):
     def __str__(self):
         return self.username
     
-    def set_password(self, raw_password):
-        """Hash and set the password"""
-        self.password = make_password(raw_password)
-    
-    def check_password(self, raw_password):
-        """Check if the provided password matches the stored hash"""
-        return check_password(raw_password, self.password)
-    
     def save(self, *args, **kwargs):
         # If password doesn't look hashed, hash it
-        if self.password and not self.password.startswith(('pbkdf2_', 'bcrypt', 'argon2')):
+        if self.password and not self.password.startswith(HASHED_PREFIXES):
             self.set_password(self.password)
         super().save(*args, **kwargs)
@@ -341,3 +341,187 @@ class SubjectUpdateAPITestCase(TestCase):
         data = json.loads(response.content)
         self.assertFalse(data['success'])
         self.assertEqual(data['error_code'], 'INVALID_JSON')
+
+
+class StudentLoginThrottleTestCase(TestCase):
+    def setUp(self):
+        """Set up a student still holding a legacy plaintext password"""
+        from .throttle import get_login_throttle
+        self.client = Client()
+        get_login_throttle().reset()
+        
+        self.test_class = Class.objects.create(name="Grade 11L", grade_level=11, section="L")
+        self.student = Student.objects.create(
+            name="Legacy Student",
+            email="legacy@example.com",
+            password="plainpass",
+            roll_id="2024101",
+            student_class=self.test_class
+        )
+        self.url = reverse('api_student_login')
+    
+    def login(self, password, **extra):
+        return self.client.post(
+            self.url,
+            data=json.dumps({'email': 'legacy@example.com', 'password': password}),
+            content_type='application/json',
+            **extra
+        )
+    
+    def test_legacy_password_rehashed_on_login(self):
+        """A successful login replaces the plaintext password with a hash"""
+        response = self.login('plainpass')
+        self.assertEqual(response.status_code, 200)
+        
+        self.student.refresh_from_db()
+        self.assertTrue(self.student.password.startswith('pbkdf2_'))
+        
+        # The hashed password keeps working
+        response = self.login('plainpass')
+        self.assertEqual(response.status_code, 200)
+    
+    def test_wrong_password_keeps_legacy_value(self):
+        """A failed login neither authenticates nor touches the stored value"""
+        response = self.login('wrongpass')
+        self.assertEqual(response.status_code, 401)
+        
+        self.student.refresh_from_db()
+        self.assertEqual(self.student.password, 'plainpass')
+    
+    def test_repeated_attempts_are_throttled(self):
+        """Attempts past the per-email burst are shed with a 429"""
+        for _ in range(5):
+            self.assertEqual(self.login('wrongpass').status_code, 401)
+        
+        response = self.login('plainpass')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+    
+    def test_token_bucket_refills(self):
+        """Buckets refill at the configured rate"""
+        from .throttle import TokenBucketThrottle
+        now = [0.0]
+        throttle = TokenBucketThrottle(burst=2, per_minute=60, clock=lambda: now[0])
+        
+        self.assertEqual(throttle.consume('key'), 0)
+        self.assertEqual(throttle.consume('key'), 0)
+        self.assertAlmostEqual(throttle.consume('key'), 1.0)
+        
+        now[0] = 1.0
+        self.assertEqual(throttle.consume('key'), 0)
+
+
+class RegistrationHashingBusyTestCase(TestCase):
+    def test_busy_hashing_pool_returns_503(self):
+        """A registration whose password hash cannot be scheduled is shed with a 503"""
+        from unittest import mock
+        from .hashing import HashingPoolBusy
+        from .models import Principal
+        with mock.patch('accounts.models.hash_password', side_effect=HashingPoolBusy('busy')):
+            response = Client().post(
+                reverse('api_admin_register_principal'),
+                data=json.dumps({'name': 'New Principal', 'email': 'new@example.com', 'password': 'secret123'}),
+                content_type='application/json'
+            )
+        
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(Principal.objects.filter(email='new@example.com').exists())
+
+
+class UnifiedStudentMarksAPITestCase(TestCase):
+    """Test cases for api_get_student_marks served from the unified read model"""
+    
+    def setUp(self):
+        """Set up a student with exam marks and legacy marks"""
+        from marks.models import Exam, Marks
+        self.client = Client()
+        self.test_class = Class.objects.create(name="Unified 11A", grade_level=11, section="A")
+        self.chemistry = Subject.objects.create(name="Unified Chemistry", code="UCHE", grade_levels="11,12")
+        self.biology = Subject.objects.create(name="Unified Biology", code="UBIO", grade_levels="11,12")
+        self.drawing = Subject.objects.create(name="Unified Drawing", code="UDRW", grade_levels="11,12")
+        self.student = Student.objects.create(
+            name="Unified Student", email="unified@example.com", password="testpass",
+            roll_id="U2024001", student_class=self.test_class
+        )
+        self.student.subjects_selected.add(self.chemistry, self.biology)
+        
+        exam = Exam.objects.create(name="Unified Term", exam_date=date(2024, 3, 1), student_class=self.test_class)
+        Marks.objects.create(student=self.student, exam=exam, subject=self.chemistry,
+                             marks_obtained=60, total_marks=80)
+        StudentMark.objects.create(student=self.student, subject=self.chemistry, exam_type="quiz",
+                                   marks_obtained=9, total_marks=10, exam_date=date(2024, 2, 1))
+        StudentMark.objects.create(student=self.student, subject=self.drawing, exam_type="quiz",
+                                   marks_obtained=5, total_marks=10, exam_date=date(2024, 2, 1))
+        
+        session = self.client.session
+        session['student_id'] = self.student.id
+        session['user_type'] = 'student'
+        session.save()
+    
+    def test_combines_exam_and_legacy_marks(self):
+        """Marks from both tables are returned, newest first, with per-subject averages"""
+        response = self.client.get(reverse('api_get_student_marks'))
+        self.assertEqual(response.status_code, 200)
+        
+        data = json.loads(response.content)
+        self.assertTrue(data['success'])
+        self.assertEqual([(m['source'], m['subject']['name'], m['percentage']) for m in data['marks']], [
+            ('exam', 'Unified Chemistry', 75.0),
+            ('legacy', 'Unified Chemistry', 90.0),
+        ])
+        self.assertEqual(data['marks'][0]['exam_name'], 'Unified Term')
+        self.assertEqual(data['marks'][1]['grade'], 'A+')
+        self.assertEqual(data['subject_averages'][str(self.chemistry.id)], {
+            'subject_name': 'Unified Chemistry',
+            'subject_code': 'UCHE',
+            'average_percentage': 82.5,
+            'total_exams': 2,
+        })
+        self.assertEqual(data['subject_averages'][str(self.biology.id)]['total_exams'], 0)
+        self.assertNotIn(str(self.drawing.id), data['subject_averages'])
+
+
+class GenerateScaleDataTestCase(TestCase):
+    """Test cases for the generate_scale_data command"""
+    
+    def generate(self, **options):
+        from io import StringIO
+        from django.core.management import call_command
+        call_command(
+            'generate_scale_data', students=20, grades='9,10', sections=1, subjects=3,
+            subjects_per_student=2, exams_per_class=2, student_marks_per_subject=1,
+            attendance_days=5, chat_fraction=0.5, messages_per_room=2, seed=7,
+            end_date=date(2024, 3, 1), prefix='tst', stdout=StringIO(), **options
+        )
+    
+    def test_generates_expected_volumes(self):
+        """Row counts follow the configured sizes"""
+        from django.db.models import Sum
+        from attendance.models import Attendance, AttendanceMonthly
+        from marks.models import Marks, UnifiedMark
+        self.generate()
+        
+        students = Student.objects.filter(email__endswith='@tst.example.com')
+        self.assertEqual(students.count(), 20)
+        self.assertEqual(Marks.objects.filter(student__in=students).count(), 20 * 2 * 2)
+        self.assertEqual(StudentMark.objects.filter(student__in=students).count(), 20 * 2)
+        self.assertEqual(Attendance.objects.filter(student__in=students).count(), 20 * 5)
+        self.assertEqual(UnifiedMark.objects.filter(student__in=students).count(), 20 * 2 * 2 + 20 * 2)
+        self.assertEqual(
+            AttendanceMonthly.objects.filter(student__in=students).aggregate(days=Sum('days'))['days'], 20 * 5
+        )
+    
+    def test_same_seed_is_deterministic_and_rerun_replaces(self):
+        """Re-running with the same seed replaces the previous rows with identical data"""
+        from attendance.models import Attendance
+        
+        def snapshot():
+            return list(Attendance.objects.filter(student__email__endswith='@tst.example.com')
+                        .order_by('student__email', 'date').values_list('student__email', 'date', 'present'))
+        
+        self.generate()
+        first = snapshot()
+        self.generate()
+        self.assertEqual(snapshot(), first)
+        self.assertEqual(Student.objects.filter(email__endswith='@tst.example.com').count(), 20)
@@ -0,0 +1,120 @@
+"""
+In-memory token-bucket throttling for login endpoints.
+
+Every login attempt takes one token from the bucket of the email it targets
+and one from the bucket of the client IP. The check happens before any
+password hashing, so a brute-force burst is shed for the cost of a dict
+lookup. State is per process, which is enough to blunt hammering against a
+single worker without needing Redis.
+"""
+import math
+import threading
+import time
+
+from django.conf import settings
+
+
+class TokenBucket:
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, tokens, updated):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class TokenBucketThrottle:
+    """A set of token buckets keyed by an arbitrary string"""
+
+    def __init__(self, burst, per_minute, max_keys=10000, clock=time.monotonic):
+        self.burst = float(burst)
+        self.rate = per_minute / 60.0
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _refill(self, bucket, now):
+        elapsed = now - bucket.updated
+        if elapsed > 0:
+            bucket.tokens = min(self.burst, bucket.tokens + elapsed * self.rate)
+            bucket.updated = now
+
+    def _prune(self, now):
+        # Buckets that have refilled completely carry no state worth keeping
+        for key in list(self._buckets):
+            bucket = self._buckets[key]
+            self._refill(bucket, now)
+            if bucket.tokens >= self.burst:
+                del self._buckets[key]
+        # Still too many keys: drop the oldest inserted ones
+        overflow = len(self._buckets) - self.max_keys
+        if overflow > 0:
+            for key in list(self._buckets)[:overflow]:
+                del self._buckets[key]
+
+    def consume(self, key):
+        """Take a token for key; return 0 on success, else seconds to wait"""
+        now = self.clock()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._prune(now)
+                bucket = self._buckets[key] = TokenBucket(self.burst, now)
+            else:
+                self._refill(bucket, now)
+
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                return 0
+            if self.rate <= 0:
+                return math.inf
+            return (1 - bucket.tokens) / self.rate
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+class LoginThrottle:
+    """Per-email and per-IP throttling for login attempts"""
+
+    def __init__(self, email_burst, email_per_minute, ip_burst, ip_per_minute):
+        self.by_email = TokenBucketThrottle(email_burst, email_per_minute)
+        self.by_ip = TokenBucketThrottle(ip_burst, ip_per_minute)
+
+    def check(self, identity, ip):
+        """Return 0 if the attempt may proceed, else seconds until it may"""
+        wait = self.by_ip.consume(ip or 'unknown')
+        if wait:
+            return wait
+        return self.by_email.consume((identity or '').strip().lower())
+
+    def reset(self):
+        self.by_email.reset()
+        self.by_ip.reset()
+
+
+_login_throttle = None
+_login_throttle_lock = threading.Lock()
+
+
+def get_login_throttle():
+    global _login_throttle
+    if _login_throttle is None:
+        with _login_throttle_lock:
+            if _login_throttle is None:
+                email = getattr(settings, 'LOGIN_THROTTLE_EMAIL', {'burst': 5, 'per_minute': 5})
+                ip = getattr(settings, 'LOGIN_THROTTLE_IP', {'burst': 30, 'per_minute': 60})
+                _login_throttle = LoginThrottle(
+                    email['burst'], email['per_minute'],
+                    ip['burst'], ip['per_minute'],
+                )
+    return _login_throttle
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR', '')
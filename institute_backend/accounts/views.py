@@ -5,6 +5,10 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.conf import settings
 from .models import Student, Faculty, Principal, Class, Subject, AdminUser
+from .hashing import HashingPoolBusy
+from .throttle import get_login_throttle, client_ip
+from marks.models import UnifiedMark
+from marks.unified import subject_averages as unified_subject_averages
 
 # Dashboard Views
 def student_dashboard(request):
@@ -31,10 +35,13 @@ def principal_dashboard(request):
     except Principal.DoesNotExist:
         return redirect('login')
 import json
+import logging
 import os
 import sys
 import re
 
+logger = logging.getLogger(__name__)
+
 # Authentication middleware
 def require_admin_auth(view_func):
     def wrapper(request, *args, **kwargs):
@@ -47,6 +54,34 @@ def require_admin_auth(view_func):
         return view_func(request, *args, **kwargs)
     return wrapper
 
+# Login throttling helpers
+def throttle_login(request, identity):
+    """Return a 429 response if this login attempt must be shed, else None"""
+    wait = get_login_throttle().check(identity, client_ip(request))
+    if not wait:
+        return None
+    response = JsonResponse({
+        'success': False,
+        'message': 'Too many login attempts. Please try again shortly.'
+    }, status=429)
+    response['Retry-After'] = str(max(1, int(wait + 0.999)))
+    return response
+
+# Seconds clients are asked to wait when the password hashing pool is saturated
+HASHING_RETRY_AFTER = 1
+
+def busy_response(message):
+    response = JsonResponse({'success': False, 'message': message}, status=503)
+    response['Retry-After'] = str(HASHING_RETRY_AFTER)
+    return response
+
+def login_busy_response():
+    return busy_response('Login service is busy. Please try again shortly.')
+
+def signup_busy_response():
+    # Saving an account hashes its password in the model's save()
+    return busy_response('Account service is busy. Please try again shortly.')
+
 # Authentication helper functions
 def create_authentication_error_response(request, message="Not authenticated", error_code="AUTHENTICATION_REQUIRED"):
     """Create standardized authentication error response with debugging info"""
@@ -70,44 +105,37 @@ def create_authentication_error_response(request, message="Not authenticated", e
 
 def validate_student_session(request):
     """Validate student session using session cookies OR auth token"""
-    print(f"=== VALIDATION DEBUG ===")
-    print(f"Session key: {request.session.session_key}")
-    print(f"Session data: {dict(request.session)}")
-    print(f"Cookies received: {dict(request.COOKIES)}")
-    print(f"Authorization header: {request.META.get('HTTP_AUTHORIZATION', 'None')}")
-    
     # Check for auth token in headers
     auth_token = request.META.get('HTTP_AUTHORIZATION')
     if auth_token and auth_token.startswith('Bearer '):
         token = auth_token.split(' ')[1]
-        print(f"🔑 Auth token received: {token}")
         
         # Find session by token
         from django.contrib.sessions.models import Session
         try:
             session_obj = Session.objects.get(session_key=token)
             session_data = session_obj.get_decoded()
-            print(f"🔑 Token session data: {session_data}")
             
             if session_data.get('user_type') == 'student' and 'student_id' in session_data:
                 student_id = session_data['student_id']
                 student = Student.objects.get(id=student_id)
-                print(f"✅ Token validation successful for: {student.name}")
+                logger.debug('student session validated', extra={'via': 'token', 'student_id': student.id})
                 return student
         except (Session.DoesNotExist, Student.DoesNotExist) as e:
-            print(f"❌ Token validation failed: {e}")
-    else:
-        print(f"❌ No valid auth token found")
+            logger.debug('token validation failed: %s', e)
     
     # Fallback to session cookies
     if 'student_id' not in request.session or request.session.get('user_type') != 'student':
-        print(f"❌ Session validation failed - student_id in session: {'student_id' in request.session}, user_type: {request.session.get('user_type')}")
+        logger.debug('student session validation failed', extra={
+            'has_student_id': 'student_id' in request.session,
+            'user_type': request.session.get('user_type'),
+        })
         return None
     
     try:
         student_id = request.session['student_id']
         student = Student.objects.get(id=student_id)
-        print(f"✅ Session validation successful for: {student.name}")
+        logger.debug('student session validated', extra={'via': 'cookie', 'student_id': student.id})
         return student
     except Student.DoesNotExist:
         return None
@@ -127,13 +155,14 @@ def student_signup(request):
             student_class = Class.objects.get(id=student_class_id)
             
             # Create student
-            student = Student.objects.create(
+            student = Student(
                 name=name,
                 email=email,
-                password=password,
                 roll_id=roll_id,
                 student_class=student_class
             )
+            student.set_password(password)
+            student.save()
             
             # Add selected subjects
             if subject_ids:
@@ -152,7 +181,13 @@ def student_login(request):
             email = request.POST['email']
             password = request.POST['password']
             
-            student = Student.objects.get(email=email, password=password)
+            if throttle_login(request, email):
+                messages.error(request, 'Too many login attempts. Please try again shortly.')
+                return render(request, 'login_student.html')
+            
+            student = Student.objects.get(email=email)
+            if not student.check_password(password):
+                raise Student.DoesNotExist
             # Store student info in session
             request.session['student_id'] = student.id
             request.session['student_name'] = student.name
@@ -173,8 +208,12 @@ def faculty_login(request):
             email = request.POST['email']
             password = request.POST['password']
             
-            faculty = Faculty.objects.filter(email=email, password=password).first()
-            if faculty:
+            if throttle_login(request, email):
+                messages.error(request, 'Too many login attempts. Please try again shortly.')
+                return render(request, 'login_faculty.html')
+            
+            faculty = Faculty.objects.filter(email=email).first()
+            if faculty and faculty.check_password(password):
                 # Store faculty info in session
                 request.session['faculty_id'] = faculty.id
                 request.session['faculty_name'] = faculty.name
@@ -195,8 +234,12 @@ def principal_login(request):
             email = request.POST['email']
             password = request.POST['password']
             
-            principal = Principal.objects.filter(email=email, password=password).first()
-            if principal:
+            if throttle_login(request, email):
+                messages.error(request, 'Too many login attempts. Please try again shortly.')
+                return render(request, 'login_principal.html')
+            
+            principal = Principal.objects.filter(email=email).first()
+            if principal and principal.check_password(password):
                 # Store principal info in session
                 request.session['principal_id'] = principal.id
                 request.session['principal_name'] = principal.name
@@ -216,15 +259,8 @@ def principal_login(request):
 @require_http_methods(["POST"])
 def api_student_signup(request):
     try:
-        print("=== SIGNUP REQUEST DEBUG ===")
-        print(f"Request body: {request.body}")
         data = json.loads(request.body)
-        print(f"Parsed data: {data}")
-        print(f"Data keys: {list(data.keys())}")
-        print(f"student_class_id in data: {'student_class_id' in data}")
-        if 'student_class_id' in data:
-            print(f"student_class_id value: {repr(data['student_class_id'])}")
-        print("==========================")
+        logger.debug('student signup', extra={'fields': ','.join(sorted(data))})
         
         # Check if email already exists
         if Student.objects.filter(email=data['email']).exists():
@@ -242,13 +278,10 @@ def api_student_signup(request):
                 'message': 'Class ID is required (student_class_id or student_class)'
             }, status=400)
         
-        print(f"Received class_id: {repr(class_id)} (type: {type(class_id)})")
-        
         # If class_id is a string (class name), try to find by name
         if isinstance(class_id, str) and not class_id.isdigit():
             try:
                 student_class = Class.objects.get(name=class_id)
-                print(f"Found class by name: {student_class.name} (ID: {student_class.id})")
             except Class.DoesNotExist:
                 return JsonResponse({
                     'success': False,
@@ -259,7 +292,6 @@ def api_student_signup(request):
             try:
                 class_id = int(class_id)
                 student_class = Class.objects.get(id=class_id)
-                print(f"Found class by ID: {student_class.name} (ID: {student_class.id})")
             except (ValueError, Class.DoesNotExist):
                 return JsonResponse({
                     'success': False,
@@ -267,19 +299,18 @@ def api_student_signup(request):
                 }, status=400)
         
         # Create student
-        student = Student.objects.create(
+        student = Student(
             name=data['name'],
             email=data['email'],
-            password=data['password'],
             roll_id=data.get('roll_id', f"AUTO_{data['email'].split('@')[0]}"),  # Auto-generate if missing
             student_class=student_class
         )
+        student.set_password(data['password'])
+        student.save()
         
         # Add selected subjects - handle both field names and formats
         subject_ids = data.get('subject_ids') or data.get('subject_selected')
         if subject_ids:
-            print(f"Received subject_ids: {repr(subject_ids)} (type: {type(subject_ids)})")
-            
             # Convert subject names to IDs if needed
             from .models import Subject
             final_subject_ids = []
@@ -293,15 +324,12 @@ def api_student_signup(request):
             else:
                 subject_list = [subject_ids]
             
-            print(f"Processing subject list: {subject_list}")
-            
             for subject_item in subject_list:
                 if isinstance(subject_item, str) and not subject_item.isdigit():
                     # It's a subject name, find by exact name first, then try case-insensitive
                     try:
                         subject = Subject.objects.get(name__iexact=subject_item)
                         final_subject_ids.append(subject.id)
-                        print(f"Found subject by exact name: {subject.name} (ID: {subject.id})")
                     except Subject.DoesNotExist:
                         # Try partial match but handle multiple results
                         try:
@@ -309,31 +337,27 @@ def api_student_signup(request):
                             if subjects.count() == 1:
                                 subject = subjects.first()
                                 final_subject_ids.append(subject.id)
-                                print(f"Found subject by partial name: {subject.name} (ID: {subject.id})")
                             elif subjects.count() > 1:
-                                print(f"Multiple subjects found for '{subject_item}': {[s.name for s in subjects]}")
                                 # Take the first exact match or shortest name
                                 subject = min(subjects, key=lambda s: len(s.name))
                                 final_subject_ids.append(subject.id)
-                                print(f"Using shortest match: {subject.name} (ID: {subject.id})")
                             else:
-                                print(f"Subject not found: {subject_item}")
+                                logger.debug('signup subject not found: %s', subject_item)
                                 continue
                         except Exception as e:
-                            print(f"Error finding subject '{subject_item}': {e}")
+                            logger.warning('error finding subject %r: %s', subject_item, e)
                             continue
                     except Subject.MultipleObjectsReturned:
-                        print(f"Multiple exact matches for '{subject_item}'")
+                        logger.debug('multiple exact subject matches for %r', subject_item)
                         continue
                 else:
                     # It's already an ID
                     try:
                         final_subject_ids.append(int(subject_item))
                     except ValueError:
-                        print(f"Invalid subject ID: {subject_item}")
+                        logger.debug('invalid subject id: %r', subject_item)
                         continue
             
-            print(f"Final subject IDs: {final_subject_ids}")
             student.subjects_selected.set(final_subject_ids)
         
         # Auto-login the user after successful signup
@@ -341,7 +365,7 @@ def api_student_signup(request):
         request.session['student_name'] = student.name
         request.session['user_type'] = 'student'
         
-        print(f"Auto-login successful for student: {student.name} (ID: {student.id})")
+        logger.info('student signed up', extra={'student_id': student.id})
         
         return JsonResponse({
             'success': True,
@@ -369,19 +393,15 @@ def api_student_signup(request):
         })
         
     except KeyError as e:
-        print(f"Missing field error: {str(e)}")
-        print(f"Received data: {data}")
-        print(f"Available keys: {list(data.keys())}")
-        
-        # Check if the field exists but is empty
         field_name = str(e).strip("'")
-        if field_name in data:
-            print(f"Field {field_name} exists but has value: {repr(data[field_name])}")
+        logger.info('student signup missing field %s', field_name)
         
         return JsonResponse({
             'success': False,
             'message': f'Missing required field: {field_name}. Received fields: {list(data.keys())}'
         }, status=400)
+    except HashingPoolBusy:
+        return signup_busy_response()
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -392,23 +412,18 @@ def api_student_signup(request):
 @require_http_methods(["POST"])
 def api_student_login(request):
     try:
-        print("=== STUDENT LOGIN DEBUG ===")
         data = json.loads(request.body)
         email = data['email']
         password = data['password']
-        print(f"Login attempt - Email: {repr(email)}, Password: {repr(password)}")
         
-        # Check if student exists with this email
-        try:
-            student_by_email = Student.objects.get(email=email)
-            print(f"Student found by email: {student_by_email.name}")
-            print(f"Stored password: {repr(student_by_email.password)}")
-            print(f"Provided password: {repr(password)}")
-            print(f"Passwords match: {student_by_email.password == password}")
-        except Student.DoesNotExist:
-            print(f"No student found with email: {email}")
+        throttled = throttle_login(request, email)
+        if throttled:
+            return throttled
         
-        student = Student.objects.get(email=email, password=password)
+        # Legacy plaintext passwords are verified and rehashed by check_password
+        student = Student.objects.select_related('student_class').get(email=email)
+        if not student.check_password(password):
+            raise Student.DoesNotExist
         
         # Store in session
         request.session['student_id'] = student.id
@@ -418,10 +433,7 @@ def api_student_login(request):
         # Force session save
         request.session.save()
         
-        print(f"=== LOGIN DEBUG ===")
-        print(f"Student logged in: {student.name}")
-        print(f"Session key: {request.session.session_key}")
-        print(f"Session data: {dict(request.session)}")
+        logger.info('student logged in', extra={'student_id': student.id})
         
         # Generate a simple auth token (session key)
         auth_token = request.session.session_key
@@ -458,6 +470,8 @@ def api_student_login(request):
             'success': False,
             'message': 'Invalid email or password'
         }, status=401)
+    except HashingPoolBusy:
+        return login_busy_response()
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -469,6 +483,11 @@ def api_student_login(request):
 def api_faculty_login(request):
     try:
         data = json.loads(request.body)
+        
+        throttled = throttle_login(request, data.get('email'))
+        if throttled:
+            return throttled
+        
         faculty = Faculty.objects.get(email=data.get('email'))
         
         if not faculty.check_password(data.get('password')):
@@ -509,6 +528,8 @@ def api_faculty_login(request):
             'success': False,
             'message': 'Faculty not found'
         }, status=401)
+    except HashingPoolBusy:
+        return login_busy_response()
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -563,6 +584,8 @@ def api_faculty_signup(request):
             'success': False,
             'message': f'Missing required field: {str(e)}'
         }, status=400)
+    except HashingPoolBusy:
+        return signup_busy_response()
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -609,6 +632,8 @@ def api_principal_signup(request):
             'success': False,
             'message': f'Missing required field: {str(e)}'
         }, status=400)
+    except HashingPoolBusy:
+        return signup_busy_response()
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -619,21 +644,19 @@ def api_principal_signup(request):
 @require_http_methods(["POST"])
 def api_principal_login(request):
     try:
-        print("=== PRINCIPAL LOGIN DEBUG ===")
         data = json.loads(request.body)
         email = data['email']
         password = data['password']
-        print(f"Principal login attempt - Email: {repr(email)}, Password: {repr(password)}")
+        
+        throttled = throttle_login(request, email)
+        if throttled:
+            return throttled
         
         # Find principal by email first
         try:
             principal = Principal.objects.get(email=email)
-            print(f"Principal found by email: {principal.name}")
-            
             # Check password using the proper method
             if principal.check_password(password):
-                print(f"Password check successful for principal: {principal.name}")
-                
                 # Store in session
                 request.session['principal_id'] = principal.id
                 request.session['principal_name'] = principal.name
@@ -642,10 +665,7 @@ def api_principal_login(request):
                 # Force session save
                 request.session.save()
                 
-                print(f"=== PRINCIPAL LOGIN SUCCESS ===")
-                print(f"Principal logged in: {principal.name}")
-                print(f"Session key: {request.session.session_key}")
-                print(f"Session data: {dict(request.session)}")
+                logger.info('principal logged in', extra={'principal_id': principal.id})
                 
                 # Generate a simple auth token (session key)
                 auth_token = request.session.session_key
@@ -663,21 +683,22 @@ def api_principal_login(request):
                     }
                 })
             else:
-                print(f"Password check failed for principal: {principal.name}")
+                logger.info('principal login failed', extra={'principal_id': principal.id})
                 return JsonResponse({
                     'success': False,
                     'message': 'Invalid email or password'
                 }, status=401)
                 
         except Principal.DoesNotExist:
-            print(f"No principal found with email: {email}")
             return JsonResponse({
                 'success': False,
                 'message': 'Invalid email or password'
             }, status=401)
             
+    except HashingPoolBusy:
+        return login_busy_response()
     except Exception as e:
-        print(f"Principal login error: {str(e)}")
+        logger.exception('principal login error')
         return JsonResponse({
             'success': False,
             'message': f'Login error: {str(e)}'
@@ -703,24 +724,15 @@ def api_logout(request):
 def api_check_auth(request):
     """Check if user is authenticated and return user data"""
     try:
-        print("=== CHECK AUTH DEBUG ===")
-        print(f"Session key: {request.session.session_key}")
-        print(f"Session data: {dict(request.session)}")
-        print(f"Authorization header: {request.META.get('HTTP_AUTHORIZATION', 'None')}")
-        
         # Check for auth token in headers first
         auth_token = request.META.get('HTTP_AUTHORIZATION')
         if auth_token and auth_token.startswith('Bearer '):
             token = auth_token.split(' ')[1]
-            print(f"🔑 Auth token received: {token}")
-            
             # Find session by token
             from django.contrib.sessions.models import Session
             try:
                 session_obj = Session.objects.get(session_key=token)
                 session_data = session_obj.get_decoded()
-                print(f"🔑 Token session data: {session_data}")
-                
                 # Check user type and get user data
                 if session_data.get('user_type') == 'student' and 'student_id' in session_data:
                     student = Student.objects.get(id=session_data['student_id'])
@@ -773,7 +785,7 @@ def api_check_auth(request):
                         }
                     })
             except (Session.DoesNotExist, Student.DoesNotExist, Faculty.DoesNotExist, Principal.DoesNotExist) as e:
-                print(f"❌ Token validation failed: {e}")
+                logger.debug('token validation failed: %s', e)
         
         # Fallback to session cookies
         user_type = request.session.get('user_type')
@@ -845,7 +857,7 @@ def api_check_auth(request):
         })
         
     except Exception as e:
-        print(f"Check auth error: {e}")
+        logger.exception('check auth error')
         return JsonResponse({
             'success': False,
             'authenticated': False,
@@ -892,7 +904,6 @@ def api_get_subjects(request):
                 grade_level = int(grade_level)
                 # Filter subjects by grade level
                 subjects = [s for s in Subject.objects.all() if s.is_available_for_grade(grade_level)]
-                print(f"Filtering subjects for grade {grade_level}: {[s.name for s in subjects]}")
             except ValueError:
                 # If invalid grade level, return all subjects
                 subjects = Subject.objects.all()
@@ -1062,11 +1073,11 @@ def api_get_student_marks(request):
         
         # Get student's selected subjects that are appropriate for their grade level
         student_grade = student.student_class.grade_level
-        student_subjects = student.subjects_selected.filter(
+        student_subjects = list(student.subjects_selected.filter(
             grade_levels__contains=str(student_grade)
-        )
+        ))
         
-        if not student_subjects.exists():
+        if not student_subjects:
             return JsonResponse({
                 'success': True,
                 'marks': [],
@@ -1076,8 +1087,8 @@ def api_get_student_marks(request):
                 'message': 'No subjects selected for the current grade level'
             })
         
-        # Get marks for selected subjects only
-        marks = StudentMark.objects.filter(
+        # Exam and legacy marks for selected subjects, from the unified read model
+        marks = UnifiedMark.objects.filter(
             student=student,
             subject__in=student_subjects
         ).select_related('subject').order_by('-exam_date', 'subject__name')
@@ -1087,22 +1098,33 @@ def api_get_student_marks(request):
         for mark in marks:
             marks_data.append({
                 'id': mark.id,
-                'subject': mark.subject.name,
+                'source': mark.source,
+                'subject': {
+                    'id': mark.subject.id,
+                    'name': mark.subject.name,
+                    'code': mark.subject.code
+                },
+                'exam_type': mark.exam_type,
+                'exam_name': mark.exam_name,
                 'exam_date': mark.exam_date,
-                'marks_obtained': mark.marks_obtained,
-                'total_marks': mark.total_marks,
-                'percentage': (mark.marks_obtained / mark.total_marks) * 100 if mark.total_marks else 0
+                'marks_obtained': float(mark.marks_obtained),
+                'total_marks': float(mark.total_marks),
+                'percentage': float(mark.percentage),
+                'grade': mark.grade,
+                'created_at': mark.created_at
             })
         
-        # Calculate subject-wise averages
+        # Subject-wise averages in one grouped query
+        averages = unified_subject_averages(student, student_subjects)
         subject_averages = {}
         for subject in student_subjects:
-            subject_marks = [m for m in marks_data if m['subject'] == subject.name]
-            if subject_marks:
-                avg = sum(m['percentage'] for m in subject_marks) / len(subject_marks)
-                subject_averages[subject.name] = round(avg, 2)
-            else:
-                subject_averages[subject.name] = 0
+            average, count = averages.get(subject.id, (None, 0))
+            subject_averages[subject.id] = {
+                'subject_name': subject.name,
+                'subject_code': subject.code,
+                'average_percentage': round(float(average), 2) if average is not None else 0,
+                'total_exams': count
+            }
         
         return JsonResponse({
             'success': True,
@@ -1551,6 +1573,10 @@ def api_admin_login(request):
                 'message': 'Username and password are required'
             }, status=400)
         
+        throttled = throttle_login(request, username)
+        if throttled:
+            return throttled
+        
         # Import AdminUser model
         from .models import AdminUser
         
@@ -1584,6 +1610,8 @@ def api_admin_login(request):
             'success': False,
             'message': 'Invalid JSON data'
         }, status=400)
+    except HashingPoolBusy:
+        return login_busy_response()
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -1855,6 +1883,8 @@ def api_admin_register_faculty(request):
             'success': False,
             'message': 'Invalid JSON data'
         }, status=400)
+    except HashingPoolBusy:
+        return signup_busy_response()
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -1922,6 +1952,8 @@ def api_admin_register_principal(request):
             'success': False,
             'message': 'Invalid JSON data'
         }, status=400)
+    except HashingPoolBusy:
+        return signup_busy_response()
     except Exception as e:
         return JsonResponse({
             'success': False,
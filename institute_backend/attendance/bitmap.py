@@ -0,0 +1,118 @@
+"""
+Attendance calendars from the monthly day bitmasks in AttendanceMonthly.
+
+A month is two 31-bit integers per student (bit 0 is the 1st): the days
+with a record and the days present. Percentages are popcounts, streaks run
+over the unpacked day bits of consecutive months, and class-wide views AND
+or OR the masks of every student, all as NumPy array operations.
+"""
+import calendar
+
+import numpy as np
+
+from .models import AttendanceMonthly
+from .rollup import month_start, next_month
+
+
+def month_range(first, last):
+    """First days of every month from first to last inclusive"""
+    months = []
+    current = month_start(first)
+    while current <= last:
+        months.append(current)
+        current = next_month(current)
+    return months
+
+
+def days_in_month(month):
+    return calendar.monthrange(month.year, month.month)[1]
+
+
+def unpack(masks):
+    """(..., 32) bool array of day bits, day 1 first"""
+    masks = np.asarray(masks, dtype='<u4')
+    return np.unpackbits(masks[..., None].view(np.uint8), axis=-1, bitorder='little').astype(bool)
+
+
+def popcount(masks):
+    """Set bits per element of an integer array"""
+    return unpack(masks).sum(axis=-1)
+
+
+def student_masks(student_ids, months):
+    """
+    (recorded, present) int64 arrays of shape (students, months) for the
+    given student ids and month starts, zero where no row exists
+    """
+    index = {student_id: i for i, student_id in enumerate(student_ids)}
+    month_index = {month: j for j, month in enumerate(months)}
+    recorded = np.zeros((len(student_ids), len(months)), dtype=np.int64)
+    present = np.zeros_like(recorded)
+    if not student_ids or not months:
+        return recorded, present
+    rows = AttendanceMonthly.objects.filter(
+        student_id__in=student_ids, month__gte=months[0], month__lte=months[-1]
+    ).order_by().values_list('student_id', 'month', 'recorded_mask', 'present_mask')
+    for student_id, month, recorded_mask, present_mask in rows:
+        i, j = index[student_id], month_index[month]
+        recorded[i, j] = recorded_mask
+        present[i, j] = present_mask
+    return recorded, present
+
+
+def streaks(recorded, present):
+    """
+    (current, longest) runs of consecutive recorded days present, for one
+    student's masks over consecutive months. Days without a record (holidays,
+    weekends) neither extend nor break a streak.
+    """
+    recorded_bits = unpack(recorded).reshape(-1)
+    present_bits = unpack(present).reshape(-1)[recorded_bits]
+    if not present_bits.size:
+        return 0, 0
+    # Positions of absences, with sentinels at both ends; runs lie between them
+    absences = np.flatnonzero(~present_bits)
+    bounds = np.concatenate(([-1], absences, [present_bits.size]))
+    runs = np.diff(bounds) - 1
+    return int(runs[-1]), int(runs.max())
+
+
+def calendar_months(months, recorded, present):
+    """Per-month calendar entries for one student's masks"""
+    recorded_counts = popcount(recorded)
+    present_counts = popcount(present)
+    return [
+        {
+            'month': month.strftime('%Y-%m'),
+            'days_in_month': days_in_month(month),
+            'recorded_mask': int(recorded[j]),
+            'present_mask': int(present[j]),
+            'days': int(recorded_counts[j]),
+            'present_days': int(present_counts[j]),
+        }
+        for j, month in enumerate(months)
+    ]
+
+
+def class_month(student_ids, month):
+    """
+    Masks for every student of a class in one month plus class-wide views:
+    days everyone recorded was present (AND), days anyone was present (OR),
+    and the number of students present on each day
+    """
+    recorded, present = student_masks(student_ids, [month])
+    recorded, present = recorded[:, 0], present[:, 0]
+    if not recorded.size:
+        return {'recorded': recorded, 'present': present, 'recorded_mask': 0, 'all_present_mask': 0,
+                'any_present_mask': 0, 'daily_present_counts': [0] * days_in_month(month)}
+    any_recorded = int(np.bitwise_or.reduce(recorded))
+    # A student with no record on a day does not block the AND view for that day
+    present_or_unrecorded = present | (~recorded & 0xFFFFFFFF)
+    return {
+        'recorded': recorded,
+        'present': present,
+        'recorded_mask': any_recorded,
+        'all_present_mask': int(np.bitwise_and.reduce(present_or_unrecorded)) & any_recorded,
+        'any_present_mask': int(np.bitwise_or.reduce(present)),
+        'daily_present_counts': unpack(present).sum(axis=0)[:days_in_month(month)].tolist(),
+    }
@@ -0,0 +1,130 @@
+"""
+Set-based attendance writes for AttendanceAdminView.
+
+AttendanceBatch validates a whole attendance_data payload for one or more
+dates with a single IN query for the student ids and a single query for the
+rows that already exist, then upsert_attendance writes every row in one
+INSERT ... ON CONFLICT DO UPDATE per batch inside a transaction.
+"""
+from datetime import datetime
+
+from django.db import transaction
+from rest_framework import serializers
+
+from accounts.models import Student
+from .models import Attendance
+from .signals import attendance_changed
+
+UPSERT_UNIQUE_FIELDS = ['student', 'date']
+UPSERT_UPDATE_FIELDS = ['present', 'updated_at']
+MAX_DATES = 31
+
+# Accepts true/false, 1/0, "yes"/"no" and the other spellings DRF understands
+_present_field = serializers.BooleanField()
+
+
+def parse_dates(date_str=None, date_list=None):
+    """
+    Dates for a POST body that has either "date" or "dates". Returns a sorted
+    list without duplicates; raises ValueError with a client-facing message.
+    """
+    if date_list in (None, '', []):
+        if not date_str:
+            raise ValueError('date field is required')
+        date_list = [date_str]
+    elif not isinstance(date_list, list):
+        raise ValueError('dates must be a list of YYYY-MM-DD strings')
+    if len(date_list) > MAX_DATES:
+        raise ValueError(f'At most {MAX_DATES} dates can be submitted at once')
+    try:
+        return sorted({datetime.strptime(str(value), '%Y-%m-%d').date() for value in date_list})
+    except ValueError:
+        raise ValueError('Invalid date format. Use YYYY-MM-DD')
+
+
+def upsert_attendance(records, batch_size=1000):
+    """
+    Insert or update Attendance instances on (student, date) in one
+    statement per batch. Returns the instances passed in.
+    """
+    if not records:
+        return records
+    with transaction.atomic():
+        Attendance.objects.bulk_create(
+            records,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=UPSERT_UNIQUE_FIELDS,
+            update_fields=UPSERT_UPDATE_FIELDS,
+        )
+        # bulk_create sends no post_save, so notify listeners directly
+        attendance_changed.send(
+            sender=Attendance,
+            student_ids={r.student_id for r in records},
+            dates={r.date for r in records},
+        )
+    return records
+
+
+class AttendanceBatch:
+    """
+    Validate attendance_data items for a list of dates. Each valid item is
+    applied to every date; a later item for the same student wins. Invalid
+    items are reported with the same messages as the old per-row loop and
+    skipped, the rest are still written.
+    """
+
+    def __init__(self, dates, items):
+        self.dates = dates
+        self.items = items
+        self.errors = []
+        self.records = []
+        self.created = 0
+        self.updated = 0
+
+    def validate(self):
+        present_by_student = {}
+        for item in self.items:
+            if not isinstance(item, dict):
+                self.errors.append(f'Missing student_id or present field in record: {item}')
+                continue
+            student_id = item.get('student_id')
+            present = item.get('present')
+            if student_id is None or present is None:
+                self.errors.append(f'Missing student_id or present field in record: {item}')
+                continue
+            try:
+                student_id = int(student_id)
+            except (TypeError, ValueError):
+                self.errors.append(f'Student with id {student_id} does not exist')
+                continue
+            try:
+                present = _present_field.to_internal_value(present)
+            except serializers.ValidationError:
+                self.errors.append(f'Invalid present value {present!r} for student {student_id}')
+                continue
+            present_by_student[student_id] = present
+
+        known = set(Student.objects.filter(id__in=present_by_student).values_list('id', flat=True))
+        for student_id in present_by_student:
+            if student_id not in known:
+                self.errors.append(f'Student with id {student_id} does not exist')
+        present_by_student = {k: v for k, v in present_by_student.items() if k in known}
+        if not present_by_student:
+            return self
+
+        existing = set(
+            Attendance.objects.filter(student_id__in=present_by_student, date__in=self.dates)
+            .order_by().values_list('student_id', 'date')
+        )
+        for attendance_date in self.dates:
+            for student_id, present in present_by_student.items():
+                self.records.append(Attendance(student_id=student_id, date=attendance_date, present=present))
+                if (student_id, attendance_date) in existing:
+                    self.updated += 1
+                else:
+                    self.created += 1
+        return self
+
+    def save(self):
+        return upsert_attendance(self.records)
@@ -0,0 +1,116 @@
+"""
+Students x dates attendance matrix for a class or a whole grade, streamed.
+
+matrix_rows() walks the students and a single Attendance query ordered the
+same way (class, student, date) side by side, so each student's row is
+complete as soon as the next student's records start and only one row is
+held in memory at a time. csv_stream() and ndjson_stream() turn the rows
+into chunks for a StreamingHttpResponse.
+"""
+import csv
+import json
+
+from accounts.models import Student
+from .models import Attendance
+
+MAX_EXPORT_DAYS = 366
+# Rows fetched per round trip while streaming
+FETCH_SIZE = 2000
+
+CELL_VALUES = {True: 'P', False: 'A', None: ''}
+
+
+def matrix_students(student_class=None, grade_level=None):
+    students = Student.objects.all()
+    if student_class is not None:
+        students = students.filter(student_class=student_class)
+    if grade_level is not None:
+        students = students.filter(student_class__grade_level=grade_level)
+    return students
+
+
+def matrix_dates(students, start_date, end_date):
+    """Dates in the range on which any of the students has a record"""
+    return list(
+        Attendance.objects.filter(student__in=students, date__range=(start_date, end_date))
+        .order_by('date').values_list('date', flat=True).distinct()
+    )
+
+
+def matrix_rows(students, dates):
+    """
+    Yield (student, cells) per student, where cells[i] is True, False or
+    None (no record) for dates[i]
+    """
+    position = {day: i for i, day in enumerate(dates)}
+    students = (
+        students.order_by('student_class_id', 'id')
+        .values('id', 'name', 'roll_id', 'student_class__name')
+    )
+    records = iter(())
+    if dates:
+        records = (
+            Attendance.objects.filter(student__in=students.values('id'), date__range=(dates[0], dates[-1]))
+            .order_by('student__student_class_id', 'student_id', 'date')
+            .values_list('student_id', 'date', 'present')
+            .iterator(chunk_size=FETCH_SIZE)
+        )
+    pending = next(records, None)
+    for student in students.iterator(chunk_size=FETCH_SIZE):
+        cells = [None] * len(dates)
+        while pending is not None and pending[0] == student['id']:
+            cells[position[pending[1]]] = pending[2]
+            pending = next(records, None)
+        yield student, cells
+
+
+def _totals(cells):
+    days = sum(cell is not None for cell in cells)
+    present_days = sum(cell is True for cell in cells)
+    percentage = round(present_days / days * 100, 2) if days else 0
+    return days, present_days, percentage
+
+
+class _Echo:
+    """File-like object whose write() hands back the line for streaming"""
+
+    def write(self, value):
+        return value
+
+
+def csv_stream(students, dates):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(
+        ['student_id', 'roll_id', 'name', 'class']
+        + [day.strftime('%Y-%m-%d') for day in dates]
+        + ['days', 'present_days', 'attendance_percentage']
+    )
+    for student, cells in matrix_rows(students, dates):
+        yield writer.writerow(
+            [student['id'], student['roll_id'], student['name'], student['student_class__name']]
+            + [CELL_VALUES[cell] for cell in cells]
+            + list(_totals(cells))
+        )
+
+
+def ndjson_stream(students, dates):
+    """A header line with the dates, then one object per student"""
+    yield json.dumps({'dates': [day.strftime('%Y-%m-%d') for day in dates]}) + '\n'
+    for student, cells in matrix_rows(students, dates):
+        days, present_days, percentage = _totals(cells)
+        yield json.dumps({
+            'student_id': student['id'],
+            'roll_id': student['roll_id'],
+            'name': student['name'],
+            'class': student['student_class__name'],
+            'present': cells,
+            'days': days,
+            'present_days': present_days,
+            'attendance_percentage': percentage,
+        }) + '\n'
+
+
+STREAMS = {
+    'csv': (csv_stream, 'text/csv'),
+    'ndjson': (ndjson_stream, 'application/x-ndjson'),
+}
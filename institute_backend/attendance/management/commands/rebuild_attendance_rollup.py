@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from attendance.rollup import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the monthly attendance rollup from the daily records. Run after deploying it, "
+        "or after attendance writes that bypassed signals (bulk_create, raw SQL)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {count} monthly attendance rows in {time.perf_counter() - started:.1f}s.'
+        ))
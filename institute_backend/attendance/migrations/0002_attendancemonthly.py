@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+
+
+def fill_monthly_counts(apps, schema_editor):
+    """Fill AttendanceMonthly from the existing daily rows, so summaries are right from this migration on"""
+    Attendance = apps.get_model('attendance', 'Attendance')
+    AttendanceMonthly = apps.get_model('attendance', 'AttendanceMonthly')
+    rows = (
+        Attendance.objects.order_by().annotate(month=TruncMonth('date'))
+        .values('student_id', 'month')
+        .annotate(days=Count('id'), present_days=Count('id', filter=Q(present=True)))
+    )
+    batch = []
+    for row in rows.iterator(chunk_size=5000):
+        batch.append(AttendanceMonthly(**row))
+        if len(batch) >= 5000:
+            AttendanceMonthly.objects.bulk_create(batch)
+            batch = []
+    AttendanceMonthly.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_adminuser'),
+        ('attendance', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceMonthly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('days', models.PositiveIntegerField(default=0)),
+                ('present_days', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attendance_months', to='accounts.student')),
+            ],
+            options={
+                'verbose_name': 'Monthly Attendance',
+                'verbose_name_plural': 'Monthly Attendance',
+                'ordering': ['-month'],
+                'unique_together': {('student', 'month')},
+            },
+        ),
+        migrations.RunPython(fill_monthly_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:55
+
+from django.db import migrations, models
+from django.db.models import BigIntegerField, Count, Q, Sum
+from django.db.models.functions import Cast, Coalesce, ExtractDay, Power, TruncMonth
+
+
+def build_monthly_rollup(apps, schema_editor):
+    """Fill AttendanceMonthly, masks included, from the existing daily rows"""
+    Attendance = apps.get_model('attendance', 'Attendance')
+    AttendanceMonthly = apps.get_model('attendance', 'AttendanceMonthly')
+    bit = Cast(Power(2, ExtractDay('date') - 1), BigIntegerField())
+    rows = (
+        Attendance.objects.order_by().annotate(month=TruncMonth('date'))
+        .values('student_id', 'month')
+        .annotate(
+            days=Count('id'),
+            present_days=Count('id', filter=Q(present=True)),
+            recorded_mask=Sum(bit),
+            present_mask=Coalesce(Sum(bit, filter=Q(present=True)), 0),
+        )
+    )
+    AttendanceMonthly.objects.all().delete()
+    batch = []
+    for row in rows.iterator(chunk_size=5000):
+        batch.append(AttendanceMonthly(**row))
+        if len(batch) >= 5000:
+            AttendanceMonthly.objects.bulk_create(batch)
+            batch = []
+    AttendanceMonthly.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0002_attendancemonthly'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancemonthly',
+            name='present_mask',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='attendancemonthly',
+            name='recorded_mask',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(build_monthly_rollup, migrations.RunPython.noop),
+    ]
@@ -3,6 +3,21 @@ from django.utils import timezone
 from accounts.models import Student
 
 
+class AttendanceQuerySet(models.QuerySet):
+    def delete(self):
+        """Delete, then report the removed days so rollups can be refreshed"""
+        from .signals import attendance_changed
+        removed = list(self.values_list('student_id', 'date'))
+        result = super().delete()
+        if removed:
+            attendance_changed.send(
+                sender=Attendance,
+                student_ids={student_id for student_id, _ in removed},
+                dates={day for _, day in removed},
+            )
+        return result
+
+
 class Attendance(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='attendance_records')
     date = models.DateField()
@@ -10,6 +25,8 @@ class Attendance(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = AttendanceQuerySet.as_manager()
+    
     class Meta:
         unique_together = ['student', 'date']
         ordering = ['-date', 'student__name']
@@ -24,3 +41,37 @@ class Attendance(models.Model):
     def __str__(self):
         status = "Present" if self.present else "Absent"
         return f"{self.student.name} - {self.date} ({status})"
+    
+    def delete(self, *args, **kwargs):
+        # Not a post_delete receiver: that would stop cascades from students
+        # fast-deleting attendance, and the rollup rows cascade on their own
+        from .signals import attendance_changed
+        result = super().delete(*args, **kwargs)
+        attendance_changed.send(sender=Attendance, student_ids={self.student_id}, dates={self.date})
+        return result
+
+
+class AttendanceMonthly(models.Model):
+    """
+    Days recorded and days present per student per calendar month, kept in
+    step with Attendance by attendance.rollup so range statistics read a
+    handful of rows instead of every daily record. The masks hold the same
+    month as bits (bit 0 is the 1st): recorded_mask marks days with a record
+    at all, present_mask the days the student was present.
+    """
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='attendance_months')
+    month = models.DateField()  # First day of the month
+    days = models.PositiveIntegerField(default=0)
+    present_days = models.PositiveIntegerField(default=0)
+    recorded_mask = models.BigIntegerField(default=0)
+    present_mask = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['student', 'month']
+        ordering = ['-month']
+        verbose_name = 'Monthly Attendance'
+        verbose_name_plural = 'Monthly Attendance'
+    
+    def __str__(self):
+        return f"{self.student.name} - {self.month:%Y-%m}: {self.present_days}/{self.days}"
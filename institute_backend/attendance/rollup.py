@@ -0,0 +1,152 @@
+"""
+Monthly attendance rollup and the summaries read from it.
+
+refresh_months() recomputes AttendanceMonthly (counts and day bitmasks) for
+the (student, month) pairs touched by a write with one grouped conditional
+aggregate, inside the writer's transaction. summary() answers a date range from whole-month rollup
+rows plus the daily rows of the partial months at either end, so a
+student's multi-year statistics cost two small queries.
+"""
+import datetime
+
+from django.db import transaction
+from django.db.models import BigIntegerField, Count, Q, Sum
+from django.db.models.functions import Cast, Coalesce, ExtractDay, Power, TruncMonth
+from django.dispatch import receiver
+
+from .models import Attendance, AttendanceMonthly
+from .signals import attendance_changed
+
+# Keeps IN (...) lists well under SQLite's bound parameter limit
+CHUNK_SIZE = 500
+
+
+def _as_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value)
+    return value
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (day.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+def day_bit():
+    """1 << (day of month - 1) as a SQL expression"""
+    return Cast(Power(2, ExtractDay('date') - 1), BigIntegerField())
+
+
+def _monthly_counts(queryset):
+    # (student, date) is unique, so summing each day's bit is a bitwise OR
+    return (
+        queryset.order_by().annotate(month=TruncMonth('date'))
+        .values('student_id', 'month')
+        .annotate(
+            days=Count('id'),
+            present_days=Count('id', filter=Q(present=True)),
+            recorded_mask=Sum(day_bit()),
+            present_mask=Coalesce(Sum(day_bit(), filter=Q(present=True)), 0),
+        )
+    )
+
+
+def refresh_months(student_ids, dates):
+    """Recompute the rollup for student_ids over the months spanned by dates"""
+    dates = [_as_date(d) for d in dates]
+    if not student_ids or not dates:
+        return
+    first = month_start(min(dates))
+    after = next_month(max(dates))
+    student_ids = sorted(student_ids)
+    with transaction.atomic(savepoint=False):
+        for start in range(0, len(student_ids), CHUNK_SIZE):
+            chunk = student_ids[start:start + CHUNK_SIZE]
+            AttendanceMonthly.objects.filter(
+                student_id__in=chunk, month__gte=first, month__lt=after
+            ).delete()
+            rows = _monthly_counts(Attendance.objects.filter(
+                student_id__in=chunk, date__gte=first, date__lt=after
+            ))
+            AttendanceMonthly.objects.bulk_create([AttendanceMonthly(**row) for row in rows], batch_size=CHUNK_SIZE)
+
+
+def rebuild(students=None, batch_size=5000):
+    """Recompute the whole rollup, or only for a queryset of students. Returns the row count"""
+    daily = Attendance.objects.all()
+    monthly = AttendanceMonthly.objects.all()
+    if students is not None:
+        daily = daily.filter(student__in=students)
+        monthly = monthly.filter(student__in=students)
+    with transaction.atomic():
+        monthly.delete()
+        count = 0
+        batch = []
+        for row in _monthly_counts(daily).iterator(chunk_size=batch_size):
+            batch.append(AttendanceMonthly(**row))
+            if len(batch) >= batch_size:
+                AttendanceMonthly.objects.bulk_create(batch)
+                count += len(batch)
+                batch = []
+        AttendanceMonthly.objects.bulk_create(batch)
+    return count + len(batch)
+
+
+def daily_summary(queryset):
+    """(days, present_days) for daily Attendance rows in one conditional aggregate"""
+    totals = queryset.order_by().aggregate(days=Count('id'), present_days=Count('id', filter=Q(present=True)))
+    return totals['days'], totals['present_days']
+
+
+def summary(student, start_date=None, end_date=None):
+    """
+    {'total_days', 'present_days', 'absent_days', 'attendance_percentage'}
+    for a student, optionally limited to an inclusive date range
+    """
+    # Whole months [full_from, full_until) come from the rollup, the partial
+    # months at either end of the range from the daily rows
+    full_from = full_until = None
+    if start_date:
+        full_from = start_date if start_date.day == 1 else next_month(start_date)
+    if end_date:
+        after_end = end_date + datetime.timedelta(days=1)
+        full_until = after_end if after_end.day == 1 else month_start(end_date)
+
+    total_days = present_days = 0
+    if full_from and full_until and full_from >= full_until:
+        # No whole month inside the range
+        edges = Q(date__gte=start_date, date__lte=end_date)
+    else:
+        months = AttendanceMonthly.objects.filter(student=student)
+        edges = Q(pk__in=[])
+        if full_from:
+            months = months.filter(month__gte=full_from)
+            edges |= Q(date__gte=start_date, date__lt=full_from)
+        if full_until:
+            months = months.filter(month__lt=full_until)
+            edges |= Q(date__gte=full_until, date__lte=end_date)
+        totals = months.order_by().aggregate(days=Sum('days'), present_days=Sum('present_days'))
+        total_days = totals['days'] or 0
+        present_days = totals['present_days'] or 0
+        if not (full_from or full_until):
+            edges = None
+    if edges is not None:
+        days, present = daily_summary(Attendance.objects.filter(student=student).filter(edges))
+        total_days += days
+        present_days += present
+    return {
+        'total_days': total_days,
+        'present_days': present_days,
+        'absent_days': total_days - present_days,
+        'attendance_percentage': round((present_days / total_days * 100), 2) if total_days > 0 else 0,
+    }
+
+
+@receiver(attendance_changed)
+def refresh_on_attendance_changed(sender, student_ids, dates, **kwargs):
+    refresh_months(student_ids, dates)
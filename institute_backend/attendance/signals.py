@@ -0,0 +1,19 @@
+"""
+Change notifications for attendance.
+
+attendance_changed is sent with the sets of affected student_ids and dates.
+Single-row saves are translated into it here; bulk upserts
+(attendance.bulk.upsert_attendance) and deletes through Attendance.delete()
+or a queryset send it themselves. Derived tables listen to this one signal.
+"""
+from django.db.models.signals import post_save
+from django.dispatch import Signal, receiver
+
+from .models import Attendance
+
+attendance_changed = Signal()
+
+
+@receiver(post_save, sender=Attendance)
+def attendance_row_saved(sender, instance, **kwargs):
+    attendance_changed.send(sender=Attendance, student_ids={instance.student_id}, dates={instance.date})
@@ -439,6 +439,72 @@ class AttendanceAdminViewTest(APITestCase):
         self.assertIn('errors', data)
         self.assertEqual(data['created'], 0)
 
+    
+    def post_json(self, payload):
+        return self.client.post(self.url, data=json.dumps(payload), content_type='application/json')
+    
+    def test_post_multiple_dates(self):
+        """POST with dates back-fills every day, counting existing rows as updates"""
+        monday = self.test_date - timedelta(days=self.test_date.weekday())
+        week = [monday + timedelta(days=i) for i in range(5)]
+        Attendance.objects.create(student=self.student_9a, date=week[2], present=False)
+        
+        response = self.post_json({
+            'dates': [d.strftime('%Y-%m-%d') for d in week],
+            'attendance_data': [
+                {'student_id': self.student_9a.id, 'present': True},
+                {'student_id': self.student_9b.id, 'present': 'false'}
+            ]
+        })
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual((data['created'], data['updated']), (9, 1))
+        self.assertEqual(data['dates'], [d.strftime('%Y-%m-%d') for d in week])
+        self.assertEqual(Attendance.objects.filter(student=self.student_9a, present=True).count(), 5)
+        self.assertEqual(Attendance.objects.filter(student=self.student_9b, present=False).count(), 5)
+    
+    def test_post_uses_constant_queries(self):
+        """Query count does not grow with the number of students or dates"""
+        items = [{'student_id': s.id, 'present': True}
+                 for s in (self.student_9a, self.student_9b, self.student_10a)]
+        dates = [(self.test_date - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(7)]
+        # Includes the delete / aggregate / insert that refresh the monthly rollup
+        # and the select / select / save that update the students' risk state
+        with self.assertNumQueries(11):
+            response = self.post_json({'dates': dates, 'attendance_data': items})
+        self.assertEqual(response.json()['created'], 21)
+    
+    def test_post_reports_item_errors(self):
+        """Invalid items are reported individually while valid ones are saved"""
+        response = self.post_json({
+            'date': self.test_date.strftime('%Y-%m-%d'),
+            'attendance_data': [
+                {'student_id': self.student_9a.id, 'present': True},
+                {'student_id': self.student_9b.id},
+                {'student_id': 99999, 'present': False},
+                {'student_id': self.student_10a.id, 'present': 'maybe'}
+            ]
+        })
+        
+        data = response.json()
+        self.assertTrue(data['partial_success'])
+        self.assertEqual(data['created'], 1)
+        self.assertEqual(len(data['errors']), 3)
+        self.assertIn('Student with id 99999 does not exist', data['errors'])
+        self.assertEqual(Attendance.objects.count(), 1)
+    
+    def test_post_invalid_dates(self):
+        """Malformed or too many dates are rejected before anything is written"""
+        item = [{'student_id': self.student_9a.id, 'present': True}]
+        response = self.post_json({'dates': ['2025-01-01', 'not-a-date'], 'attendance_data': item})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Invalid date format', response.json()['message'])
+        
+        too_many = [(self.test_date - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(32)]
+        response = self.post_json({'dates': too_many, 'attendance_data': item})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Attendance.objects.count(), 0)
 
 class StudentAttendanceViewTest(APITestCase):
     """Integration tests for StudentAttendanceView"""
@@ -547,4 +613,222 @@ class StudentAttendanceViewTest(APITestCase):
         
         self.assertEqual(len(data['attendance_history']), 0)
         self.assertEqual(data['summary']['total_days'], 0)
-        self.assertEqual(data['summary']['attendance_percentage'], 0)
\ No newline at end of file
+        self.assertEqual(data['summary']['attendance_percentage'], 0)
+
+class AttendanceRollupTest(TestCase):
+    """Test cases for the monthly attendance rollup and range summaries"""
+    
+    def setUp(self):
+        """Create a student with attendance spread over three months"""
+        self.test_class = Class.objects.create(name="Rollup 9", grade_level=9)
+        self.student = Student.objects.create(
+            name="Rollup Student", email="rollup@example.com", password="password123",
+            roll_id="ROLL1", student_class=self.test_class
+        )
+        start = date(2025, 1, 20)
+        for i in range(60):
+            Attendance.objects.create(student=self.student, date=start + timedelta(days=i), present=i % 3 != 0)
+    
+    def months(self):
+        from .models import AttendanceMonthly
+        return list(AttendanceMonthly.objects.filter(student=self.student).order_by('month')
+                    .values_list('month', 'days', 'present_days'))
+    
+    def test_rollup_follows_writes(self):
+        """Saves, bulk upserts and deletes keep the monthly counts exact"""
+        from .bulk import upsert_attendance
+        self.assertEqual(self.months(), [(date(2025, 1, 1), 12, 8), (date(2025, 2, 1), 28, 18),
+                                         (date(2025, 3, 1), 20, 14)])
+        
+        record = Attendance.objects.get(student=self.student, date=date(2025, 1, 20))
+        record.present = True
+        record.save()
+        upsert_attendance([Attendance(student=self.student, date=date(2025, 4, 1), present=True)])
+        Attendance.objects.get(student=self.student, date=date(2025, 3, 20)).delete()
+        Attendance.objects.filter(student=self.student, date__lt=date(2025, 1, 25)).delete()
+        
+        self.assertEqual(self.months(), [(date(2025, 1, 1), 7, 5), (date(2025, 2, 1), 28, 18),
+                                         (date(2025, 3, 1), 19, 13), (date(2025, 4, 1), 1, 1)])
+    
+    def test_summary_matches_daily_rows(self):
+        """Range summaries from the rollup equal counting the daily rows directly"""
+        from .rollup import daily_summary, summary
+        ranges = [(None, None), (date(2025, 2, 1), None), (None, date(2025, 2, 28)),
+                  (date(2025, 1, 25), date(2025, 3, 5)), (date(2025, 2, 3), date(2025, 2, 10)),
+                  (date(2025, 2, 1), date(2025, 3, 31)), (date(2024, 12, 31), date(2025, 1, 1))]
+        for start_date, end_date in ranges:
+            records = Attendance.objects.filter(student=self.student)
+            if start_date:
+                records = records.filter(date__gte=start_date)
+            if end_date:
+                records = records.filter(date__lte=end_date)
+            days, present = daily_summary(records)
+            result = summary(self.student, start_date, end_date)
+            self.assertEqual((result['total_days'], result['present_days']), (days, present),
+                             (start_date, end_date))
+    
+    def test_history_view_queries(self):
+        """The student history view needs no per-record or per-statistic queries"""
+        url = reverse('student-attendance', args=[self.student.id])
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.json()['summary'], {
+            'total_days': 60, 'present_days': 40, 'absent_days': 20, 'attendance_percentage': 66.67,
+        })
+        self.assertEqual(len(response.json()['attendance_history']), 60)
+        with self.assertNumQueries(4):
+            self.client.get(url, {'start_date': '2025-02-10', 'end_date': '2025-03-31'})
+    
+    def test_rebuild_command(self):
+        """rebuild_attendance_rollup restores counts after writes that skip signals"""
+        from io import StringIO
+        from django.core.management import call_command
+        expected = self.months()
+        Attendance.objects.bulk_create([Attendance(student=self.student, date=date(2025, 5, 2), present=False)])
+        
+        call_command('rebuild_attendance_rollup', stdout=StringIO())
+        self.assertEqual(self.months(), expected + [(date(2025, 5, 1), 1, 0)])
+
+
+class AttendanceBitmapTest(TestCase):
+    """Test cases for the attendance bitmasks and calendar endpoints"""
+    
+    def setUp(self):
+        """Two students in a class with a few weeks of attendance"""
+        self.test_class = Class.objects.create(name="Bitmap 9", grade_level=9)
+        self.students = [
+            Student.objects.create(name=f"Bitmap Student {i}", email=f"bitmap{i}@example.com",
+                                   password="password123", roll_id=f"BIT{i}", student_class=self.test_class)
+            for i in range(2)
+        ]
+        # Student 0: present 1-10 Jan, absent 13 Jan, present 14 Jan - 5 Feb (weekdays only)
+        # Student 1: present on even days of January only
+        day = date(2025, 1, 1)
+        while day <= date(2025, 2, 5):
+            if day.weekday() < 5:
+                Attendance.objects.create(student=self.students[0], date=day, present=day != date(2025, 1, 13))
+                if day.month == 1:
+                    Attendance.objects.create(student=self.students[1], date=day, present=day.day % 2 == 0)
+            day += timedelta(days=1)
+    
+    def test_masks_match_daily_rows(self):
+        """Each monthly mask has exactly the bits of the daily records"""
+        from .models import AttendanceMonthly
+        for row in AttendanceMonthly.objects.all():
+            records = Attendance.objects.filter(student=row.student, date__year=row.month.year,
+                                                date__month=row.month.month)
+            self.assertEqual(row.recorded_mask, sum(1 << (r.date.day - 1) for r in records))
+            self.assertEqual(row.present_mask, sum(1 << (r.date.day - 1) for r in records if r.present))
+            self.assertEqual(bin(row.present_mask).count('1'), row.present_days)
+    
+    def test_student_calendar(self):
+        """The calendar returns masks per month with percentages and streaks"""
+        url = reverse('student-attendance-calendar', args=[self.students[0].id])
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'start_month': '2024-12', 'end_month': '2025-02'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        
+        self.assertEqual([m['month'] for m in data['months']], ['2024-12', '2025-01', '2025-02'])
+        january = data['months'][1]
+        self.assertEqual(january['days_in_month'], 31)
+        self.assertEqual(january['recorded_mask'] & (1 << 12), 1 << 12)
+        self.assertEqual(january['present_mask'] & (1 << 12), 0)
+        self.assertEqual(data['months'][0]['recorded_mask'], 0)
+        # Weekdays 14 Jan - 5 Feb: 14-17, 20-24, 27-31 Jan and 3-5 Feb
+        self.assertEqual((data['summary']['current_streak'], data['summary']['longest_streak']), (17, 17))
+        self.assertEqual(data['summary']['total_days'], 26)
+        self.assertEqual(data['summary']['present_days'], 25)
+    
+    def test_class_calendar(self):
+        """Class-wide AND/OR masks and per-day counts"""
+        url = reverse('class-attendance-calendar', args=[self.test_class.id])
+        response = self.client.get(url, {'month': '2025-01'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        
+        even_weekdays = sum(1 << (d - 1) for d in range(1, 32)
+                            if d % 2 == 0 and date(2025, 1, d).weekday() < 5 and d != 13)
+        self.assertEqual(data['all_present_mask'], even_weekdays)
+        self.assertEqual(data['any_present_mask'], data['students'][0]['present_mask'])
+        self.assertEqual(data['daily_present_counts'][1], 2)  # 2 Jan: both present
+        self.assertEqual(data['daily_present_counts'][2], 1)  # 3 Jan: odd day
+        self.assertEqual(data['daily_present_counts'][3], 0)  # 4 Jan: Saturday
+    
+    def test_invalid_ranges(self):
+        """Malformed months and oversized ranges are rejected"""
+        url = reverse('student-attendance-calendar', args=[self.students[0].id])
+        self.assertEqual(self.client.get(url, {'end_month': '2025-13'}).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(url, {'start_month': '2020-01', 'end_month': '2025-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        missing = reverse('class-attendance-calendar', args=[99999])
+        self.assertEqual(self.client.get(missing).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class AttendanceMatrixExportTest(APITestCase):
+    """Test cases for the streamed class x date attendance matrix"""
+    
+    def setUp(self):
+        """Two grade 11 sections, one student without any records"""
+        self.section_a = Class.objects.create(name="Matrix 11A", grade_level=11)
+        self.section_b = Class.objects.create(name="Matrix 11B", grade_level=11)
+        self.alice = Student.objects.create(name="Alice Matrix", email="alice.matrix@example.com",
+                                            password="password123", roll_id="MX1", student_class=self.section_a)
+        self.bob = Student.objects.create(name="Bob Matrix", email="bob.matrix@example.com",
+                                          password="password123", roll_id="MX2", student_class=self.section_a)
+        self.carol = Student.objects.create(name="Carol Matrix", email="carol.matrix@example.com",
+                                            password="password123", roll_id="MX3", student_class=self.section_b)
+        Attendance.objects.create(student=self.alice, date=date(2025, 3, 3), present=True)
+        Attendance.objects.create(student=self.alice, date=date(2025, 3, 4), present=False)
+        Attendance.objects.create(student=self.carol, date=date(2025, 3, 4), present=True)
+        Attendance.objects.create(student=self.carol, date=date(2025, 4, 1), present=True)
+        self.url = reverse('attendance-matrix')
+    
+    def read(self, response):
+        return b''.join(response.streaming_content).decode()
+    
+    def test_csv_matrix_for_class(self):
+        """A class export has every student, recorded dates as columns and totals"""
+        import csv
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url, {'class_id': self.section_a.id, 'start_date': '2025-03-01',
+                                                  'end_date': '2025-03-31'})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            rows = list(csv.reader(self.read(response).splitlines()))
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('attachment;', response['Content-Disposition'])
+        self.assertEqual(rows[0], ['student_id', 'roll_id', 'name', 'class', '2025-03-03', '2025-03-04',
+                                   'days', 'present_days', 'attendance_percentage'])
+        self.assertEqual(rows[1], [str(self.alice.id), 'MX1', 'Alice Matrix', 'Matrix 11A', 'P', 'A', '2', '1', '50.0'])
+        self.assertEqual(rows[2], [str(self.bob.id), 'MX2', 'Bob Matrix', 'Matrix 11A', '', '', '0', '0', '0'])
+        self.assertEqual(len(rows), 3)
+    
+    def test_ndjson_matrix_for_grade(self):
+        """A grade export covers all its sections as one JSON object per line"""
+        response = self.client.get(self.url, {'class_grade': '11', 'start_date': '2025-03-01',
+                                              'end_date': '2025-04-30', 'output': 'ndjson'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        lines = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual(lines[0], {'dates': ['2025-03-03', '2025-03-04', '2025-04-01']})
+        by_roll = {line['roll_id']: line for line in lines[1:]}
+        self.assertEqual(list(by_roll), ['MX1', 'MX2', 'MX3'])
+        self.assertEqual(by_roll['MX1']['present'], [True, False, None])
+        self.assertEqual(by_roll['MX3']['present'], [None, True, True])
+        self.assertEqual(by_roll['MX3']['attendance_percentage'], 100.0)
+    
+    def test_invalid_parameters(self):
+        """Missing scope, bad dates, long ranges and unknown outputs are rejected"""
+        march = {'start_date': '2025-03-01', 'end_date': '2025-03-31'}
+        cases = [
+            (march, status.HTTP_400_BAD_REQUEST),
+            ({'class_grade': '8', **march}, status.HTTP_400_BAD_REQUEST),
+            ({'class_id': '999999', **march}, status.HTTP_404_NOT_FOUND),
+            ({'class_grade': '11', 'start_date': '2025-03-01'}, status.HTTP_400_BAD_REQUEST),
+            ({'class_grade': '11', 'start_date': '2024-01-01', 'end_date': '2025-03-31'},
+             status.HTTP_400_BAD_REQUEST),
+            ({'class_grade': '11', 'output': 'xml', **march}, status.HTTP_400_BAD_REQUEST),
+        ]
+        for params, expected in cases:
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, expected, params)
+            self.assertTrue(response.json()['error'])
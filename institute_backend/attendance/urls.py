@@ -7,4 +7,13 @@ urlpatterns = [
     
     # Student attendance history endpoint
     path('student/<int:student_id>/', views.StudentAttendanceView.as_view(), name='student-attendance'),
+    
+    # Students x dates matrix export (CSV or NDJSON, streamed)
+    path('matrix/', views.AttendanceMatrixView.as_view(), name='attendance-matrix'),
+    
+    # Attendance calendars as monthly day bitmasks
+    path('student/<int:student_id>/calendar/', views.StudentAttendanceCalendarView.as_view(),
+         name='student-attendance-calendar'),
+    path('class/<int:class_id>/calendar/', views.ClassAttendanceCalendarView.as_view(),
+         name='class-attendance-calendar'),
 ]
\ No newline at end of file
@@ -1,4 +1,5 @@
 from django.shortcuts import render
+from django.http import StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -6,6 +7,10 @@ from django.utils import timezone
 from datetime import datetime
 from accounts.models import Student, Class
 from .models import Attendance
+from .bulk import AttendanceBatch, parse_dates
+from .rollup import summary as attendance_summary
+from .export import MAX_EXPORT_DAYS, STREAMS, matrix_dates, matrix_students
+from .bitmap import calendar_months, class_month, days_in_month, month_range, streaks, student_masks
 from .serializers import AttendanceSerializer, UserSerializer
 
 
@@ -96,25 +101,21 @@ class AttendanceAdminView(APIView):
                 {"student_id": 2, "present": false}
             ]
         }
+        Pass "dates": ["2025-08-04", "2025-08-05", ...] instead of "date" to
+        apply the same attendance_data to several days (up to 31), e.g. to
+        back-fill a week. All rows are written with one bulk upsert.
         """
         try:
             # Get request data
-            date_str = request.data.get('date')
             attendance_data = request.data.get('attendance_data', [])
             
-            # Validate date
-            if not date_str:
-                return Response({
-                    'error': True,
-                    'message': 'date field is required'
-                }, status=status.HTTP_400_BAD_REQUEST)
-            
+            # Validate dates
             try:
-                attendance_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-            except ValueError:
+                dates = parse_dates(request.data.get('date'), request.data.get('dates'))
+            except ValueError as e:
                 return Response({
                     'error': True,
-                    'message': 'Invalid date format. Use YYYY-MM-DD'
+                    'message': str(e)
                 }, status=status.HTTP_400_BAD_REQUEST)
             
             # Validate attendance data
@@ -124,49 +125,21 @@ class AttendanceAdminView(APIView):
                     'message': 'attendance_data must be a non-empty list'
                 }, status=status.HTTP_400_BAD_REQUEST)
             
-            created_count = 0
-            updated_count = 0
-            errors = []
-            
-            # Process each attendance record
-            for item in attendance_data:
-                student_id = item.get('student_id')
-                present = item.get('present')
-                
-                # Validate individual record
-                if student_id is None or present is None:
-                    errors.append(f'Missing student_id or present field in record: {item}')
-                    continue
-                
-                try:
-                    student = Student.objects.get(id=student_id)
-                except Student.DoesNotExist:
-                    errors.append(f'Student with id {student_id} does not exist')
-                    continue
-                
-                # Create or update attendance record
-                attendance_record, created = Attendance.objects.update_or_create(
-                    student=student,
-                    date=attendance_date,
-                    defaults={'present': present}
-                )
-                
-                if created:
-                    created_count += 1
-                else:
-                    updated_count += 1
+            batch = AttendanceBatch(dates, attendance_data).validate()
+            batch.save()
             
             # Prepare response
             response_data = {
                 'success': True,
                 'message': f'Attendance processed successfully',
-                'created': created_count,
-                'updated': updated_count,
-                'date': attendance_date.strftime('%Y-%m-%d')
+                'created': batch.created,
+                'updated': batch.updated,
+                'date': dates[0].strftime('%Y-%m-%d'),
+                'dates': [d.strftime('%Y-%m-%d') for d in dates]
             }
             
-            if errors:
-                response_data['errors'] = errors
+            if batch.errors:
+                response_data['errors'] = batch.errors
                 response_data['partial_success'] = True
             
             return Response(response_data, status=status.HTTP_200_OK)
@@ -196,7 +169,7 @@ class StudentAttendanceView(APIView):
         try:
             # Get student
             try:
-                student = Student.objects.get(id=student_id)
+                student = Student.objects.select_related('student_class').get(id=student_id)
             except Student.DoesNotExist:
                 return Response({
                     'error': True,
@@ -206,6 +179,7 @@ class StudentAttendanceView(APIView):
             # Get date filters if provided
             start_date_str = request.query_params.get('start_date')
             end_date_str = request.query_params.get('end_date')
+            start_date = end_date = None
             
             # Build query for attendance records
             attendance_query = Attendance.objects.filter(student=student)
@@ -231,23 +205,18 @@ class StudentAttendanceView(APIView):
                         'message': 'Invalid end_date format. Use YYYY-MM-DD'
                     }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Get attendance records ordered by date (most recent first)
-            attendance_records = attendance_query.order_by('-date')
+            # Statistics from the monthly rollup plus any partial months at the range ends
+            summary = attendance_summary(student, start_date, end_date)
             
-            # Calculate statistics
-            total_days = attendance_records.count()
-            present_days = attendance_records.filter(present=True).count()
-            absent_days = total_days - present_days
-            attendance_percentage = round((present_days / total_days * 100), 2) if total_days > 0 else 0
-            
-            # Prepare attendance history data
-            attendance_history = []
-            for record in attendance_records:
-                attendance_history.append({
-                    'date': record.date.strftime('%Y-%m-%d'),
-                    'present': record.present,
-                    'status': 'Present' if record.present else 'Absent'
-                })
+            # Prepare attendance history data (most recent first)
+            attendance_history = [
+                {
+                    'date': day.strftime('%Y-%m-%d'),
+                    'present': present,
+                    'status': 'Present' if present else 'Absent'
+                }
+                for day, present in attendance_query.order_by('-date').values_list('date', 'present')
+            ]
             
             # Prepare student data
             student_data = {
@@ -262,12 +231,7 @@ class StudentAttendanceView(APIView):
             response_data = {
                 'student': student_data,
                 'attendance_history': attendance_history,
-                'summary': {
-                    'total_days': total_days,
-                    'present_days': present_days,
-                    'absent_days': absent_days,
-                    'attendance_percentage': attendance_percentage
-                }
+                'summary': summary
             }
             
             # Add date range info if filters were applied
@@ -283,4 +247,234 @@ class StudentAttendanceView(APIView):
             return Response({
                 'error': True,
                 'message': f'An error occurred: {str(e)}'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+MAX_CALENDAR_MONTHS = 36
+
+
+def parse_month(value):
+    """First day of a YYYY-MM month string"""
+    return datetime.strptime(value, '%Y-%m').date()
+
+
+class StudentAttendanceCalendarView(APIView):
+    """
+    API view for a student's attendance calendar
+    GET: Day bitmasks per month from the monthly rollup, plus streaks
+    """
+    
+    def get(self, request, student_id):
+        """
+        Monthly attendance bitmasks for a student. Bit 0 of each mask is the
+        1st of the month; recorded_mask marks days with a record and
+        present_mask the days present.
+        URL Parameter:
+        - student_id: Integer ID of the student
+        Query Parameters:
+        - start_month (optional): YYYY-MM, defaults to 11 months before end_month
+        - end_month (optional): YYYY-MM, defaults to the current month
+        """
+        try:
+            student = Student.objects.filter(id=student_id).values('id', 'name', 'roll_id').first()
+            if student is None:
+                return Response({
+                    'error': True,
+                    'message': f'Student with id {student_id} does not exist'
+                }, status=status.HTTP_404_NOT_FOUND)
+            
+            try:
+                end_str = request.query_params.get('end_month')
+                end_month = parse_month(end_str) if end_str else timezone.now().date().replace(day=1)
+                start_str = request.query_params.get('start_month')
+                if start_str:
+                    start_month = parse_month(start_str)
+                else:
+                    months_since_epoch = end_month.year * 12 + end_month.month - 1 - 11
+                    start_month = end_month.replace(year=months_since_epoch // 12, month=months_since_epoch % 12 + 1)
+            except ValueError:
+                return Response({
+                    'error': True,
+                    'message': 'Invalid month format. Use YYYY-MM'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            months = month_range(start_month, end_month)
+            if not months or len(months) > MAX_CALENDAR_MONTHS:
+                return Response({
+                    'error': True,
+                    'message': f'start_month must not be after end_month and the range may span '
+                               f'at most {MAX_CALENDAR_MONTHS} months'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            recorded, present = student_masks([student['id']], months)
+            current_streak, longest_streak = streaks(recorded[0], present[0])
+            calendar_data = calendar_months(months, recorded[0], present[0])
+            total_days = sum(m['days'] for m in calendar_data)
+            present_days = sum(m['present_days'] for m in calendar_data)
+            
+            return Response({
+                'student': student,
+                'months': calendar_data,
+                'summary': {
+                    'total_days': total_days,
+                    'present_days': present_days,
+                    'absent_days': total_days - present_days,
+                    'attendance_percentage': round(present_days / total_days * 100, 2) if total_days else 0,
+                    'current_streak': current_streak,
+                    'longest_streak': longest_streak
+                }
+            }, status=status.HTTP_200_OK)
+            
+        except Exception as e:
+            return Response({
+                'error': True,
+                'message': f'An error occurred: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class ClassAttendanceCalendarView(APIView):
+    """
+    API view for a class's attendance calendar
+    GET: Every student's day bitmasks for one month plus class-wide views
+    """
+    
+    def get(self, request, class_id):
+        """
+        One month of attendance bitmasks for every student in a class.
+        all_present_mask has the days on which every student with a record
+        was present, any_present_mask the days anyone was present.
+        URL Parameter:
+        - class_id: Integer ID of the class
+        Query Parameters:
+        - month (optional): YYYY-MM, defaults to the current month
+        """
+        try:
+            student_class = Class.objects.filter(id=class_id).first()
+            if student_class is None:
+                return Response({
+                    'error': True,
+                    'message': f'Class with id {class_id} does not exist'
+                }, status=status.HTTP_404_NOT_FOUND)
+            
+            month_str = request.query_params.get('month')
+            try:
+                month = parse_month(month_str) if month_str else timezone.now().date().replace(day=1)
+            except ValueError:
+                return Response({
+                    'error': True,
+                    'message': 'Invalid month format. Use YYYY-MM'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            students = list(
+                Student.objects.filter(student_class=student_class)
+                .order_by('name', 'id').values_list('id', 'name', 'roll_id')
+            )
+            view = class_month([student_id for student_id, _, _ in students], month)
+            
+            return Response({
+                'class': {'id': student_class.id, 'name': student_class.name,
+                          'grade_level': student_class.grade_level},
+                'month': month.strftime('%Y-%m'),
+                'days_in_month': days_in_month(month),
+                'recorded_mask': view['recorded_mask'],
+                'all_present_mask': view['all_present_mask'],
+                'any_present_mask': view['any_present_mask'],
+                'daily_present_counts': view['daily_present_counts'],
+                'students': [
+                    {
+                        'id': student_id,
+                        'name': name,
+                        'roll_id': roll_id,
+                        'recorded_mask': int(view['recorded'][i]),
+                        'present_mask': int(view['present'][i])
+                    }
+                    for i, (student_id, name, roll_id) in enumerate(students)
+                ]
+            }, status=status.HTTP_200_OK)
+            
+        except Exception as e:
+            return Response({
+                'error': True,
+                'message': f'An error occurred: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class AttendanceMatrixView(APIView):
+    """
+    API view for the class-wide attendance report
+    GET: Stream a students x dates attendance matrix as CSV or NDJSON
+    """
+    
+    def get(self, request):
+        """
+        Attendance of every student in a class (or every class of a grade)
+        for each date in the range with at least one record. CSV cells are
+        P, A or empty; NDJSON starts with a {"dates": [...]} line followed by
+        one object per student with present as true/false/null per date.
+        Query Parameters:
+        - class_id or class_grade (one required): a single class or a whole grade (9, 10, 11, 12)
+        - start_date, end_date (required): Date strings (YYYY-MM-DD), at most 366 days apart
+        - output (optional): csv (default) or ndjson
+        """
+        try:
+            class_id = request.query_params.get('class_id')
+            class_grade = request.query_params.get('class_grade')
+            output = request.query_params.get('output', 'csv')
+            
+            if output not in STREAMS:
+                return Response({
+                    'error': True,
+                    'message': 'output must be csv or ndjson'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            if class_id:
+                student_class = Class.objects.filter(id=class_id).first() if class_id.isdigit() else None
+                if student_class is None:
+                    return Response({
+                        'error': True,
+                        'message': f'Class with id {class_id} does not exist'
+                    }, status=status.HTTP_404_NOT_FOUND)
+                students = matrix_students(student_class=student_class)
+                label = f'class{student_class.id}'
+            elif class_grade:
+                if class_grade not in ['9', '10', '11', '12']:
+                    return Response({
+                        'error': True,
+                        'message': 'class_grade must be 9, 10, 11, or 12'
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                students = matrix_students(grade_level=int(class_grade))
+                label = f'grade{class_grade}'
+            else:
+                return Response({
+                    'error': True,
+                    'message': 'class_id or class_grade parameter is required'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            try:
+                start_date = datetime.strptime(request.query_params.get('start_date', ''), '%Y-%m-%d').date()
+                end_date = datetime.strptime(request.query_params.get('end_date', ''), '%Y-%m-%d').date()
+            except ValueError:
+                return Response({
+                    'error': True,
+                    'message': 'start_date and end_date are required. Use YYYY-MM-DD'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            if start_date > end_date or (end_date - start_date).days >= MAX_EXPORT_DAYS:
+                return Response({
+                    'error': True,
+                    'message': f'start_date must not be after end_date and the range may span '
+                               f'at most {MAX_EXPORT_DAYS} days'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            stream, content_type = STREAMS[output]
+            dates = matrix_dates(students, start_date, end_date)
+            response = StreamingHttpResponse(stream(students, dates), content_type=content_type)
+            response['Content-Disposition'] = (
+                f'attachment; filename="attendance_{label}_{start_date}_{end_date}.{output}"'
+            )
+            return response
+            
+        except Exception as e:
+            return Response({
+                'error': True,
+                'message': f'An error occurred: {str(e)}'
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,7 @@
+"""
+Performance benchmarks. Run from the institute_backend directory, e.g.
+
+    python -m benchmarks.logging_overhead
+
+Each benchmark builds a throwaway test database, so it never touches db.sqlite3.
+"""
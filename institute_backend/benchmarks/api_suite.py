@@ -0,0 +1,191 @@
+"""
+Latency and query-count benchmark over the hot API endpoints.
+
+    python -m benchmarks.api_suite [--students 2000] [--iterations 30]
+    python -m benchmarks.api_suite --update-baseline
+
+Builds a throwaway database, fills it with generate_scale_data and replays
+each endpoint through the Django test client. p50/p90/p99 latency and the
+number of queries per request are compared against benchmarks/baseline.json;
+the run exits non-zero when an endpoint gets slower than the allowed
+threshold, runs more queries, or changes status code. The news endpoint is
+measured against the bundled fallback articles so no network is involved.
+"""
+import argparse
+import datetime
+import json
+import os
+import sys
+from unittest import mock
+
+from .harness import measure, print_table, setup_django, test_database
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+PREFIX = 'bench'
+
+
+def build_context(args):
+    """Generate the dataset and log in one student client and one staff client"""
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.test import Client
+    from accounts.models import AdminUser, Student
+    from chat.models import ChatRoom
+    from marks.models import Exam
+
+    # Chat rooms are attached to the first admin user, so create one up front
+    AdminUser.objects.create(username='bench-admin', password='unused')
+    call_command(
+        'generate_scale_data', students=args.students, seed=args.seed, prefix=PREFIX,
+        end_date=args.end_date, verbosity=0,
+    )
+
+    student = (Student.objects.filter(email__endswith=f'@{PREFIX}.example.com',
+                                      chat_rooms__isnull=False)
+               .select_related('student_class').order_by('id').first())
+    exam = Exam.objects.filter(student_class=student.student_class).order_by('exam_date').first()
+    room = ChatRoom.objects.filter(student=student).order_by('id').first()
+
+    student_client = Client()
+    session = student_client.session
+    session['student_id'] = student.id
+    session['user_type'] = 'student'
+    session.save()
+
+    staff_client = Client()
+    staff_client.force_login(User.objects.create_user('bench-staff', password='unused', is_staff=True))
+
+    return {
+        'student': student,
+        'grade': student.student_class.grade_level,
+        'exam': exam,
+        'room': room,
+        'admin_id': room.admin_id,
+        'end_date': args.end_date,
+        'clients': {'student': student_client, 'staff': staff_client},
+    }
+
+
+def endpoints(ctx):
+    student_id = ctx['student'].id
+    return [
+        ('check_auth', 'student', '/accounts/api/check-auth/'),
+        ('student_marks', 'student', '/accounts/api/student/marks/'),
+        ('my_marks', 'staff', f'/api/my-marks/?student_id={student_id}'),
+        ('attendance_history', 'student', f'/api/attendance/student/{student_id}/'),
+        ('attendance_admin', 'staff',
+         f'/api/attendance/admin/?class_grade={ctx["grade"]}&date={ctx["end_date"]}'),
+        ('exam_list', 'staff', f'/api/exams/?class_grade={ctx["grade"]}'),
+        ('exam_marks', 'staff', f'/api/exams/{ctx["exam"].id}/marks/?student_id={student_id}'),
+        ('chat_rooms_student', 'student', f'/api/chat/rooms/?user_type=student&user_id={student_id}'),
+        ('chat_rooms_admin', 'staff', f'/api/chat/rooms/?user_type=admin&user_id={ctx["admin_id"]}'),
+        ('chat_room_detail', 'student', f'/api/chat/rooms/{ctx["room"].id}/'),
+        ('chat_students', 'staff', '/api/chat/students/'),
+        ('news', 'student', '/news/api/educational-news/'),
+    ]
+
+
+def run(ctx, iterations, only=None):
+    from django.db import connection
+    from institute_backend.middleware import QueryRecorder
+    from news.fallback_data import get_fallback_educational_news
+
+    results = {}
+    with mock.patch('news.views.get_educational_news',
+                    side_effect=lambda: get_fallback_educational_news()[:12]):
+        for name, client_name, url in endpoints(ctx):
+            if only and name not in only:
+                continue
+            client = ctx['clients'][client_name]
+            timing = measure(lambda: client.get(url), iterations=iterations, warmup=3)
+            # Counted after the warmup so one-off import-time work is excluded.
+            # CaptureQueriesContext would miss queries: request_started resets the log.
+            queries = QueryRecorder()
+            with connection.execute_wrapper(queries):
+                response = client.get(url)
+            summary = timing.summary_ms()
+            results[name] = {
+                'status': response.status_code,
+                'queries': queries.count,
+                'p50_ms': summary['p50_ms'],
+                'p90_ms': summary['p90_ms'],
+                'p99_ms': summary['p99_ms'],
+            }
+    return results
+
+
+def compare(results, baseline, threshold, noise_ms):
+    """Return a list of human readable regressions against the baseline"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['status'] != base['status']:
+            regressions.append(f'{name}: status {base["status"]} -> {result["status"]}')
+        if result['queries'] > base['queries']:
+            regressions.append(f'{name}: queries {base["queries"]} -> {result["queries"]}')
+        for key in ('p50_ms', 'p90_ms'):
+            limit = base[key] * (1 + threshold) + noise_ms
+            if result[key] > limit:
+                regressions.append(f'{name}: {key} {base[key]} -> {result[key]} (limit {limit:.2f})')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--students', type=int, default=2000)
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--end-date', type=datetime.date.fromisoformat, default=datetime.date(2025, 3, 28),
+                        help='Fixed so the dataset is identical between runs')
+    parser.add_argument('--only', nargs='*', help='Endpoint names to run')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Allowed relative slowdown of p50/p90 before failing')
+    parser.add_argument('--noise-ms', type=float, default=2.0,
+                        help='Absolute slack added to every latency limit')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args()
+
+    setup_django()
+    with test_database():
+        ctx = build_context(args)
+        results = run(ctx, args.iterations, args.only)
+
+    print_table([{'endpoint': name, **result} for name, result in results.items()],
+                ['endpoint', 'status', 'queries', 'p50_ms', 'p90_ms', 'p99_ms'])
+
+    dataset = {'students': args.students, 'seed': args.seed, 'end_date': str(args.end_date)}
+    if args.update_baseline:
+        baseline = {'dataset': dataset, 'endpoints': results}
+        if os.path.exists(args.baseline) and args.only:
+            with open(args.baseline) as f:
+                previous = json.load(f)
+            baseline['endpoints'] = {**previous.get('endpoints', {}), **results}
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'\nBaseline written to {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print('\nNo baseline yet; run with --update-baseline to record one.')
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get('dataset') != dataset:
+        print(f'\nWarning: baseline was recorded with {baseline.get("dataset")}, this run used {dataset}')
+
+    regressions = compare(results, baseline.get('endpoints', {}), args.threshold, args.noise_ms)
+    if regressions:
+        print('\nRegressions:')
+        for line in regressions:
+            print(f'  {line}')
+        return 1
+    print('\nNo regressions against baseline.')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
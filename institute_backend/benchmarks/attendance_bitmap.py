@@ -0,0 +1,102 @@
+"""
+Daily Attendance rows versus the monthly bitmasks in AttendanceMonthly.
+
+    python -m benchmarks.attendance_bitmap [--students 8400] [--days 120]
+
+Generates students x school days attendance rows (about a million by
+default), then reports the on-disk size of both tables with their indexes
+(from SQLite's dbstat) and times the same answers computed both ways: a
+student's year calendar with streaks, a class's month, and a student's
+attendance percentage over a date range.
+"""
+import argparse
+import datetime
+
+from .harness import measure, print_table, setup_django, test_database
+
+END_DATE = datetime.date(2025, 3, 28)
+
+
+def table_bytes(connection, table):
+    """Bytes used by a table and all of its indexes"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT SUM(pgsize) FROM dbstat WHERE name = %s OR name IN "
+            "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s)",
+            [table, table],
+        )
+        return cursor.fetchone()[0] or 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--students', type=int, default=8400)
+    parser.add_argument('--days', type=int, default=120, help='School days per student')
+    parser.add_argument('--iterations', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+    from accounts.models import Class, Student
+    from attendance.bitmap import calendar_months, class_month, month_range, streaks, student_masks
+    from attendance.models import Attendance, AttendanceMonthly
+    from attendance.rollup import daily_summary, summary
+
+    with test_database() as connection:
+        call_command(
+            'generate_scale_data', students=args.students, grades='10', sections=4, subjects=2,
+            subjects_per_student=1, exams_per_class=0, student_marks_per_subject=0,
+            attendance_days=args.days, chat_fraction=0, end_date=END_DATE, prefix='bitmap', verbosity=0,
+        )
+        student = Student.objects.filter(email__endswith='@bitmap.example.com').order_by('id').first()
+        student_class = Class.objects.get(name='bitmap-10A')
+        class_ids = list(Student.objects.filter(student_class=student_class).values_list('id', flat=True))
+        months = month_range(END_DATE - datetime.timedelta(days=365), END_DATE)
+        month = END_DATE.replace(day=1)
+        range_start = END_DATE - datetime.timedelta(days=100)
+
+        def daily_calendar():
+            masks = {}
+            for day, present in (Attendance.objects.filter(student=student, date__gte=months[0])
+                                 .order_by('date').values_list('date', 'present')):
+                recorded, present_mask = masks.get(day.replace(day=1), (0, 0))
+                bit = 1 << (day.day - 1)
+                masks[day.replace(day=1)] = (recorded | bit, present_mask | (bit if present else 0))
+            return masks
+
+        def bitmap_calendar():
+            recorded, present = student_masks([student.id], months)
+            return calendar_months(months, recorded[0], present[0]), streaks(recorded[0], present[0])
+
+        def daily_class_month():
+            return list(Attendance.objects.filter(student_id__in=class_ids, date__gte=month)
+                        .order_by().values_list('student_id', 'date', 'present'))
+
+        def daily_range_summary():
+            return daily_summary(Attendance.objects.filter(student=student, date__range=(range_start, END_DATE)))
+
+        rows = [{
+            'measure': 'rows', 'daily': Attendance.objects.count(), 'bitmap': AttendanceMonthly.objects.count(),
+        }, {
+            'measure': 'table+index MB',
+            'daily': round(table_bytes(connection, Attendance._meta.db_table) / 1e6, 1),
+            'bitmap': round(table_bytes(connection, AttendanceMonthly._meta.db_table) / 1e6, 1),
+        }]
+        for label, daily, bitmap in [
+            ('student year calendar', daily_calendar, bitmap_calendar),
+            (f'class month ({len(class_ids)} students)', daily_class_month,
+             lambda: class_month(class_ids, month)),
+            ('student 100-day summary', daily_range_summary,
+             lambda: summary(student, range_start, END_DATE)),
+        ]:
+            rows.append({
+                'measure': f'{label} p50 ms',
+                'daily': measure(daily, iterations=args.iterations).summary_ms()['p50_ms'],
+                'bitmap': measure(bitmap, iterations=args.iterations).summary_ms()['p50_ms'],
+            })
+
+    print_table(rows, ['measure', 'daily', 'bitmap'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Streaming the students x dates attendance matrix for a whole grade.
+
+    python -m benchmarks.attendance_export [--students 1200] [--days 200]
+
+Generates one grade of --students students over four sections with --days
+school days of attendance, then consumes the /api/attendance/matrix/
+response for the full range as CSV and as NDJSON. Reports rows, bytes,
+wall time and the peak Python allocation (tracemalloc) while streaming,
+which should stay flat as the grade grows rather than track the output.
+"""
+import argparse
+import datetime
+import time
+import tracemalloc
+
+from .harness import print_table, setup_django, test_database
+
+END_DATE = datetime.date(2025, 3, 28)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--students', type=int, default=1200)
+    parser.add_argument('--days', type=int, default=200, help='School days per student')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+    from django.test import Client
+
+    with test_database():
+        call_command(
+            'generate_scale_data', students=args.students, grades='10', sections=4, subjects=2,
+            subjects_per_student=1, exams_per_class=0, student_marks_per_subject=0,
+            attendance_days=args.days, chat_fraction=0, end_date=END_DATE, prefix='export', verbosity=0,
+        )
+        client = Client()
+        params = {'class_grade': '10', 'start_date': str(END_DATE - datetime.timedelta(days=365)),
+                  'end_date': str(END_DATE)}
+        # The first request imports every app's views; keep that out of the numbers
+        client.get('/api/attendance/matrix/')
+
+        rows = []
+        for output in ['csv', 'ndjson']:
+            tracemalloc.start()
+            started = time.perf_counter()
+            response = client.get('/api/attendance/matrix/', {**params, 'output': output})
+            lines = size = 0
+            for chunk in response.streaming_content:
+                lines += chunk.count(b'\n')
+                size += len(chunk)
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            rows.append({
+                'output': output, 'students': lines - 1, 'mb': round(size / 1e6, 1),
+                'seconds': round(elapsed, 2), 'peak_mb': round(peak / 1e6, 1),
+            })
+
+    print_table(rows, ['output', 'students', 'mb', 'seconds', 'peak_mb'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+WebSocket connect history from the database versus the room buffer.
+
+    python -m benchmarks.chat_connect [--rooms 200] [--messages 200]
+
+Times ChatConsumer.send_recent_messages, the work done for every connect,
+across --rooms rooms with --messages messages each: once with the buffer
+cleared before each call (the original per-connect queries) and once warm.
+A resume from the 10th newest message is timed the same way.
+"""
+import argparse
+
+from .harness import measure, print_table, setup_django, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rooms', type=int, default=200)
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+    from asgiref.sync import async_to_sync
+    from accounts.models import Class, Student
+    from chat.buffers import room_buffer
+    from chat.consumers import ChatConsumer
+    from chat.models import ChatMessage, ChatRoom
+
+    with test_database():
+        student_class = Class.objects.create(name='bench-connect', grade_level=9)
+        rooms = []
+        for r in range(args.rooms):
+            student = Student.objects.create(name=f'Bench Connect {r}', email=f'bench.connect{r}@example.com',
+                                             password='x', roll_id=f'BENCHCON{r}', student_class=student_class)
+            rooms.append(ChatRoom.objects.create(student=student, recipient_type='admin'))
+            ChatMessage.objects.bulk_create([
+                ChatMessage(room=rooms[-1], sender_type='student', sender_id=student.id,
+                            sender_name=student.name, content=f'message {i}')
+                for i in range(args.messages)
+            ])
+        last_seen = {room.id: list(room.messages.order_by('-id').values_list('id', flat=True)[:10])[-1]
+                     for room in rooms}
+
+        async def discard(text_data):
+            pass
+        consumers = []
+        for room in rooms:
+            consumer = ChatConsumer()
+            consumer.room_id, consumer.room_key, consumer.send = str(room.id), room.id, discard
+            consumers.append(consumer)
+        calls = iter(range(10 ** 9))
+
+        def connect(cold, resume=False):
+            consumer = consumers[next(calls) % len(consumers)]
+            if cold:
+                room_buffer.invalidate(consumer.room_key)
+            async_to_sync(consumer.send_recent_messages)(last_seen[consumer.room_key] if resume else None)
+
+        rows = []
+        for label, resume in [('connect', False), ('resume', True)]:
+            rows.append({
+                'call': label,
+                'database_p50_ms': measure(lambda: connect(True, resume),
+                                           iterations=args.iterations).summary_ms()['p50_ms'],
+                'buffer_p50_ms': measure(lambda: connect(False, resume),
+                                         iterations=args.iterations).summary_ms()['p50_ms'],
+            })
+
+    print(f'{args.rooms} rooms x {args.messages} messages')
+    print_table(rows, ['call', 'database_p50_ms', 'buffer_p50_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Admin chat student directory: the per-student loop versus the annotated,
+keyset-paginated query.
+
+    python -m benchmarks.chat_directory [--students 10000] [--messages 10]
+
+Creates --students students, half of them with an admin room holding
+--messages messages, then times GET /api/chat/students/ for the first page,
+a page near the end, a name search, and a walk over every page at
+page_size=200. The original view (a room lookup, unread count, last message
+and class load per student) is replayed for the full list.
+"""
+import argparse
+
+from .harness import measure, print_table, setup_django, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--students', type=int, default=10000)
+    parser.add_argument('--messages', type=int, default=10)
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.test import Client
+    from accounts.models import Class, Student
+    from chat.models import ChatMessage, ChatRoom
+    from chat.pagination import encode_student_cursor
+
+    with test_database():
+        student_class = Class.objects.create(name='bench-directory', grade_level=9)
+        Student.objects.bulk_create([
+            Student(name=f'Directory Student {i:05d}', email=f'bench.dir{i}@example.com', password='x',
+                    roll_id=f'BENCHDIR{i}', student_class=student_class)
+            for i in range(args.students)
+        ], batch_size=2000)
+        students = list(Student.objects.filter(student_class=student_class).order_by('id'))
+        ChatRoom.objects.bulk_create([ChatRoom(student=s, recipient_type='admin') for s in students[::2]],
+                                     batch_size=2000)
+        rooms = list(ChatRoom.objects.filter(student__student_class=student_class))
+        for start in range(0, len(rooms), 500):
+            ChatMessage.objects.bulk_create([
+                ChatMessage(room=room, sender_type='student' if m % 3 else 'admin', sender_id=room.student_id,
+                            sender_name='Bench', content=f'message {m}')
+                for room in rooms[start:start + 500] for m in range(args.messages)
+            ])
+
+        def per_student():
+            # The view's loop before the annotated query
+            for student in Student.objects.all().order_by('name'):
+                try:
+                    room = ChatRoom.objects.get(student=student, recipient_type='admin')
+                    ChatMessage.objects.filter(room=room, sender_type='student', id__gt=room.staff_last_read_id).count()
+                    room.messages.last()
+                except ChatRoom.DoesNotExist:
+                    pass
+                student.student_class.name
+
+        client = Client()
+        url = '/api/chat/students/'
+        client.get(url)
+        ordered = Student.objects.order_by('name', 'id')
+        deep = {'after': encode_student_cursor(ordered[args.students - 60])}
+
+        def walk():
+            params = {'page_size': 200}
+            while True:
+                data = client.get(url, params).json()
+                if not data['pagination']['has_more']:
+                    return
+                params['after'] = data['pagination']['next_cursor']
+
+        rows = []
+        for label, run, iterations in [
+            ('per_student_full_list', per_student, 1),
+            ('first_page', lambda: client.get(url), args.iterations),
+            ('last_page', lambda: client.get(url, deep), args.iterations),
+            ('search', lambda: client.get(url, {'search': '0042'}), args.iterations),
+            ('all_pages_200', walk, 3),
+        ]:
+            # Counted with a wrapper; DEBUG's query log is capped below the loop's count
+            queries = []
+            with connection.execute_wrapper(lambda execute, *a: queries.append(1) or execute(*a)):
+                run()
+            rows.append({
+                'request': label,
+                'queries': len(queries),
+                'p50_ms': measure(run, iterations=iterations).summary_ms()['p50_ms'],
+            })
+
+    print(f'{args.students} students, {len(rooms)} rooms x {args.messages} messages')
+    print_table(rows, ['request', 'queries', 'p50_ms'])
+
+
+if __name__ == '__main__':
+    main()
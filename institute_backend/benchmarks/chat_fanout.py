@@ -0,0 +1,93 @@
+"""
+Chat broadcast fan-out: encoding per listener versus once per broadcast.
+
+    python -m benchmarks.chat_fanout [--listeners 1 10 100]
+
+Sends one chat message to a room group of N listening ChatConsumers
+through the in-memory channel layer and delivers it to every socket. The
+per-listener column replays the original path (a dict event that each
+consumer json.dumps itself); the encoded-once column uses frame_event, so
+listeners only forward the finished text. The handlers-only columns leave
+out the layer's per-channel queueing to show the encoding cost alone.
+"""
+import argparse
+import json
+
+from .harness import measure, print_table, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--listeners', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    from asgiref.sync import async_to_sync
+    from channels.layers import InMemoryChannelLayer
+    from chat.consumers import ChatConsumer
+    from chat.encoding import ORJSON_AVAILABLE, frame_event
+
+    message = {
+        'id': 123456, 'content': 'Please bring the signed permission slip for Friday. ' * 8,
+        'sender_type': 'admin', 'sender_id': 7, 'sender_name': 'Front Office',
+        'timestamp': '2025-08-04T10:30:00.123456+00:00', 'is_read': False,
+    }
+
+    async def discard(text_data):
+        pass
+
+    async def per_listener_handler(self, event):
+        # The handler as it was before frame_event
+        await self.send(text_data=json.dumps({'type': 'chat_message', 'message': event['message']}))
+
+    rows = []
+    for count in args.listeners:
+        layer = InMemoryChannelLayer(capacity=count + 10)
+        consumers = {}
+
+        async def join():
+            for _ in range(count):
+                consumer = ChatConsumer()
+                consumer.send = discard
+                channel = await layer.new_channel()
+                await layer.group_add('chat_bench', channel)
+                consumers[channel] = consumer
+        async_to_sync(join)()
+
+        def broadcast(build_event, handler):
+            async def run():
+                await layer.group_send('chat_bench', build_event())
+                for channel, consumer in consumers.items():
+                    await handler(consumer, await layer.receive(channel))
+            async_to_sync(run)()
+
+        def deliver(build_event, handler):
+            async def run():
+                event = build_event()
+                for consumer in consumers.values():
+                    await handler(consumer, event)
+            async_to_sync(run)()
+
+        legacy_event = lambda: {'type': 'chat_message', 'message': message}
+        framed_event = lambda: frame_event('chat_message', message=message)
+        rows.append({
+            'listeners': count,
+            'handlers_per_listener_ms': measure(lambda: deliver(legacy_event, per_listener_handler),
+                                                iterations=args.iterations).summary_ms()['p50_ms'],
+            'handlers_encoded_once_ms': measure(lambda: deliver(framed_event, ChatConsumer.chat_message),
+                                                iterations=args.iterations).summary_ms()['p50_ms'],
+            'layer_per_listener_ms': measure(lambda: broadcast(legacy_event, per_listener_handler),
+                                             iterations=args.iterations).summary_ms()['p50_ms'],
+            'layer_encoded_once_ms': measure(lambda: broadcast(framed_event, ChatConsumer.chat_message),
+                                             iterations=args.iterations).summary_ms()['p50_ms'],
+        })
+
+    print(f'orjson available: {ORJSON_AVAILABLE}')
+    print('p50 per broadcast')
+    print_table(rows, ['listeners', 'handlers_per_listener_ms', 'handlers_encoded_once_ms',
+                       'layer_per_listener_ms', 'layer_encoded_once_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Heartbeat scheduling: one sleeping task per connection versus the shared
+timer wheel in chat.timers.
+
+    python -m benchmarks.chat_heartbeats [--connections 1000 10000] [--interval 1] [--seconds 5]
+
+Runs an event loop for --seconds with N idle-free connections that need a
+heartbeat every --interval seconds (scaled down from 30 s so several rounds
+fit), and reports the CPU time used and the number of tasks alive.
+"""
+import argparse
+import asyncio
+import time
+
+from .harness import print_table, setup_django
+
+
+class Connection:
+    heartbeats = 0
+
+    async def send(self, text_data):
+        Connection.heartbeats += 1
+
+    async def close(self, code=None):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--connections', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--interval', type=float, default=1.0)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    setup_django()
+    from chat.encoding import dumps
+    from chat.timers import ConnectionTimers
+
+    async def per_connection(count):
+        # The consumer's heartbeat_loop before the timer wheel
+        async def heartbeat_loop(connection):
+            while True:
+                await asyncio.sleep(args.interval)
+                await connection.send(text_data=dumps({'type': 'heartbeat', 'timestamp': time.time()}))
+        tasks = [asyncio.create_task(heartbeat_loop(Connection())) for _ in range(count)]
+        await asyncio.sleep(args.seconds)
+        alive = len(asyncio.all_tasks())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return alive
+
+    async def wheel(count):
+        timers = ConnectionTimers(heartbeat_interval=args.interval, idle_timeout=args.seconds * 10,
+                                  tick=args.interval / 10)
+        connections = [Connection() for _ in range(count)]
+        for connection in connections:
+            timers.register(connection)
+        await asyncio.sleep(args.seconds)
+        alive = len(asyncio.all_tasks())
+        for connection in connections:
+            timers.unregister(connection)
+        await timers._task
+        return alive
+
+    rows = []
+    for count in args.connections:
+        for label, scheduler in [('per_connection', per_connection), ('timer_wheel', wheel)]:
+            Connection.heartbeats = 0
+            started = time.process_time()
+            tasks = asyncio.run(scheduler(count))
+            rows.append({
+                'connections': count,
+                'scheduler': label,
+                'tasks': tasks,
+                'heartbeats': Connection.heartbeats,
+                'cpu_ms': round((time.process_time() - started) * 1000, 1),
+            })
+
+    print(f'{args.seconds:g}s at one heartbeat per {args.interval:g}s')
+    print_table(rows, ['connections', 'scheduler', 'tasks', 'heartbeats', 'cpu_ms'])
+
+
+if __name__ == '__main__':
+    main()
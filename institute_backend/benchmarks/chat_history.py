@@ -0,0 +1,78 @@
+"""
+Chat history pagination by page number versus by cursor.
+
+    python -m benchmarks.chat_history [--messages 100000] [--page-size 50]
+
+Fills one room with --messages messages, then times GET
+/api/chat/rooms/<id>/ for pages at increasing depth: with ?page=N (offset
+plus a full count, the original behaviour) and with ?before=<cursor> for
+the same page. Cursor pages should cost the same at any depth.
+"""
+import argparse
+import datetime
+
+from .harness import measure, print_table, setup_django, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--iterations', type=int, default=30)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import Client
+    from django.utils import timezone
+    from accounts.models import Class, Student
+    from chat.models import ChatMessage, ChatRoom
+    from chat.pagination import encode_cursor
+
+    with test_database():
+        student_class = Class.objects.create(name='bench-chat', grade_level=9)
+        student = Student.objects.create(name='Bench Chat', email='bench.chat@example.com', password='x',
+                                         roll_id='BENCHCHAT', student_class=student_class)
+        room = ChatRoom.objects.create(student=student, recipient_type='admin')
+        other = ChatRoom.objects.create(student=student, recipient_type='faculty')
+        start = timezone.now() - datetime.timedelta(days=365)
+        # A second room interleaves its messages so the index has to skip them
+        for offset in range(0, args.messages, 10000):
+            batch = []
+            for i in range(offset, min(offset + 10000, args.messages)):
+                batch.append(ChatMessage(room=room, sender_type='student', sender_id=student.id,
+                                         sender_name=student.name, content=f'message {i}'))
+                if i % 3 == 0:
+                    batch.append(ChatMessage(room=other, sender_type='student', sender_id=student.id,
+                                             sender_name=student.name, content=f'other {i}'))
+            ChatMessage.objects.bulk_create(batch)
+        # Spread timestamps over the year; bulk_create stamps them all with now()
+        messages = ChatMessage.objects.filter(room=room)
+        total = messages.count()
+        step = datetime.timedelta(days=365) / max(total, 1)
+        for i, message_id in enumerate(messages.order_by('id').values_list('id', flat=True)):
+            if i % 1000 == 0:
+                ChatMessage.objects.filter(room=room, id__gte=message_id).update(timestamp=start + step * i)
+
+        client = Client()
+        url = f'/api/chat/rooms/{room.id}/'
+        client.get(url)
+        ordered = messages.order_by('-timestamp', '-id')
+        rows = []
+        for page in [1, 10, 100, total // args.page_size]:
+            depth = (page - 1) * args.page_size
+            newer = ordered[depth - 1] if depth else None
+            cursor = {'before': encode_cursor(newer)} if newer else {}
+            rows.append({
+                'page': page,
+                'offset_p50_ms': measure(lambda: client.get(url, {'page': page, 'page_size': args.page_size}),
+                                         iterations=args.iterations).summary_ms()['p50_ms'],
+                'cursor_p50_ms': measure(lambda: client.get(url, {**cursor, 'page_size': args.page_size}),
+                                         iterations=args.iterations).summary_ms()['p50_ms'],
+            })
+
+    print(f'{total} messages in the room, page size {args.page_size}')
+    print_table(rows, ['page', 'offset_p50_ms', 'cursor_p50_ms'])
+
+
+if __name__ == '__main__':
+    main()
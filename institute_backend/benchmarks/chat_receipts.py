@@ -0,0 +1,110 @@
+"""
+Marking a chat backlog read, and read receipt traffic.
+
+    python -m benchmarks.chat_receipts [--backlog 10000] [--readers 20] [--minutes 5]
+
+Fills one room with --backlog unread student messages and times marking
+them read for staff: the per-row update the original view ran (replayed on
+is_deleted, since is_read is now derived) against moving the staff
+high-water mark with chat.counters.mark_read. Each high-water run first
+resets the mark with one primary key update.
+
+Then replays --readers clients scrolling through rooms on a simulated
+clock, sending a mark_read frame per message seen, and counts the
+messages_read events that reach the channel layer: one per frame before,
+versus the broadcasts of chat.receipts.ReceiptCoalescer.
+"""
+import argparse
+import random
+
+from .harness import measure, print_table, setup_django, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--backlog', type=int, default=10000)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--readers', type=int, default=20)
+    parser.add_argument('--minutes', type=float, default=5)
+    parser.add_argument('--interval', type=float, default=1.0)
+    args = parser.parse_args()
+
+    setup_django()
+    from asgiref.sync import async_to_sync
+    from django.db import connection
+    from accounts.models import Class, Student
+    from chat.counters import STAFF, mark_read
+    from chat.models import ChatMessage, ChatRoom
+    from chat.receipts import ReceiptCoalescer
+
+    with test_database():
+        student_class = Class.objects.create(name='bench-receipts', grade_level=9)
+        student = Student.objects.create(name='Receipt Bench', email='bench.receipts@example.com', password='x',
+                                         roll_id='BENCHRCP', student_class=student_class)
+        room = ChatRoom.objects.create(student=student, recipient_type='admin')
+        ChatMessage.objects.bulk_create([
+            ChatMessage(room=room, sender_type='student', sender_id=student.id, sender_name='Bench',
+                        content=f'message {m}')
+            for m in range(args.backlog)
+        ], batch_size=2000)
+        last_id = ChatMessage.objects.filter(room=room).latest('id').id
+        ChatRoom.objects.filter(id=room.id).update(last_message_id=last_id, unread_for_staff=args.backlog)
+
+        def per_row():
+            ChatMessage.objects.filter(room=room, sender_type='student', is_deleted=False).update(is_deleted=False)
+
+        def high_water():
+            ChatRoom.objects.filter(id=room.id).update(staff_last_read_id=0)
+            mark_read(room.id, STAFF, last_id)
+
+        rows = []
+        for label, run in [('per_row_update', per_row), ('high_water_mark', high_water)]:
+            queries = []
+            with connection.execute_wrapper(lambda execute, *a: queries.append(1) or execute(*a)):
+                run()
+            rows.append({
+                'path': label,
+                'queries': len(queries),
+                'p50_ms': measure(run, iterations=args.iterations).summary_ms()['p50_ms'],
+            })
+    print(f'{args.backlog} unread messages')
+    print_table(rows, ['path', 'queries', 'p50_ms'])
+
+    rng = random.Random(7)
+    seconds = args.minutes * 60
+    frames = []
+    for reader in range(args.readers):
+        moment, upto = rng.uniform(0, 5), 0
+        while moment < seconds:
+            # A burst of messages scrolled past, then a pause
+            for _ in range(rng.randint(5, 60)):
+                upto += 1
+                frames.append((moment, f'chat_{reader}', upto))
+                moment += rng.uniform(0.05, 0.4)
+            moment += rng.uniform(5, 30)
+    frames.sort()
+    now = [0.0]
+    broadcasts = []
+
+    async def send(group_name, event):
+        broadcasts.append(event)
+    coalescer = ReceiptCoalescer(interval=args.interval, send=send, clock=lambda: now[0])
+
+    async def replay():
+        for moment, group_name, upto in frames:
+            now[0] = moment
+            await coalescer.run_due()
+            await coalescer.read(group_name, 'staff', upto)
+        now[0] = seconds + 60
+        await coalescer.run_due()
+    async_to_sync(replay)()
+
+    print(f'\n{args.readers} readers over {args.minutes:g} minutes, {args.interval:g}s interval')
+    print_table([
+        {'path': 'per_frame', 'events': len(frames)},
+        {'path': 'coalesced', 'events': len(broadcasts)},
+    ], ['path', 'events'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Typing indicator traffic with and without the coalescer in chat.typing.
+
+    python -m benchmarks.chat_typing [--typers 20] [--minutes 5] [--listeners 10]
+
+Simulates --typers people typing in bursts (a frame per keystroke every
+~150 ms, with pauses and an explicit stop after each message) on a
+simulated clock, and counts the typing_indicator events that reach the
+channel layer: one per frame before, versus the coalescer's broadcasts.
+Deliveries multiply each event by the room's listeners.
+"""
+import argparse
+import random
+
+from .harness import print_table, setup_django
+
+
+def keystrokes(rng, seconds):
+    """(time, is_typing) frames for one person over the given seconds"""
+    frames = []
+    moment = rng.uniform(0, 5)
+    while moment < seconds:
+        for _ in range(rng.randint(10, 80)):
+            frames.append((moment, True))
+            moment += rng.uniform(0.08, 0.25)
+        if rng.random() < 0.7:
+            frames.append((moment, False))  # sent the message
+        moment += rng.uniform(2, 20)
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--typers', type=int, default=20)
+    parser.add_argument('--minutes', type=float, default=5)
+    parser.add_argument('--listeners', type=int, default=10)
+    parser.add_argument('--interval', type=float, default=1.0)
+    args = parser.parse_args()
+
+    setup_django()
+    from asgiref.sync import async_to_sync
+    from chat.typing import TypingCoalescer
+
+    rng = random.Random(7)
+    seconds = args.minutes * 60
+    frames = sorted(
+        (moment, f'Typer {i}', state)
+        for i in range(args.typers)
+        for moment, state in keystrokes(rng, seconds)
+    )
+    now = [0.0]
+    broadcasts = []
+
+    async def send(group_name, event):
+        broadcasts.append(event)
+    coalescer = TypingCoalescer(interval=args.interval, send=send, clock=lambda: now[0])
+
+    async def replay():
+        for moment, sender, state in frames:
+            now[0] = moment
+            await coalescer.run_due()
+            await coalescer.typing('chat_bench', sender, state)
+        now[0] = seconds + 60
+        await coalescer.run_due()
+    async_to_sync(replay)()
+
+    rows = [
+        {'path': 'per_frame', 'events': len(frames), 'deliveries': len(frames) * args.listeners},
+        {'path': 'coalesced', 'events': len(broadcasts), 'deliveries': len(broadcasts) * args.listeners},
+    ]
+    print(f'{args.typers} typers over {args.minutes:g} minutes, {args.listeners} listeners, '
+          f'{args.interval:g}s interval')
+    print_table(rows, ['path', 'events', 'deliveries'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Persisting WebSocket chat messages one at a time versus write-behind batches.
+
+    python -m benchmarks.chat_writes [--messages 100] [--rooms 10]
+
+Writes --messages messages spread over --rooms rooms. The per-message
+column replays the original consumer path (fetch the room, insert, save
+updated_at, get_or_create the notification and save its count); the
+batched column writes them through chat.persistence.write_batch.
+"""
+import argparse
+
+from .harness import measure, print_table, setup_django, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--messages', type=int, default=100)
+    parser.add_argument('--rooms', type=int, default=10)
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection, reset_queries
+    from django.test.utils import CaptureQueriesContext
+    from django.utils import timezone
+    from accounts.models import Class, Student
+    from chat.models import ChatMessage, ChatNotification, ChatRoom
+    from chat.persistence import PendingMessage, write_batch
+
+    with test_database():
+        student_class = Class.objects.create(name='bench-writes', grade_level=9)
+        rooms = []
+        for r in range(args.rooms):
+            student = Student.objects.create(name=f'Bench Writes {r}', email=f'bench.writes{r}@example.com',
+                                             password='x', roll_id=f'BENCHWR{r}', student_class=student_class)
+            rooms.append(ChatRoom.objects.create(student=student, recipient_type='admin'))
+        senders = [(rooms[i % len(rooms)], f'message {i}') for i in range(args.messages)]
+
+        def per_message():
+            # The consumer's save_message and update_notifications before the queue
+            for sender_room, content in senders:
+                room = ChatRoom.objects.get(id=sender_room.id)
+                message = ChatMessage.objects.create(room=room, sender_type='student', sender_id=room.student_id,
+                                                     sender_name='Bench', content=content, message_type='text')
+                room.updated_at = timezone.now()
+                room.save(update_fields=['updated_at'])
+                notification, created = ChatNotification.objects.get_or_create(
+                    room=room, recipient_type='admin', recipient_id=room.admin_id or 0,
+                    defaults={'unread_count': 1, 'last_message': message})
+                if not created:
+                    notification.unread_count += 1
+                    notification.last_message = message
+                    notification.save()
+
+        def batched():
+            write_batch([PendingMessage(room.id, 'student', room.student_id, 'Bench', content)
+                         for room, content in senders])
+
+        rows = []
+        for label, write in [('per_message', per_message), ('batched', batched)]:
+            # DEBUG keeps a bounded query log; a full one would hide the count
+            reset_queries()
+            with CaptureQueriesContext(connection) as queries:
+                write()
+            rows.append({
+                'path': label,
+                'queries': len(queries),
+                'p50_ms': measure(write, iterations=args.iterations).summary_ms()['p50_ms'],
+            })
+
+    print(f'{args.messages} messages over {args.rooms} rooms')
+    print_table(rows, ['path', 'queries', 'p50_ms'])
+
+
+if __name__ == '__main__':
+    main()
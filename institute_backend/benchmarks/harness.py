@@ -0,0 +1,81 @@
+"""Shared helpers for the benchmark scripts"""
+import math
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django():
+    if PROJECT_DIR not in sys.path:
+        sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'institute_backend.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    """Create a throwaway test database for the duration of the block"""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def percentile(sorted_samples, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, math.ceil(q / 100.0 * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+class Timing:
+    def __init__(self, samples):
+        self.samples = sorted(samples)
+
+    @property
+    def mean(self):
+        return sum(self.samples) / len(self.samples) if self.samples else 0.0
+
+    def p(self, q):
+        return percentile(self.samples, q)
+
+    def summary_ms(self):
+        return {
+            'mean_ms': round(self.mean * 1000, 3),
+            'p50_ms': round(self.p(50) * 1000, 3),
+            'p90_ms': round(self.p(90) * 1000, 3),
+            'p99_ms': round(self.p(99) * 1000, 3),
+        }
+
+
+def measure(fn, iterations=100, warmup=5):
+    """Call fn repeatedly and return a Timing of the per-call wall time"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return Timing(samples)
+
+
+def print_table(rows, columns, out=None):
+    """Print a list of dicts as an aligned text table"""
+    out = out or sys.stdout
+    widths = {c: max(len(c), *(len(str(r.get(c, ''))) for r in rows)) for c in columns}
+    out.write('  '.join(c.ljust(widths[c]) for c in columns) + '\n')
+    out.write('  '.join('-' * widths[c] for c in columns) + '\n')
+    for row in rows:
+        out.write('  '.join(str(row.get(c, '')).ljust(widths[c]) for c in columns) + '\n')
@@ -0,0 +1,70 @@
+"""
+Per-request cost of hot-path logging on the check-auth endpoint.
+
+    python -m benchmarks.logging_overhead [--iterations 500]
+
+Compares the accounts logger at INFO (debug calls short-circuit), at DEBUG
+with the configured sampling, and at DEBUG with every record written.
+"""
+import argparse
+import logging
+
+from .harness import measure, print_table, setup_django, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.test import Client
+    from accounts.models import Class, Student
+    from institute_backend.log import SampledDebugFilter
+
+    with test_database():
+        student_class = Class.objects.create(name='Bench 10', grade_level=10)
+        student = Student.objects.create(
+            name='Bench Student', email='bench@example.com', password='x',
+            roll_id='B1', student_class=student_class,
+        )
+        client = Client()
+        session = client.session
+        session['student_id'] = student.id
+        session['user_type'] = 'student'
+        session.save()
+
+        accounts_logger = logging.getLogger('accounts')
+        sample_filters = [
+            f for h in logging.getLogger().handlers for f in h.filters
+            if isinstance(f, SampledDebugFilter)
+        ]
+
+        def request():
+            client.get('/accounts/api/check-auth/')
+
+        rows = []
+        scenarios = [
+            ('INFO', logging.INFO, settings.LOG_DEBUG_SAMPLE_RATE),
+            (f'DEBUG sampled 1/{settings.LOG_DEBUG_SAMPLE_RATE}', logging.DEBUG, settings.LOG_DEBUG_SAMPLE_RATE),
+            ('DEBUG unsampled', logging.DEBUG, 1),
+        ]
+        original_level = accounts_logger.level
+        try:
+            for label, level, rate in scenarios:
+                accounts_logger.setLevel(level)
+                for f in sample_filters:
+                    f.rate = rate
+                timing = measure(request, iterations=args.iterations, warmup=20)
+                rows.append({'logging': label, **timing.summary_ms()})
+        finally:
+            accounts_logger.setLevel(original_level)
+            for f in sample_filters:
+                f.rate = settings.LOG_DEBUG_SAMPLE_RATE
+
+        print_table(rows, ['logging', 'mean_ms', 'p50_ms', 'p90_ms', 'p99_ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+Throughput and memory of the streaming marks importer.
+
+    python -m benchmarks.marks_import [--rows 100000] [--xlsx]
+
+Generates one class with enough students that a single exam has --rows
+(student, subject) cells, writes them to a CSV (and optionally an XLSX)
+file, then times a dry run and a committing import of that file. Peak Python
+heap usage is reported to show memory stays bounded by the chunk size.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from .harness import print_table, setup_django, test_database
+
+SUBJECTS_PER_STUDENT = 5
+
+
+def write_csv(path, cells, rng):
+    with open(path, 'w', newline='') as f:
+        f.write('roll_id,subject_code,marks_obtained,total_marks\n')
+        for roll_id, code in cells:
+            f.write(f'{roll_id},{code},{rng.randint(0, 200) / 2},100\n')
+
+
+def write_xlsx(path, cells, rng):
+    import openpyxl
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(['roll_id', 'subject_code', 'marks_obtained', 'total_marks'])
+    for roll_id, code in cells:
+        sheet.append([roll_id, code, rng.randint(0, 200) / 2, 100])
+    workbook.save(path)
+
+
+def run_import(exam, path, dry_run):
+    from django.core.files import File
+    from marks.importer import import_marks
+
+    with open(path, 'rb') as f:
+        result = import_marks(exam, File(f, name=os.path.basename(path)), dry_run=dry_run)
+    assert result['error_count'] == 0, result['errors'][:5]
+    return result
+
+
+def timed_import(exam, path, dry_run):
+    start = time.perf_counter()
+    result = run_import(exam, path, dry_run)
+    elapsed = time.perf_counter() - start
+    # tracemalloc slows the run several times over, so memory gets its own pass
+    tracemalloc.start()
+    run_import(exam, path, dry_run)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'rows': result['rows'],
+        'seconds': round(elapsed, 2),
+        'rows_per_s': int(result['rows'] / elapsed),
+        'peak_mb': round(peak / 1e6, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--xlsx', action='store_true', help='Also benchmark an XLSX file')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+    from accounts.models import Student
+    from marks.models import Exam
+
+    rng = random.Random(1)
+    with test_database(), tempfile.TemporaryDirectory() as tmp:
+        call_command(
+            'generate_scale_data', students=args.rows // SUBJECTS_PER_STUDENT, grades='10', sections=1,
+            subjects=SUBJECTS_PER_STUDENT * 2, subjects_per_student=SUBJECTS_PER_STUDENT,
+            exams_per_class=1, student_marks_per_subject=0, attendance_days=0, chat_fraction=0,
+            prefix='import', verbosity=0,
+        )
+        exam = Exam.objects.select_related('student_class').get(student_class__name='import-10A')
+        through = Student.subjects_selected.through
+        cells = list(
+            through.objects.filter(student__student_class=exam.student_class)
+            .order_by('student_id', 'subject_id').values_list('student__roll_id', 'subject__code')
+        )
+
+        files = [('csv', os.path.join(tmp, 'marks.csv'), write_csv)]
+        if args.xlsx:
+            files.append(('xlsx', os.path.join(tmp, 'marks.xlsx'), write_xlsx))
+
+        rows = []
+        for kind, path, writer in files:
+            writer(path, cells, rng)
+            size_mb = round(os.path.getsize(path) / 1e6, 1)
+            for label, dry_run in (('dry run', True), ('import', False)):
+                rows.append({'file': f'{kind} ({size_mb} MB)', 'mode': label,
+                             **timed_import(exam, path, dry_run)})
+
+    print_table(rows, ['file', 'mode', 'rows', 'seconds', 'rows_per_s', 'peak_mb'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Report card generation for one class, serially and across a process pool.
+
+    python -m benchmarks.report_cards [--students 500] [--workers 4]
+
+Generates a single class of --students students with a term of exams and
+attendance, then times generate_report_cards() into an in-memory zip with
+one worker and with --workers processes. The target is a 500-student class
+in well under a minute.
+"""
+import argparse
+import datetime
+import io
+import os
+import time
+
+from .harness import print_table, setup_django, test_database
+
+END_DATE = datetime.date(2025, 3, 28)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--students', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.management import call_command
+    from accounts.models import Class
+    from marks.analytics import refresh_exam
+    from marks.models import Exam
+    from marks.reports import collect_cards, generate_report_cards
+
+    with test_database():
+        call_command(
+            'generate_scale_data', students=args.students, grades='10', sections=1, subjects=8,
+            subjects_per_student=6, exams_per_class=6, student_marks_per_subject=0,
+            attendance_days=120, chat_fraction=0, end_date=END_DATE, prefix='report', verbosity=0,
+        )
+        student_class = Class.objects.get(name='report-10A')
+        for exam_id in Exam.objects.filter(student_class=student_class).values_list('id', flat=True):
+            refresh_exam(exam_id)
+        start_date = END_DATE - datetime.timedelta(days=200)
+
+        started = time.perf_counter()
+        collect_cards(student_class, start_date, END_DATE)
+        collect_ms = round((time.perf_counter() - started) * 1000, 1)
+
+        rows = []
+        for workers in sorted({1, args.workers}):
+            output = io.BytesIO()
+            started = time.perf_counter()
+            count = generate_report_cards(student_class, start_date, END_DATE, output, workers=workers)
+            elapsed = time.perf_counter() - started
+            rows.append({
+                'workers': workers, 'cards': count, 'collect_ms': collect_ms,
+                'seconds': round(elapsed, 2), 'cards_per_s': int(count / elapsed),
+                'zip_kb': round(output.getbuffer().nbytes / 1024),
+            })
+
+    print_table(rows, ['workers', 'cards', 'collect_ms', 'seconds', 'cards_per_s', 'zip_kb'])
+
+
+if __name__ == '__main__':
+    main()
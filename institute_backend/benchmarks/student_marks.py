@@ -0,0 +1,76 @@
+"""
+Student marks payload: DRF serializers versus the values() fast path.
+
+    python -m benchmarks.student_marks [--exams 60] [--subjects 25]
+
+Creates one student with exams x subjects marks (1500 by default) and times
+building marks_by_exam through StudentMarksSerializer, through
+build_student_marks without the cache, and the full /api/my-marks/ request
+with a warm cache (uncached without Redis, see marks.student_marks). The rendered JSON of both builders is checked to be equal.
+"""
+import argparse
+import datetime
+import random
+from decimal import Decimal
+
+from .harness import measure, print_table, setup_django, test_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--exams', type=int, default=60)
+    parser.add_argument('--subjects', type=int, default=25)
+    parser.add_argument('--iterations', type=int, default=30)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.test import Client
+    from rest_framework.renderers import JSONRenderer
+    from accounts.models import Class, Student, Subject
+    from marks.models import Exam, Marks
+    from marks.student_marks import build_student_marks, build_with_serializers, cache_is_shared
+
+    rng = random.Random(5)
+    with test_database():
+        student_class = Class.objects.create(name='Bench 11', grade_level=11)
+        student = Student.objects.create(name='Bench Student', email='bench@example.com',
+                                          password='x', roll_id='B1', student_class=student_class)
+        subjects = Subject.objects.bulk_create([
+            Subject(name=f'Bench Subject {i}', code=f'BS{i:03d}', grade_levels='11') for i in range(args.subjects)
+        ])
+        start = datetime.date(2020, 1, 1)
+        exams = Exam.objects.bulk_create([
+            Exam(name=f'Bench Exam {i}', exam_date=start + datetime.timedelta(days=7 * i),
+                 student_class=student_class)
+            for i in range(args.exams)
+        ])
+        Marks.objects.bulk_create([
+            Marks(student=student, exam=exam, subject=subject,
+                  marks_obtained=Decimal(rng.randint(0, 200)) / 2, total_marks=Decimal('100.00'))
+            for exam in exams for subject in subjects
+        ])
+
+        renderer = JSONRenderer()
+        assert renderer.render(build_student_marks(student)) == renderer.render(build_with_serializers(student))
+
+        client = Client()
+        client.force_login(User.objects.create_user('bench', password='x'))
+        url = f'/api/my-marks/?student_id={student.id}'
+        client.get(url)
+
+        total = args.exams * args.subjects
+        rows = []
+        for label, fn in [
+            ('DRF serializers', lambda: build_with_serializers(student)),
+            ('values() fast path', lambda: build_student_marks(student)),
+            ('view, warm cache' if cache_is_shared() else 'view, uncached', lambda: client.get(url)),
+        ]:
+            timing = measure(fn, iterations=args.iterations, warmup=2)
+            rows.append({'path': label, 'marks': total, **timing.summary_ms()})
+
+    print_table(rows, ['path', 'marks', 'mean_ms', 'p50_ms', 'p90_ms', 'p99_ms'])
+
+
+if __name__ == '__main__':
+    main()
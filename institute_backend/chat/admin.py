@@ -17,7 +17,7 @@ class ChatRoomAdmin(admin.ModelAdmin):
 @admin.register(ChatMessage)
 class ChatMessageAdmin(admin.ModelAdmin):
     list_display = ['id', 'room', 'sender_name', 'sender_type', 'content_preview', 'timestamp', 'is_read']
-    list_filter = ['sender_type', 'message_type', 'is_read', 'timestamp']
+    list_filter = ['sender_type', 'message_type', 'timestamp']
     search_fields = ['content', 'sender_name', 'room__student__name']
     ordering = ['-timestamp']
     readonly_fields = ['timestamp']
@@ -0,0 +1,178 @@
+"""
+Per-room ring buffers of recently serialized chat messages.
+
+ChatConsumer serves the "recent_messages" sent on connect, and the gap after
+a client's last_seen_id on reconnect, from these buffers instead of querying
+the database each time. A room's buffer is filled from the database on its
+first read, then kept current by the receivers below: new messages are
+appended and edited ones (unsent) replaced in place. Writes that bypass
+save() call mark_read() (see chat.counters.mark_read) or invalidate()
+themselves.
+
+Buffers live in the process, so with several server processes one process
+does not see another's writes. Entries therefore expire after
+CHAT_BUFFER_TTL seconds and are reloaded on the next read.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import ChatMessage, ChatRoom
+
+
+def serialize_message(message, is_read=None):
+    """
+    The message dict sent to WebSocket clients. Pass is_read=False for
+    messages just created, which nobody has read, to skip loading the room
+    for ChatMessage.is_read.
+    """
+    return {
+        'id': message.id,
+        'content': message.content,
+        'sender_type': message.sender_type,
+        'sender_id': message.sender_id,
+        'sender_name': message.sender_name,
+        'timestamp': message.timestamp.isoformat(),
+        'is_read': message.is_read if is_read is None else is_read
+    }
+
+
+class _Room:
+    __slots__ = ('messages', 'loaded_at', 'complete')
+
+    def __init__(self, messages, size, loaded_at):
+        self.messages = deque(messages, maxlen=size)
+        self.loaded_at = loaded_at
+        # True while the buffer holds the room's whole history
+        self.complete = len(self.messages) < size
+
+
+class RoomBuffer:
+    """
+    Bounded, thread-safe LRU of rooms, each holding its last `size`
+    serialized messages oldest first. Methods take the room id as an int.
+    """
+
+    def __init__(self, size=50, ttl=30.0, max_rooms=1000, clock=time.monotonic):
+        self.size = size
+        self.ttl = ttl
+        self.max_rooms = max_rooms
+        self.clock = clock
+        self._rooms = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, room_id):
+        room = self._rooms.get(room_id)
+        if room is None:
+            return None
+        if self.clock() - room.loaded_at > self.ttl:
+            del self._rooms[room_id]
+            return None
+        self._rooms.move_to_end(room_id)
+        return room
+
+    def has(self, room_id):
+        with self._lock:
+            return self._get(room_id) is not None
+
+    def recent(self, room_id):
+        """The buffered messages, oldest first, or None if the room is not buffered"""
+        with self._lock:
+            room = self._get(room_id)
+            return list(room.messages) if room is not None else None
+
+    def since(self, room_id, last_seen_id):
+        """
+        Messages newer than last_seen_id, or None when the buffer cannot
+        vouch for the whole gap (not buffered, or older messages evicted)
+        """
+        with self._lock:
+            room = self._get(room_id)
+            if room is None:
+                return None
+            messages = room.messages
+            # Every message after the oldest buffered one is buffered, so the
+            # gap is covered if the client has seen that one (ids are global,
+            # not consecutive per room, so nothing less will do)
+            if not room.complete and (not messages or messages[0]['id'] > last_seen_id):
+                return None
+            return [message for message in messages if message['id'] > last_seen_id]
+
+    def fill(self, room_id, messages):
+        """Buffer a room's latest messages (oldest first), as read from the database"""
+        with self._lock:
+            self._rooms[room_id] = _Room(messages[-self.size:], self.size, self.clock())
+            self._rooms.move_to_end(room_id)
+            while len(self._rooms) > self.max_rooms:
+                self._rooms.popitem(last=False)
+
+    def append(self, room_id, message):
+        """Add a new message to a buffered room; rooms not buffered are left to load on read"""
+        with self._lock:
+            room = self._get(room_id)
+            if room is None:
+                return
+            if room.messages and room.messages[-1]['id'] >= message['id']:
+                # Saved out of order; reload rather than guess its position
+                del self._rooms[room_id]
+                return
+            if len(room.messages) == self.size:
+                room.complete = False
+            room.messages.append(message)
+
+    def replace(self, room_id, message):
+        """Swap in the current version of a buffered message"""
+        with self._lock:
+            room = self._get(room_id)
+            if room is None:
+                return
+            for i, buffered in enumerate(room.messages):
+                if buffered['id'] == message['id']:
+                    room.messages[i] = message
+                    return
+
+    def mark_read(self, room_id, upto, sender_types):
+        """Mirror a read high-water mark moving to upto for messages from sender_types"""
+        with self._lock:
+            room = self._get(room_id)
+            if room is None:
+                return
+            for i, message in enumerate(room.messages):
+                if (message['id'] <= upto and message['sender_type'] in sender_types
+                        and not message['is_read']):
+                    room.messages[i] = {**message, 'is_read': True}
+
+    def invalidate(self, room_id):
+        with self._lock:
+            self._rooms.pop(room_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._rooms.clear()
+
+
+room_buffer = RoomBuffer(
+    size=getattr(settings, 'CHAT_BUFFER_SIZE', 50),
+    ttl=getattr(settings, 'CHAT_BUFFER_TTL', 30.0),
+)
+
+
+@receiver(post_save, sender=ChatMessage)
+def buffer_saved_message(sender, instance, created, **kwargs):
+    # After commit, so a rolled back message never reaches the buffer
+    message = serialize_message(instance, is_read=False if created else None)
+    if created:
+        transaction.on_commit(lambda: room_buffer.append(instance.room_id, message))
+    else:
+        transaction.on_commit(lambda: room_buffer.replace(instance.room_id, message))
+
+
+@receiver(post_delete, sender=ChatRoom)
+def forget_deleted_room(sender, instance, **kwargs):
+    # Messages deleted on their own invalidate the room in ChatMessage.delete()
+    room_buffer.invalidate(instance.id)
@@ -1,34 +1,48 @@
 import json
-import asyncio
 import logging
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.utils import timezone
-from .models import ChatRoom, ChatMessage, ChatNotification
+from . import counters
+from .models import ChatRoom, ChatMessage
+from .buffers import room_buffer, serialize_message
+from .encoding import dumps, frame_event
+from .persistence import message_queue
+from .receipts import receipt_coalescer
+from .timers import connection_timers
+from .typing import typing_coalescer
 from accounts.models import Student, AdminUser
 
 logger = logging.getLogger(__name__)
 
+# Channel layer group of the admins connected to ws/staff/alerts/
+STAFF_ALERTS_GROUP = 'staff_alerts'
+
 
 class ChatConsumer(AsyncWebsocketConsumer):
+    # Most missed messages sent on resume before falling back to the recent page
+    RESUME_LIMIT = 200
+    
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.heartbeat_task = None
-        self.heartbeat_interval = 30  # seconds
         self.last_heartbeat = None
         self.connection_id = None
         self.offline_messages = []
+        self.room_key = None
         
     async def connect(self):
         self.room_id = self.scope['url_route']['kwargs']['room_id']
         self.room_group_name = f'chat_{self.room_id}'
         self.connection_id = f"{self.room_id}_{self.channel_name}"
+        # Integer room id for the message buffer, None if the URL id is not numeric
+        self.room_key = int(self.room_id) if self.room_id.isdigit() else None
         
         try:
-            # Verify user has access to this room
-            has_access = await self.verify_room_access()
+            # Verify user has access to this room (a buffered room is known to exist)
+            has_access = room_buffer.has(self.room_key) or await self.verify_room_access()
             if not has_access:
-                logger.warning(f"Access denied for room {self.room_id}")
+                logger.warning("Access denied for room %s", self.room_id)
                 await self.close(code=4003)  # Forbidden
                 return
             
@@ -39,50 +53,53 @@ class ChatConsumer(AsyncWebsocketConsumer):
             )
             
             await self.accept()
-            logger.info(f"WebSocket connected to room {self.room_id}")
+            logger.info("WebSocket connected to room %s", self.room_id)
             
-            # Start heartbeat mechanism
-            self.heartbeat_task = asyncio.create_task(self.heartbeat_loop())
+            # Heartbeats and idle timeouts are driven by the shared timer wheel
+            connection_timers.register(self)
             
             # Send connection confirmation
-            await self.send(text_data=json.dumps({
+            await self.send(text_data=dumps({
                 'type': 'connection_established',
                 'room_id': self.room_id,
                 'connection_id': self.connection_id,
                 'timestamp': timezone.now().isoformat()
             }))
             
-            # Send recent messages to newly connected user
-            await self.send_recent_messages()
+            # Send recent messages, or only the gap after ?last_seen_id= when reconnecting
+            await self.send_recent_messages(self.last_seen_id(parse_qs(self.scope.get('query_string', b'').decode())))
             
-        except Exception as e:
-            logger.error(f"Error during WebSocket connection: {e}")
+        except Exception:
+            logger.exception("Error during WebSocket connection")
             await self.close(code=4000)  # Server error
     
     async def disconnect(self, close_code):
-        # Cancel heartbeat task
-        if self.heartbeat_task:
-            self.heartbeat_task.cancel()
-            
+        # Stop heartbeats
+        connection_timers.unregister(self)
+        
         # Leave room group
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name
         )
         
-        logger.info(f"WebSocket disconnected from room {self.room_id}, code: {close_code}")
+        logger.info("WebSocket disconnected from room %s, code: %s", self.room_id, close_code)
         
         # Process any offline messages that were queued
         if self.offline_messages:
             await self.process_offline_messages()
+        
+        # Write anything this connection sent before the socket goes away
+        await message_queue.flush()
     
     async def receive(self, text_data):
         try:
             text_data_json = json.loads(text_data)
             message_type = text_data_json.get('type', 'chat_message')
             
-            # Update last heartbeat time
+            # Update last heartbeat time; any frame keeps the connection alive
             self.last_heartbeat = timezone.now()
+            connection_timers.touch(self)
             
             if message_type == 'chat_message':
                 await self.handle_chat_message(text_data_json)
@@ -92,22 +109,24 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 await self.handle_typing(text_data_json)
             elif message_type == 'heartbeat':
                 await self.handle_heartbeat(text_data_json)
+            elif message_type == 'resume':
+                await self.send_recent_messages(self.last_seen_id(text_data_json))
             elif message_type == 'ping':
-                await self.send(text_data=json.dumps({
+                await self.send(text_data=dumps({
                     'type': 'pong',
                     'timestamp': timezone.now().isoformat()
                 }))
                 
         except json.JSONDecodeError as e:
-            logger.error(f"Invalid JSON received: {e}")
-            await self.send(text_data=json.dumps({
+            logger.error("Invalid JSON received: %s", e)
+            await self.send(text_data=dumps({
                 'type': 'error',
                 'error': 'Invalid JSON format',
                 'code': 'INVALID_JSON'
             }))
-        except Exception as e:
-            logger.error(f"Error processing message: {e}")
-            await self.send(text_data=json.dumps({
+        except Exception:
+            logger.exception("Error processing message")
+            await self.send(text_data=dumps({
                 'type': 'error',
                 'error': 'Message processing failed',
                 'code': 'PROCESSING_ERROR'
@@ -118,77 +137,67 @@ class ChatConsumer(AsyncWebsocketConsumer):
         sender_type = data['sender_type']  # 'student' or 'admin'
         sender_id = data['sender_id']
         sender_name = data['sender_name']
+        if self.room_key is None:
+            return
         
-        # Save message to database
-        message = await self.save_message(
-            message_content, sender_type, sender_id, sender_name
+        # Queue the message for writing (see chat.persistence) and send it to
+        # the room group now; clients get its id from "messages_saved"
+        message = await message_queue.enqueue(
+            self.room_key, sender_type, sender_id, sender_name, message_content
         )
-        
-        if message:
-            # Send message to room group
-            await self.channel_layer.group_send(
-                self.room_group_name,
-                {
-                    'type': 'chat_message',
-                    'message': {
-                        'id': message.id,
-                        'content': message.content,
-                        'sender_type': message.sender_type,
-                        'sender_id': message.sender_id,
-                        'sender_name': message.sender_name,
-                        'timestamp': message.timestamp.isoformat(),
-                        'is_read': message.is_read
-                    }
-                }
-            )
-            
-            # Update notifications
-            await self.update_notifications(message)
-    
-    async def handle_mark_read(self, data):
-        message_ids = data.get('message_ids', [])
-        await self.mark_messages_read(message_ids)
-        
-        # Notify other users that messages were read
         await self.channel_layer.group_send(
             self.room_group_name,
-            {
-                'type': 'messages_read',
-                'message_ids': message_ids
-            }
+            frame_event('chat_message', message=message.serialize())
         )
     
+    async def handle_mark_read(self, data):
+        # Read state is a high-water mark, so the newest id read covers the
+        # rest; older clients send message_ids
+        try:
+            upto = int(data.get('last_read_message_id') or max(data.get('message_ids') or [0]))
+        except (TypeError, ValueError):
+            return
+        if upto <= 0 or self.room_key is None:
+            return
+        marked = await self.mark_messages_read(upto, data.get('user_type'))
+        
+        # Notify other users that messages were read, coalesced per reader (see chat.receipts)
+        if marked:
+            await receipt_coalescer.read(self.room_group_name, *marked)
+    
     async def handle_typing(self, data):
-        # Broadcast typing indicator to other users
-        await self.channel_layer.group_send(
-            self.room_group_name,
-            {
-                'type': 'typing_indicator',
-                'sender_name': data['sender_name'],
-                'is_typing': data['is_typing']
-            }
-        )
+        # Broadcast typing indicator to other users, throttled per sender (see chat.typing)
+        await typing_coalescer.typing(self.room_group_name, data['sender_name'], data['is_typing'])
     
-    # Receive message from room group
+    # Receive message from room group. Broadcasts carry the frame already
+    # encoded in 'text' (see frame_event); events without it are encoded here.
     async def chat_message(self, event):
-        message = event['message']
-        
         # Send message to WebSocket
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=event.get('text') or dumps({
             'type': 'chat_message',
-            'message': message
+            'message': event['message']
         }))
     
     async def messages_read(self, event):
         # Send read receipt to WebSocket
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=event.get('text') or dumps({
             'type': 'messages_read',
-            'message_ids': event['message_ids']
+            'reader': event['reader'],
+            'sender_types': event['sender_types'],
+            'last_read_message_id': event['last_read_message_id']
         }))
     
+    async def messages_saved(self, event):
+        # Ids of broadcast messages, once written (see chat.persistence)
+        await self.send(text_data=event['text'])
+
+    async def messages_failed(self, event):
+        # Keys of broadcast messages that could not be written
+        await self.send(text_data=event['text'])
+    
     async def typing_indicator(self, event):
         # Send typing indicator to WebSocket
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=event.get('text') or dumps({
             'type': 'typing_indicator',
             'sender_name': event['sender_name'],
             'is_typing': event['is_typing']
@@ -206,130 +215,108 @@ class ChatConsumer(AsyncWebsocketConsumer):
             return False
     
     @database_sync_to_async
-    def save_message(self, content, sender_type, sender_id, sender_name):
-        """Save message to database"""
+    def mark_messages_read(self, upto, user_type=None):
+        """
+        Move the reader's high-water mark to message upto. The reader is
+        user_type's side, or else the side that message was sent to.
+        Returns (reader, mark) if the mark moved, else None.
+        """
         try:
-            room = ChatRoom.objects.get(id=self.room_id)
-            message = ChatMessage.objects.create(
-                room=room,
-                sender_type=sender_type,
-                sender_id=sender_id,
-                sender_name=sender_name,
-                content=content,
-                message_type='text'
-            )
-            
-            # Update room's updated_at timestamp
-            room.updated_at = timezone.now()
-            room.save(update_fields=['updated_at'])
-            
-            return message
-        except Exception as e:
-            print(f"Error saving message: {e}")
+            if user_type:
+                reader = counters.STUDENT if user_type == 'student' else counters.STAFF
+            else:
+                sender_type = ChatMessage.objects.filter(id=upto, room_id=self.room_key).values_list(
+                    'sender_type', flat=True
+                ).first()
+                if sender_type is None:
+                    return None
+                reader = counters.reader_of(sender_type)
+            last_message_id = ChatRoom.objects.filter(id=self.room_key).values_list(
+                'last_message_id', flat=True
+            ).first()
+            upto = min(upto, last_message_id or 0)
+            if not counters.mark_read(self.room_key, reader, upto):
+                return None
+            counters.sync_notifications(self.room_key, reader)
+            return reader, upto
+        except Exception:
+            logger.exception("Error marking messages as read")
             return None
     
     @database_sync_to_async
-    def update_notifications(self, message):
-        """Update notification counts for recipients"""
+    def get_recent_messages(self, limit=None):
+        """Get recent messages for the room, filling its buffer"""
         try:
-            room = message.room
-            
-            # Determine recipient type (opposite of sender)
-            if message.sender_type == 'student':
-                recipient_type = 'admin'
-                recipient_id = room.admin.id if room.admin else 0
-            else:
-                recipient_type = 'student'
-                recipient_id = room.student.id
-            
-            # Update or create notification
-            notification, created = ChatNotification.objects.get_or_create(
-                room=room,
-                recipient_type=recipient_type,
-                recipient_id=recipient_id,
-                defaults={
-                    'unread_count': 1,
-                    'last_message': message
-                }
-            )
-            
-            if not created:
-                notification.unread_count += 1
-                notification.last_message = message
-                notification.save()
-                
-        except Exception as e:
-            print(f"Error updating notifications: {e}")
+            limit = limit or room_buffer.size
+            messages = [
+                serialize_message(msg)
+                for msg in reversed(ChatMessage.objects.filter(room_id=self.room_id).select_related('room')
+                                    .order_by('-id')[:limit])
+            ]
+            if self.room_key is not None:
+                room_buffer.fill(self.room_key, messages)
+            return messages
+        except Exception:
+            logger.exception("Error getting recent messages")
+            return []
     
     @database_sync_to_async
-    def mark_messages_read(self, message_ids):
-        """Mark messages as read"""
-        try:
-            ChatMessage.objects.filter(
-                id__in=message_ids,
-                room_id=self.room_id
-            ).update(is_read=True)
-        except Exception as e:
-            print(f"Error marking messages as read: {e}")
+    def get_messages_since(self, last_seen_id):
+        """Messages after last_seen_id, or None if there are more than RESUME_LIMIT of them"""
+        messages = list(
+            ChatMessage.objects.filter(room_id=self.room_id, id__gt=last_seen_id).select_related('room')
+            .order_by('id')[:self.RESUME_LIMIT + 1]
+        )
+        if len(messages) > self.RESUME_LIMIT:
+            return None
+        return [serialize_message(msg) for msg in messages]
     
-    @database_sync_to_async
-    def get_recent_messages(self, limit=50):
-        """Get recent messages for the room"""
+    @staticmethod
+    def last_seen_id(params):
+        """last_seen_id from a message or parsed query string, None if absent or invalid"""
+        value = params.get('last_seen_id')
+        if isinstance(value, list):
+            value = value[0] if value else None
         try:
-            room = ChatRoom.objects.get(id=self.room_id)
-            messages = room.messages.all().order_by('-timestamp')[:limit]
-            
-            return [{
-                'id': msg.id,
-                'content': msg.content,
-                'sender_type': msg.sender_type,
-                'sender_id': msg.sender_id,
-                'sender_name': msg.sender_name,
-                'timestamp': msg.timestamp.isoformat(),
-                'is_read': msg.is_read
-            } for msg in reversed(messages)]
-        except Exception as e:
-            logger.error(f"Error getting recent messages: {e}")
-            return []
+            return int(value) if value is not None else None
+        except (TypeError, ValueError):
+            return None
     
-    async def send_recent_messages(self):
-        """Send recent messages to newly connected user"""
-        messages = await self.get_recent_messages()
+    async def send_recent_messages(self, last_seen_id=None):
+        """
+        Send recent messages to a newly connected user, from the room buffer
+        when possible. With last_seen_id only the newer messages are sent
+        (resumed: true), unless the gap exceeds RESUME_LIMIT, in which case
+        the client gets the usual recent page and should replace its list.
+        """
+        messages = None
+        recent = room_buffer.recent(self.room_key) if self.room_key is not None else None
+        if recent is None:
+            # Loading the recent page also fills the buffer for the next connect
+            recent = await self.get_recent_messages()
+        if last_seen_id is not None:
+            if self.room_key is not None:
+                messages = room_buffer.since(self.room_key, last_seen_id)
+            if messages is None:
+                messages = await self.get_messages_since(last_seen_id)
+        resumed = messages is not None
+        if messages is None:
+            messages = recent
+        if self.room_key is not None:
+            # Messages already broadcast but not yet written
+            loaded_ids = {message['id'] for message in messages}
+            messages = messages + message_queue.pending_for(self.room_key, loaded_ids)
         
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=dumps({
             'type': 'recent_messages',
-            'messages': messages
+            'messages': messages,
+            'resumed': resumed
         }))
     
-    async def heartbeat_loop(self):
-        """Send periodic heartbeat to maintain connection"""
-        try:
-            while True:
-                await asyncio.sleep(self.heartbeat_interval)
-                
-                # Check if connection is still alive
-                if self.last_heartbeat:
-                    time_since_last = (timezone.now() - self.last_heartbeat).total_seconds()
-                    if time_since_last > self.heartbeat_interval * 2:
-                        logger.warning(f"Connection {self.connection_id} appears stale")
-                        break
-                
-                # Send heartbeat
-                await self.send(text_data=json.dumps({
-                    'type': 'heartbeat',
-                    'timestamp': timezone.now().isoformat(),
-                    'connection_id': self.connection_id
-                }))
-                
-        except asyncio.CancelledError:
-            logger.info(f"Heartbeat cancelled for {self.connection_id}")
-        except Exception as e:
-            logger.error(f"Heartbeat error for {self.connection_id}: {e}")
-    
     async def handle_heartbeat(self, data):
         """Handle heartbeat response from client"""
         self.last_heartbeat = timezone.now()
-        await self.send(text_data=json.dumps({
+        await self.send(text_data=dumps({
             'type': 'heartbeat_ack',
             'timestamp': self.last_heartbeat.isoformat()
         }))
@@ -340,14 +327,14 @@ class ChatConsumer(AsyncWebsocketConsumer):
             for message_data in self.offline_messages:
                 await self.handle_chat_message(message_data)
             self.offline_messages.clear()
-            logger.info(f"Processed {len(self.offline_messages)} offline messages")
-        except Exception as e:
-            logger.error(f"Error processing offline messages: {e}")
+            logger.info("Processed %s offline messages", len(self.offline_messages))
+        except Exception:
+            logger.exception("Error processing offline messages")
     
     async def queue_offline_message(self, message_data):
         """Queue message for processing when connection is restored"""
         self.offline_messages.append(message_data)
-        logger.info(f"Queued offline message for {self.connection_id}")
+        logger.info("Queued offline message for %s", self.connection_id)
     
     async def send_error_response(self, error_code, message, details=None):
         """Send standardized error response"""
@@ -361,4 +348,30 @@ class ChatConsumer(AsyncWebsocketConsumer):
         if details:
             error_response['details'] = details
             
-        await self.send(text_data=json.dumps(error_response))
\ No newline at end of file
+        await self.send(text_data=dumps(error_response))
+
+
+class StaffAlertsConsumer(AsyncWebsocketConsumer):
+    """Pushes staff-only notifications, such as at-risk alerts, to connected admins"""
+
+    async def connect(self):
+        if not await self.is_staff():
+            logger.warning('Access denied for staff alerts')
+            await self.close(code=4003)  # Forbidden
+            return
+        await self.channel_layer.group_add(STAFF_ALERTS_GROUP, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(STAFF_ALERTS_GROUP, self.channel_name)
+
+    async def risk_alert(self, event):
+        await self.send(text_data=event['text'])
+
+    @database_sync_to_async
+    def is_staff(self):
+        """An admin session or a Django staff user, as for the admin HTTP endpoints"""
+        session = self.scope.get('session')
+        user = self.scope.get('user')
+        return bool((session is not None and session.get('admin_authenticated'))
+                    or getattr(user, 'is_staff', False))
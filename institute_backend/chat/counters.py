@@ -0,0 +1,182 @@
+"""
+Denormalized per-room chat counters.
+
+Each ChatRoom stores how many messages are unread by the student
+(unread_for_student) and by staff (unread_for_staff), plus a pointer to its
+newest message, so room lists read them straight off the row instead of
+aggregating the messages table. Writers keep them current with single-row
+F() updates inside the writer's transaction: messages saved through the ORM
+are counted by the post_save receiver below, bulk writers call
+record_messages() themselves, and readers go through mark_read() followed
+by sync_notifications().
+
+Read state is a high-water mark per side (student_last_read_id,
+staff_last_read_id): a side has read every message sent to it up to its
+mark, so marking a backlog read moves the mark and recounts what is left
+above it in one UPDATE of the room row, whatever the backlog's size.
+
+Writes that bypass these functions (bulk loads, deletes, manual SQL) leave
+the counters stale; reconcile() recomputes them from the messages and
+repairs rooms and ChatNotification rows that drifted. ChatNotification
+unread counts follow the room: admin rows match unread_for_staff and
+student rows unread_for_student.
+"""
+import logging
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .buffers import room_buffer
+from .models import ChatMessage, ChatNotification, ChatRoom
+
+logger = logging.getLogger(__name__)
+
+STUDENT = 'student'
+STAFF = 'staff'
+CHUNK_SIZE = 1000
+
+
+def unread_field(reader):
+    return 'unread_for_student' if reader == STUDENT else 'unread_for_staff'
+
+
+def last_read_field(reader):
+    return 'student_last_read_id' if reader == STUDENT else 'staff_last_read_id'
+
+
+def recipient_type(reader):
+    """ChatNotification.recipient_type of the reader's side"""
+    return 'student' if reader == STUDENT else 'admin'
+
+
+def reader_of(sender_type):
+    """Whose unread counter a message from sender_type adds to"""
+    return STUDENT if sender_type in ChatMessage.STAFF_SENDER_TYPES else STAFF
+
+
+def sent_to(reader):
+    """Sender types whose messages the reader receives"""
+    if reader == STUDENT:
+        return list(ChatMessage.STAFF_SENDER_TYPES)
+    return [value for value, _ in ChatMessage.SENDER_TYPES if value not in ChatMessage.STAFF_SENDER_TYPES]
+
+
+def unread_count(reader, room, above):
+    """Subquery counting the messages sent to reader in room with ids above `above`"""
+    counted = (
+        ChatMessage.objects.filter(room=room, sender_type__in=sent_to(reader), id__gt=above)
+        .order_by().values('room').annotate(count=Count('id')).values('count')
+    )
+    return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+
+
+def record_messages(messages):
+    """
+    Count newly inserted messages into their rooms' counters and move each
+    room's last_message pointer forward. One UPDATE per room.
+    """
+    by_room = defaultdict(list)
+    for message in messages:
+        by_room[message.room_id].append(message)
+    now = timezone.now()
+    with transaction.atomic(savepoint=False):
+        for room_id, room_messages in by_room.items():
+            latest = max(room_messages, key=lambda message: message.id)
+            changes = {
+                # Ids only grow, so the larger id is the newer message even
+                # if a concurrent writer got here first
+                'last_message_id': Greatest(Coalesce(F('last_message_id'), Value(0)), Value(latest.id)),
+                'last_message_at': Greatest(Coalesce(F('last_message_at'), Value(latest.timestamp)),
+                                            Value(latest.timestamp)),
+                'updated_at': now,
+            }
+            for reader in (STUDENT, STAFF):
+                added = sum(reader_of(message.sender_type) == reader for message in room_messages)
+                if added:
+                    changes[unread_field(reader)] = F(unread_field(reader)) + added
+            ChatRoom.objects.filter(id=room_id).update(**changes)
+
+
+@receiver(post_save, sender=ChatMessage)
+def count_saved_message(sender, instance, created, raw=False, **kwargs):
+    # bulk_create sends no post_save; its callers use record_messages()
+    if created and not raw:
+        record_messages([instance])
+
+
+def mark_read(room_id, reader, upto):
+    """
+    Move the reader's high-water mark in the room forward to message id upto
+    (at most the room's last message) and recount the messages still unread
+    above it, in one UPDATE. Returns whether the mark moved.
+    """
+    mark = last_read_field(reader)
+    target = Least(Value(upto), Coalesce(F('last_message_id'), Value(0)))
+    moved = ChatRoom.objects.filter(id=room_id, **{f'{mark}__lt': target}).update(**{
+        mark: target,
+        unread_field(reader): unread_count(reader, OuterRef('pk'), upto),
+    })
+    if moved:
+        transaction.on_commit(lambda: room_buffer.mark_read(int(room_id), upto, sent_to(reader)))
+    return bool(moved)
+
+
+def sync_notifications(room_id, reader):
+    """Set the reader side's ChatNotification rows in the room to its unread counter"""
+    ChatNotification.objects.filter(room_id=room_id, recipient_type=recipient_type(reader)).update(
+        unread_count=Subquery(ChatRoom.objects.filter(id=room_id).values(unread_field(reader))[:1])
+    )
+
+
+def expected_counters(rooms):
+    """rooms annotated with counters recomputed from their messages (expected_* fields)"""
+    messages = ChatMessage.objects.filter(room=OuterRef('pk')).order_by()
+    return rooms.annotate(
+        expected_unread_for_student=unread_count(STUDENT, OuterRef('pk'), OuterRef('student_last_read_id')),
+        expected_unread_for_staff=unread_count(STAFF, OuterRef('pk'), OuterRef('staff_last_read_id')),
+        expected_last_message_id=Subquery(messages.values('room').annotate(last=Max('id')).values('last')),
+    )
+
+
+def reconcile(rooms=None, chunk_size=CHUNK_SIZE):
+    """
+    Recompute counters and last_message for rooms (default: all) from their
+    messages and fix the ones that drifted, along with their ChatNotification
+    rows. Returns the number of rooms repaired.
+    """
+    rooms = rooms if rooms is not None else ChatRoom.objects.all()
+    fields = ['unread_for_student', 'unread_for_staff', 'last_message_id']
+    repaired = 0
+    last_id = 0
+    while True:
+        chunk = list(expected_counters(rooms.filter(id__gt=last_id).order_by('id'))[:chunk_size])
+        if not chunk:
+            return repaired
+        last_id = chunk[-1].id
+        drifted = [room for room in chunk
+                   if any(getattr(room, field) != getattr(room, f'expected_{field}') for field in fields)]
+        if drifted:
+            last_messages = ChatMessage.objects.in_bulk([room.expected_last_message_id for room in drifted
+                                                        if room.expected_last_message_id])
+            for room in drifted:
+                for field in fields:
+                    setattr(room, field, getattr(room, f'expected_{field}'))
+                last_message = last_messages.get(room.last_message_id)
+                room.last_message_at = last_message.timestamp if last_message else None
+            with transaction.atomic():
+                ChatRoom.objects.bulk_update(drifted, fields + ['last_message_at'])
+            repaired += len(drifted)
+            logger.info('Repaired chat room counters', extra={'room_count': len(drifted)})
+        with transaction.atomic():
+            for reader in (STAFF, STUDENT):
+                field = unread_field(reader)
+                ChatNotification.objects.filter(
+                    room__in=[room.id for room in chunk], recipient_type=recipient_type(reader)
+                ).exclude(unread_count=F(f'room__{field}')).update(
+                    unread_count=Subquery(ChatRoom.objects.filter(id=OuterRef('room_id')).values(field)[:1])
+                )
@@ -0,0 +1,31 @@
+"""
+JSON encoding for WebSocket frames.
+
+Room broadcasts are encoded once by the sender and the finished frame is
+carried through the channel layer as the event's 'text', so each listening
+consumer only writes it to its socket instead of running json.dumps on the
+same payload again. orjson is used when installed and the standard library
+otherwise; both produce compact JSON that clients parse the same way.
+"""
+import json
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def dumps(data):
+    """data as a compact JSON string"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data).decode()
+    return json.dumps(data, separators=(',', ':'))
+
+
+def frame_event(event_type, **payload):
+    """
+    A channel layer event for group_send whose 'text' is the client frame
+    {"type": event_type, **payload}, encoded once for every listener
+    """
+    return {'type': event_type, 'text': dumps({'type': event_type, **payload})}
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_chatmessage_deleted_at_chatmessage_is_deleted'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['room', 'timestamp', 'id'], name='chat_chatme_room_id_6e4daa_idx'),
+        ),
+    ]
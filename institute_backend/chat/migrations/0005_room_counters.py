@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, Max, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+STAFF_SENDER_TYPES = ('admin', 'faculty', 'principal')
+
+
+def fill_room_counters(apps, schema_editor):
+    """Count unread messages and find the last message of every existing room"""
+    ChatRoom = apps.get_model('chat', 'ChatRoom')
+    ChatMessage = apps.get_model('chat', 'ChatMessage')
+    messages = ChatMessage.objects.filter(room=OuterRef('pk')).order_by()
+    staff_sent = Q(sender_type__in=STAFF_SENDER_TYPES)
+
+    def unread(condition):
+        counted = messages.filter(condition, is_read=False).values('room').annotate(count=Count('id')).values('count')
+        return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+    ChatRoom.objects.update(
+        unread_for_student=unread(staff_sent),
+        unread_for_staff=unread(~staff_sent),
+        last_message_id=Subquery(messages.values('room').annotate(last=Max('id')).values('last')),
+        last_message_at=Subquery(messages.values('room').annotate(last=Max('timestamp')).values('last')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_student_name_index'),
+        ('chat', '0004_chatmessage_room_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.chatmessage'),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='unread_for_staff',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='unread_for_student',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='chatroom',
+            index=models.Index(fields=['admin', 'is_active', '-updated_at'], name='chat_chatro_admin_i_c3d8c7_idx'),
+        ),
+        migrations.RunPython(fill_room_counters, migrations.RunPython.noop),
+    ]
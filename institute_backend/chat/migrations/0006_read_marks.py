@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:00
+
+from django.db import migrations, models
+from django.db.models import Count, F, IntegerField, Min, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+STAFF_SENDER_TYPES = ('admin', 'faculty', 'principal')
+
+
+def fill_read_marks(apps, schema_editor):
+    """
+    Turn per-message is_read flags into a high-water mark per side: just
+    below the side's oldest unread message, or the room's last message when
+    it has read everything. Unread counters are then recounted above the marks.
+    """
+    ChatRoom = apps.get_model('chat', 'ChatRoom')
+    ChatMessage = apps.get_model('chat', 'ChatMessage')
+    messages = ChatMessage.objects.filter(room=OuterRef('pk')).order_by()
+    staff_sent = models.Q(sender_type__in=STAFF_SENDER_TYPES)
+
+    def mark(sent_to_reader):
+        oldest_unread = messages.filter(sent_to_reader, is_read=False).values('room').annotate(
+            first=Min('id')
+        ).values('first')
+        return Coalesce(Subquery(oldest_unread) - 1, F('last_message_id'), Value(0))
+
+    def unread(sent_to_reader, last_read):
+        counted = messages.filter(sent_to_reader, id__gt=OuterRef(last_read)).values('room').annotate(
+            count=Count('id')
+        ).values('count')
+        return Coalesce(Subquery(counted, output_field=IntegerField()), 0)
+    ChatRoom.objects.update(student_last_read_id=mark(staff_sent), staff_last_read_id=mark(~staff_sent))
+    ChatRoom.objects.update(unread_for_student=unread(staff_sent, 'student_last_read_id'),
+                            unread_for_staff=unread(~staff_sent, 'staff_last_read_id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0005_room_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='staff_last_read_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='student_last_read_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['room', 'sender_type', 'id'], name='chat_chatme_room_id_27daf7_idx'),
+        ),
+        migrations.RunPython(fill_read_marks, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='chatmessage',
+            name='is_read',
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:00
+
+from django.db import migrations
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+STAFF_SENDER_TYPES = ('admin', 'faculty', 'principal')
+
+
+def remove_risk_alert_messages(apps, schema_editor):
+    """
+    At-risk alerts used to be posted as system messages in the student's own
+    room, where the student could read them; they now go to staff only. Drop
+    the posted alerts and recount the rooms they were in.
+    """
+    ChatRoom = apps.get_model('chat', 'ChatRoom')
+    ChatMessage = apps.get_model('chat', 'ChatMessage')
+    ChatNotification = apps.get_model('chat', 'ChatNotification')
+    alerts = ChatMessage.objects.filter(sender_type='system', message_type='system')
+    room_ids = set(alerts.values_list('room_id', flat=True).distinct())
+    if not room_ids:
+        return
+
+    # Notifications pointing at an alert would be deleted with it; point them at the newest other message
+    kept = ChatMessage.objects.filter(room=OuterRef('room_id')).exclude(
+        sender_type='system', message_type='system'
+    ).order_by('-id')
+    ChatNotification.objects.filter(last_message__in=alerts).update(last_message=Subquery(kept.values('id')[:1]))
+    alerts.delete()
+
+    newest = ChatMessage.objects.filter(room=OuterRef('pk')).order_by('-id')
+    unread = (
+        ChatMessage.objects.filter(room=OuterRef('pk'), id__gt=OuterRef('staff_last_read_id'))
+        .exclude(sender_type__in=STAFF_SENDER_TYPES)
+        .order_by().values('room').annotate(count=Count('id')).values('count')
+    )
+    ChatRoom.objects.filter(id__in=room_ids).update(
+        last_message_id=Subquery(newest.values('id')[:1]),
+        last_message_at=Subquery(newest.values('timestamp')[:1]),
+        unread_for_staff=Coalesce(Subquery(unread, output_field=IntegerField()), Value(0)),
+    )
+    ChatNotification.objects.filter(room_id__in=room_ids, recipient_type='admin').update(
+        unread_count=Subquery(ChatRoom.objects.filter(id=OuterRef('room_id')).values('unread_for_staff')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0006_read_marks'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_risk_alert_messages, migrations.RunPython.noop),
+    ]
@@ -17,10 +17,24 @@ class ChatRoom(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
+    # Denormalized by chat.counters on send and mark-read; reconcile_chat_counters repairs drift
+    last_message = models.ForeignKey('ChatMessage', on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='+')
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    unread_for_student = models.PositiveIntegerField(default=0)
+    unread_for_staff = models.PositiveIntegerField(default=0)
+    # Read high-water marks: each side has read every message sent to it
+    # with an id up to and including its mark
+    student_last_read_id = models.BigIntegerField(default=0)
+    staff_last_read_id = models.BigIntegerField(default=0)
     
     class Meta:
         unique_together = ['student', 'recipient_type']
         ordering = ['-updated_at']
+        indexes = [
+            # Admin room lists: active rooms, most recently updated first
+            models.Index(fields=['admin', 'is_active', '-updated_at']),
+        ]
     
     def __str__(self):
         return f"Chat: {self.student.name} - {self.get_recipient_type_display()}"
@@ -31,6 +45,17 @@ class ChatRoom(models.Model):
         return f"chat_{self.id}"
 
 
+class ChatMessageQuerySet(models.QuerySet):
+    def delete(self):
+        """Delete, then drop the affected rooms from the message buffer"""
+        from .buffers import room_buffer
+        room_ids = set(self.values_list('room_id', flat=True))
+        result = super().delete()
+        for room_id in room_ids:
+            room_buffer.invalidate(room_id)
+        return result
+
+
 class ChatMessage(models.Model):
     """Individual chat messages"""
     MESSAGE_TYPES = [
@@ -46,6 +71,9 @@ class ChatMessage(models.Model):
         ('principal', 'Principal'),
         ('system', 'System'),
     ]
+    # Messages from these senders are unread for the student; the rest
+    # (the student's own and system alerts) are unread for staff
+    STAFF_SENDER_TYPES = ('admin', 'faculty', 'principal')
     
     room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name='messages')
     sender_type = models.CharField(max_length=10, choices=SENDER_TYPES)
@@ -55,20 +83,45 @@ class ChatMessage(models.Model):
     content = models.TextField()
     file_url = models.URLField(blank=True, null=True)  # For file messages
     timestamp = models.DateTimeField(auto_now_add=True)
-    is_read = models.BooleanField(default=False)
     is_deleted = models.BooleanField(default=False)
     deleted_at = models.DateTimeField(null=True, blank=True)
     
+    objects = ChatMessageQuerySet.as_manager()
+    
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # Keyset pagination of a room's history on (timestamp, id)
+            models.Index(fields=['room', 'timestamp', 'id']),
+            # Unread counts: one side's messages above the reader's high-water mark
+            models.Index(fields=['room', 'sender_type', 'id']),
+        ]
     
     def __str__(self):
         return f"{self.sender_name}: {self.content[:50]}..."
     
+    @property
+    def is_read(self):
+        """Whether the recipient's read high-water mark in the room has reached this message"""
+        if self.id is None:
+            return False
+        if self.sender_type in self.STAFF_SENDER_TYPES:
+            return self.id <= self.room.student_last_read_id
+        return self.id <= self.room.staff_last_read_id
+    
     def mark_as_read(self):
-        """Mark message as read"""
-        self.is_read = True
-        self.save(update_fields=['is_read'])
+        """Mark this message, and everything before it sent to the same side, as read"""
+        from .counters import mark_read, reader_of
+        mark_read(self.room_id, reader_of(self.sender_type), upto=self.id)
+        self.room.refresh_from_db()
+    
+    def delete(self, *args, **kwargs):
+        # Not a post_delete receiver: that would stop room deletes from
+        # fast-deleting messages; deleted rooms are dropped by their own receiver
+        from .buffers import room_buffer
+        result = super().delete(*args, **kwargs)
+        room_buffer.invalidate(self.room_id)
+        return result
     
     def delete_message(self):
         """Mark message as deleted (unsend)"""
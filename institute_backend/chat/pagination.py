@@ -0,0 +1,93 @@
+"""
+Keyset pagination for chat message history and the student directory.
+
+A page is the page_size messages before a cursor, newest first, found by
+seeking the (room, timestamp, id) index instead of skipping an offset, so
+every page costs the same however far back it is. Cursors are opaque
+URL-safe strings naming the (timestamp, id) of the oldest message already
+shown. The student directory pages forward through (name, id) the same way.
+"""
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def _encode(raw):
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode(cursor):
+    return base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+
+
+def encode_cursor(message):
+    return _encode(f'{message.timestamp.isoformat()}|{message.id}')
+
+
+def decode_cursor(cursor):
+    """(timestamp, id) from a cursor; ValueError if it is malformed"""
+    try:
+        timestamp, message_id = _decode(cursor).rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(message_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError('Invalid cursor')
+
+
+def encode_student_cursor(student):
+    return _encode(f'{student.name}|{student.id}')
+
+
+def decode_student_cursor(cursor):
+    """(name, id) from a student directory cursor; ValueError if it is malformed"""
+    try:
+        name, student_id = _decode(cursor).rsplit('|', 1)
+        return name, int(student_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError('Invalid cursor')
+
+
+def parse_page_size(value):
+    """page_size query parameter clamped to 1..MAX_PAGE_SIZE; ValueError if not an integer"""
+    if value in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(value), MAX_PAGE_SIZE))
+
+
+def messages_before(messages, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    (page, next_cursor) for a room's messages queryset: up to page_size
+    messages older than cursor (or the newest ones), oldest first, and the
+    cursor for the page before them or None when there are no more
+    """
+    if cursor:
+        timestamp, message_id = decode_cursor(cursor)
+        # The plain timestamp bound lets the index seek; the OR only breaks ties
+        messages = messages.filter(timestamp__lte=timestamp).filter(
+            Q(timestamp__lt=timestamp) | Q(id__lt=message_id)
+        )
+    # One extra row tells whether an older page exists without counting
+    page = list(messages.order_by('-timestamp', '-id')[:page_size + 1])
+    has_more = len(page) > page_size
+    page = page[:page_size]
+    page.reverse()
+    return page, (encode_cursor(page[0]) if has_more else None)
+
+
+def students_after(students, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    (page, next_cursor) for a students queryset ordered by (name, id): up to
+    page_size students after cursor, and the cursor for the next page or
+    None when there are no more
+    """
+    if cursor:
+        name, student_id = decode_student_cursor(cursor)
+        students = students.filter(name__gte=name).filter(Q(name__gt=name) | Q(id__gt=student_id))
+    page = list(students.order_by('name', 'id')[:page_size + 1])
+    has_more = len(page) > page_size
+    page = page[:page_size]
+    return page, (encode_student_cursor(page[-1]) if has_more else None)
@@ -0,0 +1,282 @@
+"""
+Write-behind persistence for messages sent over the WebSocket.
+
+ChatConsumer broadcasts a new message as soon as it arrives and hands it to
+message_queue. The queue writes pending messages in batches: one
+bulk_create for the messages, one update of each room's counters (see
+chat.counters), and one F() increment of unread_count per notification row,
+so concurrent senders never lose a count. A batch is flushed when it reaches CHAT_WRITE_BATCH_SIZE
+messages or CHAT_WRITE_FLUSH_INTERVAL seconds after its first message, and
+when a consumer disconnects.
+
+Broadcast messages carry a provisional 'key' and no id. Once a batch is
+committed each room group receives a "messages_saved" frame mapping keys to
+ids and stored timestamps. The room buffer is given the saved messages on the
+event loop in the same step that stops listing them as pending, so a client
+loading the room never sees a message both ways.
+
+A batch that fails to write is put back at the head of the queue and
+retried with backoff. After CHAT_WRITE_MAX_ATTEMPTS failed writes its
+messages are tried one at a time, so only those that still fail are
+dropped (and logged); messages for deleted rooms are dropped too. Each room
+group is sent a "messages_failed" frame with the keys of its dropped
+messages, so clients can stop showing them as sent.
+Pending messages live in the process, so a crash loses at most the
+messages not yet flushed.
+"""
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import counters
+from .buffers import room_buffer, serialize_message
+from .encoding import frame_event
+from .models import ChatMessage, ChatNotification, ChatRoom
+
+logger = logging.getLogger(__name__)
+
+# Longest wait between retries of a failed batch, in seconds
+MAX_RETRY_DELAY = 5.0
+
+
+def notification_recipient(room, sender_type):
+    """(recipient_type, recipient_id) notified of a message: the other side of the room"""
+    if sender_type == 'student':
+        return 'admin', room.admin_id or 0
+    return 'student', room.student_id
+
+
+class PendingMessage:
+    __slots__ = ('key', 'id', 'room_id', 'sender_type', 'sender_id', 'sender_name', 'content',
+                 'message_type', 'timestamp', 'attempts')
+
+    def __init__(self, room_id, sender_type, sender_id, sender_name, content, message_type='text'):
+        self.key = uuid.uuid4().hex
+        # Set once written; a client may read the row before the queue learns it was saved
+        self.id = None
+        self.room_id = room_id
+        self.sender_type = sender_type
+        self.sender_id = sender_id
+        self.sender_name = sender_name
+        self.content = content
+        self.message_type = message_type
+        self.timestamp = timezone.now()
+        self.attempts = 0
+
+    def serialize(self):
+        """The broadcast form of the message, before it has an id"""
+        return {
+            'id': None,
+            'key': self.key,
+            'content': self.content,
+            'sender_type': self.sender_type,
+            'sender_id': self.sender_id,
+            'sender_name': self.sender_name,
+            'timestamp': self.timestamp.isoformat(),
+            'is_read': False
+        }
+
+
+def write_batch(batch):
+    """
+    Persist a batch of PendingMessages in one transaction. Returns
+    [(pending, ChatMessage)] for the messages written, in batch order.
+    """
+    rooms = ChatRoom.objects.in_bulk({pending.room_id for pending in batch})
+    if len(rooms) < len({pending.room_id for pending in batch}):
+        logger.warning('Dropped chat messages for deleted rooms',
+                       extra={'message_count': sum(pending.room_id not in rooms for pending in batch)})
+        batch = [pending for pending in batch if pending.room_id in rooms]
+    if not batch:
+        return []
+    with transaction.atomic():
+        messages = ChatMessage.objects.bulk_create([
+            ChatMessage(room_id=pending.room_id, sender_type=pending.sender_type, sender_id=pending.sender_id,
+                        sender_name=pending.sender_name, content=pending.content,
+                        message_type=pending.message_type)
+            for pending in batch
+        ])
+        for pending, message in zip(batch, messages):
+            pending.id = message.id
+        counters.record_messages(messages)
+
+        # unread increments per notification row, and the newest message for it
+        counts = defaultdict(int)
+        latest = {}
+        for pending, message in zip(batch, messages):
+            recipient = (pending.room_id, *notification_recipient(rooms[pending.room_id], pending.sender_type))
+            counts[recipient] += 1
+            latest[recipient] = message
+        ChatNotification.objects.bulk_create([
+            ChatNotification(room_id=room_id, recipient_type=recipient_type, recipient_id=recipient_id)
+            for room_id, recipient_type, recipient_id in counts
+        ], ignore_conflicts=True)
+        for (room_id, recipient_type, recipient_id), count in counts.items():
+            ChatNotification.objects.filter(
+                room_id=room_id, recipient_type=recipient_type, recipient_id=recipient_id
+            ).update(unread_count=F('unread_count') + count, last_message=latest[room_id, recipient_type, recipient_id],
+                     updated_at=timezone.now())
+    return list(zip(batch, messages))
+
+
+def write_each(batch):
+    """Write messages one by one, logging and dropping any that fail"""
+    saved = []
+    for pending in batch:
+        try:
+            saved.extend(write_batch([pending]))
+        except Exception:
+            logger.exception('Dropped chat message after repeated write failures',
+                             extra={'room_id': pending.room_id, 'message_key': pending.key})
+    return saved
+
+
+class MessageWriteQueue:
+    """
+    Batches PendingMessages from the consumers on one event loop. Flushes
+    run one at a time, so messages are written in the order they were sent.
+    """
+
+    def __init__(self, batch_size=100, flush_interval=0.05, max_attempts=10):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.pending = []
+        # The batch being written, still pending until its transaction commits
+        self._writing = []
+        self._timer = None
+        self._loop = None
+        self._lock = None
+        self._tasks = set()
+
+    def _bind(self):
+        # asyncio primitives belong to one loop; rebind if it changed (tests run a loop per call)
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._lock = asyncio.Lock()
+            self._timer = None
+        return loop
+
+    async def enqueue(self, room_id, sender_type, sender_id, sender_name, content, message_type='text'):
+        """Queue a message for writing and return it, flushing if the batch is full"""
+        self._bind()
+        pending = PendingMessage(room_id, sender_type, sender_id, sender_name, content, message_type)
+        self.pending.append(pending)
+        if len(self.pending) >= self.batch_size:
+            await self.flush()
+        else:
+            self._schedule(self.flush_interval)
+        return pending
+
+    def pending_for(self, room_id, loaded_ids=()):
+        """
+        Serialized messages for a room that are not written yet, oldest first,
+        leaving out any whose row is already among loaded_ids
+        """
+        return [pending.serialize() for pending in self._writing + self.pending
+                if pending.room_id == room_id and (pending.id is None or pending.id not in loaded_ids)]
+
+    def _schedule(self, delay):
+        if self._timer is not None:
+            return
+        loop = self._bind()
+
+        def fire():
+            self._timer = None
+            task = loop.create_task(self.flush())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        self._timer = loop.call_later(delay, fire)
+
+    async def flush(self):
+        """Write everything pending. Returns the number of messages written."""
+        self._bind()
+        written = 0
+        async with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            while self.pending:
+                batch, self.pending = self.pending[:self.batch_size], self.pending[self.batch_size:]
+                self._writing = batch
+                try:
+                    saved = await database_sync_to_async(write_batch)(batch)
+                    retry = []
+                except Exception:
+                    logger.exception('Failed to write chat messages', extra={'message_count': len(batch)})
+                    saved, retry = await self._after_failure(batch)
+                finally:
+                    self._writing = []
+                # bulk_create sends no post_save, so feed the room buffers here,
+                # before any await, so readers see each message pending or buffered
+                for _, message in saved:
+                    room_buffer.append(message.room_id, serialize_message(message, is_read=False))
+                self.pending = retry + self.pending
+                written += len(saved)
+                await self._announce(saved)
+                kept = {pending.key for pending, _ in saved} | {pending.key for pending in retry}
+                await self._announce_failed([pending for pending in batch if pending.key not in kept])
+                if retry:
+                    attempts = max(pending.attempts for pending in retry)
+                    self._schedule(min(self.flush_interval * 2 ** attempts, MAX_RETRY_DELAY))
+                    break
+        return written
+
+    async def _after_failure(self, batch):
+        """
+        Count a failed write. Messages on their last attempt are written one
+        at a time, so only those that cannot be written are dropped.
+        Returns (saved, messages to retry).
+        """
+        for pending in batch:
+            pending.attempts += 1
+            # The write rolled back, so its ids may be given to other rows
+            pending.id = None
+        last = [pending for pending in batch if pending.attempts >= self.max_attempts]
+        saved = await database_sync_to_async(write_each)(last) if last else []
+        return saved, [pending for pending in batch if pending.attempts < self.max_attempts]
+
+    async def _announce(self, saved):
+        """Tell each room's clients the ids of their newly written messages"""
+        channel_layer = get_channel_layer()
+        if channel_layer is None or not saved:
+            return
+        by_room = defaultdict(list)
+        for pending, message in saved:
+            by_room[message.room_id].append({'key': pending.key, 'id': message.id,
+                                             'timestamp': message.timestamp.isoformat()})
+        for room_id, messages in by_room.items():
+            try:
+                await channel_layer.group_send(f'chat_{room_id}', frame_event('messages_saved', messages=messages))
+            except Exception:
+                logger.exception('Failed to announce saved chat messages', extra={'room_id': room_id})
+
+    async def _announce_failed(self, dropped):
+        """Tell each room's clients the keys of the messages that were dropped"""
+        channel_layer = get_channel_layer()
+        if channel_layer is None or not dropped:
+            return
+        by_room = defaultdict(list)
+        for pending in dropped:
+            by_room[pending.room_id].append(pending.key)
+        for room_id, keys in by_room.items():
+            try:
+                await channel_layer.group_send(f'chat_{room_id}', frame_event('messages_failed', keys=keys))
+            except Exception:
+                logger.exception('Failed to announce dropped chat messages', extra={'room_id': room_id})
+
+
+message_queue = MessageWriteQueue(
+    batch_size=getattr(settings, 'CHAT_WRITE_BATCH_SIZE', 100),
+    flush_interval=getattr(settings, 'CHAT_WRITE_FLUSH_INTERVAL', 0.05),
+    max_attempts=getattr(settings, 'CHAT_WRITE_MAX_ATTEMPTS', 10),
+)
@@ -0,0 +1,91 @@
+"""
+Coalesced read receipts.
+
+Read state is a high-water mark per room and reader side (see
+chat.counters), so a receipt only needs the newest mark: "messages_read"
+carries the reader, the sender types whose messages it covers and
+last_read_message_id, and clients mark every such message up to that id as
+read. receipt_coalescer broadcasts a moved mark at once, then at most once
+per CHAT_RECEIPT_INTERVAL seconds per room and reader; marks that arrive in
+between are folded into one receipt sent at the end of the interval.
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from institute_backend.metrics import registry
+
+from .counters import sent_to
+from .encoding import frame_event
+from .timers import ThrottledBroadcaster
+
+logger = logging.getLogger(__name__)
+
+READ_MARKS = registry.counter(
+    'chat_read_marks_total', 'Read high-water marks moved through chat WebSocket connections',
+)
+RECEIPT_BROADCASTS = registry.counter(
+    'chat_receipt_broadcasts_total', 'messages_read events sent to the channel layer',
+)
+
+
+def receipt_event(reader, upto):
+    return frame_event('messages_read', reader=reader, sender_types=sent_to(reader), last_read_message_id=upto)
+
+
+def send_receipt(group_name, reader, upto):
+    """Broadcast a receipt right away, from synchronous code"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(group_name, receipt_event(reader, upto))
+    except Exception:
+        logger.exception('Failed to broadcast read receipt', extra={'group_name': group_name})
+
+
+class _Mark:
+    __slots__ = ('sent', 'sent_at', 'wanted')
+
+    def __init__(self):
+        self.sent = 0
+        self.sent_at = float('-inf')
+        self.wanted = 0
+
+
+class ReceiptCoalescer(ThrottledBroadcaster):
+    """Per (room group, reader) high-water marks, broadcast through send(group_name, event)"""
+    tick_failed_message = 'Read receipt timer tick failed'
+
+    async def read(self, group_name, reader, upto):
+        """Record that reader's mark moved to upto, broadcasting now if the throttle allows"""
+        READ_MARKS.labels().inc()
+        key = (group_name, reader)
+        mark = self.states.get(key)
+        if mark is None:
+            mark = self.states[key] = _Mark()
+        mark.wanted = max(mark.wanted, upto)
+        await self._settle(key, mark)
+
+    async def _settle(self, key, mark):
+        now = self.clock()
+        if mark.wanted > mark.sent and now - mark.sent_at >= self.interval:
+            mark.sent, mark.sent_at = mark.wanted, now
+            RECEIPT_BROADCASTS.labels().inc()
+            group_name, reader = key
+            try:
+                await self.send(group_name, receipt_event(reader, mark.sent))
+            except Exception:
+                logger.exception('Failed to broadcast read receipt', extra={'group_name': group_name})
+
+        # Held-back marks wait for the end of the interval; a mark just sent
+        # is kept until then so the next one is throttled too
+        if now - mark.sent_at < self.interval:
+            self._schedule(key, mark.sent_at + self.interval - now)
+        else:
+            self._forget(key)
+
+
+receipt_coalescer = ReceiptCoalescer(interval=getattr(settings, 'CHAT_RECEIPT_INTERVAL', 1.0))
@@ -3,4 +3,5 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/chat/(?P<room_id>\w+)/$', consumers.ChatConsumer.as_asgi()),
+    re_path(r'ws/staff/alerts/$', consumers.StaffAlertsConsumer.as_asgi()),
 ]
\ No newline at end of file
@@ -22,6 +22,9 @@ class ChatRoomSerializer(serializers.ModelSerializer):
 
 
 class ChatMessageSerializer(serializers.ModelSerializer):
+    # Derived from the room's read high-water marks
+    is_read = serializers.BooleanField(read_only=True)
+    
     class Meta:
         model = ChatMessage
         fields = [
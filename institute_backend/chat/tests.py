@@ -1,3 +1,711 @@
+import asyncio
+import json
+from datetime import timedelta
+from asgiref.sync import async_to_sync
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from accounts.models import Class, Student
+from .models import ChatMessage, ChatNotification, ChatRoom
 
-# Create your tests here.
+
+class ChatHistoryPaginationTest(APITestCase):
+    """Test cases for keyset pagination of a room's message history"""
+
+    def setUp(self):
+        """A room with 25 messages, several sharing a timestamp"""
+        test_class = Class.objects.create(name="Chat 9A", grade_level=9)
+        student = Student.objects.create(name="Chat Student", email="chat.student@example.com",
+                                         password="password123", roll_id="CHT1", student_class=test_class)
+        self.room = ChatRoom.objects.create(student=student, recipient_type='admin')
+        ChatMessage.objects.bulk_create([
+            ChatMessage(room=self.room, sender_type='student', sender_id=student.id,
+                        sender_name=student.name, content=f'message {i}')
+            for i in range(25)
+        ])
+        # Pairs of messages share a timestamp so the id tie-break matters
+        base = timezone.now() - timedelta(days=1)
+        for i, message in enumerate(ChatMessage.objects.order_by('id')):
+            ChatMessage.objects.filter(id=message.id).update(timestamp=base + timedelta(seconds=i // 2))
+        self.url = reverse('chat-room-detail', args=[self.room.id])
+
+    def test_cursor_walk_returns_every_message_once(self):
+        """Following next_cursor pages back through the history in order"""
+        seen = []
+        cursor = None
+        while True:
+            params = {'page_size': 10}
+            if cursor:
+                params['before'] = cursor
+            with self.assertNumQueries(2):
+                data = self.client.get(self.url, params).json()
+            seen = [m['content'] for m in data['messages']] + seen
+            cursor = data['pagination']['next_cursor']
+            self.assertEqual(data['pagination']['has_more'], cursor is not None)
+            self.assertNotIn('total_messages', data['pagination'])
+            if cursor is None:
+                break
+        self.assertEqual(seen, [f'message {i}' for i in range(25)])
+
+    def test_optional_total_and_invalid_cursor(self):
+        """include_total adds an exact count; a malformed cursor is rejected"""
+        data = self.client.get(self.url, {'include_total': 'true'}).json()
+        self.assertEqual(data['pagination']['total_messages'], 25)
+        self.assertEqual(len(data['messages']), 25)
+        response = self.client.get(self.url, {'before': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'page_size': 'ten'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_page_numbers_still_work(self):
+        """Older clients using page numbers get the same pages plus a cursor"""
+        data = self.client.get(self.url, {'page': 2, 'page_size': 10}).json()
+        self.assertEqual([m['content'] for m in data['messages']], [f'message {i}' for i in range(5, 15)])
+        self.assertEqual((data['pagination']['total_pages'], data['pagination']['has_next']), (3, True))
+        older = self.client.get(self.url, {'before': data['pagination']['next_cursor'], 'page_size': 10}).json()
+        self.assertEqual([m['content'] for m in older['messages']], [f'message {i}' for i in range(5)])
+
+
+class RoomBufferTest(TestCase):
+    """Test cases for the per-room recent message ring buffer"""
+
+    def message(self, message_id, sender_type='student'):
+        return {'id': message_id, 'content': f'm{message_id}', 'sender_type': sender_type, 'is_read': False}
+
+    def test_bounded_append_and_gap_coverage(self):
+        """Appends evict the oldest message and since() only answers gaps it fully holds"""
+        from .buffers import RoomBuffer
+        buffer = RoomBuffer(size=3)
+        self.assertIsNone(buffer.recent(1))
+        buffer.append(1, self.message(1))
+        self.assertIsNone(buffer.recent(1))
+
+        buffer.fill(1, [self.message(4), self.message(7)])
+        self.assertEqual([m['id'] for m in buffer.since(1, 0)], [4, 7])
+        buffer.append(1, self.message(9))
+        buffer.append(1, self.message(12))
+        self.assertEqual([m['id'] for m in buffer.recent(1)], [7, 9, 12])
+        self.assertEqual([m['id'] for m in buffer.since(1, 9)], [12])
+        self.assertEqual(buffer.since(1, 7), [self.message(9), self.message(12)])
+        # Message 4 was evicted, so a client that last saw 5 may have missed something
+        self.assertIsNone(buffer.since(1, 5))
+
+    def test_expiry_and_updates(self):
+        """Rooms expire after the TTL; read marks and out-of-order saves are handled"""
+        from .buffers import RoomBuffer
+        now = [0.0]
+        buffer = RoomBuffer(size=5, ttl=10, clock=lambda: now[0])
+        buffer.fill(1, [self.message(1), self.message(2, 'admin')])
+        buffer.mark_read(1, upto=2, sender_types=['admin'])
+        self.assertEqual([m['is_read'] for m in buffer.recent(1)], [False, True])
+        buffer.append(1, self.message(2))
+        self.assertFalse(buffer.has(1))
+
+        buffer.fill(1, [self.message(1)])
+        now[0] = 11
+        self.assertIsNone(buffer.recent(1))
+
+    def test_deleting_messages_drops_their_room(self):
+        """Hard deletes, one message or a queryset, drop the room from the buffer"""
+        from .buffers import room_buffer
+        test_class = Class.objects.create(name="Buffer 9A", grade_level=9)
+        student = Student.objects.create(name="Buffer Student", email="buffer.student@example.com",
+                                         password="password123", roll_id="BUF1", student_class=test_class)
+        room = ChatRoom.objects.create(student=student, recipient_type='admin')
+        self.addCleanup(room_buffer.invalidate, room.id)
+        messages = [ChatMessage.objects.create(room=room, sender_type='student', sender_id=student.id,
+                                               sender_name='S', content=f'm{i}') for i in range(3)]
+
+        room_buffer.fill(room.id, [])
+        messages[0].delete()
+        self.assertFalse(room_buffer.has(room.id))
+        room_buffer.fill(room.id, [])
+        ChatMessage.objects.filter(room=room).delete()
+        self.assertFalse(room_buffer.has(room.id))
+
+
+class ConsumerRecentMessagesTest(TestCase):
+    """Test cases for serving connect and reconnect history from the room buffer"""
+
+    def setUp(self):
+        """A room with a few messages and a consumer attached to it without a socket"""
+        from .buffers import room_buffer
+        from .consumers import ChatConsumer
+        room_buffer.clear()
+        self.addCleanup(room_buffer.clear)
+        test_class = Class.objects.create(name="Buffer 9A", grade_level=9)
+        self.student = Student.objects.create(name="Buffer Student", email="buffer.student@example.com",
+                                              password="password123", roll_id="BUF1", student_class=test_class)
+        self.room = ChatRoom.objects.create(student=self.student, recipient_type='admin')
+        self.messages = [self.post(f'hello {i}') for i in range(3)]
+        self.consumer = ChatConsumer()
+        self.consumer.room_id = str(self.room.id)
+        self.consumer.room_key = self.room.id
+        self.sent = []
+
+        async def send(text_data):
+            self.sent.append(json.loads(text_data))
+        self.consumer.send = send
+
+    def post(self, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            return ChatMessage.objects.create(room=self.room, sender_type='student', sender_id=self.student.id,
+                                              sender_name=self.student.name, content=content)
+
+    def connect(self, last_seen_id=None):
+        async_to_sync(self.consumer.send_recent_messages)(last_seen_id)
+        return self.sent.pop()
+
+    def test_connects_are_served_from_the_buffer(self):
+        """Only the first connect reads the database; later writes are appended"""
+        with self.assertNumQueries(1):
+            first = self.connect()
+        self.assertEqual([m['content'] for m in first['messages']], ['hello 0', 'hello 1', 'hello 2'])
+        self.post('hello 3')
+        with self.assertNumQueries(0):
+            second = self.connect()
+        self.assertEqual([m['content'] for m in second['messages']][-1], 'hello 3')
+        self.assertFalse(second['resumed'])
+
+    def test_resume_sends_only_the_gap(self):
+        """A reconnect with last_seen_id gets just the newer messages"""
+        self.connect()
+        new = self.post('after the blip')
+        with self.assertNumQueries(0):
+            resumed = self.connect(last_seen_id=self.messages[-1].id)
+        self.assertTrue(resumed['resumed'])
+        self.assertEqual([m['id'] for m in resumed['messages']], [new.id])
+
+        # Without a buffer the gap comes from the database
+        from .buffers import room_buffer
+        room_buffer.clear()
+        with self.assertNumQueries(1):
+            resumed = self.connect(last_seen_id=self.messages[0].id)
+        self.assertEqual([m['content'] for m in resumed['messages']], ['hello 1', 'hello 2', 'after the blip'])
+
+
+class BroadcastEncodingTest(TestCase):
+    """Test cases for encoding room broadcasts once for every listener"""
+
+    def test_listeners_forward_the_encoded_frame(self):
+        """Each listener sends the frame encoded by the sender; older events are still encoded"""
+        from .consumers import ChatConsumer
+        from .encoding import frame_event
+        event = frame_event('typing_indicator', sender_name='Admin', is_typing=True)
+        self.assertEqual(json.loads(event['text']),
+                         {'type': 'typing_indicator', 'sender_name': 'Admin', 'is_typing': True})
+
+        sent = []
+        consumers = [ChatConsumer() for _ in range(3)]
+        for consumer in consumers:
+            async def send(text_data):
+                sent.append(text_data)
+            consumer.send = send
+            async_to_sync(consumer.typing_indicator)(event)
+        self.assertEqual(sent, [event['text']] * 3)
+        self.assertTrue(all(text is event['text'] for text in sent))
+
+        receipt = {'reader': 'staff', 'sender_types': ['student'], 'last_read_message_id': 5}
+        async_to_sync(consumers[0].messages_read)({'type': 'messages_read', **receipt})
+        self.assertEqual(json.loads(sent[-1]), {'type': 'messages_read', **receipt})
+
+
+class MessageWriteQueueTest(TestCase):
+    """Test cases for write-behind persistence of WebSocket messages"""
+
+    def setUp(self):
+        """A room whose admin already has two unread messages"""
+        test_class = Class.objects.create(name="Queue 9A", grade_level=9)
+        self.student = Student.objects.create(name="Queue Student", email="queue.student@example.com",
+                                              password="password123", roll_id="QUE1", student_class=test_class)
+        self.room = ChatRoom.objects.create(student=self.student, recipient_type='admin')
+        ChatNotification.objects.create(room=self.room, recipient_type='admin', recipient_id=0, unread_count=2)
+
+    def enqueue(self, queue, *contents, then=None):
+        """Queue one student message per content, then await then() in the same event loop"""
+        async def run():
+            for content in contents:
+                await queue.enqueue(self.room.id, 'student', self.student.id, self.student.name, content)
+            if then:
+                return await then()
+        return async_to_sync(run)()
+
+    def test_full_batch_is_written_and_announced(self):
+        """Reaching the batch size writes the messages, counts them with F() and sends their ids"""
+        from channels.layers import get_channel_layer
+        from .persistence import MessageWriteQueue
+        channel_layer = get_channel_layer()
+        channel_name = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(self.room.room_name, channel_name)
+
+        queue = MessageWriteQueue(batch_size=3, flush_interval=60)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.enqueue(queue, 'one', 'two')
+            self.assertFalse(ChatMessage.objects.exists())
+            self.assertEqual([m['content'] for m in queue.pending_for(self.room.id)], ['one', 'two'])
+            self.enqueue(queue, 'three')
+        self.assertEqual(queue.pending, [])
+
+        messages = list(ChatMessage.objects.order_by('id'))
+        self.assertEqual([m.content for m in messages], ['one', 'two', 'three'])
+        notification = ChatNotification.objects.get(room=self.room, recipient_type='admin')
+        self.assertEqual((notification.unread_count, notification.last_message_id), (5, messages[-1].id))
+        self.room.refresh_from_db()
+        self.assertEqual((self.room.unread_for_staff, self.room.last_message_id), (3, messages[-1].id))
+        frame = json.loads(async_to_sync(channel_layer.receive)(channel_name)['text'])
+        self.assertEqual(frame['type'], 'messages_saved')
+        self.assertEqual([m['id'] for m in frame['messages']], [m.id for m in messages])
+
+    def test_written_messages_move_from_pending_to_the_buffer(self):
+        """A loaded room lists each message once, whether it is pending, being written or saved"""
+        from .buffers import room_buffer
+        from .persistence import MessageWriteQueue
+        room_buffer.fill(self.room.id, [])
+        self.addCleanup(room_buffer.invalidate, self.room.id)
+        queue = MessageWriteQueue(batch_size=100, flush_interval=60)
+        self.enqueue(queue, 'one')
+        pending = queue.pending[0]
+
+        # A read that sees the row before the queue hears back leaves it out of pending
+        pending.id = 10 ** 6
+        queue._writing, queue.pending = queue.pending, []
+        self.assertEqual(queue.pending_for(self.room.id, {pending.id}), [])
+        self.assertEqual(len(queue.pending_for(self.room.id)), 1)
+        queue.pending, queue._writing = queue._writing, []
+        pending.id = None
+
+        async_to_sync(queue.flush)()
+        message = ChatMessage.objects.get()
+        self.assertEqual(queue.pending_for(self.room.id), [])
+        self.assertEqual([m['id'] for m in room_buffer.recent(self.room.id)], [message.id])
+
+    def test_timer_flushes_a_partial_batch(self):
+        """Messages below the batch size are written once the flush interval passes"""
+        from .persistence import MessageWriteQueue
+        queue = MessageWriteQueue(batch_size=100, flush_interval=0.01)
+        self.enqueue(queue, 'hello', then=lambda: asyncio.sleep(0.1))
+        self.assertEqual(queue.pending, [])
+        self.assertEqual(ChatMessage.objects.get().content, 'hello')
+        self.assertEqual(ChatNotification.objects.get(recipient_type='admin').unread_count, 3)
+
+    def test_failed_writes_are_retried_then_isolated(self):
+        """A failing batch stays queued; on its last attempt only the bad message is dropped and announced"""
+        from channels.layers import get_channel_layer
+        from .persistence import MessageWriteQueue
+        channel_layer = get_channel_layer()
+        channel_name = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(self.room.room_name, channel_name)
+        self.addCleanup(async_to_sync(channel_layer.group_discard), self.room.room_name, channel_name)
+        queue = MessageWriteQueue(batch_size=100, flush_interval=60, max_attempts=2)
+        # content is NOT NULL, so this message can never be written
+        with self.assertLogs('chat.persistence', 'ERROR'):
+            written = self.enqueue(queue, 'kept', None, then=queue.flush)
+        self.assertEqual(written, 0)
+        self.assertEqual([p.content for p in queue.pending], ['kept', None])
+        dropped = queue.pending[1]
+        self.assertFalse(ChatMessage.objects.exists())
+
+        with self.assertLogs('chat.persistence', 'ERROR'):
+            written = async_to_sync(queue.flush)()
+        self.assertEqual(written, 1)
+        self.assertEqual(queue.pending, [])
+        self.assertEqual(list(ChatMessage.objects.values_list('content', flat=True)), ['kept'])
+        self.assertEqual(ChatNotification.objects.get(recipient_type='admin').unread_count, 3)
+        frames = [json.loads(async_to_sync(channel_layer.receive)(channel_name)['text']) for _ in range(2)]
+        self.assertEqual([frame['type'] for frame in frames], ['messages_saved', 'messages_failed'])
+        self.assertEqual(frames[1]['keys'], [dropped.key])
+
+    def test_messages_for_deleted_rooms_are_announced_as_failed(self):
+        """Messages whose room was deleted before the write are dropped and their keys sent back"""
+        from channels.layers import get_channel_layer
+        from .persistence import MessageWriteQueue
+        channel_layer = get_channel_layer()
+        channel_name = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(self.room.room_name, channel_name)
+        self.addCleanup(async_to_sync(channel_layer.group_discard), self.room.room_name, channel_name)
+        queue = MessageWriteQueue(batch_size=100, flush_interval=60)
+        self.enqueue(queue, 'orphan')
+        key = queue.pending[0].key
+        self.room.delete()
+
+        with self.assertLogs('chat.persistence', 'WARNING'):
+            self.assertEqual(async_to_sync(queue.flush)(), 0)
+        frame = json.loads(async_to_sync(channel_layer.receive)(channel_name)['text'])
+        self.assertEqual((frame['type'], frame['keys']), ('messages_failed', [key]))
+
+
+class ConnectionTimersTest(TestCase):
+    """Test cases for the shared heartbeat timer wheel"""
+
+    def test_wheel_fires_each_timer_once_on_time(self):
+        """Timers beyond one turn of the wheel wait out their rounds; cancelled ones never fire"""
+        from .timers import TimerWheel
+        now = [0.0]
+        wheel = TimerWheel(tick=1.0, size=8, clock=lambda: now[0])
+        wheel.schedule('soon', 3)
+        wheel.schedule('late', 20)
+        wheel.schedule('cancelled', 5)
+        wheel.cancel('cancelled')
+        fired = {}
+        for second in range(1, 25):
+            now[0] = second
+            for key in wheel.advance():
+                fired[key] = second
+        self.assertEqual(fired, {'soon': 3, 'late': 20})
+        self.assertEqual(len(wheel), 0)
+
+    def test_heartbeats_and_idle_reaping(self):
+        """Live connections get one heartbeat per interval; silent ones are closed and counted"""
+        from .timers import CONNECTIONS_REAPED, ConnectionTimers
+        now = [0.0]
+        timers = ConnectionTimers(heartbeat_interval=30, idle_timeout=60, batch_size=2, clock=lambda: now[0])
+
+        class Connection:
+            def __init__(self):
+                self.frames, self.closed = [], None
+
+            async def send(self, text_data):
+                self.frames.append(json.loads(text_data))
+
+            async def close(self, code=None):
+                self.closed = code
+
+        active, silent = Connection(), [Connection(), Connection()]
+
+        async def register():
+            for connection in [active, *silent]:
+                timers.register(connection)
+        async_to_sync(register)()
+
+        now[0] = 30
+        self.assertEqual(async_to_sync(timers.run_due)(), (3, 0))
+        self.assertEqual(active.frames[0]['type'], 'heartbeat')
+        now[0] = 45
+        timers.touch(active)
+
+        reaped_before = CONNECTIONS_REAPED.labels().value
+        now[0] = 62
+        self.assertEqual(async_to_sync(timers.run_due)(), (1, 2))
+        self.assertEqual([c.closed for c in silent], [4008, 4008])
+        self.assertIsNone(active.closed)
+        self.assertEqual(list(timers.last_seen), [active])
+        self.assertEqual(CONNECTIONS_REAPED.labels().value - reaped_before, 2)
+        self.assertEqual(async_to_sync(timers.run_due)(), (0, 0))
+
+
+class TypingCoalescerTest(TestCase):
+    """Test cases for throttled typing indicators"""
+
+    def test_throttle_hold_back_and_expiry(self):
+        """Keystrokes coalesce into state changes, held-back changes follow, and typing expires"""
+        from .typing import TypingCoalescer
+        now = [0.0]
+        sent = []
+
+        async def send(group_name, event):
+            sent.append((group_name, json.loads(event['text'])['is_typing']))
+        coalescer = TypingCoalescer(interval=1.0, expiry=5.0, tick=0.25, send=send, clock=lambda: now[0])
+
+        def at(moment, *is_typing):
+            now[0] = moment
+
+            async def run():
+                await coalescer.run_due()
+                for state in is_typing:
+                    await coalescer.typing('chat_1', 'Asha', state)
+            async_to_sync(run)()
+
+        at(0.0, True, True, True)
+        at(0.5, False)
+        at(0.7, True)
+        at(1.5)
+        self.assertEqual(sent, [('chat_1', True)])
+        at(2.0, False)
+        at(3.0, True)
+        at(8.5)
+        self.assertEqual([state for _, state in sent], [True, False, True, False])
+        self.assertEqual(coalescer.states, {})
+
+        at(10.0, True, True)
+        at(10.2, False)
+        at(11.0)
+        self.assertEqual([state for _, state in sent][-2:], [True, False])
+        self.assertEqual(len(coalescer.wheel), 0)
+
+
+class ChatDirectoryTest(APITestCase):
+    """Test cases for the paginated student directory used by admin messaging"""
+
+    def setUp(self):
+        """Three students; one has an admin room with unread messages and a faculty room"""
+        test_class = Class.objects.create(name="Directory 9A", grade_level=9)
+        self.students = [
+            Student.objects.create(name=name, email=f"dir{i}@example.com", password="password123",
+                                   roll_id=f"DIR{i}", student_class=test_class)
+            for i, name in enumerate(["Cora Directory", "Abel Directory", "Bela Directory"])
+        ]
+        abel = self.students[1]
+        room = ChatRoom.objects.create(student=abel, recipient_type='admin')
+        faculty_room = ChatRoom.objects.create(student=abel, recipient_type='faculty')
+        for sender_type, content in [('student', 'first'), ('student', 'second'), ('admin', 'reply')]:
+            ChatMessage.objects.create(room=room, sender_type=sender_type, sender_id=1, sender_name='x', content=content)
+        ChatMessage.objects.create(room=faculty_room, sender_type='student', sender_id=abel.id,
+                                   sender_name='x', content='to faculty')
+        self.room = room
+        self.url = reverse('all-students-for-chat')
+
+    def test_one_page_in_two_queries(self):
+        """Rooms, unread counts and last messages come from the annotated query"""
+        with self.assertNumQueries(2):
+            data = self.client.get(self.url).json()
+        self.assertEqual([s['name'] for s in data['students']],
+                         ['Abel Directory', 'Bela Directory', 'Cora Directory'])
+        abel, bela = data['students'][:2]
+        self.assertEqual((abel['room_id'], abel['unread_count']), (self.room.id, 2))
+        self.assertEqual(abel['last_message']['content'], 'reply')
+        self.assertEqual(abel['class_name'], 'Directory 9A')
+        self.assertEqual((bela['has_chat_room'], bela['unread_count'], bela['last_message']), (False, 0, None))
+        self.assertIsNone(data['pagination']['next_cursor'])
+
+    def test_cursor_walk_and_search(self):
+        """Pages follow next_cursor in name order; search matches name, email, roll id or class"""
+        names = []
+        params = {'page_size': 2, 'include_total': 'true'}
+        while True:
+            data = self.client.get(self.url, params).json()
+            self.assertEqual(data['total_count'], 3)
+            names += [s['name'] for s in data['students']]
+            if not data['pagination']['has_more']:
+                break
+            params['after'] = data['pagination']['next_cursor']
+        self.assertEqual(names, ['Abel Directory', 'Bela Directory', 'Cora Directory'])
+
+        data = self.client.get(self.url, {'search': 'bel'}).json()
+        self.assertEqual([s['name'] for s in data['students']], ['Abel Directory', 'Bela Directory'])
+        data = self.client.get(self.url, {'search': 'dir2'}).json()
+        self.assertEqual([s['name'] for s in data['students']], ['Bela Directory'])
+        data = self.client.get(self.url, {'search': 'directory 9a', 'page_size': 2}).json()
+        self.assertEqual(len(data['students']), 2)
+        self.assertEqual(self.client.get(self.url, {'after': '!!'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RoomCountersTest(APITestCase):
+    """Test cases for the unread counters and last message stored on chat rooms"""
+
+    def setUp(self):
+        """An admin room with two student messages, one admin reply and a risk alert"""
+        from django.contrib.auth.models import User
+        from accounts.models import AdminUser
+        test_class = Class.objects.create(name="Counter 9A", grade_level=9)
+        self.student = Student.objects.create(name="Counter Student", email="counter.student@example.com",
+                                              password="password123", roll_id="CNT1", student_class=test_class)
+        self.admin = AdminUser.objects.create(username="counter-admin", password="password123")
+        self.room = ChatRoom.objects.create(student=self.student, admin=self.admin, recipient_type='admin')
+        for sender_type, content in [('student', 'one'), ('student', 'two'), ('admin', 'reply'),
+                                     ('system', 'alert')]:
+            self.last = ChatMessage.objects.create(room=self.room, sender_type=sender_type, sender_id=1,
+                                                   sender_name='x', content=content)
+        self.client.force_authenticate(user=User.objects.create_user('counter', password='x'))
+
+    def test_sending_updates_counters(self):
+        """Each side's unread counter and the last message follow new messages"""
+        self.room.refresh_from_db()
+        self.assertEqual((self.room.unread_for_staff, self.room.unread_for_student), (3, 1))
+        self.assertEqual((self.room.last_message_id, self.room.last_message_at), (self.last.id, self.last.timestamp))
+
+        response = self.client.post(reverse('send-message'), {
+            'room_id': self.room.id, 'content': 'hi', 'sender_type': 'faculty',
+            'sender_id': 1, 'sender_name': 'Faculty'
+        })
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.unread_for_student, 2)
+        self.assertEqual(self.room.last_message_id, response.json()['message']['id'])
+
+    def test_room_list_reads_counters_in_one_query(self):
+        """The room list takes unread counts from the room row, with no messages join"""
+        url = reverse('chat-rooms')
+        with self.assertNumQueries(1):
+            rooms = self.client.get(url, {'user_type': 'admin', 'user_id': self.admin.id}).json()['rooms']
+        self.assertEqual((rooms[0]['unread_count'], rooms[0]['admin_name']), (3, 'counter-admin'))
+        self.assertIsNotNone(rooms[0]['last_message_time'])
+        rooms = self.client.get(url, {'user_type': 'student', 'user_id': self.student.id}).json()['rooms']
+        self.assertEqual(rooms[0]['unread_count'], 1)
+
+    def unread_contents(self):
+        return [message.content for message in self.room.messages.all() if not message.is_read]
+
+    def test_mark_read_moves_the_reader_mark(self):
+        """Reading moves one side's high-water mark: staff read student and system messages, students all staff"""
+        response = self.client.post(reverse('mark-messages-read'), {
+            'room_id': self.room.id, 'user_type': 'admin', 'user_id': self.admin.id
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.room.refresh_from_db()
+        self.assertEqual((self.room.unread_for_staff, self.room.unread_for_student), (0, 1))
+        self.assertEqual(self.room.staff_last_read_id, self.last.id)
+        self.assertEqual(self.unread_contents(), ['reply'])
+
+        ChatMessage.objects.create(room=self.room, sender_type='faculty', sender_id=1, sender_name='y', content='hi')
+        self.client.post(reverse('mark-messages-read'), {
+            'room_id': self.room.id, 'user_type': 'student', 'user_id': self.student.id
+        })
+        self.room.refresh_from_db()
+        self.assertEqual((self.room.unread_for_staff, self.room.unread_for_student), (0, 0))
+        self.assertEqual(self.unread_contents(), [])
+
+    def test_mark_read_updates_the_reader_notifications(self):
+        """Staff of any kind clear the room's admin notification; the student's row is left alone"""
+        admin_row = ChatNotification.objects.create(room=self.room, recipient_type='admin',
+                                                    recipient_id=self.admin.id, unread_count=3)
+        student_row = ChatNotification.objects.create(room=self.room, recipient_type='student',
+                                                      recipient_id=self.student.id, unread_count=1)
+        self.client.post(reverse('mark-messages-read'), {
+            'room_id': self.room.id, 'user_type': 'principal', 'user_id': 1
+        })
+        admin_row.refresh_from_db()
+        student_row.refresh_from_db()
+        self.assertEqual((admin_row.unread_count, student_row.unread_count), (0, 1))
+
+    def test_mark_read_is_one_row_update(self):
+        """A mark covers any number of messages in one query; it only moves forward and stops at the last message"""
+        from .counters import STAFF, mark_read
+        first = self.room.messages.get(content='one')
+        with self.assertNumQueries(1):
+            self.assertTrue(mark_read(self.room.id, STAFF, first.id))
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.unread_for_staff, 2)
+        self.assertEqual(self.unread_contents(), ['two', 'reply', 'alert'])
+
+        self.assertFalse(mark_read(self.room.id, STAFF, first.id - 1))
+        self.assertTrue(mark_read(self.room.id, STAFF, self.last.id + 100))
+        self.room.refresh_from_db()
+        self.assertEqual((self.room.staff_last_read_id, self.room.unread_for_staff), (self.last.id, 0))
+
+    def test_reconcile_repairs_drift(self):
+        """reconcile recomputes drifted rooms and their notifications and leaves correct ones alone"""
+        from .counters import reconcile
+        ChatRoom.objects.filter(id=self.room.id).update(
+            unread_for_staff=9, last_message=None, staff_last_read_id=self.room.messages.get(content='one').id
+        )
+        ChatNotification.objects.create(room=self.room, recipient_type='admin', recipient_id=self.admin.id,
+                                        unread_count=7)
+
+        self.assertEqual(reconcile(), 1)
+        self.room.refresh_from_db()
+        self.assertEqual((self.room.unread_for_staff, self.room.unread_for_student), (2, 1))
+        self.assertEqual((self.room.last_message_id, self.room.last_message_at), (self.last.id, self.last.timestamp))
+        self.assertEqual(ChatNotification.objects.get().unread_count, 2)
+        self.assertEqual(reconcile(), 0)
+
+
+class ReadReceiptTest(TestCase):
+    """Test cases for coalesced read receipts"""
+
+    def test_marks_coalesce_per_interval(self):
+        """The first mark is sent at once; later ones in the interval fold into one receipt at its end"""
+        from .receipts import ReceiptCoalescer
+        now = [0.0]
+        sent = []
+
+        async def send(group_name, event):
+            sent.append(json.loads(event['text'])['last_read_message_id'])
+        coalescer = ReceiptCoalescer(interval=1.0, tick=0.25, send=send, clock=lambda: now[0])
+
+        def at(moment, *marks):
+            now[0] = moment
+
+            async def run():
+                await coalescer.run_due()
+                for upto in marks:
+                    await coalescer.read('chat_1', 'staff', upto)
+            async_to_sync(run)()
+
+        at(0.0, 5)
+        at(0.3, 7)
+        at(0.6, 9, 8)
+        self.assertEqual(sent, [5])
+        at(1.0)
+        at(2.5)
+        self.assertEqual(sent, [5, 9])
+        self.assertEqual(coalescer.states, {})
+
+    def test_consumer_marks_from_message_ids(self):
+        """mark_read with message_ids moves the reader's mark to the newest, syncs notifications and sends a receipt"""
+        from .consumers import ChatConsumer
+        from .receipts import receipt_coalescer
+        sent = []
+
+        async def send(group_name, event):
+            sent.append((group_name, json.loads(event['text'])))
+        original = receipt_coalescer.send
+        receipt_coalescer.send = send
+        self.addCleanup(setattr, receipt_coalescer, 'send', original)
+
+        test_class = Class.objects.create(name="Receipt 9A", grade_level=9)
+        student = Student.objects.create(name="Receipt Student", email="receipt.student@example.com",
+                                         password="password123", roll_id="RCP1", student_class=test_class)
+        room = ChatRoom.objects.create(student=student, recipient_type='admin')
+        replies = [ChatMessage.objects.create(room=room, sender_type='principal', sender_id=1, sender_name='P',
+                                              content=f'reply {i}') for i in range(3)]
+        notification = ChatNotification.objects.create(room=room, recipient_type='student',
+                                                       recipient_id=student.id, unread_count=3)
+        consumer = ChatConsumer()
+        consumer.room_id, consumer.room_key = str(room.id), room.id
+        consumer.room_group_name = room.room_name
+
+        async_to_sync(consumer.handle_mark_read)({'message_ids': [replies[0].id, replies[2].id]})
+        room.refresh_from_db()
+        self.assertEqual((room.student_last_read_id, room.unread_for_student), (replies[2].id, 0))
+        group_name, frame = sent[0]
+        self.assertEqual((group_name, frame['reader'], frame['last_read_message_id']),
+                         (room.room_name, 'student', replies[2].id))
+        self.assertIn('principal', frame['sender_types'])
+        notification.refresh_from_db()
+        self.assertEqual(notification.unread_count, 0)
+
+
+class StaffAlertsConsumerTest(TestCase):
+    """Test cases for the staff-only alerts WebSocket"""
+
+    def connect(self, session, user):
+        """Run connect() on a StaffAlertsConsumer; returns (consumer, accepted, close code)"""
+        from channels.layers import get_channel_layer
+        from django.contrib.auth.models import AnonymousUser
+        from .consumers import StaffAlertsConsumer
+        consumer = StaffAlertsConsumer()
+        consumer.scope = {'session': session, 'user': user or AnonymousUser()}
+        consumer.channel_layer = get_channel_layer()
+        consumer.channel_name = async_to_sync(consumer.channel_layer.new_channel)()
+        result = {'accepted': False, 'closed': None}
+
+        async def accept(subprotocol=None, headers=None):
+            result['accepted'] = True
+
+        async def close(code=None, reason=None):
+            result['closed'] = code
+        consumer.accept, consumer.close = accept, close
+        async_to_sync(consumer.connect)()
+        self.addCleanup(async_to_sync(consumer.disconnect), 1000)
+        return consumer, result['accepted'], result['closed']
+
+    def test_only_admins_receive_alerts(self):
+        """Students are refused; an admin session joins the group and gets each alert frame as sent"""
+        from .consumers import STAFF_ALERTS_GROUP
+        from .encoding import frame_event
+        _, accepted, closed = self.connect({'student_id': 1}, None)
+        self.assertEqual((accepted, closed), (False, 4003))
+
+        consumer, accepted, closed = self.connect({'admin_authenticated': True}, None)
+        self.assertEqual((accepted, closed), (True, None))
+        event = frame_event('risk_alert', alert={'student_id': 1, 'kind': 'attendance'})
+        async_to_sync(consumer.channel_layer.group_send)(STAFF_ALERTS_GROUP, event)
+        received = async_to_sync(consumer.channel_layer.receive)(consumer.channel_name)
+        sent = []
+
+        async def send(text_data):
+            sent.append(text_data)
+        consumer.send = send
+        async_to_sync(consumer.risk_alert)(received)
+        self.assertEqual(json.loads(sent[0])['alert']['kind'], 'attendance')
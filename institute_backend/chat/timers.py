@@ -0,0 +1,231 @@
+"""
+Process-wide heartbeats and idle timeouts for chat WebSocket connections.
+
+Instead of each ChatConsumer sleeping in its own heartbeat task, consumers
+register with connection_timers. One driver task per event loop wakes every
+tick, takes the connections that are due from a hashed timer wheel, closes
+the ones that have been silent for longer than CHAT_IDLE_TIMEOUT and sends
+a heartbeat to the rest in batches. Any frame from the client counts as
+activity, including its reply to a heartbeat.
+
+ThrottledBroadcaster drives the same kind of wheel for per-key state that is
+broadcast to room groups at most once per interval (typing indicators, read
+receipts).
+"""
+import asyncio
+import logging
+import math
+import time
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.utils import timezone
+
+from institute_backend.metrics import registry
+
+from .encoding import dumps
+
+logger = logging.getLogger(__name__)
+
+HEARTBEATS_SENT = registry.counter(
+    'chat_heartbeats_sent_total', 'Heartbeat frames sent to chat WebSocket clients',
+)
+CONNECTIONS_REAPED = registry.counter(
+    'chat_connections_reaped_total', 'Chat WebSocket connections closed for being idle',
+)
+# Close code sent to clients that stopped responding
+IDLE_CLOSE_CODE = 4008
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel with `size` slots of `tick` seconds. Scheduling and
+    cancelling are O(1); advance() visits only the slots for elapsed ticks.
+    Entries further out than one turn of the wheel wait out whole rounds in
+    their slot. Keys must be hashable; each key has at most one timer.
+    """
+
+    def __init__(self, tick=1.0, size=512, clock=time.monotonic):
+        self.tick = tick
+        self.size = size
+        self.clock = clock
+        # Per slot: key -> turns of the wheel left before it fires
+        self.slots = [{} for _ in range(size)]
+        self.slot_of = {}
+        self.current = self._tick_at(clock())
+
+    def _tick_at(self, now):
+        return math.floor(now / self.tick)
+
+    def __len__(self):
+        return len(self.slot_of)
+
+    def schedule(self, key, delay):
+        """(Re)schedule key to fire `delay` seconds from now, rounded up to a tick"""
+        self.cancel(key)
+        # Count from the deadline rather than the last processed tick, which may lag the clock
+        ticks = max(1, math.ceil((self.clock() + delay) / self.tick) - self.current)
+        slot = (self.current + ticks) % self.size
+        self.slots[slot][key] = (ticks - 1) // self.size
+        self.slot_of[key] = slot
+
+    def cancel(self, key):
+        slot = self.slot_of.pop(key, None)
+        if slot is not None:
+            del self.slots[slot][key]
+
+    def advance(self):
+        """Move the wheel to the current time and return the keys that fired"""
+        due = []
+        target = self._tick_at(self.clock())
+        while self.current < target:
+            self.current += 1
+            slot = self.slots[self.current % self.size]
+            for key, rounds in list(slot.items()):
+                if rounds:
+                    slot[key] = rounds - 1
+                else:
+                    del slot[key]
+                    del self.slot_of[key]
+                    due.append(key)
+        return due
+
+
+async def group_send(group_name, event):
+    await get_channel_layer().group_send(group_name, event)
+
+
+class ThrottledBroadcaster:
+    """
+    Per-key state broadcast through send(group_name, event) at most once per
+    interval per key. Subclasses keep their state objects in self.states and
+    implement _settle(key, state), which sends what is due and then either
+    calls _schedule(key, delay) to be settled again or _forget(key).
+    """
+    # Logged when a timer tick fails
+    tick_failed_message = 'Chat broadcast timer tick failed'
+
+    def __init__(self, interval=1.0, tick=0.25, send=group_send, clock=time.monotonic):
+        self.interval = interval
+        self.send = send
+        self.clock = clock
+        self.wheel = TimerWheel(tick=tick, clock=clock)
+        self.states = {}
+        self._task = None
+
+    async def run_due(self):
+        """Settle the keys whose timers fired"""
+        for key in self.wheel.advance():
+            state = self.states.get(key)
+            if state is not None:
+                await self._settle(key, state)
+
+    async def _settle(self, key, state):
+        raise NotImplementedError
+
+    def _schedule(self, key, delay):
+        self.wheel.schedule(key, delay)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def _forget(self, key):
+        self.wheel.cancel(key)
+        del self.states[key]
+
+    async def _run(self):
+        while len(self.wheel):
+            await asyncio.sleep(self.wheel.tick)
+            try:
+                await self.run_due()
+            except Exception:
+                logger.exception(self.tick_failed_message)
+
+
+class ConnectionTimers:
+    """Heartbeats and idle reaping for the consumers registered on one process"""
+
+    def __init__(self, heartbeat_interval=30.0, idle_timeout=60.0, tick=1.0, batch_size=500,
+                 clock=time.monotonic):
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.batch_size = batch_size
+        self.clock = clock
+        self.wheel = TimerWheel(tick=tick, clock=clock)
+        # consumer -> clock() of its last frame
+        self.last_seen = {}
+        self._task = None
+
+    def register(self, consumer):
+        """Start heartbeats for a newly accepted connection"""
+        self.last_seen[consumer] = self.clock()
+        self.wheel.schedule(consumer, self.heartbeat_interval)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def touch(self, consumer):
+        if consumer in self.last_seen:
+            self.last_seen[consumer] = self.clock()
+
+    def unregister(self, consumer):
+        self.last_seen.pop(consumer, None)
+        self.wheel.cancel(consumer)
+
+    async def run_due(self):
+        """
+        Handle the connections whose timers fired: close idle ones, send the
+        rest a heartbeat and reschedule them. Returns (heartbeats, reaped).
+        """
+        now = self.clock()
+        live, stale = [], []
+        for consumer in self.wheel.advance():
+            last_seen = self.last_seen.get(consumer)
+            if last_seen is None:
+                continue
+            idle = now - last_seen
+            if idle > self.idle_timeout:
+                stale.append(consumer)
+            else:
+                live.append(consumer)
+                # Check again at the next heartbeat, or just after the idle deadline if sooner
+                self.wheel.schedule(consumer, min(self.heartbeat_interval,
+                                                  self.idle_timeout - idle + self.wheel.tick))
+
+        frame = dumps({'type': 'heartbeat', 'timestamp': timezone.now().isoformat()})
+        for start in range(0, len(live), self.batch_size):
+            results = await asyncio.gather(
+                *(consumer.send(text_data=frame) for consumer in live[start:start + self.batch_size]),
+                return_exceptions=True,
+            )
+            failed = sum(isinstance(result, Exception) for result in results)
+            if failed:
+                logger.warning('Failed to send chat heartbeats', extra={'failed_count': failed})
+        HEARTBEATS_SENT.labels().inc(len(live))
+
+        for consumer in stale:
+            self.unregister(consumer)
+            try:
+                await consumer.close(code=IDLE_CLOSE_CODE)
+            except Exception:
+                logger.exception('Failed to close idle chat connection')
+        if stale:
+            CONNECTIONS_REAPED.labels().inc(len(stale))
+            logger.info('Closed idle chat connections', extra={'reaped_count': len(stale)})
+        return len(live), len(stale)
+
+    async def _run(self):
+        while self.last_seen:
+            await asyncio.sleep(self.wheel.tick)
+            try:
+                await self.run_due()
+            except Exception:
+                logger.exception('Chat connection timer tick failed')
+
+
+connection_timers = ConnectionTimers(
+    heartbeat_interval=getattr(settings, 'CHAT_HEARTBEAT_INTERVAL', 30.0),
+    idle_timeout=getattr(settings, 'CHAT_IDLE_TIMEOUT', 60.0),
+)
+registry.gauge_callback(
+    'chat_connections_active', 'Chat WebSocket connections registered for heartbeats',
+    lambda: len(connection_timers.last_seen),
+)
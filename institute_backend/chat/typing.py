@@ -0,0 +1,89 @@
+"""
+Throttled typing indicators.
+
+Clients may send a "typing" frame on every keystroke. typing_coalescer
+keeps the typing state of each sender in each room and broadcasts a
+typing_indicator only when the state shown to the room changes, and at most
+once per CHAT_TYPING_INTERVAL seconds per sender: a change inside the
+interval is held back and sent at its end, unless it was undone meanwhile.
+"Is typing" expires after CHAT_TYPING_EXPIRY seconds without another typing
+frame, so a sender who disconnects mid-sentence does not stay typing.
+"""
+import logging
+import time
+
+from django.conf import settings
+
+from institute_backend.metrics import registry
+
+from .encoding import frame_event
+from .timers import ThrottledBroadcaster, group_send
+
+logger = logging.getLogger(__name__)
+
+TYPING_FRAMES = registry.counter(
+    'chat_typing_frames_total', 'Typing frames received from chat WebSocket clients',
+)
+TYPING_BROADCASTS = registry.counter(
+    'chat_typing_broadcasts_total', 'typing_indicator events sent to the channel layer',
+)
+
+
+class _Typer:
+    __slots__ = ('shown', 'shown_at', 'wanted', 'expires_at')
+
+    def __init__(self):
+        self.shown = False
+        self.shown_at = float('-inf')
+        self.wanted = False
+        self.expires_at = 0.0
+
+
+class TypingCoalescer(ThrottledBroadcaster):
+    """Per (room group, sender) typing state, broadcast through send(group_name, event)"""
+    tick_failed_message = 'Typing indicator timer tick failed'
+
+    def __init__(self, interval=1.0, expiry=5.0, tick=0.25, send=group_send, clock=time.monotonic):
+        super().__init__(interval=interval, tick=tick, send=send, clock=clock)
+        self.expiry = expiry
+
+    async def typing(self, group_name, sender_name, is_typing):
+        """Record a typing frame, broadcasting now if the throttle allows"""
+        TYPING_FRAMES.labels().inc()
+        key = (group_name, sender_name)
+        typer = self.states.get(key)
+        if typer is None:
+            typer = self.states[key] = _Typer()
+        typer.wanted = bool(is_typing)
+        if typer.wanted:
+            typer.expires_at = self.clock() + self.expiry
+        await self._settle(key, typer)
+
+    async def _settle(self, key, typer):
+        now = self.clock()
+        if typer.wanted and now >= typer.expires_at:
+            typer.wanted = False
+        if typer.wanted != typer.shown and now - typer.shown_at >= self.interval:
+            typer.shown, typer.shown_at = typer.wanted, now
+            TYPING_BROADCASTS.labels().inc()
+            group_name, sender_name = key
+            try:
+                await self.send(group_name, frame_event('typing_indicator', sender_name=sender_name,
+                                                        is_typing=typer.shown))
+            except Exception:
+                logger.exception('Failed to broadcast typing indicator', extra={'group_name': group_name})
+
+        # One timer per typer: the end of the throttle for a held-back
+        # change, else the expiry of a shown "is typing"
+        if typer.wanted != typer.shown:
+            self._schedule(key, typer.shown_at + self.interval - now)
+        elif typer.shown:
+            self._schedule(key, typer.expires_at - now)
+        else:
+            self._forget(key)
+
+
+typing_coalescer = TypingCoalescer(
+    interval=getattr(settings, 'CHAT_TYPING_INTERVAL', 1.0),
+    expiry=getattr(settings, 'CHAT_TYPING_EXPIRY', 5.0),
+)
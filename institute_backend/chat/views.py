@@ -3,11 +3,18 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Count, Max
-from django.utils import timezone
+from django.db import transaction
+from django.db.models import Q, F, FilteredRelation
+from django.db.models.functions import Coalesce
 from accounts.models import Student, AdminUser
 from .models import ChatRoom, ChatMessage, ChatNotification
 from .serializers import ChatRoomSerializer, ChatMessageSerializer
+from . import counters
+from .receipts import send_receipt
+from .pagination import encode_cursor, messages_before, parse_page_size, students_after
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class ChatRoomListView(APIView):
@@ -25,19 +32,16 @@ class ChatRoomListView(APIView):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            print(f"🔍 ChatRoomListView called with user_type={user_type}, user_id={user_id}")
+            logger.debug('listing chat rooms', extra={'user_type': user_type, 'user_id': user_id})
             
             if user_type == 'admin':
                 # Get all chat rooms for admin
                 rooms = ChatRoom.objects.filter(
                     admin_id=user_id, is_active=True
                 ).annotate(
-                    unread_count=Count('messages', filter=Q(
-                        messages__is_read=False,
-                        messages__sender_type='student'
-                    )),
-                    last_message_time=Max('messages__timestamp')
-                ).order_by('-updated_at')
+                    unread_count=F('unread_for_staff'),
+                    last_message_time=F('last_message_at')
+                )
                 
             elif user_type == 'student':
                 # Get all chat rooms for student
@@ -46,13 +50,13 @@ class ChatRoomListView(APIView):
                 rooms = ChatRoom.objects.filter(
                     student=student, is_active=True
                 ).annotate(
-                    unread_count=Count('messages', filter=Q(
-                        messages__is_read=False,
-                        messages__sender_type__in=['admin', 'faculty', 'principal']
-                    )),
-                    last_message_time=Max('messages__timestamp')
-                ).order_by('-updated_at')
+                    unread_count=F('unread_for_student'),
+                    last_message_time=F('last_message_at')
+                )
             
+            # Counters live on the room row (see chat.counters), so this is
+            # one indexed scan with no join to the messages table
+            rooms = rooms.select_related('student', 'admin').order_by('-updated_at')
             serializer = ChatRoomSerializer(rooms, many=True)
             return Response({
                 'success': True,
@@ -71,51 +75,93 @@ class ChatRoomDetailView(APIView):
     # permission_classes = [IsAuthenticated]
     
     def get(self, request, room_id):
+        """
+        Room details with one page of messages, oldest first.
+        Query Parameters:
+        - before (optional): cursor from pagination.next_cursor; returns the page of older messages
+        - page_size (optional): 1-200, defaults to 50
+        - include_total (optional): "true" to add an exact total_messages count
+        - page (optional, deprecated): offset pagination, kept for older clients
+        """
         try:
-            room = get_object_or_404(ChatRoom, id=room_id, is_active=True)
-            
-            # Get pagination parameters
-            page = int(request.query_params.get('page', 1))
-            page_size = int(request.query_params.get('page_size', 50))
-            
-            # Calculate offset
-            offset = (page - 1) * page_size
+            room = get_object_or_404(ChatRoom.objects.select_related('student', 'admin'), id=room_id, is_active=True)
             
-            # Get total message count
-            total_messages = room.messages.count()
+            try:
+                page_size = parse_page_size(request.query_params.get('page_size'))
+            except ValueError:
+                return Response({
+                    'error': 'page_size must be an integer'
+                }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Get paginated messages (ordered by timestamp, newest first for pagination)
-            messages = room.messages.all().order_by('-timestamp')[offset:offset + page_size]
+            serializer = ChatRoomSerializer(room)
             
-            # Reverse the messages for display (oldest first)
-            messages = list(reversed(messages))
+            if 'page' in request.query_params and 'before' not in request.query_params:
+                return self.offset_page(room, serializer, request.query_params.get('page'), page_size)
             
-            # Calculate pagination info
-            has_next = offset + page_size < total_messages
-            has_previous = page > 1
-            total_pages = (total_messages + page_size - 1) // page_size
+            try:
+                messages, next_cursor = messages_before(
+                    room.messages.all(), request.query_params.get('before'), page_size
+                )
+            except ValueError:
+                return Response({
+                    'error': 'Invalid cursor'
+                }, status=status.HTTP_400_BAD_REQUEST)
             
-            serializer = ChatRoomSerializer(room)
-            message_serializer = ChatMessageSerializer(messages, many=True)
+            pagination = {
+                'page_size': page_size,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
+            }
+            if request.query_params.get('include_total') == 'true':
+                pagination['total_messages'] = room.messages.count()
             
             return Response({
                 'success': True,
                 'room': serializer.data,
-                'messages': message_serializer.data,
-                'pagination': {
-                    'page': page,
-                    'page_size': page_size,
-                    'total_messages': total_messages,
-                    'total_pages': total_pages,
-                    'has_next': has_next,
-                    'has_previous': has_previous
-                }
+                'messages': ChatMessageSerializer(messages, many=True).data,
+                'pagination': pagination
             })
             
         except Exception as e:
             return Response({
                 'error': f'Error fetching chat room: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    def offset_page(self, room, serializer, page, page_size):
+        """The original page-number pagination; cost grows with the page number"""
+        page = max(1, int(page))
+        offset = (page - 1) * page_size
+        
+        # Get total message count
+        total_messages = room.messages.count()
+        
+        # Get paginated messages (ordered by timestamp, newest first for pagination)
+        messages = room.messages.all().order_by('-timestamp', '-id')[offset:offset + page_size]
+        
+        # Reverse the messages for display (oldest first)
+        messages = list(reversed(messages))
+        
+        # Calculate pagination info
+        has_next = offset + page_size < total_messages
+        has_previous = page > 1
+        total_pages = (total_messages + page_size - 1) // page_size
+        
+        message_serializer = ChatMessageSerializer(messages, many=True)
+        
+        return Response({
+            'success': True,
+            'room': serializer.data,
+            'messages': message_serializer.data,
+            'pagination': {
+                'page': page,
+                'page_size': page_size,
+                'total_messages': total_messages,
+                'total_pages': total_pages,
+                'has_next': has_next,
+                'has_previous': has_previous,
+                'next_cursor': encode_cursor(messages[0]) if has_next and messages else None
+            }
+        })
 
 
 class CreateChatRoomView(APIView):
@@ -223,6 +269,13 @@ class MarkMessagesReadView(APIView):
     permission_classes = [IsAuthenticated]
     
     def post(self, request):
+        """
+        Move the reader's read high-water mark in the room: one update of the
+        room row however many messages it covers. Body: room_id, user_type,
+        user_id and optionally last_read_message_id (defaults to the room's
+        last message). The room is sent a "messages_read" receipt when the
+        mark moves.
+        """
         try:
             room_id = request.data.get('room_id')
             user_type = request.data.get('user_type')
@@ -234,29 +287,20 @@ class MarkMessagesReadView(APIView):
                 }, status=status.HTTP_400_BAD_REQUEST)
             
             room = get_object_or_404(ChatRoom, id=room_id)
+            try:
+                upto = min(int(request.data.get('last_read_message_id') or room.last_message_id or 0),
+                           room.last_message_id or 0)
+            except (TypeError, ValueError):
+                return Response({
+                    'error': 'last_read_message_id must be an integer'
+                }, status=status.HTTP_400_BAD_REQUEST)
             
-            # Mark messages as read (messages sent by the other party)
-            if user_type == 'student':
-                # Student reading admin messages
-                ChatMessage.objects.filter(
-                    room=room,
-                    sender_type='admin',
-                    is_read=False
-                ).update(is_read=True)
-            else:
-                # Admin reading student messages
-                ChatMessage.objects.filter(
-                    room=room,
-                    sender_type='student',
-                    is_read=False
-                ).update(is_read=True)
-            
-            # Reset notification count
-            ChatNotification.objects.filter(
-                room=room,
-                recipient_type=user_type,
-                recipient_id=user_id
-            ).update(unread_count=0)
+            # Messages sent by the other party count as read up to the mark;
+            # notification counts follow what is left unread in the room
+            reader = counters.STUDENT if user_type == 'student' else counters.STAFF
+            if counters.mark_read(room.id, reader, upto):
+                counters.sync_notifications(room.id, reader)
+                send_receipt(room.room_name, reader, upto)
             
             return Response({
                 'success': True,
@@ -275,66 +319,91 @@ class AllStudentsForChatView(APIView):
     # permission_classes = [IsAuthenticated]
     
     def get(self, request):
+        """
+        One page of students ordered by name, each with their admin chat room,
+        unread count and last message, in a single query plus one for the
+        last messages.
+        Query Parameters:
+        - after (optional): cursor from pagination.next_cursor; returns the next page
+        - page_size (optional): 1-200, defaults to 50
+        - search (optional): case-insensitive match on the student's name,
+          email, roll id or class name
+        - include_total (optional): "true" to add an exact total_count
+        """
         try:
-            print("🔍 AllStudentsForChatView called")
-            # Get all active students
-            students = Student.objects.all().order_by('name')
-            print(f"📊 Found {students.count()} students")
+            try:
+                page_size = parse_page_size(request.query_params.get('page_size'))
+            except ValueError:
+                return Response({
+                    'error': 'page_size must be an integer'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            students = Student.objects.all()
+            search = request.query_params.get('search', '').strip()
+            if search:
+                students = students.filter(
+                    Q(name__icontains=search) | Q(email__icontains=search) | Q(roll_id__icontains=search)
+                    | Q(student_class__name__icontains=search)
+                )
+            
+            # Unread count and last message come from the room's counters
+            # (chat.counters): no GROUP BY, so the (name, id) index streams
+            # and LIMIT stops early
+            directory = students.annotate(
+                # Left join to the student's admin room only
+                admin_room=FilteredRelation('chat_rooms', condition=Q(chat_rooms__recipient_type='admin')),
+                room_id=F('admin_room__id'),
+                room_updated_at=F('admin_room__updated_at'),
+                class_name=F('student_class__name'),
+                unread_count=Coalesce(F('admin_room__unread_for_staff'), 0),
+                last_message_id=F('admin_room__last_message_id'),
+            )
+            
+            try:
+                page, next_cursor = students_after(directory, request.query_params.get('after'), page_size)
+            except ValueError:
+                return Response({
+                    'error': 'Invalid cursor'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            last_messages = ChatMessage.objects.in_bulk(
+                [student.last_message_id for student in page if student.last_message_id]
+            )
             
             student_data = []
-            for student in students:
-                # Check if there's an existing chat room
-                try:
-                    room = ChatRoom.objects.get(student=student, recipient_type='admin')
-                    
-                    # Get unread count for admin
-                    unread_count = ChatMessage.objects.filter(
-                        room=room,
-                        sender_type='student',
-                        is_read=False
-                    ).count()
-                    
-                    # Get last message
-                    last_message = room.messages.last()
-                    
-                    student_data.append({
-                        'id': student.id,
-                        'name': student.name,
-                        'email': student.email,
-                        'roll_id': student.roll_id,
-                        'class_name': student.student_class.name if student.student_class else 'No Class',
-                        'room_id': room.id,
-                        'has_chat_room': True,
-                        'unread_count': unread_count,
-                        'last_message': {
-                            'content': last_message.content if last_message else '',
-                            'timestamp': last_message.timestamp.isoformat() if last_message else '',
-                            'sender_name': last_message.sender_name if last_message else '',
-                            'sender_type': last_message.sender_type if last_message else ''
-                        } if last_message else None,
-                        'room_updated_at': room.updated_at.isoformat()
-                    })
-                    
-                except ChatRoom.DoesNotExist:
-                    # No chat room exists yet
-                    student_data.append({
-                        'id': student.id,
-                        'name': student.name,
-                        'email': student.email,
-                        'roll_id': student.roll_id,
-                        'class_name': student.student_class.name if student.student_class else 'No Class',
-                        'room_id': None,
-                        'has_chat_room': False,
-                        'unread_count': 0,
-                        'last_message': None,
-                        'room_updated_at': None
-                    })
+            for student in page:
+                last_message = last_messages.get(student.last_message_id)
+                student_data.append({
+                    'id': student.id,
+                    'name': student.name,
+                    'email': student.email,
+                    'roll_id': student.roll_id,
+                    'class_name': student.class_name or 'No Class',
+                    'room_id': student.room_id,
+                    'has_chat_room': student.room_id is not None,
+                    'unread_count': student.unread_count,
+                    'last_message': {
+                        'content': last_message.content,
+                        'timestamp': last_message.timestamp.isoformat(),
+                        'sender_name': last_message.sender_name,
+                        'sender_type': last_message.sender_type
+                    } if last_message else None,
+                    'room_updated_at': student.room_updated_at.isoformat() if student.room_updated_at else None
+                })
             
-            return Response({
+            pagination = {
+                'page_size': page_size,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
+            }
+            response = {
                 'success': True,
                 'students': student_data,
-                'total_count': len(student_data)
-            })
+                'pagination': pagination
+            }
+            if request.query_params.get('include_total') == 'true':
+                response['total_count'] = students.count()
+            return Response(response)
             
         except Exception as e:
             return Response({
@@ -349,14 +418,13 @@ class SendMessageView(APIView):
     
     def post(self, request):
         try:
-            print("📡 SendMessageView called")
             room_id = request.data.get('room_id')
             content = request.data.get('content')
             sender_type = request.data.get('sender_type')
             sender_id = request.data.get('sender_id')
             sender_name = request.data.get('sender_name')
             
-            print(f"📡 Message data: room_id={room_id}, sender_type={sender_type}, content={content}")
+            logger.debug('http message send', extra={'room_id': room_id, 'sender_type': sender_type})
             
             if not all([room_id, content, sender_type, sender_id, sender_name]):
                 return Response({
@@ -367,20 +435,18 @@ class SendMessageView(APIView):
             room = get_object_or_404(ChatRoom, id=room_id)
             
             # Create the message
-            message = ChatMessage.objects.create(
-                room=room,
-                sender_type=sender_type,
-                sender_id=sender_id,
-                sender_name=sender_name,
-                content=content,
-                message_type='text'
-            )
-            
-            # Update room's updated_at timestamp
-            room.updated_at = timezone.now()
-            room.save(update_fields=['updated_at'])
+            # Atomic with the room counter update made by chat.counters on post_save
+            with transaction.atomic():
+                message = ChatMessage.objects.create(
+                    room=room,
+                    sender_type=sender_type,
+                    sender_id=sender_id,
+                    sender_name=sender_name,
+                    content=content,
+                    message_type='text'
+                )
             
-            print(f"✅ Message created with ID: {message.id}")
+            logger.debug('http message created', extra={'room_id': room.id, 'message_id': message.id})
             
             return Response({
                 'success': True,
@@ -396,7 +462,7 @@ class SendMessageView(APIView):
             })
             
         except Exception as e:
-            print(f"❌ Error sending message: {e}")
+            logger.exception('error sending message')
             return Response({
                 'error': f'Error sending message: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
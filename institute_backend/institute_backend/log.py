@@ -0,0 +1,102 @@
+"""
+Structured logging helpers wired up through settings.LOGGING.
+
+Request handlers log through module loggers with %-style arguments and
+``extra`` fields, so nothing is formatted unless the level is enabled. Records
+are handed to a queue and written by a background listener thread, keeping
+stream I/O off the request path. Debug records can be sampled so turning on
+DEBUG for a busy module does not flood the output.
+"""
+import atexit
+import copy
+import itertools
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+# Attributes every LogRecord has; anything else on a record came from extra=
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {
+    'message', 'asctime', 'taskName',
+}
+
+
+def _format_value(value):
+    text = str(value)
+    if not text or any(c in text for c in ' ="\n'):
+        return '"' + text.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+    return text
+
+
+class StructuredFormatter(logging.Formatter):
+    """Render records as logfmt: ts=... level=... logger=... msg=... key=value"""
+
+    def format(self, record):
+        fields = [
+            ('ts', time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created))
+             + '.%03dZ' % record.msecs),
+            ('level', record.levelname.lower()),
+            ('logger', record.name),
+            ('msg', record.getMessage()),
+        ]
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith('_'):
+                fields.append((key, value))
+
+        line = ' '.join(f'{key}={_format_value(value)}' for key, value in fields)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            line = f'{line}\n{record.exc_text}'
+        return line
+
+
+class SampledDebugFilter(logging.Filter):
+    """Let through every record at INFO and above, but only 1 in N DEBUG records"""
+
+    def __init__(self, rate=10, name=''):
+        super().__init__(name)
+        self.rate = max(1, int(rate))
+        self._counter = itertools.count()
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate == 1:
+            return True
+        return next(self._counter) % self.rate == 0
+
+
+class QueueLogHandler(logging.handlers.QueueHandler):
+    """
+    Non-blocking handler: records go onto an in-process queue and a listener
+    thread writes them to stderr with the StructuredFormatter.
+    """
+
+    def __init__(self, level=logging.NOTSET):
+        super().__init__(queue.SimpleQueue())
+        self.setLevel(level)
+        target = logging.StreamHandler()
+        target.setFormatter(StructuredFormatter())
+        self.listener = logging.handlers.QueueListener(self.queue, target, respect_handler_level=True)
+        self.listener.start()
+        self._stopped = threading.Event()
+        atexit.register(self.stop)
+
+    def prepare(self, record):
+        # Only resolve %-args here; the listener thread does the real formatting
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def stop(self):
+        if not self._stopped.is_set():
+            self._stopped.set()
+            self.listener.stop()
+
+    def close(self):
+        self.stop()
+        super().close()
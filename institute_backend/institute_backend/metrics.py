@@ -0,0 +1,233 @@
+"""
+In-process metrics: HDR-style histograms, counters and gauges, rendered in
+the Prometheus text exposition format.
+
+Histograms record integers (microseconds, bytes, query counts) into log-linear
+buckets with a fixed relative precision, so percentiles stay accurate over many
+orders of magnitude while memory stays bounded. Everything lives in the
+current process; with several workers each one reports its own numbers.
+"""
+import threading
+from collections import OrderedDict
+
+
+class HdrHistogram:
+    """
+    Log-linear histogram in the style of HdrHistogram.
+
+    Values below ``2 ** sub_bucket_bits`` are counted exactly. Above that each
+    power-of-two range is split into ``2 ** (sub_bucket_bits - 1)`` equal
+    buckets, which bounds the relative error to under 1% with the default of
+    8 bits (two significant decimal digits).
+    """
+
+    def __init__(self, sub_bucket_bits=8):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_bucket_count = 1 << sub_bucket_bits
+        self.sub_bucket_half = self.sub_bucket_count >> 1
+        self.counts = {}
+        self.total_count = 0
+        self.total_sum = 0
+        self.min = None
+        self.max = None
+        self._lock = threading.Lock()
+
+    def _index(self, value):
+        shift = max(0, value.bit_length() - self.sub_bucket_bits)
+        return shift * self.sub_bucket_half + (value >> shift)
+
+    def _bounds(self, index):
+        """Lowest and highest value that map to the bucket at index"""
+        if index < self.sub_bucket_count:
+            return index, index
+        shift = index // self.sub_bucket_half - 1
+        low = (index - shift * self.sub_bucket_half) << shift
+        return low, low + (1 << shift) - 1
+
+    def record(self, value, count=1):
+        value = max(0, int(value))
+        index = self._index(value)
+        with self._lock:
+            self.counts[index] = self.counts.get(index, 0) + count
+            self.total_count += count
+            self.total_sum += value * count
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+
+    def value_at_percentile(self, percentile):
+        """Highest equivalent value of the bucket holding the given percentile"""
+        with self._lock:
+            if not self.total_count:
+                return 0
+            target = max(1, int(round(percentile / 100.0 * self.total_count)))
+            seen = 0
+            for index in sorted(self.counts):
+                seen += self.counts[index]
+                if seen >= target:
+                    return min(self._bounds(index)[1], self.max)
+            return self.max
+
+    def count_at_or_below(self, value):
+        """Number of recorded values whose bucket lies entirely at or below value"""
+        with self._lock:
+            return sum(
+                count for index, count in self.counts.items()
+                if self._bounds(index)[1] <= value
+            )
+
+    def merge(self, other):
+        with other._lock:
+            counts = dict(other.counts)
+            total_sum, minimum, maximum = other.total_sum, other.min, other.max
+        with self._lock:
+            for index, count in counts.items():
+                self.counts[index] = self.counts.get(index, 0) + count
+                self.total_count += count
+            self.total_sum += total_sum
+            if minimum is not None and (self.min is None or minimum < self.min):
+                self.min = minimum
+            if maximum is not None and (self.max is None or maximum > self.max):
+                self.max = maximum
+
+    def reset(self):
+        with self._lock:
+            self.counts.clear()
+            self.total_count = 0
+            self.total_sum = 0
+            self.min = self.max = None
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Gauge:
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.extend(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class MetricFamily:
+    def __init__(self, name, kind, help_text, labelnames, factory, scale=1):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.factory = factory
+        self.scale = scale
+        self.children = OrderedDict()
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        child = self.children.get(values)
+        if child is None:
+            with self._lock:
+                child = self.children.setdefault(values, self.factory())
+        return child
+
+
+class MetricsRegistry:
+    QUANTILES = (0.5, 0.9, 0.99)
+
+    def __init__(self):
+        self.families = OrderedDict()
+        self.callbacks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _family(self, name, kind, help_text, labelnames, factory, scale=1):
+        with self._lock:
+            family = self.families.get(name)
+            if family is None:
+                family = self.families[name] = MetricFamily(
+                    name, kind, help_text, labelnames, factory, scale
+                )
+            return family
+
+    def histogram(self, name, help_text, labelnames=(), scale=1):
+        """
+        Histogram family exposed as a Prometheus summary. Values are recorded
+        as integers and multiplied by scale on export (e.g. 1e-6 for
+        microseconds reported as seconds).
+        """
+        return self._family(name, 'summary', help_text, labelnames, HdrHistogram, scale)
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._family(name, 'counter', help_text, labelnames, Counter)
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._family(name, 'gauge', help_text, labelnames, Gauge)
+
+    def gauge_callback(self, name, help_text, callback):
+        """Gauge read from callback() at scrape time"""
+        with self._lock:
+            self.callbacks[name] = (help_text, callback)
+
+    def reset(self):
+        with self._lock:
+            for family in self.families.values():
+                family.children.clear()
+
+    def render(self):
+        lines = []
+        for family in list(self.families.values()):
+            lines.append(f'# HELP {family.name} {family.help}')
+            lines.append(f'# TYPE {family.name} {family.kind}')
+            for values, child in list(family.children.items()):
+                if family.kind == 'summary':
+                    for q in self.QUANTILES:
+                        value = child.value_at_percentile(q * 100) * family.scale
+                        lines.append(
+                            f'{family.name}{_labels(family.labelnames, values, [("quantile", q)])} '
+                            f'{_number(value)}'
+                        )
+                    lines.append(f'{family.name}_sum{_labels(family.labelnames, values)} '
+                                 f'{_number(child.total_sum * family.scale)}')
+                    lines.append(f'{family.name}_count{_labels(family.labelnames, values)} '
+                                 f'{child.total_count}')
+                else:
+                    lines.append(f'{family.name}{_labels(family.labelnames, values)} '
+                                 f'{_number(child.value)}')
+        for name, (help_text, callback) in list(self.callbacks.items()):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {_number(callback())}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,118 @@
+"""
+Per-endpoint request profiling.
+
+Every request is timed and its database queries are counted and timed via
+connection.execute_wrapper. Samples are grouped by the resolved URL name and
+recorded into the histograms in institute_backend.metrics. Set
+PROFILING_SLOW_REQUEST_MS to also log requests slower than that threshold,
+together with the SQL they ran.
+"""
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+REQUEST_DURATION = registry.histogram(
+    'http_request_duration_seconds', 'Wall time spent handling the request',
+    ['view', 'method'], scale=1e-6,
+)
+REQUEST_QUERIES = registry.histogram(
+    'http_request_db_queries', 'Database queries executed per request', ['view', 'method'],
+)
+REQUEST_DB_DURATION = registry.histogram(
+    'http_request_db_duration_seconds', 'Time spent in database queries per request',
+    ['view', 'method'], scale=1e-6,
+)
+RESPONSE_SIZE = registry.histogram(
+    'http_response_size_bytes', 'Size of non-streaming response bodies', ['view', 'method'],
+)
+REQUESTS_TOTAL = registry.counter(
+    'http_requests_total', 'Requests handled, by view and status code', ['view', 'method', 'status'],
+)
+
+# Cap on statements kept for the slow-request log so a runaway N+1 loop
+# cannot hold the whole query history in memory
+MAX_CAPTURED_QUERIES = 200
+
+
+class QueryRecorder:
+    """execute_wrapper that counts and times queries, optionally keeping the SQL"""
+
+    def __init__(self, capture_sql=False):
+        self.count = 0
+        self.duration = 0.0
+        self.capture_sql = capture_sql
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            if self.capture_sql and len(self.statements) < MAX_CAPTURED_QUERIES:
+                self.statements.append((elapsed, sql))
+
+
+def view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        # Unresolved paths share a label so 404 scans cannot blow up cardinality
+        return 'unresolved'
+    return match.view_name or match._func_path
+
+
+class RequestProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'PROFILING_ENABLED', True)
+        self.slow_request_ms = getattr(settings, 'PROFILING_SLOW_REQUEST_MS', None)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        recorder = QueryRecorder(capture_sql=self.slow_request_ms is not None)
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        view = view_label(request)
+        method = request.method
+        REQUEST_DURATION.labels(view, method).record(elapsed * 1e6)
+        REQUEST_QUERIES.labels(view, method).record(recorder.count)
+        REQUEST_DB_DURATION.labels(view, method).record(recorder.duration * 1e6)
+        if not response.streaming:
+            RESPONSE_SIZE.labels(view, method).record(len(response.content))
+        REQUESTS_TOTAL.labels(view, method, response.status_code).inc()
+
+        if self.slow_request_ms is not None and elapsed * 1000 >= self.slow_request_ms:
+            self.log_slow_request(request, response, view, elapsed, recorder)
+        return response
+
+    def log_slow_request(self, request, response, view, elapsed, recorder):
+        sql = '\n'.join(
+            f'[{duration * 1000:.2f}ms] {statement}' for duration, statement in recorder.statements
+        )
+        logger.warning(
+            'Slow request %s %s', request.method, request.path,
+            extra={
+                'view': view,
+                'status': response.status_code,
+                'duration_ms': round(elapsed * 1000, 2),
+                'queries': recorder.count,
+                'db_ms': round(recorder.duration * 1000, 2),
+                'sql': sql,
+            },
+        )
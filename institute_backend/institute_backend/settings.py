@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -51,6 +52,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'institute_backend.middleware.RequestProfilingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -225,6 +227,91 @@ if DEBUG:
     CSRF_COOKIE_SECURE = False
     SESSION_COOKIE_SECURE = False
 
+# Logging
+# Records go through a queue to a background writer (institute_backend.log).
+# Levels can be raised per app, e.g. DJANGO_LOG_LEVEL_CHAT=DEBUG; only one in
+# LOG_DEBUG_SAMPLE_RATE debug records is written.
+LOG_LEVEL = os.environ.get('DJANGO_LOG_LEVEL', 'INFO')
+LOG_DEBUG_SAMPLE_RATE = int(os.environ.get('DJANGO_LOG_DEBUG_SAMPLE_RATE', '10'))
+LOG_APPS = ['accounts', 'students', 'attendance', 'marks', 'chat', 'news', 'institute_backend']
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'sample_debug': {
+            '()': 'institute_backend.log.SampledDebugFilter',
+            'rate': LOG_DEBUG_SAMPLE_RATE,
+        },
+    },
+    'handlers': {
+        'queue': {
+            'class': 'institute_backend.log.QueueLogHandler',
+            'filters': ['sample_debug'],
+        },
+    },
+    'root': {
+        'handlers': ['queue'],
+        'level': 'WARNING',
+    },
+    'loggers': {
+        app: {
+            'handlers': ['queue'],
+            'level': os.environ.get(f'DJANGO_LOG_LEVEL_{app.upper()}', LOG_LEVEL),
+            'propagate': False,
+        }
+        for app in LOG_APPS
+    },
+}
+
+# Login throughput: password hashing pool and in-memory login throttling
+PASSWORD_HASH_WORKERS = 4  # PBKDF2 releases the GIL, so threads hash in parallel
+PASSWORD_HASH_MAX_PENDING = 32  # Logins beyond workers + pending get a 503
+PASSWORD_HASH_TIMEOUT = 10  # seconds
+LOGIN_THROTTLE_EMAIL = {'burst': 5, 'per_minute': 5}
+LOGIN_THROTTLE_IP = {'burst': 30, 'per_minute': 60}
+
+# Request profiling, exposed at /api/admin/metrics/. Set
+# DJANGO_SLOW_REQUEST_MS to log slower requests along with their SQL.
+PROFILING_ENABLED = True
+PROFILING_SLOW_REQUEST_MS = (
+    int(os.environ['DJANGO_SLOW_REQUEST_MS']) if os.environ.get('DJANGO_SLOW_REQUEST_MS') else None
+)
+
+# Processes used to render report cards (marks.reports); None uses one per CPU
+REPORT_CARD_WORKERS = None
+
+# At-risk flags (students.risk), in percent: rolling attendance below, exam
+# average below, or exam trend falling by at least this many points per exam
+RISK_ATTENDANCE_THRESHOLD = 75.0
+RISK_MARKS_THRESHOLD = 40.0
+RISK_MARKS_DROP = 10.0
+
+# Recent messages kept per chat room for WebSocket connects (chat.buffers),
+# and seconds before a room's buffer is reloaded from the database
+CHAT_BUFFER_SIZE = 50
+CHAT_BUFFER_TTL = 30.0
+
+# Write-behind queue for WebSocket chat messages (chat.persistence): batch
+# size, seconds a message may wait before its batch is written, and failed
+# writes before its messages are tried one by one and dropped if they fail
+CHAT_WRITE_BATCH_SIZE = 100
+CHAT_WRITE_FLUSH_INTERVAL = 0.05
+CHAT_WRITE_MAX_ATTEMPTS = 10
+
+# Seconds between heartbeats to chat WebSocket clients, and silence after
+# which a connection is closed (chat.timers)
+CHAT_HEARTBEAT_INTERVAL = 30.0
+CHAT_IDLE_TIMEOUT = 60.0
+
+# Typing indicators (chat.typing): least seconds between broadcasts per
+# sender, and seconds after the last typing frame that "is typing" expires
+CHAT_TYPING_INTERVAL = 1.0
+CHAT_TYPING_EXPIRY = 5.0
+# Read receipts (chat.receipts): least seconds between "messages_read"
+# broadcasts per room and reader
+CHAT_RECEIPT_INTERVAL = 1.0
+
 # Channels configuration
 ASGI_APPLICATION = 'institute_backend.asgi.application'
 
@@ -237,7 +324,15 @@ CHANNEL_LAYERS = {
     },
 }
 
-# If Redis is not available, use in-memory channel layer (for development only)
+# Shared by every worker, so an invalidation on one reaches them all
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/1',
+    }
+}
+
+# If Redis is not available, use in-memory channel layer and cache (for development only)
 try:
     import redis
     redis.Redis(host='127.0.0.1', port=6379, db=0).ping()
@@ -246,4 +341,9 @@ except:
         'default': {
             'BACKEND': 'channels.layers.InMemoryChannelLayer'
         }
+    }
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
     }
\ No newline at end of file
@@ -0,0 +1,90 @@
+import logging
+
+from django.test import SimpleTestCase, TestCase
+
+from .log import SampledDebugFilter, StructuredFormatter
+from .metrics import HdrHistogram, registry
+
+
+def make_record(level=logging.DEBUG, msg='hello %s', args=('world',), **extra):
+    record = logging.LogRecord('accounts.views', level, __file__, 1, msg, args, None)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+class StructuredLoggingTest(SimpleTestCase):
+    """Test cases for the structured logging helpers"""
+    
+    def test_formatter_renders_extra_fields(self):
+        """Extra fields are rendered as key=value pairs, quoting when needed"""
+        line = StructuredFormatter().format(make_record(student_id=7, user_type='a b'))
+        
+        self.assertIn('level=debug', line)
+        self.assertIn('logger=accounts.views', line)
+        self.assertIn('msg="hello world"', line)
+        self.assertIn('student_id=7', line)
+        self.assertIn('user_type="a b"', line)
+    
+    def test_debug_records_are_sampled(self):
+        """Only one in N debug records passes, other levels always pass"""
+        sample = SampledDebugFilter(rate=5)
+        
+        passed = sum(sample.filter(make_record()) for _ in range(50))
+        self.assertEqual(passed, 10)
+        
+        self.assertTrue(all(sample.filter(make_record(level=logging.INFO)) for _ in range(5)))
+
+
+class HdrHistogramTest(SimpleTestCase):
+    """Test cases for the log-linear histogram"""
+    
+    def test_percentiles_within_one_percent(self):
+        """Percentiles over a wide range stay within the bucket precision"""
+        histogram = HdrHistogram()
+        for value in range(1, 100001):
+            histogram.record(value)
+        
+        self.assertEqual(histogram.total_count, 100000)
+        for percentile in (50, 90, 99):
+            expected = percentile * 1000
+            self.assertAlmostEqual(histogram.value_at_percentile(percentile), expected,
+                                   delta=expected * 0.01)
+        self.assertEqual(histogram.value_at_percentile(100), 100000)
+    
+    def test_small_values_are_exact(self):
+        """Values below the sub-bucket count land in their own bucket"""
+        histogram = HdrHistogram()
+        for value in (3, 3, 7):
+            histogram.record(value)
+        
+        self.assertEqual(histogram.value_at_percentile(50), 3)
+        self.assertEqual(histogram.value_at_percentile(99), 7)
+
+
+class RequestProfilingTest(TestCase):
+    """Test cases for the profiling middleware and metrics endpoint"""
+    
+    def setUp(self):
+        registry.reset()
+    
+    def test_metrics_require_admin(self):
+        """The metrics endpoint is closed to anonymous clients"""
+        response = self.client.get('/api/admin/metrics/')
+        self.assertEqual(response.status_code, 401)
+    
+    def test_requests_are_recorded_per_view(self):
+        """Requests show up in the exposition under their URL name"""
+        self.client.get('/accounts/api/classes/')
+        self.client.get('/accounts/api/classes/')
+        
+        session = self.client.session
+        session['admin_authenticated'] = True
+        session.save()
+        response = self.client.get('/api/admin/metrics/')
+        
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('http_request_duration_seconds_count{view="api_get_classes",method="GET"} 2', body)
+        self.assertIn('http_request_db_queries{view="api_get_classes",method="GET",quantile="0.5"}', body)
+        self.assertIn('http_requests_total{view="api_get_classes",method="GET",status="200"} 2', body)
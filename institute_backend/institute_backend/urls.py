@@ -18,6 +18,8 @@ from django.contrib import admin
 from django.urls import path, include
 from django.http import HttpResponse
 
+from . import views
+
 def home(request):
     return HttpResponse("""
     <h1>Institute Backend API</h1>
@@ -37,6 +39,7 @@ urlpatterns = [
     path('news/', include('news.urls')),
     path('students/', include('students.urls')),
     path('api/attendance/', include('attendance.urls')),
+    path('api/admin/metrics/', views.metrics, name='metrics'),
     path('', include('marks.urls')),
     path('', include('chat.urls')),
     path('', home, name='home'),
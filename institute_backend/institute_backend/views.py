@@ -0,0 +1,20 @@
+from django.http import HttpResponse, JsonResponse
+
+from .metrics import registry
+
+
+def is_admin_request(request):
+    """An admin session (admin login) or a Django staff user"""
+    user = getattr(request, 'user', None)
+    is_staff = user is not None and user.is_authenticated and user.is_staff
+    return bool(request.session.get('admin_authenticated') or is_staff)
+
+
+def metrics(request):
+    """Prometheus text exposition of the in-process metrics, for admins only"""
+    if not is_admin_request(request):
+        return JsonResponse({
+            'success': False,
+            'message': 'Admin authentication required'
+        }, status=401)
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
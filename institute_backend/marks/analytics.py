@@ -0,0 +1,179 @@
+"""
+Exam analytics computed with NumPy and stored in summary tables.
+
+refresh_exam() loads an exam's marks in one query, computes per-subject and
+overall percentage distributions (mean, median, standard deviation, grade
+histogram) plus every student's rank and percentile, and replaces the rows
+in ExamStats, ExamSubjectStats and StudentExamRank. Refreshes run on commit
+of the transaction that changed the marks, once per exam however many rows
+were touched.
+
+Percentages and grades use integer arithmetic in hundredths of a percent so
+they agree exactly with Marks.percentage / Marks.grade, which round the
+Decimal quotient half-to-even.
+"""
+import logging
+import threading
+
+import numpy as np
+from django.db import transaction
+from django.dispatch import receiver
+
+from .models import Exam, ExamStats, ExamSubjectStats, Marks, StudentExamRank
+from .signals import marks_changed
+
+logger = logging.getLogger(__name__)
+
+# Lower bounds in hundredths of a percent, ascending, and the grade at and above each
+GRADE_BOUNDS = np.array([4000, 5000, 6000, 7000, 8000, 9000])
+GRADE_LABELS = ['F', 'D', 'C', 'B', 'B+', 'A', 'A+']
+
+
+def to_cents(values):
+    """Two-place Decimals (or floats) as exact int64 hundredths"""
+    return np.rint(np.asarray(values, dtype=float) * 100).astype(np.int64)
+
+
+def percentage_hundredths(obtained_cents, total_cents):
+    """round(obtained / total * 100, 2) in hundredths, rounding half to even; 0 if total <= 0"""
+    obtained_cents = np.asarray(obtained_cents, dtype=np.int64)
+    total_cents = np.asarray(total_cents, dtype=np.int64)
+    safe_total = np.where(total_cents > 0, total_cents, 1)
+    quotient, remainder = np.divmod(obtained_cents * 10000, safe_total)
+    twice = 2 * remainder
+    round_up = (twice > safe_total) | ((twice == safe_total) & (quotient % 2 == 1))
+    return np.where(total_cents > 0, quotient + round_up, 0)
+
+
+def grade_indices(hundredths):
+    """Index into GRADE_LABELS for each percentage"""
+    return np.searchsorted(GRADE_BOUNDS, hundredths, side='right')
+
+
+def distribution(hundredths):
+    """Summary statistics of an array of percentages in hundredths"""
+    values = hundredths / 100.0
+    counts = np.bincount(grade_indices(hundredths), minlength=len(GRADE_LABELS))
+    return {
+        'student_count': int(values.size),
+        'mean': round(float(values.mean()), 2),
+        'median': round(float(np.median(values)), 2),
+        'std_dev': round(float(values.std()), 2),
+        'min_percentage': float(values.min()),
+        'max_percentage': float(values.max()),
+        'grade_histogram': {label: int(counts[i]) for i, label in enumerate(GRADE_LABELS)},
+    }
+
+
+def ranks_and_percentiles(hundredths):
+    """Competition rank (1 = best) and percentile rank for each score"""
+    ordered = np.sort(hundredths)
+    below = np.searchsorted(ordered, hundredths, side='left')
+    at_or_below = np.searchsorted(ordered, hundredths, side='right')
+    ranks = ordered.size - at_or_below + 1
+    percentiles = (below + 0.5 * (at_or_below - below)) / ordered.size * 100
+    return ranks, np.round(percentiles, 2)
+
+
+def summarize(rows):
+    """
+    Analytics of an exam from its (student_id, subject_id, marks_obtained,
+    total_marks) rows: (overall distribution, {subject_id: distribution},
+    [(subject_id or None, student_id, percentage, rank, percentile)]).
+    Touches no models, so migrations can store the results too.
+    """
+    student_ids, subject_ids, obtained, total = zip(*rows)
+    student_ids = np.array(student_ids, dtype=np.int64)
+    subject_ids = np.array(subject_ids, dtype=np.int64)
+    obtained = to_cents(obtained)
+    total = to_cents(total)
+    percentages = percentage_hundredths(obtained, total)
+
+    subject_stats = {}
+    ranks = []
+    for subject_id in np.unique(subject_ids):
+        in_subject = subject_ids == subject_id
+        scores = percentages[in_subject]
+        subject_stats[int(subject_id)] = distribution(scores)
+        ranks.extend(_rank_rows(int(subject_id), student_ids[in_subject], scores))
+
+    # Overall: each student's summed marks over summed totals
+    students, inverse = np.unique(student_ids, return_inverse=True)
+    overall = percentage_hundredths(
+        np.bincount(inverse, weights=obtained).astype(np.int64),
+        np.bincount(inverse, weights=total).astype(np.int64),
+    )
+    ranks.extend(_rank_rows(None, students, overall))
+    return distribution(overall), subject_stats, ranks
+
+
+def refresh_exam(exam_id):
+    """Recompute and store all analytics for one exam"""
+    rows = list(
+        Marks.objects.filter(exam_id=exam_id)
+        .values_list('student_id', 'subject_id', 'marks_obtained', 'total_marks')
+    )
+    with transaction.atomic():
+        if not Exam.objects.filter(id=exam_id).exists():
+            return
+        ExamSubjectStats.objects.filter(exam_id=exam_id).delete()
+        StudentExamRank.objects.filter(exam_id=exam_id).delete()
+        if not rows:
+            ExamStats.objects.filter(exam_id=exam_id).delete()
+            return
+
+        overall, subject_stats, ranks = summarize(rows)
+        ExamStats.objects.update_or_create(exam_id=exam_id, defaults=overall)
+        ExamSubjectStats.objects.bulk_create([
+            ExamSubjectStats(exam_id=exam_id, subject_id=subject_id, **stats)
+            for subject_id, stats in subject_stats.items()
+        ])
+        StudentExamRank.objects.bulk_create([
+            StudentExamRank(exam_id=exam_id, subject_id=subject_id, student_id=student_id,
+                            percentage=percentage, rank=rank, percentile=percentile)
+            for subject_id, student_id, percentage, rank, percentile in ranks
+        ], batch_size=2000)
+
+
+def _rank_rows(subject_id, student_ids, hundredths):
+    ranks, percentiles = ranks_and_percentiles(hundredths)
+    return [
+        (subject_id, int(student_id), float(score) / 100, int(rank), float(percentile))
+        for student_id, score, rank, percentile in zip(student_ids, hundredths, ranks, percentiles)
+    ]
+
+
+_pending = threading.local()
+
+
+def _pending_exams():
+    if not hasattr(_pending, 'exam_ids'):
+        _pending.exam_ids = set()
+    return _pending.exam_ids
+
+
+def schedule_refresh(exam_ids):
+    """
+    Refresh exam_ids once the current transaction commits. Every call
+    registers a callback, but the first one to run drains the pending set,
+    so each exam is recomputed once per transaction. Re-registering on each
+    call also recovers exams left pending by a rolled back transaction.
+    """
+    _pending_exams().update(exam_ids)
+    transaction.on_commit(flush_pending_refreshes, robust=True)
+
+
+def flush_pending_refreshes():
+    pending = _pending_exams()
+    exam_ids = sorted(pending)
+    pending.clear()
+    for exam_id in exam_ids:
+        try:
+            refresh_exam(exam_id)
+        except Exception:
+            logger.exception('Failed to refresh exam analytics', extra={'exam_id': exam_id})
+
+
+@receiver(marks_changed)
+def refresh_on_marks_changed(sender, exam_ids, **kwargs):
+    schedule_refresh(exam_ids)
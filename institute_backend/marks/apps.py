@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class MarksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'marks'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from . import analytics  # noqa: F401
+        from . import student_marks  # noqa: F401
+        from . import unified  # noqa: F401
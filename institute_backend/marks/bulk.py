@@ -0,0 +1,225 @@
+"""
+Set-based validation and bulk upsert of exam marks.
+
+ExamEligibility loads everything needed to validate marks for one exam in a
+fixed number of queries: the students of the exam's class, the subjects and
+the grades they are offered for, each student's subject selections and the
+marks already recorded. Cells are then checked against those sets in memory
+and written with a single bulk_create(update_conflicts=True).
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from accounts.models import Student, Subject
+from .models import Marks
+from .signals import marks_changed
+
+UPSERT_UNIQUE_FIELDS = ['student', 'exam', 'subject']
+UPSERT_UPDATE_FIELDS = ['marks_obtained', 'total_marks', 'updated_at']
+# Marks.marks_obtained / total_marks are DecimalField(max_digits=5, decimal_places=2)
+MAX_SCORE = Decimal('999.99')
+TWO_PLACES = Decimal('0.01')
+
+
+def parse_score(value):
+    """Return value as a two-place Decimal, or raise ValueError with a message"""
+    if isinstance(value, bool):
+        raise ValueError('must be a number')
+    try:
+        score = Decimal(str(value).strip())
+    except (InvalidOperation, TypeError):
+        raise ValueError('must be a number')
+    if not score.is_finite():
+        raise ValueError('must be a number')
+    if score != score.quantize(TWO_PLACES):
+        raise ValueError('must have at most 2 decimal places')
+    if score > MAX_SCORE:
+        raise ValueError(f'cannot be greater than {MAX_SCORE}')
+    return score.quantize(TWO_PLACES)
+
+
+def check_scores(marks_obtained, total_marks):
+    """Marks.clean rules; return an error message or None"""
+    if marks_obtained < 0:
+        return 'Marks obtained cannot be negative.'
+    if total_marks <= 0:
+        return 'Total marks must be greater than zero.'
+    if marks_obtained > total_marks:
+        return f'Marks obtained ({marks_obtained}) cannot be greater than total marks ({total_marks}).'
+    return None
+
+
+class ExamEligibility:
+    """Preloaded lookup sets for validating marks of one exam"""
+
+    def __init__(self, exam):
+        self.exam = exam
+        self.grade_level = exam.student_class.grade_level
+        self.students = {}
+        self.roll_ids = {}
+        self.duplicate_roll_ids = set()
+        for student_id, name, roll_id in (Student.objects.filter(student_class_id=exam.student_class_id)
+                                          .values_list('id', 'name', 'roll_id')):
+            self.students[student_id] = name
+            roll_id = roll_id.strip().upper()
+            if roll_id in self.roll_ids:
+                self.duplicate_roll_ids.add(roll_id)
+            self.roll_ids[roll_id] = student_id
+        self.subjects = {}
+        self.subject_codes = {}
+        self.grade_subjects = set()
+        for subject in Subject.objects.all():
+            self.subjects[subject.id] = subject.name
+            self.subject_codes[subject.code.upper()] = subject.id
+            if subject.is_available_for_grade(self.grade_level):
+                self.grade_subjects.add(subject.id)
+        through = Student.subjects_selected.through
+        self.selected = set(
+            through.objects.filter(student__student_class_id=exam.student_class_id)
+            .values_list('student_id', 'subject_id')
+        )
+        self.existing = set(
+            Marks.objects.filter(exam=exam).values_list('student_id', 'subject_id')
+        )
+
+    def check(self, student_id, subject_id):
+        """Return why student_id cannot get marks in subject_id, or None"""
+        if student_id not in self.students:
+            return f'Student {student_id} does not belong to the class for this exam'
+        if subject_id not in self.subjects:
+            return f'Subject with ID {subject_id} does not exist'
+        if subject_id not in self.grade_subjects:
+            return f'Subject {self.subjects[subject_id]} is not available for grade {self.grade_level}'
+        if (student_id, subject_id) not in self.selected:
+            return (f'Student {self.students[student_id]} has not selected subject '
+                    f'{self.subjects[subject_id]}')
+        return None
+
+
+def upsert_marks(marks, batch_size=1000):
+    """
+    Insert or update Marks instances on (student, exam, subject) in one
+    statement per batch. Returns the instances passed in.
+    """
+    if not marks:
+        return marks
+    with transaction.atomic():
+        Marks.objects.bulk_create(
+            marks,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=UPSERT_UNIQUE_FIELDS,
+            update_fields=UPSERT_UPDATE_FIELDS,
+        )
+        # bulk_create sends no post_save, so notify listeners directly
+        marks_changed.send(
+            sender=Marks,
+            exam_ids={m.exam_id for m in marks},
+            student_ids={m.student_id for m in marks},
+        )
+    return marks
+
+
+class MarksMatrix:
+    """
+    Validate a class x subject matrix for an exam:
+
+        {
+            "total_marks": 100,
+            "subjects": [3, 5, 8],
+            "rows": [
+                {"student_id": 12, "marks": [87.5, null, 64]},
+                ...
+            ]
+        }
+
+    Each row's marks line up with the subject columns; null or "" leaves
+    the cell untouched. A row may carry its own "total_marks".
+    """
+
+    MAX_CELLS = 10000
+
+    def __init__(self, exam, eligibility=None):
+        self.exam = exam
+        self.eligibility = eligibility or ExamEligibility(exam)
+
+    def validate(self, data):
+        """Return (marks, errors): unsaved Marks instances and per-cell errors"""
+        errors = []
+        if not isinstance(data, dict):
+            return [], [{'error': 'Expected a JSON object'}]
+
+        subjects = data.get('subjects')
+        rows = data.get('rows')
+        if not isinstance(subjects, list) or not subjects:
+            errors.append({'field': 'subjects', 'error': 'subjects must be a non-empty list of subject IDs'})
+        if not isinstance(rows, list) or not rows:
+            errors.append({'field': 'rows', 'error': 'rows must be a non-empty list'})
+        if errors:
+            return [], errors
+        if len(subjects) * len(rows) > self.MAX_CELLS:
+            return [], [{'error': f'Cannot process more than {self.MAX_CELLS} cells at once'}]
+
+        try:
+            subject_ids = [int(s) for s in subjects]
+        except (TypeError, ValueError):
+            return [], [{'field': 'subjects', 'error': 'subject IDs must be integers'}]
+        if len(set(subject_ids)) != len(subject_ids):
+            return [], [{'field': 'subjects', 'error': 'Duplicate subject IDs in columns'}]
+
+        default_total = data.get('total_marks')
+        marks = []
+        students_seen = set()
+        for row_index, row in enumerate(rows):
+            if not isinstance(row, dict):
+                errors.append({'row': row_index, 'error': 'Row must be an object'})
+                continue
+            try:
+                student_id = int(row.get('student_id'))
+            except (TypeError, ValueError):
+                errors.append({'row': row_index, 'error': 'student_id must be an integer'})
+                continue
+            if student_id in students_seen:
+                errors.append({'row': row_index, 'student_id': student_id,
+                               'error': 'Duplicate student in the same request'})
+                continue
+            students_seen.add(student_id)
+
+            values = row.get('marks')
+            if not isinstance(values, list) or len(values) != len(subject_ids):
+                errors.append({'row': row_index, 'student_id': student_id,
+                               'error': f'marks must be a list of {len(subject_ids)} values'})
+                continue
+
+            try:
+                total_marks = parse_score(row.get('total_marks', default_total))
+            except ValueError as e:
+                errors.append({'row': row_index, 'student_id': student_id,
+                               'error': f'total_marks {e}'})
+                continue
+
+            for subject_id, value in zip(subject_ids, values):
+                if value is None or value == '':
+                    continue
+                cell = {'row': row_index, 'student_id': student_id, 'subject_id': subject_id}
+                problem = self.eligibility.check(student_id, subject_id)
+                if problem is None:
+                    try:
+                        marks_obtained = parse_score(value)
+                    except ValueError as e:
+                        problem = f'marks_obtained {e}'
+                    else:
+                        problem = check_scores(marks_obtained, total_marks)
+                if problem:
+                    errors.append({**cell, 'error': problem})
+                    continue
+                marks.append(Marks(
+                    student_id=student_id, exam_id=self.exam.id, subject_id=subject_id,
+                    marks_obtained=marks_obtained, total_marks=total_marks,
+                ))
+        return marks, errors
+
+    def count_new(self, marks):
+        existing = self.eligibility.existing
+        return sum(1 for m in marks if (m.student_id, m.subject_id) not in existing)
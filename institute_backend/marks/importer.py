@@ -0,0 +1,273 @@
+"""
+Streaming CSV/XLSX import of exam marks.
+
+Rows are read one at a time from the upload (CSV through a text wrapper,
+XLSX through openpyxl's read-only mode) and validated in chunks: roll ids
+and subject codes are resolved through the ExamEligibility lookup maps, and
+the Marks.clean rules and eligibility checks run as NumPy array operations
+over the whole chunk. Valid chunks are written with the same bulk upsert as
+the bulk marks endpoint. Memory is bounded by the chunk size plus one entry
+per (student, subject) cell seen, which is needed to catch duplicate rows.
+
+Expected columns (header names are case-insensitive):
+roll_id, subject_code, marks_obtained and optionally total_marks.
+"""
+import csv
+import io
+from decimal import Decimal
+from itertools import islice
+
+import numpy as np
+from django.db import transaction
+
+from .bulk import ExamEligibility, MAX_SCORE, parse_score, upsert_marks
+from .models import Marks
+
+try:
+    import openpyxl
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+REQUIRED_COLUMNS = ('roll_id', 'subject_code', 'marks_obtained')
+OPTIONAL_COLUMNS = ('total_marks',)
+# Packs (student_id, subject_id) into one int64 so pair membership can use np.isin
+PAIR_SHIFT = 32
+
+
+class ImportFormatError(ValueError):
+    """The upload cannot be read as a marks sheet at all"""
+
+
+def _normalize_header(value):
+    return str(value or '').strip().lower().replace(' ', '_')
+
+
+def _cell_text(value):
+    """Text of a cell; spreadsheet numbers like 1001.0 become '1001'"""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def _column_positions(header):
+    names = [_normalize_header(h) for h in header]
+    missing = [c for c in REQUIRED_COLUMNS if c not in names]
+    if missing:
+        raise ImportFormatError(f'Missing required columns: {", ".join(missing)}')
+    return [names.index(c) if c in names else None for c in REQUIRED_COLUMNS + OPTIONAL_COLUMNS]
+
+
+def _project(rows):
+    """Yield (roll_id, subject_code, marks_obtained, total_marks) from header + rows"""
+    rows = iter(rows)
+    header = next(rows, None)
+    if header is None:
+        raise ImportFormatError('The file is empty')
+    positions = _column_positions(header)
+    for row in rows:
+        if not row or all(v is None or str(v).strip() == '' for v in row):
+            yield None
+            continue
+        yield tuple(
+            row[p] if p is not None and p < len(row) else None
+            for p in positions
+        )
+
+
+def read_csv(fileobj):
+    text = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+    try:
+        yield from _project(csv.reader(text))
+    except UnicodeDecodeError:
+        raise ImportFormatError('CSV files must be UTF-8 encoded')
+    finally:
+        text.detach()
+
+
+def read_xlsx(fileobj):
+    if not OPENPYXL_AVAILABLE:
+        raise ImportFormatError('XLSX import requires the openpyxl package; upload a CSV instead')
+    try:
+        workbook = openpyxl.load_workbook(fileobj, read_only=True, data_only=True)
+    except Exception:
+        raise ImportFormatError('Could not open the XLSX file')
+    try:
+        yield from _project(workbook.active.iter_rows(values_only=True))
+    finally:
+        workbook.close()
+
+
+def read_upload(upload):
+    """Row iterator for an uploaded file, chosen by extension"""
+    name = (upload.name or '').lower()
+    fileobj = getattr(upload, 'file', upload)
+    if name.endswith('.xlsx'):
+        return read_xlsx(fileobj)
+    if name.endswith('.csv'):
+        return read_csv(fileobj)
+    raise ImportFormatError('Unsupported file type; upload a .csv or .xlsx file')
+
+
+def _to_float(values):
+    """Parse a list of cells into floats, NaN where a cell is not a number"""
+    try:
+        return np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        out = np.empty(len(values), dtype=float)
+        for i, value in enumerate(values):
+            try:
+                out[i] = float(value)
+            except (TypeError, ValueError):
+                out[i] = np.nan
+        return out
+
+
+class MarksImport:
+    """
+    Validate and upsert marks for one exam from a row iterator.
+
+    With dry_run nothing is written. Otherwise chunks are upserted inside a
+    single transaction that is rolled back if any row fails, so an import
+    either applies completely or not at all.
+    """
+
+    CHUNK_SIZE = 5000
+    MAX_REPORTED_ERRORS = 1000
+
+    def __init__(self, exam, total_marks=None, dry_run=False, chunk_size=None):
+        self.exam = exam
+        self.default_total = total_marks
+        self.dry_run = dry_run
+        self.chunk_size = chunk_size or self.CHUNK_SIZE
+        self.eligibility = ExamEligibility(exam)
+        self.grade_subjects = np.fromiter(self.eligibility.grade_subjects, dtype=np.int64)
+        self.selected_pairs = np.fromiter(
+            ((s << PAIR_SHIFT) | j for s, j in self.eligibility.selected), dtype=np.int64
+        )
+        self.seen = {}
+        self.errors = []
+        self.error_count = 0
+        self.rows = 0
+        self.valid = 0
+        self.created = 0
+
+    def add_error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < self.MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'error': message})
+
+    def run(self, rows):
+        with transaction.atomic():
+            first_row = 2  # Spreadsheet numbering: the header is row 1
+            rows = iter(rows)
+            while True:
+                chunk = list(islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+                marks = self.validate_chunk(chunk, first_row)
+                first_row += len(chunk)
+                if marks and not self.dry_run and not self.error_count:
+                    upsert_marks(marks)
+            committed = not self.dry_run and not self.error_count
+            if not committed:
+                transaction.set_rollback(True)
+        return {
+            'rows': self.rows,
+            'valid': self.valid,
+            'created': self.created if committed else 0,
+            'updated': self.valid - self.created if committed else 0,
+            'would_create': self.created,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'dry_run': self.dry_run,
+            'committed': committed,
+        }
+
+    def validate_chunk(self, chunk, first_row):
+        """Return unsaved Marks for the valid rows of chunk (none on a dry run), recording errors"""
+        numbers, rolls, codes, obtained_raw, total_raw = [], [], [], [], []
+        for offset, row in enumerate(chunk):
+            if row is None:
+                continue
+            roll_id, code, obtained, total = row
+            numbers.append(first_row + offset)
+            rolls.append(_cell_text(roll_id).upper())
+            codes.append(_cell_text(code).upper())
+            obtained_raw.append(_cell_text(obtained))
+            total_raw.append(_cell_text(total) or self.default_total)
+        if not numbers:
+            return []
+        self.rows += len(numbers)
+
+        roll_map = self.eligibility.roll_ids
+        code_map = self.eligibility.subject_codes
+        duplicate_rolls = self.eligibility.duplicate_roll_ids
+        student_ids = np.fromiter((roll_map.get(r, -1) for r in rolls), dtype=np.int64, count=len(rolls))
+        subject_ids = np.fromiter((code_map.get(c, -1) for c in codes), dtype=np.int64, count=len(codes))
+        obtained = _to_float([v if v != '' else None for v in obtained_raw])
+        total = _to_float([v if v not in ('', None) else None for v in total_raw])
+
+        max_score = float(MAX_SCORE)
+        checks = [
+            (student_ids < 0, 'Unknown roll id {roll} for this exam\'s class'),
+            (np.fromiter((r in duplicate_rolls for r in rolls), dtype=bool, count=len(rolls)),
+             'Roll id {roll} matches more than one student'),
+            (subject_ids < 0, 'Unknown subject code {code}'),
+            (~np.isin(subject_ids, self.grade_subjects),
+             'Subject {code} is not available for grade ' + str(self.eligibility.grade_level)),
+            (~np.isin((student_ids << PAIR_SHIFT) | subject_ids, self.selected_pairs),
+             'Student {roll} has not selected subject {code}'),
+            (np.isnan(obtained), 'marks_obtained must be a number'),
+            (np.isnan(total), 'total_marks must be a number'),
+            (np.abs(np.round(obtained * 100) - obtained * 100) > 1e-6,
+             'marks_obtained must have at most 2 decimal places'),
+            (np.abs(np.round(total * 100) - total * 100) > 1e-6,
+             'total_marks must have at most 2 decimal places'),
+            ((obtained > max_score) | (total > max_score),
+             f'Scores cannot be greater than {MAX_SCORE}'),
+            (obtained < 0, 'Marks obtained cannot be negative.'),
+            (total <= 0, 'Total marks must be greater than zero.'),
+            (obtained > total, 'Marks obtained ({obtained}) cannot be greater than total marks ({total}).'),
+        ]
+        # First failing check per row, in the order above; NaN comparisons are False
+        failed = np.full(len(numbers), -1, dtype=np.int64)
+        for index, (mask, _) in reversed(list(enumerate(checks))):
+            failed[mask] = index
+
+        marks = []
+        existing = self.eligibility.existing
+        for i in np.flatnonzero(failed >= 0):
+            self.add_error(numbers[i], checks[failed[i]][1].format(
+                roll=rolls[i] or '(blank)', code=codes[i] or '(blank)',
+                obtained=obtained_raw[i], total=total_raw[i],
+            ))
+        for i in np.flatnonzero(failed < 0):
+            key = (int(student_ids[i]), int(subject_ids[i]))
+            previous = self.seen.get(key)
+            if previous is not None:
+                self.add_error(numbers[i], f'Duplicate of row {previous} for {rolls[i]} / {codes[i]}')
+                continue
+            self.seen[key] = numbers[i]
+            self.valid += 1
+            if key not in existing:
+                self.created += 1
+            if self.dry_run:
+                continue
+            marks.append(Marks(
+                student_id=key[0], exam_id=self.exam.id, subject_id=key[1],
+                marks_obtained=Decimal(f'{obtained[i]:.2f}'), total_marks=Decimal(f'{total[i]:.2f}'),
+            ))
+        return marks
+
+
+def import_marks(exam, upload, total_marks=None, dry_run=False):
+    """Validate default total_marks, then import an uploaded file"""
+    if total_marks not in (None, ''):
+        try:
+            total_marks = str(parse_score(total_marks))
+        except ValueError as e:
+            raise ImportFormatError(f'total_marks {e}')
+    return MarksImport(exam, total_marks=total_marks, dry_run=dry_run).run(read_upload(upload))
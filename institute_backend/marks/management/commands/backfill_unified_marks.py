@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from marks.models import UnifiedMark
+from marks.unified import backfill
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the unified marks read model from Marks and the legacy StudentMark table. "
+        "Run after writes that bypassed signals (bulk_create, raw SQL); the migration fills it on deploy."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        exam_rows, legacy_rows = backfill(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {UnifiedMark._meta.verbose_name_plural.lower()}: {exam_rows} exam and '
+            f'{legacy_rows} legacy rows in {time.perf_counter() - started:.1f}s.'
+        ))
@@ -0,0 +1,55 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import Class
+from marks.reports import generate_report_cards
+
+
+class Command(BaseCommand):
+    help = (
+        "Render an HTML report card for every student in a class, covering the exams and "
+        "attendance between two dates, into a zip archive."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--class', dest='class_name', required=True, help='Class name or ID')
+        parser.add_argument('--from', dest='start_date', type=datetime.date.fromisoformat, required=True,
+                            help='First exam/attendance date (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='end_date', type=datetime.date.fromisoformat, required=True,
+                            help='Last exam/attendance date (YYYY-MM-DD)')
+        parser.add_argument('--output', help='Zip file to write; defaults to report_cards_<class>_<from>_<to>.zip')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Render processes (default: settings.REPORT_CARD_WORKERS or one per CPU)')
+
+    def handle(self, *args, **options):
+        self.verbosity = options['verbosity']
+        name = options['class_name']
+        student_class = Class.objects.filter(name=name).first()
+        if student_class is None and name.isdigit():
+            student_class = Class.objects.filter(id=int(name)).first()
+        if student_class is None:
+            raise CommandError(f'Class "{name}" not found')
+        start_date, end_date = options['start_date'], options['end_date']
+        if start_date > end_date:
+            raise CommandError('--from must not be after --to')
+        output = options['output'] or (
+            f"report_cards_{student_class.name.replace(' ', '_')}_{start_date}_{end_date}.zip"
+        )
+
+        step = {'next': 0}
+
+        def progress(done, total):
+            # Roughly every 10%, plus the last card
+            if self.verbosity and (done >= step['next'] or done == total):
+                self.stdout.write(f'  {done}/{total} report cards')
+                step['next'] = done + max(1, total // 10)
+
+        started = time.perf_counter()
+        with open(output, 'wb') as f:
+            count = generate_report_cards(student_class, start_date, end_date, f,
+                                          workers=options['workers'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {count} report cards to {output} in {time.perf_counter() - started:.1f}s.'
+        ))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from marks.analytics import refresh_exam
+from marks.models import Exam
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored exam analytics (stats, subject stats and ranks) for all or selected exams."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--exam', type=int, action='append', dest='exams',
+                            help='Exam ID to refresh; repeat for several. Defaults to all exams.')
+
+    def handle(self, *args, **options):
+        exam_ids = options['exams'] or list(Exam.objects.order_by('id').values_list('id', flat=True))
+        started = time.perf_counter()
+        for i, exam_id in enumerate(exam_ids, 1):
+            refresh_exam(exam_id)
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  [{i}/{len(exam_ids)}] exam {exam_id}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed analytics for {len(exam_ids)} exams in {time.perf_counter() - started:.1f}s.'
+        ))
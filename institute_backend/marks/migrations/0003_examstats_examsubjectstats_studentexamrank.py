@@ -0,0 +1,98 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from marks.analytics import summarize
+
+
+def fill_exam_analytics(apps, schema_editor):
+    """Compute the analytics of every exam that has marks, so they are served from this migration on"""
+    Marks = apps.get_model('marks', 'Marks')
+    ExamStats = apps.get_model('marks', 'ExamStats')
+    ExamSubjectStats = apps.get_model('marks', 'ExamSubjectStats')
+    StudentExamRank = apps.get_model('marks', 'StudentExamRank')
+    exam_ids = Marks.objects.order_by('exam_id').values_list('exam_id', flat=True).distinct()
+    for exam_id in exam_ids.iterator():
+        rows = list(Marks.objects.filter(exam_id=exam_id)
+                    .values_list('student_id', 'subject_id', 'marks_obtained', 'total_marks'))
+        overall, subject_stats, ranks = summarize(rows)
+        ExamStats.objects.create(exam_id=exam_id, **overall)
+        ExamSubjectStats.objects.bulk_create([
+            ExamSubjectStats(exam_id=exam_id, subject_id=subject_id, **stats)
+            for subject_id, stats in subject_stats.items()
+        ])
+        StudentExamRank.objects.bulk_create([
+            StudentExamRank(exam_id=exam_id, subject_id=subject_id, student_id=student_id,
+                            percentage=percentage, rank=rank, percentile=percentile)
+            for subject_id, student_id, percentage, rank, percentile in ranks
+        ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_adminuser'),
+        ('marks', '0002_exam_marks_exam_student_2b66b5_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('student_count', models.PositiveIntegerField(default=0)),
+                ('mean', models.FloatField(default=0)),
+                ('median', models.FloatField(default=0)),
+                ('std_dev', models.FloatField(default=0)),
+                ('min_percentage', models.FloatField(default=0)),
+                ('max_percentage', models.FloatField(default=0)),
+                ('grade_histogram', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('exam', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='marks.exam')),
+            ],
+            options={
+                'verbose_name': 'Exam Statistics',
+                'verbose_name_plural': 'Exam Statistics',
+            },
+        ),
+        migrations.CreateModel(
+            name='ExamSubjectStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('student_count', models.PositiveIntegerField(default=0)),
+                ('mean', models.FloatField(default=0)),
+                ('median', models.FloatField(default=0)),
+                ('std_dev', models.FloatField(default=0)),
+                ('min_percentage', models.FloatField(default=0)),
+                ('max_percentage', models.FloatField(default=0)),
+                ('grade_histogram', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subject_stats', to='marks.exam')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.subject')),
+            ],
+            options={
+                'verbose_name': 'Exam Subject Statistics',
+                'verbose_name_plural': 'Exam Subject Statistics',
+                'ordering': ['exam', 'subject__name'],
+                'unique_together': {('exam', 'subject')},
+            },
+        ),
+        migrations.CreateModel(
+            name='StudentExamRank',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('percentage', models.FloatField()),
+                ('rank', models.PositiveIntegerField()),
+                ('percentile', models.FloatField()),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ranks', to='marks.exam')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exam_ranks', to='accounts.student')),
+                ('subject', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='accounts.subject')),
+            ],
+            options={
+                'ordering': ['exam', 'subject', 'rank'],
+                'indexes': [models.Index(fields=['exam', 'subject', 'rank'], name='marks_stude_exam_id_3d0aa6_idx'), models.Index(fields=['student', 'exam'], name='marks_stude_student_9760c1_idx')],
+            },
+        ),
+        migrations.RunPython(fill_exam_analytics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.2.18 on 2026-10-19 07:38
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def percentage(obtained, total):
+    if total > 0:
+        return round((Decimal(str(obtained)) / Decimal(str(total))) * 100, 2)
+    return Decimal('0.00')
+
+
+def fill_unified_marks(apps, schema_editor):
+    """Fill UnifiedMark from Marks and the legacy StudentMark table, so marks reads are right from this migration on"""
+    Marks = apps.get_model('marks', 'Marks')
+    StudentMark = apps.get_model('students', 'StudentMark')
+    UnifiedMark = apps.get_model('marks', 'UnifiedMark')
+    exam_rows = Marks.objects.order_by('id').values_list(
+        'id', 'student_id', 'subject_id', 'exam_id', 'exam__name', 'exam__exam_date',
+        'marks_obtained', 'total_marks', 'created_at',
+    )
+    legacy_rows = StudentMark.objects.order_by('id').values_list(
+        'id', 'student_id', 'subject_id', 'exam_type', 'exam_date',
+        'marks_obtained', 'total_marks', 'created_at',
+    )
+
+    def from_exam(row):
+        mark_id, student_id, subject_id, exam_id, exam_name, exam_date, obtained, total, created_at = row
+        return UnifiedMark(
+            source='exam', exam_mark_id=mark_id, student_id=student_id, subject_id=subject_id,
+            exam_id=exam_id, exam_type='exam', exam_name=exam_name, exam_date=exam_date,
+            marks_obtained=obtained, total_marks=total, percentage=percentage(obtained, total),
+            created_at=created_at,
+        )
+
+    def from_legacy(row):
+        mark_id, student_id, subject_id, exam_type, exam_date, obtained, total, created_at = row
+        return UnifiedMark(
+            source='legacy', legacy_mark_id=mark_id, student_id=student_id, subject_id=subject_id,
+            exam_type=exam_type, exam_date=exam_date, marks_obtained=obtained, total_marks=total,
+            percentage=percentage(obtained, total), created_at=created_at,
+        )
+
+    for rows, convert in ((exam_rows, from_exam), (legacy_rows, from_legacy)):
+        batch = []
+        for row in rows.iterator(chunk_size=5000):
+            batch.append(convert(row))
+            if len(batch) >= 5000:
+                UnifiedMark.objects.bulk_create(batch)
+                batch = []
+        UnifiedMark.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_adminuser'),
+        ('marks', '0003_examstats_examsubjectstats_studentexamrank'),
+        ('students', '0003_studentmark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnifiedMark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('exam', 'Exam marks'), ('legacy', 'Legacy student marks')], max_length=10)),
+                ('exam_type', models.CharField(max_length=20)),
+                ('exam_name', models.CharField(blank=True, max_length=100)),
+                ('exam_date', models.DateField()),
+                ('marks_obtained', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('total_marks', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('percentage', models.DecimalField(decimal_places=2, max_digits=9)),
+                ('created_at', models.DateTimeField()),
+                ('exam', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='marks.exam')),
+                ('exam_mark', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='unified', to='marks.marks')),
+                ('legacy_mark', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='unified', to='students.studentmark')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unified_marks', to='accounts.student')),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.subject')),
+            ],
+            options={
+                'verbose_name': 'Unified Mark',
+                'verbose_name_plural': 'Unified Marks',
+                'ordering': ['-exam_date', 'id'],
+                'indexes': [models.Index(fields=['student', 'subject', '-exam_date'], name='marks_unifi_student_bb6b5c_idx'), models.Index(fields=['student', '-exam_date'], name='marks_unifi_student_ca711d_idx'), models.Index(fields=['subject', 'exam_date'], name='marks_unifi_subject_140dfe_idx'), models.Index(fields=['exam', 'student'], name='marks_unifi_exam_id_26baf9_idx')],
+            },
+        ),
+        migrations.RunPython(fill_unified_marks, migrations.RunPython.noop),
+    ]
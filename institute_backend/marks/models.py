@@ -2,11 +2,31 @@ from django.db import models
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 from accounts.models import Student, Subject, Class
+from students.models import StudentMark
+
+
+class MarksQuerySet(models.QuerySet):
+    def delete(self):
+        """Delete, then report the removed rows in one marks_changed"""
+        from .signals import marks_changed
+        removed = list(self.values_list('exam_id', 'student_id'))
+        result = super().delete()
+        if removed:
+            marks_changed.send(
+                sender=Marks,
+                exam_ids={exam_id for exam_id, _ in removed},
+                student_ids={student_id for _, student_id in removed},
+                deleted=True,
+            )
+        return result
 
 
 class MarksManager(models.Manager):
     """Custom manager for Marks model with optimized queries"""
     
+    def get_queryset(self):
+        return MarksQuerySet(self.model, using=self._db)
+    
     def get_student_marks_optimized(self, student):
         """Get all marks for a student with optimized queries"""
         return self.filter(
@@ -123,8 +143,150 @@ class Marks(models.Model):
         else:
             return 'F'
     
+    def delete(self, *args, **kwargs):
+        # Not a post_delete receiver: that would stop cascades from exams and
+        # students fast-deleting marks (marks.signals reports those in one go)
+        from .signals import marks_changed
+        result = super().delete(*args, **kwargs)
+        marks_changed.send(sender=Marks, exam_ids={self.exam_id}, student_ids={self.student_id}, deleted=True)
+        return result
+    
     def clean(self):
         """Custom validation to ensure marks_obtained <= total_marks"""
         from django.core.exceptions import ValidationError
         if self.marks_obtained > self.total_marks:
-            raise ValidationError('Marks obtained cannot be greater than total marks.')
\ No newline at end of file
+            raise ValidationError('Marks obtained cannot be greater than total marks.')
+
+class ExamStats(models.Model):
+    """
+    Precomputed distribution of students' overall percentage in an exam
+    (marks obtained over total marks across all their subjects). Kept up to
+    date by marks.analytics whenever the exam's marks change.
+    """
+    exam = models.OneToOneField(Exam, on_delete=models.CASCADE, related_name='stats')
+    student_count = models.PositiveIntegerField(default=0)
+    mean = models.FloatField(default=0)
+    median = models.FloatField(default=0)
+    std_dev = models.FloatField(default=0)
+    min_percentage = models.FloatField(default=0)
+    max_percentage = models.FloatField(default=0)
+    grade_histogram = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Exam Statistics'
+        verbose_name_plural = 'Exam Statistics'
+    
+    def __str__(self):
+        return f"Stats for {self.exam.name} ({self.student_count} students)"
+
+
+class ExamSubjectStats(models.Model):
+    """Precomputed percentage distribution for one subject of an exam"""
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='subject_stats')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    student_count = models.PositiveIntegerField(default=0)
+    mean = models.FloatField(default=0)
+    median = models.FloatField(default=0)
+    std_dev = models.FloatField(default=0)
+    min_percentage = models.FloatField(default=0)
+    max_percentage = models.FloatField(default=0)
+    grade_histogram = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['exam', 'subject__name']
+        verbose_name = 'Exam Subject Statistics'
+        verbose_name_plural = 'Exam Subject Statistics'
+        unique_together = ['exam', 'subject']
+    
+    def __str__(self):
+        return f"Stats for {self.exam.name} - {self.subject.name}"
+
+
+class StudentExamRank(models.Model):
+    """
+    A student's standing in an exam, either in one subject or overall
+    (subject is null). Rank is competition style (1, 2, 2, 4); percentile is
+    the share of students scoring below, counting ties as half.
+    """
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='ranks')
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='exam_ranks')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE, null=True, blank=True)
+    percentage = models.FloatField()
+    rank = models.PositiveIntegerField()
+    percentile = models.FloatField()
+    
+    class Meta:
+        ordering = ['exam', 'subject', 'rank']
+        indexes = [
+            models.Index(fields=['exam', 'subject', 'rank']),
+            models.Index(fields=['student', 'exam']),
+        ]
+    
+    def __str__(self):
+        scope = self.subject.name if self.subject_id else 'Overall'
+        return f"{self.student.name} - {self.exam.name} ({scope}): #{self.rank}"
+
+
+class UnifiedMark(models.Model):
+    """
+    Read model combining exam marks (Marks) and legacy marks
+    (students.StudentMark) in one indexed table, so a student's marks and
+    per-subject averages come from a single query. Rows are derived data,
+    kept in sync by marks.unified and rebuilt with backfill_unified_marks;
+    each links to its source row and is deleted along with it.
+    """
+    SOURCE_EXAM = 'exam'
+    SOURCE_LEGACY = 'legacy'
+    SOURCE_CHOICES = [
+        (SOURCE_EXAM, 'Exam marks'),
+        (SOURCE_LEGACY, 'Legacy student marks'),
+    ]
+    
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES)
+    exam_mark = models.OneToOneField(Marks, on_delete=models.CASCADE, null=True, blank=True, related_name='unified')
+    legacy_mark = models.OneToOneField(StudentMark, on_delete=models.CASCADE, null=True, blank=True, related_name='unified')
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='unified_marks')
+    subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    exam_type = models.CharField(max_length=20)
+    exam_name = models.CharField(max_length=100, blank=True)
+    exam_date = models.DateField()
+    marks_obtained = models.DecimalField(max_digits=5, decimal_places=2)
+    total_marks = models.DecimalField(max_digits=5, decimal_places=2)
+    percentage = models.DecimalField(max_digits=9, decimal_places=2)
+    created_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['-exam_date', 'id']
+        verbose_name = 'Unified Mark'
+        verbose_name_plural = 'Unified Marks'
+        indexes = [
+            models.Index(fields=['student', 'subject', '-exam_date']),
+            models.Index(fields=['student', '-exam_date']),
+            models.Index(fields=['subject', 'exam_date']),
+            models.Index(fields=['exam', 'student']),
+        ]
+    
+    def __str__(self):
+        return f"{self.student.name} - {self.subject.name} ({self.exam_name or self.exam_type}): {self.marks_obtained}/{self.total_marks}"
+    
+    @property
+    def grade(self):
+        """Letter grade on the same scale as Marks.grade"""
+        percentage = self.percentage
+        if percentage >= 90:
+            return 'A+'
+        elif percentage >= 80:
+            return 'A'
+        elif percentage >= 70:
+            return 'B+'
+        elif percentage >= 60:
+            return 'B'
+        elif percentage >= 50:
+            return 'C'
+        elif percentage >= 40:
+            return 'D'
+        else:
+            return 'F'
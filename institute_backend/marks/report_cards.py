@@ -0,0 +1,79 @@
+"""
+HTML rendering of a single report card.
+
+Runs in report worker processes, so this module only uses the standard
+library: it can be imported (and pickled by reference) without Django being
+set up. Cards arrive as plain dicts built by marks.reports.collect_cards.
+"""
+import re
+from html import escape
+
+STYLE = """
+body { font-family: Arial, sans-serif; margin: 32px; color: #222; }
+h1 { font-size: 22px; margin-bottom: 4px; }
+.meta { color: #555; margin-bottom: 24px; }
+table { border-collapse: collapse; width: 100%; margin-bottom: 24px; }
+th, td { border: 1px solid #ccc; padding: 6px 10px; text-align: left; }
+th { background: #f3f3f3; }
+td.num { text-align: right; }
+.summary td { font-weight: bold; }
+"""
+
+
+def filename_for(card):
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', card['student']['name']).strip('-').lower() or 'student'
+    roll = re.sub(r'[^A-Za-z0-9]+', '', card['student']['roll_id']) or str(card['student']['id'])
+    return f"{roll}_{slug}.html"
+
+
+def _percent(value):
+    return '-' if value is None else f'{value:.2f}%'
+
+
+def _exam_section(exam):
+    rows = ''.join(
+        f"<tr><td>{escape(mark['subject'])}</td>"
+        f"<td class=\"num\">{mark['marks_obtained']}</td><td class=\"num\">{mark['total_marks']}</td>"
+        f"<td class=\"num\">{_percent(mark['percentage'])}</td><td>{mark['grade']}</td></tr>"
+        for mark in exam['marks']
+    )
+    rank = f" &middot; Rank {exam['rank']} of {exam['ranked']}" if exam.get('rank') else ''
+    return (
+        f"<h2>{escape(exam['name'])} <small>({exam['exam_date']}){rank}</small></h2>"
+        "<table><tr><th>Subject</th><th>Obtained</th><th>Total</th><th>Percentage</th><th>Grade</th></tr>"
+        f"{rows}"
+        f"<tr class=\"summary\"><td>Overall</td><td class=\"num\">{exam['marks_obtained']}</td>"
+        f"<td class=\"num\">{exam['total_marks']}</td><td class=\"num\">{_percent(exam['percentage'])}</td>"
+        f"<td>{exam['grade']}</td></tr></table>"
+    )
+
+
+def render_html(card):
+    student = card['student']
+    attendance = card['attendance']
+    exams = ''.join(_exam_section(exam) for exam in card['exams']) or '<p>No marks recorded for this term.</p>'
+    subjects = ''.join(
+        f"<tr><td>{escape(row['subject'])}</td><td class=\"num\">{row['exams']}</td>"
+        f"<td class=\"num\">{_percent(row['percentage'])}</td><td>{row['grade']}</td></tr>"
+        for row in card['subjects']
+    )
+    return (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\">"
+        f"<title>Report card - {escape(student['name'])}</title><style>{STYLE}</style></head><body>"
+        f"<h1>{escape(student['name'])}</h1>"
+        f"<div class=\"meta\">Roll ID {escape(student['roll_id'])} &middot; {escape(card['class_name'])} "
+        f"&middot; {card['start_date']} to {card['end_date']}</div>"
+        f"{exams}"
+        "<h2>Subject summary</h2>"
+        "<table><tr><th>Subject</th><th>Exams</th><th>Percentage</th><th>Grade</th></tr>"
+        f"{subjects}</table>"
+        "<h2>Attendance</h2>"
+        f"<p>Present {attendance['present']} of {attendance['days']} school days "
+        f"({_percent(attendance['percentage'])}).</p>"
+        "</body></html>"
+    )
+
+
+def render_report_card(card):
+    """(archive file name, UTF-8 HTML) for one student's card"""
+    return filename_for(card), render_html(card).encode('utf-8')
@@ -0,0 +1,187 @@
+"""
+Batch report cards for a class over a range of exam dates.
+
+collect_cards() gathers everything with six bulk queries (students, exams,
+marks, overall ranks, exam sizes and an attendance aggregate) and turns it
+into one plain dict per student. Rendering those dicts to HTML is pure CPU
+work, so generate_report_cards() fans it out over a process pool and writes
+each card into a zip archive as soon as it comes back; the archive can be
+any writable file object, seekable or not.
+"""
+import logging
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db.models import Count, Q
+
+from attendance.models import Attendance
+from accounts.models import Student
+from .analytics import GRADE_LABELS, grade_indices, percentage_hundredths, to_cents
+from .models import Exam, ExamStats, Marks, StudentExamRank
+from .report_cards import render_report_card
+
+logger = logging.getLogger(__name__)
+
+# Below this many cards, starting worker processes costs more than it saves
+MIN_PARALLEL_CARDS = 20
+
+
+def _scored(obtained_cents, total_cents):
+    """[(percentage or None, grade)] for parallel lists of cents"""
+    if not obtained_cents:
+        return []
+    hundredths = percentage_hundredths(obtained_cents, total_cents)
+    grades = grade_indices(hundredths)
+    return [
+        (value / 100 if total > 0 else None, GRADE_LABELS[grade] if total > 0 else '-')
+        for value, grade, total in zip(hundredths.tolist(), grades.tolist(), total_cents)
+    ]
+
+
+def _cents_text(cents):
+    return f'{cents // 100}.{cents % 100:02d}'
+
+
+def collect_cards(student_class, start_date, end_date):
+    """One card dict per student in the class, ordered by name"""
+    students = list(
+        Student.objects.filter(student_class=student_class)
+        .order_by('name', 'id').values_list('id', 'name', 'roll_id')
+    )
+    exams = list(
+        Exam.objects.filter(student_class=student_class, exam_date__range=(start_date, end_date))
+        .order_by('exam_date', 'name').values_list('id', 'name', 'exam_date')
+    )
+    exam_ids = [exam_id for exam_id, _, _ in exams]
+    marks = list(
+        Marks.objects.filter(exam_id__in=exam_ids, student__student_class=student_class)
+        .order_by('subject__name').values_list('student_id', 'exam_id', 'subject__name',
+                                               'marks_obtained', 'total_marks')
+    )
+    ranks = {
+        (exam_id, student_id): rank
+        for exam_id, student_id, rank in StudentExamRank.objects.filter(
+            exam_id__in=exam_ids, subject__isnull=True
+        ).values_list('exam_id', 'student_id', 'rank')
+    }
+    ranked = dict(ExamStats.objects.filter(exam_id__in=exam_ids).values_list('exam_id', 'student_count'))
+    attendance = {
+        row['student_id']: row
+        for row in Attendance.objects.filter(
+            student__student_class=student_class, date__range=(start_date, end_date)
+        ).order_by().values('student_id').annotate(
+            days=Count('id'), present=Count('id', filter=Q(present=True))
+        )
+    }
+
+    obtained = to_cents([m[3] for m in marks]).tolist() if marks else []
+    total = to_cents([m[4] for m in marks]).tolist() if marks else []
+    per_mark = _scored(obtained, total)
+
+    # student -> exam -> [mark rows]; running sums per (student, exam) and (student, subject)
+    by_student = {student_id: {} for student_id, _, _ in students}
+    exam_sums = {}
+    subject_sums = {}
+    for (student_id, exam_id, subject, _, _), o, t, (pct, grade) in zip(marks, obtained, total, per_mark):
+        by_student[student_id].setdefault(exam_id, []).append({
+            'subject': subject, 'marks_obtained': _cents_text(o), 'total_marks': _cents_text(t),
+            'percentage': pct, 'grade': grade,
+        })
+        sums = exam_sums.setdefault((student_id, exam_id), [0, 0])
+        sums[0] += o
+        sums[1] += t
+        sums = subject_sums.setdefault((student_id, subject), [0, 0, 0])
+        sums[0] += o
+        sums[1] += t
+        sums[2] += 1
+
+    exam_keys = list(exam_sums)
+    exam_scores = dict(zip(exam_keys, _scored([exam_sums[k][0] for k in exam_keys],
+                                              [exam_sums[k][1] for k in exam_keys])))
+    subject_keys = sorted(subject_sums)
+    subject_scores = dict(zip(subject_keys, _scored([subject_sums[k][0] for k in subject_keys],
+                                                    [subject_sums[k][1] for k in subject_keys])))
+    subjects_by_student = {}
+    for key in subject_keys:
+        subjects_by_student.setdefault(key[0], []).append(key)
+
+    cards = []
+    for student_id, name, roll_id in students:
+        student_exams = []
+        for exam_id, exam_name, exam_date in exams:
+            exam_marks = by_student[student_id].get(exam_id)
+            if not exam_marks:
+                continue
+            o, t = exam_sums[(student_id, exam_id)]
+            pct, grade = exam_scores[(student_id, exam_id)]
+            student_exams.append({
+                'name': exam_name, 'exam_date': exam_date.isoformat(), 'marks': exam_marks,
+                'marks_obtained': _cents_text(o), 'total_marks': _cents_text(t),
+                'percentage': pct, 'grade': grade,
+                'rank': ranks.get((exam_id, student_id)), 'ranked': ranked.get(exam_id),
+            })
+        days = attendance.get(student_id, {'days': 0, 'present': 0})
+        cards.append({
+            'student': {'id': student_id, 'name': name, 'roll_id': roll_id},
+            'class_name': student_class.name,
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'exams': student_exams,
+            'subjects': [
+                {'subject': key[1], 'exams': subject_sums[key][2],
+                 'percentage': subject_scores[key][0], 'grade': subject_scores[key][1]}
+                for key in subjects_by_student.get(student_id, [])
+            ],
+            'attendance': {
+                'days': days['days'], 'present': days['present'],
+                'percentage': round(days['present'] / days['days'] * 100, 2) if days['days'] else None,
+            },
+        })
+    return cards
+
+
+def _render_all(cards, workers):
+    """Rendered (name, bytes) pairs in card order"""
+    if workers <= 1 or len(cards) < MIN_PARALLEL_CARDS:
+        yield from map(render_report_card, cards)
+        return
+    # spawn, not fork: forking a process that holds DB connections and
+    # server threads is unsafe, and the renderer does not need Django
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        chunksize = max(1, len(cards) // (workers * 4))
+        yield from executor.map(render_report_card, cards, chunksize=chunksize)
+
+
+def generate_report_cards(student_class, start_date, end_date, output, workers=None, progress=None):
+    """
+    Write one HTML report card per student of student_class into a zip
+    archive on output. progress(done, total) is called after each card.
+    Returns the number of cards written.
+    """
+    started = time.perf_counter()
+    if workers is None:
+        workers = getattr(settings, 'REPORT_CARD_WORKERS', None) or os.cpu_count() or 1
+    cards = collect_cards(student_class, start_date, end_date)
+    collected = time.perf_counter()
+
+    names = set()
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for done, (name, content) in enumerate(_render_all(cards, workers), 1):
+            if name in names:
+                name = name.replace('.html', f"_{cards[done - 1]['student']['id']}.html")
+            names.add(name)
+            archive.writestr(name, content)
+            if progress:
+                progress(done, len(cards))
+
+    logger.info('Report cards generated', extra={
+        'class_id': student_class.id, 'cards': len(cards), 'workers': workers,
+        'collect_ms': round((collected - started) * 1000, 1),
+        'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+    })
+    return len(cards)
@@ -3,7 +3,7 @@ from django.utils import timezone
 from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db import IntegrityError
 from accounts.models import Subject, Student, Class
-from .models import Exam, Marks
+from .models import Exam, ExamStats, ExamSubjectStats, Marks, StudentExamRank
 import logging
 
 logger = logging.getLogger(__name__)
@@ -139,12 +139,12 @@ class MarksSerializer(serializers.ModelSerializer):
         try:
             return super().create(validated_data)
         except IntegrityError as e:
-            logger.error(f"IntegrityError creating marks: {e}")
+            logger.error("IntegrityError creating marks: %s", e)
             raise serializers.ValidationError({
                 'non_field_errors': "A marks record with these details already exists."
             })
         except Exception as e:
-            logger.error(f"Error creating marks: {e}")
+            logger.error("Error creating marks: %s", e)
             raise serializers.ValidationError({
                 'non_field_errors': "An error occurred while saving marks. Please try again."
             })
@@ -154,7 +154,7 @@ class MarksSerializer(serializers.ModelSerializer):
         try:
             return super().update(instance, validated_data)
         except Exception as e:
-            logger.error(f"Error updating marks: {e}")
+            logger.error("Error updating marks: %s", e)
             raise serializers.ValidationError({
                 'non_field_errors': "An error occurred while updating marks. Please try again."
             })
@@ -252,4 +252,32 @@ class BulkMarksSerializer(serializers.Serializer):
             # Store subject object for further validation
             mark_data['_subject_obj'] = subject
         
-        return value
\ No newline at end of file
+        return value
+
+class ExamStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ExamStats
+        fields = [
+            'student_count', 'mean', 'median', 'std_dev', 'min_percentage',
+            'max_percentage', 'grade_histogram', 'updated_at'
+        ]
+
+
+class ExamSubjectStatsSerializer(serializers.ModelSerializer):
+    subject = SubjectSerializer(read_only=True)
+    
+    class Meta:
+        model = ExamSubjectStats
+        fields = [
+            'subject', 'student_count', 'mean', 'median', 'std_dev', 'min_percentage',
+            'max_percentage', 'grade_histogram', 'updated_at'
+        ]
+
+
+class StudentExamRankSerializer(serializers.ModelSerializer):
+    student_name = serializers.CharField(source='student.name', read_only=True)
+    roll_id = serializers.CharField(source='student.roll_id', read_only=True)
+    
+    class Meta:
+        model = StudentExamRank
+        fields = ['student', 'student_name', 'roll_id', 'subject', 'percentage', 'rank', 'percentile']
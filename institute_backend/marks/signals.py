@@ -0,0 +1,47 @@
+"""
+Change notifications for exam marks.
+
+marks_changed is sent with the sets of affected exam_ids and student_ids,
+plus deleted=True when the rows were removed rather than written.
+Single-row saves are translated into it here; deletes send it from
+Marks.delete() and MarksQuerySet.delete(), and bulk writes, which bypass
+post_save, send it themselves (see marks.bulk.upsert_marks). Marks deleted
+in a cascade from their exam, student or subject are reported here, in one
+signal per deleted parent. Anything derived from Marks (analytics, caches)
+listens to this one signal.
+"""
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from accounts.models import Student, Subject
+from .models import Exam, Marks
+
+marks_changed = Signal()
+
+# The Marks foreign key to each parent whose deletes cascade to marks
+CASCADE_FIELDS = {Exam: 'exam', Student: 'student', Subject: 'subject'}
+
+
+@receiver(post_save, sender=Marks)
+def marks_row_saved(sender, instance, **kwargs):
+    marks_changed.send(sender=Marks, exam_ids={instance.exam_id}, student_ids={instance.student_id})
+
+
+@receiver(pre_delete, sender=Exam)
+@receiver(pre_delete, sender=Student)
+@receiver(pre_delete, sender=Subject)
+def collect_cascaded_marks(sender, instance, **kwargs):
+    # Read before the cascade fast-deletes the rows
+    instance._cascaded_marks = list(
+        Marks.objects.filter(**{CASCADE_FIELDS[sender]: instance}).values_list('exam_id', 'student_id')
+    )
+
+
+@receiver(post_delete, sender=Exam)
+@receiver(post_delete, sender=Student)
+@receiver(post_delete, sender=Subject)
+def report_cascaded_marks(sender, instance, **kwargs):
+    removed = getattr(instance, '_cascaded_marks', None)
+    if removed:
+        marks_changed.send(sender=Marks, exam_ids={exam_id for exam_id, _ in removed},
+                           student_ids={student_id for _, student_id in removed}, deleted=True)
@@ -0,0 +1,181 @@
+"""
+Fast path for the "my marks" payload served by StudentMarksView.
+
+build_student_marks() fetches plain tuples in one query, computes every
+percentage and grade with the vectorized helpers from marks.analytics, and
+groups rows by exam in a single pass, formatting each exam and subject only
+once. The result is identical to serializing each Marks row with
+StudentMarksSerializer (build_with_serializers, kept as the reference).
+
+Payloads are cached per student. Entries are dropped when marks_changed
+fires for the student or the student is saved; edits to exams, subjects or
+classes, which can appear in many students' payloads, bump a generation
+number that is part of every key instead. Invalidation only reaches other
+workers through a shared cache backend, so payloads are not cached at all
+when the default cache is the per-process local-memory one.
+"""
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework import serializers
+
+from accounts.models import Class, Student, Subject
+from .analytics import GRADE_LABELS, grade_indices, percentage_hundredths, to_cents
+from .models import Exam, Marks
+from .serializers import ExamSerializer, StudentMarksSerializer
+from .signals import marks_changed
+
+CACHE_TIMEOUT = 300  # seconds
+GENERATION_KEY = 'student_marks:generation'
+
+_datetime = serializers.DateTimeField()
+
+MARK_FIELDS = (
+    'id', 'marks_obtained', 'total_marks', 'created_at',
+    'exam_id', 'exam__name', 'exam__exam_date', 'exam__student_class_id',
+    'exam__student_class__name', 'exam__created_at', 'exam__updated_at',
+    'subject_id', 'subject__name', 'subject__code', 'subject__grade_levels',
+)
+
+
+def student_summary(student):
+    return {
+        'id': student.id,
+        'name': student.name,
+        'class': student.student_class.name
+    }
+
+
+def build_student_marks(student):
+    """marks_by_exam for a student: exams newest first, each with its marks"""
+    rows = list(
+        Marks.objects.filter(student=student)
+        .order_by('-exam__exam_date', 'subject__name')
+        .values_list(*MARK_FIELDS)
+    )
+    if not rows:
+        return []
+
+    hundredths = percentage_hundredths(to_cents([r[1] for r in rows]), to_cents([r[2] for r in rows]))
+    grades = grade_indices(hundredths)
+
+    exams = {}
+    subjects = {}
+    marks_by_exam = {}
+    for row, value, grade in zip(rows, hundredths.tolist(), grades.tolist()):
+        (mark_id, obtained, total, created_at, exam_id, exam_name, exam_date, class_id,
+         class_name, exam_created, exam_updated, subject_id, subject_name, code, grade_levels) = row
+
+        exam = exams.get(exam_id)
+        if exam is None:
+            exam = exams[exam_id] = {
+                'id': exam_id,
+                'name': exam_name,
+                'exam_date': exam_date.isoformat(),
+                'student_class': class_id,
+                'student_class_name': class_name,
+                'created_at': _datetime.to_representation(exam_created),
+                'updated_at': _datetime.to_representation(exam_updated),
+            }
+            marks_by_exam[exam_id] = {'exam': exam, 'marks': []}
+        subject = subjects.get(subject_id)
+        if subject is None:
+            subject = subjects[subject_id] = {
+                'id': subject_id, 'name': subject_name, 'code': code, 'grade_levels': grade_levels,
+            }
+
+        marks_by_exam[exam_id]['marks'].append({
+            'id': mark_id,
+            'exam': exam,
+            'subject': subject,
+            'marks_obtained': str(obtained),
+            'total_marks': str(total),
+            # Marks.percentage is a Decimal, or the int 0 when total is not positive
+            'percentage': value / 100 if total > 0 else 0,
+            'grade': GRADE_LABELS[grade],
+            'created_at': _datetime.to_representation(created_at),
+        })
+
+    marks_list = list(marks_by_exam.values())
+    marks_list.sort(key=lambda x: x['exam']['exam_date'], reverse=True)
+    return marks_list
+
+
+def build_with_serializers(student):
+    """Reference implementation: serialize every Marks row through DRF"""
+    marks_by_exam = {}
+    for mark in Marks.objects.get_student_marks_optimized(student):
+        exam_id = mark.exam.id
+        if exam_id not in marks_by_exam:
+            marks_by_exam[exam_id] = {
+                'exam': ExamSerializer(mark.exam).data,
+                'marks': []
+            }
+        marks_by_exam[exam_id]['marks'].append(StudentMarksSerializer(mark).data)
+    marks_list = list(marks_by_exam.values())
+    marks_list.sort(key=lambda x: x['exam']['exam_date'], reverse=True)
+    return marks_list
+
+
+def _generation():
+    return cache.get_or_set(GENERATION_KEY, 1, None)
+
+
+def cache_key(student_id, generation=None):
+    return f'student_marks:v{generation or _generation()}:{student_id}'
+
+
+def cache_is_shared():
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def get_student_marks(student):
+    """Cached build_student_marks"""
+    if not cache_is_shared():
+        return build_student_marks(student)
+    key = cache_key(student.id)
+    marks_list = cache.get(key)
+    if marks_list is None:
+        marks_list = build_student_marks(student)
+        cache.set(key, marks_list, CACHE_TIMEOUT)
+    return marks_list
+
+
+def invalidate_students(student_ids):
+    """Drop cached payloads now and again after commit, so a read racing the
+    transaction cannot leave stale data behind"""
+    student_ids = list(student_ids)
+    if not student_ids:
+        return
+    generation = _generation()
+    keys = [cache_key(student_id, generation) for student_id in student_ids]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_all():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 2, None)
+
+
+@receiver(marks_changed)
+def invalidate_on_marks_changed(sender, student_ids, **kwargs):
+    invalidate_students(student_ids)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def invalidate_on_student_changed(sender, instance, **kwargs):
+    invalidate_students([instance.id])
+
+
+@receiver(post_save, sender=Exam)
+@receiver(post_delete, sender=Exam)
+@receiver(post_save, sender=Subject)
+@receiver(post_save, sender=Class)
+def invalidate_on_shared_row_changed(sender, **kwargs):
+    invalidate_all()
@@ -1,4 +1,4 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from django.contrib.auth.models import User
@@ -6,10 +6,13 @@ from rest_framework.test import APITestCase
 from rest_framework import status
 from decimal import Decimal
 from datetime import date, timedelta
+from unittest import skipUnless
+import tempfile
 
 from accounts.models import Student, Subject, Class
-from .models import Exam, Marks
+from .models import Exam, ExamSubjectStats, Marks, StudentExamRank, UnifiedMark
 from .serializers import ExamSerializer, MarksSerializer, StudentMarksSerializer
+from .importer import OPENPYXL_AVAILABLE
 
 
 class ExamModelTest(TestCase):
@@ -416,4 +419,516 @@ class StudentMarksViewTest(APITestCase):
         response = self.client.get(url, {'student_id': self.student.id})
         
         # DRF returns 403 for permission denied, not 401
-        self.assertIn(response.status_code, [status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN])
\ No newline at end of file
+        self.assertIn(response.status_code, [status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN])
+
+class ClassMarksFixture:
+    """A class of three students with an exam, for the whole-class marks views"""
+    
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser(
+            username='bulkadmin',
+            email='bulkadmin@example.com',
+            password='adminpass123'
+        )
+        self.client.force_authenticate(user=self.admin_user)
+        
+        self.test_class = Class.objects.create(name="Bulk 11A", grade_level=11, section="A")
+        self.other_class = Class.objects.create(name="Bulk 11B", grade_level=11, section="B")
+        self.physics = Subject.objects.create(name="Bulk Physics", code="BPHY", grade_levels="11,12")
+        self.history = Subject.objects.create(name="Bulk History", code="BHIS", grade_levels="11,12")
+        self.junior = Subject.objects.create(name="Bulk Junior", code="BJUN", grade_levels="9")
+        
+        self.students = []
+        for i in range(3):
+            student = Student.objects.create(
+                name=f"Bulk Student {i}", email=f"bulk{i}@example.com", password="x",
+                roll_id=f"BULK{i}", student_class=self.test_class
+            )
+            student.subjects_selected.set([self.physics, self.history])
+            self.students.append(student)
+        self.outsider = Student.objects.create(
+            name="Bulk Outsider", email="bulkout@example.com", password="x",
+            roll_id="BULKX", student_class=self.other_class
+        )
+        
+        self.exam = Exam.objects.create(
+            name="Bulk Term", exam_date=date.today(), student_class=self.test_class
+        )
+
+class ExamMarksBulkViewTest(ClassMarksFixture, APITestCase):
+    """Test cases for ExamMarksBulkView"""
+    
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('exam-marks-bulk', args=[self.exam.id])
+    
+    def payload(self, rows, subjects=None):
+        return {
+            'total_marks': 100,
+            'subjects': subjects or [self.physics.id, self.history.id],
+            'rows': rows,
+        }
+    
+    def test_upserts_whole_matrix(self):
+        """All cells are created, then updated in place on a second submit"""
+        Marks.objects.create(
+            student=self.students[0], exam=self.exam, subject=self.physics,
+            marks_obtained=Decimal('10.00'), total_marks=Decimal('100.00')
+        )
+        rows = [{'student_id': s.id, 'marks': [80 + i, None if i == 2 else 70]}
+                for i, s in enumerate(self.students)]
+        
+        response = self.client.post(self.url, self.payload(rows), format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 4)
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(Marks.objects.filter(exam=self.exam).count(), 5)
+        self.assertEqual(
+            Marks.objects.get(exam=self.exam, student=self.students[0], subject=self.physics).marks_obtained,
+            Decimal('80.00')
+        )
+    
+    def test_bulk_entry_uses_constant_queries(self):
+        """Query count does not grow with the number of cells"""
+        # Includes the delete / select / insert that resync the unified read model
+        # and the select / select / save that update the students' risk state
+        rows = [{'student_id': s.id, 'marks': [50, 60]} for s in self.students]
+        with self.assertNumQueries(14):
+            response = self.client.post(self.url, self.payload(rows), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+    
+    def test_reports_errors_per_cell(self):
+        """Invalid cells are reported individually and nothing is written"""
+        rows = [
+            {'student_id': self.students[0].id, 'marks': [120, 50]},
+            {'student_id': self.outsider.id, 'marks': [40, 40]},
+            {'student_id': self.students[1].id, 'marks': ['abc', 50]},
+            {'student_id': self.students[2].id, 'marks': [30, None]},
+        ]
+        subjects = [self.physics.id, self.junior.id]
+        rows[0]['marks'][1] = rows[2]['marks'][1] = None
+        
+        response = self.client.post(self.url, self.payload(rows, subjects), format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        cells = {(e['row'], e['subject_id']) for e in response.data['details']}
+        self.assertEqual(cells, {(0, self.physics.id), (1, self.physics.id), (1, self.junior.id),
+                                 (2, self.physics.id)})
+        self.assertFalse(Marks.objects.filter(exam=self.exam).exists())
+    
+    def test_requires_admin(self):
+        """Non-staff users cannot use the bulk endpoint"""
+        self.client.force_authenticate(user=None)
+        response = self.client.post(self.url, self.payload([]), format='json')
+        self.assertIn(response.status_code, [status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN])
+
+
+class ExamMarksImportViewTest(ClassMarksFixture, APITestCase):
+    """Test cases for ExamMarksImportView"""
+    
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('exam-marks-import', args=[self.exam.id])
+    
+    def upload(self, lines, name='marks.csv', **data):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        content = '\n'.join(lines).encode()
+        return self.client.post(
+            self.url, {'file': SimpleUploadedFile(name, content), **data}, format='multipart'
+        )
+    
+    def test_imports_csv(self):
+        """Rows are resolved by roll id and subject code and upserted"""
+        response = self.upload([
+            'Roll ID,Subject Code,Marks Obtained',
+            'bulk0,BPHY,75.5',
+            'BULK1,bhis,60',
+            '',
+            'BULK2,BPHY,40',
+        ], total_marks='80')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['rows'], 3)
+        self.assertEqual(response.data['created'], 3)
+        mark = Marks.objects.get(exam=self.exam, student=self.students[0], subject=self.physics)
+        self.assertEqual(mark.marks_obtained, Decimal('75.50'))
+        self.assertEqual(mark.total_marks, Decimal('80.00'))
+    
+    def test_dry_run_reports_errors_per_row(self):
+        """A dry run validates every row without writing anything"""
+        response = self.upload([
+            'roll_id,subject_code,marks_obtained,total_marks',
+            'BULK0,BPHY,90,100',
+            'BULKX,BPHY,50,100',
+            'BULK1,BJUN,50,100',
+            'BULK1,BPHY,120,100',
+            'BULK2,BPHY,abc,100',
+            'BULK0,BPHY,95,100',
+        ], dry_run='true')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['committed'])
+        self.assertEqual(response.data['valid'], 1)
+        self.assertEqual([e['row'] for e in response.data['errors']], [3, 4, 5, 6, 7])
+        self.assertIn('Duplicate of row 2', response.data['errors'][-1]['error'])
+        self.assertFalse(Marks.objects.filter(exam=self.exam).exists())
+    
+    def test_errors_roll_back_import(self):
+        """A failing row prevents the whole file from being written"""
+        response = self.upload([
+            'roll_id,subject_code,marks_obtained,total_marks',
+            'BULK0,BPHY,90,100',
+            'BULK1,BPHY,-1,100',
+        ])
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error_count'], 1)
+        self.assertFalse(Marks.objects.filter(exam=self.exam).exists())
+    
+    def test_missing_columns(self):
+        """Files without the required columns are rejected"""
+        response = self.upload(['roll_id,marks_obtained', 'BULK0,90'])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('subject_code', response.data['error'])
+    
+    @skipUnless(OPENPYXL_AVAILABLE, 'openpyxl is not installed')
+    def test_imports_xlsx(self):
+        """XLSX sheets are read the same way, including numeric roll ids"""
+        import io
+        import openpyxl
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        self.students[0].roll_id = '1001'
+        self.students[0].save()
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(['roll_id', 'subject_code', 'marks_obtained', 'total_marks'])
+        sheet.append([1001, 'BPHY', 88, 100])
+        buffer = io.BytesIO()
+        workbook.save(buffer)
+        
+        response = self.client.post(
+            self.url, {'file': SimpleUploadedFile('marks.xlsx', buffer.getvalue())}, format='multipart'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Marks.objects.get(exam=self.exam, student=self.students[0]).marks_obtained,
+                         Decimal('88.00'))
+
+
+class ExamAnalyticsTest(ClassMarksFixture, APITestCase):
+    """Test cases for the precomputed exam analytics"""
+    
+    def add_marks(self, scores):
+        """scores: {(student_index, subject): marks out of 100}, committed so analytics refresh"""
+        with self.captureOnCommitCallbacks(execute=True):
+            for (index, subject), value in scores.items():
+                Marks.objects.create(
+                    student=self.students[index], exam=self.exam, subject=subject,
+                    marks_obtained=Decimal(value), total_marks=Decimal('100.00')
+                )
+    
+    def test_percentages_match_model(self):
+        """Vectorized percentages and grades agree with Marks.percentage and Marks.grade"""
+        import random
+        from .analytics import GRADE_LABELS, grade_indices, percentage_hundredths, to_cents
+        rng = random.Random(3)
+        pairs = [(Decimal(rng.randint(0, 1000)) / 100, Decimal(rng.randint(1, 1000)) / 100)
+                 for _ in range(500)]
+        pairs += [(Decimal('1'), Decimal('8')), (Decimal('0.01'), Decimal('16')), (Decimal('89.99'), Decimal('99.99'))]
+        pairs = [(o, t) for o, t in pairs if o <= t and o == o.quantize(Decimal('0.01'))]
+        
+        hundredths = percentage_hundredths(to_cents([o for o, _ in pairs]), to_cents([t for _, t in pairs]))
+        grades = grade_indices(hundredths)
+        for (obtained, total), value, grade in zip(pairs, hundredths, grades):
+            mark = Marks(marks_obtained=obtained, total_marks=total)
+            self.assertEqual(Decimal(int(value)) / 100, mark.percentage)
+            self.assertEqual(GRADE_LABELS[grade], mark.grade)
+    
+    def test_refresh_on_commit(self):
+        """Stats, histograms and tied ranks are stored once the marks commit"""
+        from .models import ExamStats
+        self.add_marks({
+            (0, self.physics): '90', (1, self.physics): '70', (2, self.physics): '90',
+            (0, self.history): '50', (1, self.history): '80',
+        })
+        
+        stats = ExamStats.objects.get(exam=self.exam)
+        self.assertEqual(stats.student_count, 3)
+        self.assertEqual(stats.max_percentage, 90.0)
+        subject = ExamSubjectStats.objects.get(exam=self.exam, subject=self.physics)
+        self.assertAlmostEqual(subject.mean, 83.33)
+        self.assertEqual(subject.median, 90.0)
+        self.assertEqual(subject.grade_histogram['A+'], 2)
+        self.assertEqual(subject.grade_histogram['B+'], 1)
+        
+        ranks = dict(StudentExamRank.objects.filter(exam=self.exam, subject=self.physics)
+                     .values_list('student_id', 'rank'))
+        self.assertEqual(ranks, {self.students[0].id: 1, self.students[2].id: 1, self.students[1].id: 3})
+        overall = StudentExamRank.objects.get(exam=self.exam, subject__isnull=True, student=self.students[2])
+        self.assertEqual(overall.rank, 1)
+        self.assertAlmostEqual(overall.percentile, 83.33)
+        
+        # Deleting a mark refreshes the exam again
+        with self.captureOnCommitCallbacks(execute=True):
+            Marks.objects.filter(exam=self.exam, subject=self.history).delete()
+        self.assertFalse(ExamSubjectStats.objects.filter(exam=self.exam, subject=self.history).exists())
+    
+    def test_deletes_send_one_signal_per_delete(self):
+        """Queryset deletes and cascades from a deleted student each send one batched marks_changed"""
+        from .signals import marks_changed
+        self.add_marks({(i, subject): '60' for i in range(3) for subject in (self.physics, self.history)})
+        received = []
+
+        def listener(sender, exam_ids, student_ids, deleted=False, **kwargs):
+            received.append((exam_ids, student_ids, deleted))
+        marks_changed.connect(listener)
+        self.addCleanup(marks_changed.disconnect, listener)
+
+        Marks.objects.filter(exam=self.exam, subject=self.history).delete()
+        self.assertEqual(received, [({self.exam.id}, {s.id for s in self.students}, True)])
+        student_id = self.students[0].id
+        self.students[0].delete()
+        self.assertEqual(received[1:], [({self.exam.id}, {student_id}, True)])
+        self.assertEqual(Marks.objects.count(), 2)
+
+    def test_bulk_upsert_refreshes(self):
+        """Bulk entry, which bypasses post_save, also refreshes analytics"""
+        rows = [{'student_id': s.id, 'marks': [50 + 10 * i, None]} for i, s in enumerate(self.students)]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                reverse('exam-marks-bulk', args=[self.exam.id]),
+                {'total_marks': 100, 'subjects': [self.physics.id, self.history.id], 'rows': rows},
+                format='json'
+            )
+        self.assertEqual(ExamSubjectStats.objects.get(exam=self.exam, subject=self.physics).student_count, 3)
+    
+    def test_analytics_endpoints(self):
+        """Summary and ranking are served from the stored tables in constant queries"""
+        self.add_marks({(0, self.physics): '90', (1, self.physics): '70', (2, self.history): '60'})
+        
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('exam-analytics', args=[self.exam.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['overall']['student_count'], 3)
+        self.assertEqual(len(response.data['subjects']), 2)
+        
+        response = self.client.get(reverse('exam-ranking', args=[self.exam.id]),
+                                   {'subject_id': self.physics.id})
+        self.assertEqual([r['rank'] for r in response.data['results']], [1, 2])
+        self.assertEqual(response.data['results'][0]['student'], self.students[0].id)
+
+
+class StudentMarksFastPathTest(ClassMarksFixture, APITestCase):
+    """Test cases for the pre-serialized student marks payload"""
+    
+    def setUp(self):
+        super().setUp()
+        from django.core.cache import cache
+        cache.clear()
+        self.student = self.students[0]
+        later = Exam.objects.create(
+            name="Bulk Final", exam_date=date.today() + timedelta(days=30), student_class=self.test_class
+        )
+        for exam, subject, obtained, total in [
+            (self.exam, self.physics, '1.00', '3.00'),
+            (self.exam, self.history, '89.99', '99.99'),
+            (later, self.physics, '45.50', '50.00'),
+            (later, self.history, '0.00', '80.00'),
+        ]:
+            Marks.objects.create(student=self.student, exam=exam, subject=subject,
+                                 marks_obtained=Decimal(obtained), total_marks=Decimal(total))
+    
+    def test_matches_serializer_output(self):
+        """The fast path renders exactly the same JSON as the DRF serializers"""
+        from rest_framework.renderers import JSONRenderer
+        from .student_marks import build_student_marks, build_with_serializers
+        
+        fast = build_student_marks(self.student)
+        self.assertEqual([len(group['marks']) for group in fast], [2, 2])
+        self.assertEqual(JSONRenderer().render(fast), JSONRenderer().render(build_with_serializers(self.student)))
+    
+    def test_cached_until_marks_change(self):
+        """Repeat requests hit the cache; changing a mark invalidates it"""
+        with tempfile.TemporaryDirectory() as location, override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location,
+        }}):
+            self.check_cached_until_marks_change()
+    
+    def test_not_cached_in_local_memory(self):
+        """A per-process cache could serve stale payloads after another worker's write, so it is skipped"""
+        self.client.force_authenticate(user=User.objects.create_user('fastpath', password='x'))
+        url = reverse('student-marks')
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.client.get(url, {'student_id': self.student.id})
+            # A write this process never hears about, as if made by another worker
+            Marks.objects.filter(exam=self.exam, subject=self.physics).update(marks_obtained=Decimal('2.00'))
+            response = self.client.get(url, {'student_id': self.student.id})
+        self.assertEqual(response.data['marks_by_exam'][1]['marks'][1]['marks_obtained'], '2.00')
+    
+    def check_cached_until_marks_change(self):
+        self.client.force_authenticate(user=User.objects.create_user('fastpath', password='x'))
+        url = reverse('student-marks')
+        self.client.get(url, {'student_id': self.student.id})
+        
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'student_id': self.student.id})
+        self.assertEqual(response.data['marks_by_exam'][1]['marks'][1]['marks_obtained'], '1.00')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Marks.objects.filter(exam=self.exam, subject=self.physics).update(marks_obtained=Decimal('2.00'))
+            mark = Marks.objects.get(exam=self.exam, subject=self.physics)
+            mark.save()
+        
+        response = self.client.get(url, {'student_id': self.student.id})
+        self.assertEqual(response.data['marks_by_exam'][1]['marks'][1]['marks_obtained'], '2.00')
+
+
+class UnifiedMarkTest(ClassMarksFixture, APITestCase):
+    """Test cases for the unified marks read model"""
+    
+    def setUp(self):
+        super().setUp()
+        from students.models import StudentMark
+        self.student = self.students[0]
+        self.mark = Marks.objects.create(student=self.student, exam=self.exam, subject=self.physics,
+                                         marks_obtained=Decimal('45.00'), total_marks=Decimal('60.00'))
+        self.legacy = StudentMark.objects.create(student=self.student, subject=self.physics, exam_type='quiz',
+                                                 marks_obtained=Decimal('9.00'), total_marks=Decimal('10.00'),
+                                                 exam_date=date(2024, 1, 10))
+    
+    def rows(self):
+        return {
+            (row.source, row.subject_id, row.exam_type, row.exam_name, row.exam_date,
+             row.marks_obtained, row.total_marks, row.percentage)
+            for row in UnifiedMark.objects.filter(student=self.student)
+        }
+    
+    def test_rows_follow_both_sources(self):
+        """Saves, deletes and exam edits on either table show up in the read model"""
+        self.assertEqual(self.rows(), {
+            ('exam', self.physics.id, 'exam', 'Bulk Term', self.exam.exam_date,
+             Decimal('45.00'), Decimal('60.00'), Decimal('75.00')),
+            ('legacy', self.physics.id, 'quiz', '', date(2024, 1, 10),
+             Decimal('9.00'), Decimal('10.00'), Decimal('90.00')),
+        })
+        
+        self.mark.marks_obtained = Decimal('30.00')
+        self.mark.save()
+        self.exam.name = 'Bulk Term Renamed'
+        self.exam.save()
+        self.legacy.delete()
+        self.assertEqual(self.rows(), {
+            ('exam', self.physics.id, 'exam', 'Bulk Term Renamed', self.exam.exam_date,
+             Decimal('30.00'), Decimal('60.00'), Decimal('50.00')),
+        })
+        
+        self.mark.delete()
+        self.assertEqual(self.rows(), set())
+    
+    def test_bulk_upsert_is_synced(self):
+        """Marks written by the bulk endpoint appear without a backfill"""
+        response = self.client.post(reverse('exam-marks-bulk', args=[self.exam.id]), {
+            'total_marks': 100,
+            'subjects': [self.physics.id, self.history.id],
+            'rows': [{'student_id': s.id, 'marks': [80, 70]} for s in self.students],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        exam_rows = UnifiedMark.objects.filter(source=UnifiedMark.SOURCE_EXAM)
+        self.assertEqual(exam_rows.count(), 6)
+        self.assertEqual(exam_rows.get(exam_mark=self.mark).marks_obtained, Decimal('80.00'))
+    
+    def test_backfill_rebuilds_rows(self):
+        """backfill_unified_marks restores rows missed by writes that skip signals"""
+        from django.core.management import call_command
+        from io import StringIO
+        before = self.rows()
+        Marks.objects.bulk_create([Marks(student=self.student, exam=self.exam, subject=self.history,
+                                         marks_obtained=Decimal('20.00'), total_marks=Decimal('40.00'))])
+        UnifiedMark.objects.filter(source=UnifiedMark.SOURCE_LEGACY).delete()
+        
+        call_command('backfill_unified_marks', stdout=StringIO())
+        self.assertEqual(self.rows(), before | {
+            ('exam', self.history.id, 'exam', 'Bulk Term', self.exam.exam_date,
+             Decimal('20.00'), Decimal('40.00'), Decimal('50.00')),
+        })
+    
+    def test_subject_averages_single_query(self):
+        """Per-subject averages cover both sources and take one query"""
+        from .unified import subject_averages
+        with self.assertNumQueries(1):
+            averages = subject_averages(self.student, [self.physics, self.history])
+        self.assertEqual(averages, {self.physics.id: (82.5, 2)})
+
+
+class ReportCardsTest(ClassMarksFixture, APITestCase):
+    """Test cases for batch report card generation"""
+    
+    def setUp(self):
+        super().setUp()
+        from attendance.models import Attendance
+        self.students[0].name = 'Bulk <Student> 0'
+        self.students[0].save()
+        with self.captureOnCommitCallbacks(execute=True):
+            for student, physics, history in zip(self.students, ['80.00', '45.50', '30.00'],
+                                                 ['70.00', '60.00', None]):
+                Marks.objects.create(student=student, exam=self.exam, subject=self.physics,
+                                     marks_obtained=Decimal(physics), total_marks=Decimal('100.00'))
+                if history:
+                    Marks.objects.create(student=student, exam=self.exam, subject=self.history,
+                                         marks_obtained=Decimal(history), total_marks=Decimal('100.00'))
+        for day in range(4):
+            Attendance.objects.create(student=self.students[0], date=date.today() - timedelta(days=day),
+                                      present=day != 0)
+        self.start = date.today() - timedelta(days=30)
+    
+    def archive(self, **kwargs):
+        import io
+        import zipfile
+        from .reports import generate_report_cards
+        output = io.BytesIO()
+        calls = []
+        count = generate_report_cards(self.test_class, self.start, date.today(), output,
+                                      progress=lambda done, total: calls.append((done, total)), **kwargs)
+        return count, calls, zipfile.ZipFile(output)
+    
+    def test_collects_in_constant_queries(self):
+        """Card data for the whole class comes from six bulk queries"""
+        from .reports import collect_cards
+        with self.assertNumQueries(6):
+            cards = collect_cards(self.test_class, self.start, date.today())
+        
+        self.assertEqual([c['student']['roll_id'] for c in cards], ['BULK0', 'BULK1', 'BULK2'])
+        first = cards[0]
+        exam = first['exams'][0]
+        self.assertEqual((exam['marks_obtained'], exam['total_marks'], exam['percentage'], exam['grade']),
+                         ('150.00', '200.00', 75.0, 'B+'))
+        self.assertEqual(exam['rank'], 1)
+        self.assertEqual(first['attendance'], {'days': 4, 'present': 3, 'percentage': 75.0})
+        self.assertEqual(cards[2]['subjects'], [
+            {'subject': 'Bulk Physics', 'exams': 1, 'percentage': 30.0, 'grade': 'F'},
+        ])
+    
+    def test_writes_one_card_per_student(self):
+        """The zip has an escaped HTML card per student and progress covers every card"""
+        count, calls, archive = self.archive(workers=1)
+        
+        self.assertEqual(count, 3)
+        self.assertEqual(calls, [(1, 3), (2, 3), (3, 3)])
+        self.assertEqual(sorted(archive.namelist()),
+                         ['BULK0_bulk-student-0.html', 'BULK1_bulk-student-1.html', 'BULK2_bulk-student-2.html'])
+        html = archive.read('BULK0_bulk-student-0.html').decode()
+        self.assertIn('Bulk &lt;Student&gt; 0', html)
+        self.assertIn('Present 3 of 4 school days', html)
+        self.assertIn('Bulk Term', html)
+    
+    def test_process_pool_matches_serial_output(self):
+        """Rendering across worker processes produces the same archive contents"""
+        from unittest import mock
+        _, _, serial = self.archive(workers=1)
+        with mock.patch('marks.reports.MIN_PARALLEL_CARDS', 0):
+            _, calls, parallel = self.archive(workers=2)
+        
+        self.assertEqual(len(calls), 3)
+        self.assertEqual({name: parallel.read(name) for name in parallel.namelist()},
+                         {name: serial.read(name) for name in serial.namelist()})
@@ -0,0 +1,163 @@
+"""
+Keeps the UnifiedMark read model in sync with Marks and StudentMark.
+
+Exam marks are resynced per (exam, student) from marks_changed, which covers
+single saves as well as the bulk upsert paths. Legacy marks are mirrored row
+by row from StudentMark's post_save. Deletes need nothing here: every
+UnifiedMark references its source row and cascades with it. Syncing runs
+inside the writer's transaction, so the read model commits or rolls back
+together with the marks themselves. Writes that bypass signals entirely
+(bulk_create, queryset update) need backfill() afterwards.
+"""
+import logging
+import time
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Avg, Count
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from students.models import StudentMark
+from .models import Exam, Marks, UnifiedMark
+from .signals import marks_changed
+
+logger = logging.getLogger(__name__)
+
+# Keeps IN (...) lists well under SQLite's bound parameter limit
+SYNC_CHUNK_SIZE = 500
+
+EXAM_FIELDS = (
+    'id', 'student_id', 'subject_id', 'exam_id', 'exam__name', 'exam__exam_date',
+    'marks_obtained', 'total_marks', 'created_at',
+)
+LEGACY_FIELDS = (
+    'id', 'student_id', 'subject_id', 'exam_type', 'exam_date',
+    'marks_obtained', 'total_marks', 'created_at',
+)
+
+
+def percentage(obtained, total):
+    """Same value as Marks.percentage / StudentMark.percentage"""
+    obtained, total = Decimal(str(obtained)), Decimal(str(total))
+    if total > 0:
+        return round((obtained / total) * 100, 2)
+    return Decimal('0.00')
+
+
+def from_exam_row(row):
+    mark_id, student_id, subject_id, exam_id, exam_name, exam_date, obtained, total, created_at = row
+    return UnifiedMark(
+        source=UnifiedMark.SOURCE_EXAM, exam_mark_id=mark_id, student_id=student_id,
+        subject_id=subject_id, exam_id=exam_id, exam_type=UnifiedMark.SOURCE_EXAM,
+        exam_name=exam_name, exam_date=exam_date, marks_obtained=obtained, total_marks=total,
+        percentage=percentage(obtained, total), created_at=created_at,
+    )
+
+
+def from_legacy_row(row):
+    mark_id, student_id, subject_id, exam_type, exam_date, obtained, total, created_at = row
+    return UnifiedMark(
+        source=UnifiedMark.SOURCE_LEGACY, legacy_mark_id=mark_id, student_id=student_id,
+        subject_id=subject_id, exam_type=exam_type, exam_date=exam_date,
+        marks_obtained=obtained, total_marks=total,
+        percentage=percentage(obtained, total), created_at=created_at,
+    )
+
+
+def _chunks(values, size=SYNC_CHUNK_SIZE):
+    values = sorted(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def sync_exam_marks(exam_ids, student_ids):
+    """Replace the exam rows of student_ids in exam_ids with the current Marks"""
+    exam_ids = list(exam_ids)
+    # Part of the caller's transaction when there is one; no savepoint needed
+    with transaction.atomic(savepoint=False):
+        for students in _chunks(student_ids):
+            UnifiedMark.objects.filter(
+                source=UnifiedMark.SOURCE_EXAM, exam_id__in=exam_ids, student_id__in=students,
+            ).delete()
+            rows = (Marks.objects.filter(exam_id__in=exam_ids, student_id__in=students)
+                    .order_by().values_list(*EXAM_FIELDS))
+            UnifiedMark.objects.bulk_create([from_exam_row(row) for row in rows], batch_size=SYNC_CHUNK_SIZE)
+
+
+def backfill(students=None, chunk_size=5000):
+    """
+    Rebuild the read model from both source tables, optionally only for the
+    students in a queryset. Returns (exam_rows, legacy_rows).
+    """
+    unified = UnifiedMark.objects.all()
+    exam_marks = Marks.objects.order_by('id')
+    legacy_marks = StudentMark.objects.order_by('id')
+    if students is not None:
+        unified = unified.filter(student__in=students)
+        exam_marks = exam_marks.filter(student__in=students)
+        legacy_marks = legacy_marks.filter(student__in=students)
+
+    with transaction.atomic():
+        unified.delete()
+        counts = []
+        for queryset, fields, convert in (
+            (exam_marks, EXAM_FIELDS, from_exam_row),
+            (legacy_marks, LEGACY_FIELDS, from_legacy_row),
+        ):
+            rows = queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+            batch = []
+            count = 0
+            for row in rows:
+                batch.append(convert(row))
+                if len(batch) >= chunk_size:
+                    UnifiedMark.objects.bulk_create(batch, batch_size=chunk_size)
+                    count += len(batch)
+                    batch = []
+            UnifiedMark.objects.bulk_create(batch, batch_size=chunk_size)
+            counts.append(count + len(batch))
+    return tuple(counts)
+
+
+def subject_averages(student, subjects):
+    """
+    {subject_id: (average_percentage, mark_count)} over both sources, from
+    one grouped aggregate query
+    """
+    return {
+        row['subject_id']: (row['average'], row['count'])
+        for row in UnifiedMark.objects.filter(student=student, subject__in=subjects)
+        .order_by().values('subject_id').annotate(average=Avg('percentage'), count=Count('id'))
+    }
+
+
+@receiver(marks_changed)
+def sync_on_marks_changed(sender, exam_ids, student_ids, deleted=False, **kwargs):
+    if deleted:
+        return
+    started = time.perf_counter()
+    sync_exam_marks(exam_ids, student_ids)
+    logger.debug('Synced unified marks', extra={
+        'exam_count': len(exam_ids), 'student_count': len(student_ids),
+        'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+    })
+
+
+@receiver(post_save, sender=StudentMark)
+def sync_legacy_mark(sender, instance, **kwargs):
+    row = from_legacy_row(tuple(getattr(instance, field) for field in LEGACY_FIELDS))
+    UnifiedMark.objects.update_or_create(
+        legacy_mark=instance, source=UnifiedMark.SOURCE_LEGACY,
+        defaults={field: getattr(row, field) for field in (
+            'student_id', 'subject_id', 'exam_type', 'exam_date',
+            'marks_obtained', 'total_marks', 'percentage', 'created_at',
+        )},
+    )
+
+
+@receiver(post_save, sender=Exam)
+def sync_exam_details(sender, instance, created, **kwargs):
+    if not created:
+        UnifiedMark.objects.filter(exam_id=instance.id).update(
+            exam_name=instance.name, exam_date=instance.exam_date,
+        )
@@ -1,8 +1,15 @@
 from django.urls import path
-from .views import ExamManagementView, MarksManagementView, StudentMarksView
+from .views import (
+    ExamAnalyticsView, ExamManagementView, ExamMarksBulkView, ExamMarksImportView,
+    ExamRankingView, MarksManagementView, StudentMarksView
+)
 
 urlpatterns = [
     path('api/exams/', ExamManagementView.as_view(), name='exam-management'),
     path('api/exams/<int:exam_id>/marks/', MarksManagementView.as_view(), name='marks-management'),
+    path('api/exams/<int:exam_id>/marks/bulk/', ExamMarksBulkView.as_view(), name='exam-marks-bulk'),
+    path('api/exams/<int:exam_id>/marks/import/', ExamMarksImportView.as_view(), name='exam-marks-import'),
+    path('api/exams/<int:exam_id>/analytics/', ExamAnalyticsView.as_view(), name='exam-analytics'),
+    path('api/exams/<int:exam_id>/analytics/ranking/', ExamRankingView.as_view(), name='exam-ranking'),
     path('api/my-marks/', StudentMarksView.as_view(), name='student-marks'),
 ]
\ No newline at end of file
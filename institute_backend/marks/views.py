@@ -9,11 +9,15 @@ from django.core.exceptions import ValidationError as DjangoValidationError
 from django.core.paginator import Paginator
 from django.core.cache import cache
 from accounts.models import Student, Subject, Class
-from .models import Exam, Marks
+from .models import Exam, ExamSubjectStats, Marks, StudentExamRank
 from .serializers import (
     ExamSerializer, MarksSerializer, StudentMarksSerializer, 
-    SubjectSerializer, BulkMarksSerializer
+    SubjectSerializer, BulkMarksSerializer, ExamStatsSerializer,
+    ExamSubjectStatsSerializer, StudentExamRankSerializer
 )
+from .bulk import MarksMatrix, upsert_marks
+from .importer import ImportFormatError, import_marks
+from .student_marks import get_student_marks, student_summary
 import logging
 
 logger = logging.getLogger(__name__)
@@ -70,7 +74,7 @@ class ExamManagementView(APIView):
             return Response(serializer.data, status=status.HTTP_200_OK)
             
         except Exception as e:
-            logger.error(f"Error fetching exams: {e}")
+            logger.error("Error fetching exams: %s", e)
             return Response(
                 {'error': 'An error occurred while fetching exams'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -84,7 +88,7 @@ class ExamManagementView(APIView):
             if serializer.is_valid():
                 try:
                     exam = serializer.save()
-                    logger.info(f"Exam created successfully: {exam.name} for {exam.student_class.name}")
+                    logger.info("Exam created successfully: %s for %s", exam.name, exam.student_class.name)
                     return Response(
                         ExamSerializer(exam).data, 
                         status=status.HTTP_201_CREATED
@@ -101,7 +105,7 @@ class ExamManagementView(APIView):
                 )
                 
         except Exception as e:
-            logger.error(f"Error creating exam: {e}")
+            logger.error("Error creating exam: %s", e)
             return Response(
                 {'error': 'An error occurred while creating exam'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -179,7 +183,7 @@ class MarksManagementView(APIView):
             }, status=status.HTTP_200_OK)
             
         except Exception as e:
-            logger.error(f"Error fetching marks data: {e}")
+            logger.error("Error fetching marks data: %s", e)
             return Response(
                 {'error': 'An error occurred while fetching marks data'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -268,7 +272,8 @@ class MarksManagementView(APIView):
                 all_marks = created_marks + updated_marks
                 response_data = MarksSerializer(all_marks, many=True).data
                 
-                logger.info(f"Successfully processed {len(all_marks)} marks for student {student.name} in exam {exam.name}")
+                logger.info("Successfully processed %s marks for student %s in exam %s",
+                            len(all_marks), student.name, exam.name)
                 
                 return Response({
                     'message': f'Successfully processed {len(all_marks)} marks',
@@ -278,13 +283,158 @@ class MarksManagementView(APIView):
                 }, status=status.HTTP_201_CREATED)
                 
         except Exception as e:
-            logger.error(f"Error saving marks: {e}")
+            logger.error("Error saving marks: %s", e)
             return Response(
                 {'error': 'An error occurred while saving marks'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
 
+class ExamMarksBulkView(APIView):
+    """
+    API view for entering marks for a whole class at once
+    POST: Validate a student x subject matrix and upsert all cells
+    """
+    permission_classes = [IsAdminUser]
+    
+    def post(self, request, exam_id):
+        """Bulk create/update marks for every student and subject of an exam"""
+        exam = get_object_or_404(Exam.objects.select_related('student_class'), id=exam_id)
+        
+        try:
+            matrix = MarksMatrix(exam)
+            marks, errors = matrix.validate(request.data)
+            if errors:
+                return Response(
+                    {'error': 'Some marks could not be processed', 'details': errors},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            
+            created = matrix.count_new(marks)
+            upsert_marks(marks)
+            
+            logger.info(
+                'Bulk marks saved',
+                extra={'exam_id': exam.id, 'cells': len(marks), 'new_cells': created}
+            )
+            
+            return Response({
+                'message': f'Successfully processed {len(marks)} marks',
+                'created': created,
+                'updated': len(marks) - created,
+            }, status=status.HTTP_201_CREATED)
+            
+        except Exception:
+            logger.exception('Error saving bulk marks', extra={'exam_id': exam_id})
+            return Response(
+                {'error': 'An error occurred while saving marks'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class ExamMarksImportView(APIView):
+    """
+    API view for importing an exam's marks from a spreadsheet
+    POST: Stream an uploaded CSV/XLSX file (roll_id, subject_code,
+    marks_obtained[, total_marks]) and upsert every row
+    """
+    permission_classes = [IsAdminUser]
+    
+    def post(self, request, exam_id):
+        """Import marks from the uploaded 'file'; pass dry_run=true to only validate"""
+        exam = get_object_or_404(Exam.objects.select_related('student_class'), id=exam_id)
+        
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {'error': 'A CSV or XLSX file is required in the "file" field'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        dry_run = str(request.data.get('dry_run', '')).lower() in ('1', 'true', 'yes')
+        
+        try:
+            result = import_marks(
+                exam, upload, total_marks=request.data.get('total_marks'), dry_run=dry_run
+            )
+        except ImportFormatError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception:
+            logger.exception('Error importing marks', extra={'exam_id': exam.id})
+            return Response(
+                {'error': 'An error occurred while importing marks'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        logger.info(
+            'Marks import finished',
+            extra={'exam_id': exam.id, 'rows': result['rows'], 'errors': result['error_count'],
+                   'dry_run': dry_run}
+        )
+        
+        if result['error_count'] and not dry_run:
+            return Response(
+                {'error': 'Some rows could not be imported', **result},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(
+            result,
+            status=status.HTTP_200_OK if dry_run else status.HTTP_201_CREATED
+        )
+
+
+class ExamAnalyticsView(APIView):
+    """
+    API view for precomputed exam analytics
+    GET: Overall and per-subject percentage distributions for an exam
+    """
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request, exam_id):
+        """Return the stored summary for an exam (refreshed when its marks change)"""
+        exam = get_object_or_404(
+            Exam.objects.select_related('student_class', 'stats'), id=exam_id
+        )
+        subject_stats = ExamSubjectStats.objects.filter(exam=exam).select_related('subject')
+        overall = getattr(exam, 'stats', None)
+        
+        return Response({
+            'exam': ExamSerializer(exam).data,
+            'overall': ExamStatsSerializer(overall).data if overall else None,
+            'subjects': ExamSubjectStatsSerializer(subject_stats, many=True).data,
+        }, status=status.HTTP_200_OK)
+
+
+class ExamRankingView(APIView):
+    """
+    API view for student rankings in an exam
+    GET: Paginated ranking, overall or for ?subject_id=; ?student_id= filters to one student
+    """
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request, exam_id):
+        """Return students ordered by rank"""
+        ranks = StudentExamRank.objects.filter(exam_id=exam_id).select_related('student')
+        
+        subject_id = request.query_params.get('subject_id')
+        student_id = request.query_params.get('student_id')
+        try:
+            if subject_id:
+                ranks = ranks.filter(subject_id=int(subject_id))
+            else:
+                ranks = ranks.filter(subject__isnull=True)
+            if student_id:
+                ranks = ranks.filter(student_id=int(student_id))
+        except ValueError:
+            return Response(
+                {'error': 'subject_id and student_id must be valid integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        paginator = StandardResultsSetPagination()
+        page = paginator.paginate_queryset(ranks.order_by('rank', 'student__name'), request, view=self)
+        return paginator.get_paginated_response(StudentExamRankSerializer(page, many=True).data)
+
+
 class StudentMarksView(APIView):
     """
     API view for students to view their own marks
@@ -317,48 +467,25 @@ class StudentMarksView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            student = get_object_or_404(Student, id=student_id)
+            student = get_object_or_404(Student.objects.select_related('student_class'), id=student_id)
             
-            # Get all marks for the student using optimized manager method
-            marks = Marks.objects.get_student_marks_optimized(student)
+            # One values() query, vectorized grades and per-student caching
+            marks_list = get_student_marks(student)
             
-            if not marks.exists():
+            if not marks_list:
                 return Response({
                     'message': 'No marks found for this student',
-                    'student': {
-                        'id': student.id,
-                        'name': student.name,
-                        'class': student.student_class.name
-                    },
+                    'student': student_summary(student),
                     'marks_by_exam': []
                 }, status=status.HTTP_200_OK)
             
-            # Group marks by exam
-            marks_by_exam = {}
-            for mark in marks:
-                exam_id = mark.exam.id
-                if exam_id not in marks_by_exam:
-                    marks_by_exam[exam_id] = {
-                        'exam': ExamSerializer(mark.exam).data,
-                        'marks': []
-                    }
-                marks_by_exam[exam_id]['marks'].append(StudentMarksSerializer(mark).data)
-            
-            # Convert to list and sort by exam date (most recent first)
-            marks_list = list(marks_by_exam.values())
-            marks_list.sort(key=lambda x: x['exam']['exam_date'], reverse=True)
-            
             return Response({
-                'student': {
-                    'id': student.id,
-                    'name': student.name,
-                    'class': student.student_class.name
-                },
+                'student': student_summary(student),
                 'marks_by_exam': marks_list
             }, status=status.HTTP_200_OK)
             
         except Exception as e:
-            logger.error(f"Error fetching student marks: {e}")
+            logger.error("Error fetching student marks: %s", e)
             return Response(
                 {'error': 'An error occurred while fetching student marks'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -77,7 +77,7 @@ class EnhancedFakeNewsDetector:
             self.stop_words = set(stopwords.words('english'))
             
         except Exception as e:
-            logger.warning(f"NLTK initialization failed: {e}")
+            logger.warning("NLTK initialization failed: %s", e)
             # Fallback to basic preprocessing
             self.lemmatizer = None
             self.stop_words = set()
@@ -91,7 +91,7 @@ class EnhancedFakeNewsDetector:
             metadata_file = os.path.join(self.model_path, 'model_metadata.pkl')
             
             if not all(os.path.exists(f) for f in [model_file, vectorizer_file]):
-                logger.warning(f"Enhanced model files not found in {self.model_path}")
+                logger.warning("Enhanced model files not found in %s", self.model_path)
                 return False
             
             # Load model components
@@ -108,7 +108,7 @@ class EnhancedFakeNewsDetector:
             return True
             
         except Exception as e:
-            logger.error(f"Failed to load enhanced model: {e}")
+            logger.error("Failed to load enhanced model: %s", e)
             self.is_loaded = False
             return False
     
@@ -147,7 +147,7 @@ class EnhancedFakeNewsDetector:
                 return ' '.join(filtered_words)
                 
         except Exception as e:
-            logger.warning(f"Text preprocessing failed: {e}")
+            logger.warning("Text preprocessing failed: %s", e)
             # Return basic cleaned text
             return re.sub(r'[^a-zA-Z\s]', '', str(text).lower()).strip()
     
@@ -199,7 +199,7 @@ class EnhancedFakeNewsDetector:
             }
             
         except Exception as e:
-            logger.error(f"Prediction failed: {e}")
+            logger.error("Prediction failed: %s", e)
             raise Exception(f"Prediction error: {str(e)}")
     
     def get_model_info(self) -> Dict:
@@ -142,12 +142,12 @@ def api_detect_fake_news(request):
             })
         
         # Try enhanced model first
-        logger.info(f"Enhanced detector available: {ENHANCED_DETECTOR_AVAILABLE}")
+        logger.info("Enhanced detector available: %s", ENHANCED_DETECTOR_AVAILABLE)
         if ENHANCED_DETECTOR_AVAILABLE:
             try:
                 logger.info("Attempting enhanced model prediction...")
                 result = predict_with_enhanced_model(text)
-                logger.info(f"Enhanced model result: {result}")
+                logger.info("Enhanced model result: %s", result)
                 
                 return JsonResponse({
                     'success': True,
@@ -166,9 +166,9 @@ def api_detect_fake_news(request):
                     }
                 })
             except Exception as e:
-                logger.error(f"Enhanced model prediction failed: {e}")
+                logger.error("Enhanced model prediction failed: %s", e)
                 import traceback
-                logger.error(f"Traceback: {traceback.format_exc()}")
+                logger.error("Traceback: %s", traceback.format_exc())
         
         # Fallback to original model
         if detector is not None:
@@ -188,7 +188,7 @@ def api_detect_fake_news(request):
                     }
                 })
             except Exception as e:
-                logger.error(f"Original model prediction failed: {e}")
+                logger.error("Original model prediction failed: %s", e)
         
         # Final fallback - demo mode
         return JsonResponse({
@@ -156,17 +156,17 @@ def fetch_with_beautifulsoup(source):
             # Get image with multiple fallback strategies and debug logging
             image = None
             base_url = source["url"].split('/')[0] + '//' + source["url"].split('/')[2]
-            logger.info(f"Processing article {i+1}: {title[:50]}...")
+            logger.info("Processing article %s: %s...", i + 1, title[:50])
             
             # Strategy 1: Try to find image near the article link
             if i < len(images):
                 img_elem = images[i]
-                logger.info(f"Found {len(images)} images for article {i+1}")
+                logger.info("Found %s images for article %s", len(images), i + 1)
                 
                 for attr in ['src', 'data-src', 'data-lazy-src', 'data-original']:
                     if img_elem.has_attr(attr):
                         img_src = img_elem[attr].strip()
-                        logger.info(f"Checking image attribute {attr}: {img_src[:100]}")
+                        logger.info("Checking image attribute %s: %s", attr, img_src[:100])
                         
                         # Skip unwanted images
                         skip_keywords = [
@@ -176,38 +176,38 @@ def fetch_with_beautifulsoup(source):
                         ]
                         
                         if any(skip in img_src.lower() for skip in skip_keywords):
-                            logger.info(f"Skipping unwanted image: {img_src[:50]}")
+                            logger.info("Skipping unwanted image: %s", img_src[:50])
                             continue
                         
                         # Process and validate image URL
                         if img_src.startswith('http'):
                             image = img_src
-                            logger.info(f"Found absolute image URL: {image[:80]}")
+                            logger.info("Found absolute image URL: %s", image[:80])
                             break
                         elif img_src.startswith('/'):
                             image = base_url + img_src
-                            logger.info(f"Converted relative URL to absolute: {image[:80]}")
+                            logger.info("Converted relative URL to absolute: %s", image[:80])
                             break
                         elif img_src.startswith('//'):
                             image = 'https:' + img_src
-                            logger.info(f"Added protocol to protocol-relative URL: {image[:80]}")
+                            logger.info("Added protocol to protocol-relative URL: %s", image[:80])
                             break
             
             # Strategy 2: Try to find image in the article's parent container
             if not image:
                 try:
-                    logger.info(f"Strategy 2: Searching in parent container for article {i+1}")
+                    logger.info("Strategy 2: Searching in parent container for article %s", i + 1)
                     parent = a.find_parent()
                     if parent:
                         # Look for images in various containers
                         nearby_imgs = parent.find_all('img')
-                        logger.info(f"Found {len(nearby_imgs)} images in parent container")
+                        logger.info("Found %s images in parent container", len(nearby_imgs))
                         
                         for nearby_img in nearby_imgs:
                             for attr in ['src', 'data-src', 'data-lazy-src', 'data-original']:
                                 if nearby_img.has_attr(attr):
                                     img_src = nearby_img[attr].strip()
-                                    logger.info(f"Parent container image {attr}: {img_src[:100]}")
+                                    logger.info("Parent container image %s: %s", attr, img_src[:100])
                                     
                                     # Skip unwanted images
                                     skip_keywords = [
@@ -217,36 +217,36 @@ def fetch_with_beautifulsoup(source):
                                     ]
                                     
                                     if any(skip in img_src.lower() for skip in skip_keywords):
-                                        logger.info(f"Skipping unwanted parent image: {img_src[:50]}")
+                                        logger.info("Skipping unwanted parent image: %s", img_src[:50])
                                         continue
                                         
                                     # Process and validate image URL
                                     if img_src.startswith('http'):
                                         image = img_src
-                                        logger.info(f"Found absolute parent image URL: {image[:80]}")
+                                        logger.info("Found absolute parent image URL: %s", image[:80])
                                         break
                                     elif img_src.startswith('/'):
                                         image = base_url + img_src
-                                        logger.info(f"Converted relative parent URL: {image[:80]}")
+                                        logger.info("Converted relative parent URL: %s", image[:80])
                                         break
                                     elif img_src.startswith('//'):
                                         image = 'https:' + img_src
-                                        logger.info(f"Added protocol to parent URL: {image[:80]}")
+                                        logger.info("Added protocol to parent URL: %s", image[:80])
                                         break
                             
                             if image:
                                 break
                 except Exception as e:
-                    logger.warning(f"Error in Strategy 2 for article {i+1}: {e}")
+                    logger.warning("Error in Strategy 2 for article %s: %s", i + 1, e)
             
             # Strategy 3: Use source-specific fallback images
             if not image:
                 if source['name'] in ['The Hindu', 'India Today', 'Indian Express', 'Times Express']:
                     image = get_indian_education_image()
-                    logger.info(f"Using Indian education fallback image for {source['name']}")
+                    logger.info("Using Indian education fallback image for %s", source['name'])
                 else:
                     image = get_random_education_image()
-                    logger.info(f"Using general education fallback image for {source['name']}")
+                    logger.info("Using general education fallback image for %s", source['name'])
             
             # Final validation of image URL
             if image:
@@ -257,12 +257,12 @@ def fetch_with_beautifulsoup(source):
                     elif image.startswith('/'):
                         image = base_url + image
                     else:
-                        logger.warning(f"Invalid image URL format: {image}")
+                        logger.warning("Invalid image URL format: %s", image)
                         image = get_indian_education_image() if source['name'] in ['The Hindu', 'India Today', 'Indian Express', 'Times Express'] else get_random_education_image()
                 
-                logger.info(f"Final image URL for article {i+1}: {image}")
+                logger.info("Final image URL for article %s: %s", i + 1, image)
             else:
-                logger.warning(f"No image found for article {i+1}, using fallback")
+                logger.warning("No image found for article %s, using fallback", i + 1)
                 image = get_indian_education_image() if source['name'] in ['The Hindu', 'India Today', 'Indian Express', 'Times Express'] else get_random_education_image()
             
             # Get description (try to find summary or use title)
@@ -289,7 +289,7 @@ def fetch_with_beautifulsoup(source):
                 
         return results
     except Exception as e:
-        logger.warning(f"BeautifulSoup failed for {source['name']}: {e}")
+        logger.warning("BeautifulSoup failed for %s: %s", source['name'], e)
         return []
 
 def fetch_with_rss(source):
@@ -328,7 +328,7 @@ def fetch_with_rss(source):
             })
         return results
     except Exception as e:
-        logger.warning(f"RSS failed for {source['name']}: {e}")
+        logger.warning("RSS failed for %s: %s", source['name'], e)
         return []
 
 def fetch_with_selenium(source):
@@ -362,7 +362,7 @@ def fetch_with_selenium(source):
             })
         return results
     except Exception as e:
-        logger.warning(f"Selenium failed for {source['name']}: {e}")
+        logger.warning("Selenium failed for %s: %s", source['name'], e)
         return []
 
 def fetch_education_news():
@@ -372,7 +372,7 @@ def fetch_education_news():
     sorted_sources = SOURCES  # Process all sources
 
     for source in sorted_sources:
-        logger.info(f"Fetching news from {source['name']}")
+        logger.info("Fetching news from %s", source['name'])
         
         # Add small delay between requests to avoid rate limiting
         if all_news:  # Only delay if we've already made requests
@@ -383,7 +383,7 @@ def fetch_education_news():
         if source.get("alternate_urls"):
             all_urls = [source["url"]] + source["alternate_urls"]
             source["url"] = random.choice(all_urls)
-            logger.info(f"Using URL: {source['url']}")
+            logger.info("Using URL: %s", source['url'])
         
         # Try BeautifulSoup first
         news = fetch_with_beautifulsoup(source)
@@ -393,32 +393,32 @@ def fetch_education_news():
         
         # Fallback to RSS if available and BeautifulSoup failed
         if not news and source.get("rss"):
-            logger.info(f"Trying RSS for {source['name']}")
+            logger.info("Trying RSS for %s", source['name'])
             news = fetch_with_rss(source)
         
         # For The Hindu, try RSS first if BeautifulSoup gives few results
         if source['name'] == 'The Hindu' and len(news) < 3 and source.get("rss"):
-            logger.info(f"Trying RSS for better results from {source['name']}")
+            logger.info("Trying RSS for better results from %s", source['name'])
             rss_news = fetch_with_rss(source)
             if len(rss_news) > len(news):
                 news = rss_news
         
         # Fallback to Selenium for JavaScript-heavy sites (use sparingly)
         if not news and source['name'] in ['Times Higher Education']:
-            logger.info(f"Trying Selenium for {source['name']}")
+            logger.info("Trying Selenium for %s", source['name'])
             news = fetch_with_selenium(source)
         
         if news:
-            logger.info(f"Successfully fetched {len(news)} articles from {source['name']}")
+            logger.info("Successfully fetched %s articles from %s", len(news), source['name'])
             # Log image URLs for debugging
             for idx, article in enumerate(news[:3]):  # Log first 3 articles
-                logger.info(f"{source['name']} Article {idx+1}: {article['title'][:50]} | Image: {article['image'][:80]}")
+                logger.info("%s Article %s: %s | Image: %s", source['name'], idx + 1, article['title'][:50], article['image'][:80])
             
             # Limit articles per source to ensure variety
             max_per_source = 8 if source.get('priority', 2) == 1 else 10  # 8 for international, 10 for Indian
             all_news.extend(news[:max_per_source])
         else:
-            logger.warning(f"No articles fetched from {source['name']}")
+            logger.warning("No articles fetched from %s", source['name'])
 
     # Remove duplicates based on URL and title similarity
     seen_urls = set()
@@ -463,7 +463,7 @@ def fetch_education_news():
         elif 'thehindu' in domain or 'indiatoday' in domain or 'indianexpress' in domain or 'timesexpress' in domain:
             indian_news.append(article)
     
-    logger.info(f"Found {len(international_news)} international and {len(indian_news)} Indian articles")
+    logger.info("Found %s international and %s Indian articles", len(international_news), len(indian_news))
     
     # Shuffle articles for variety on each refresh
     random.shuffle(international_news)
@@ -497,12 +497,12 @@ def fetch_education_news():
     # Final shuffle for variety in display order
     random.shuffle(final_news)
     
-    logger.info(f"Final news distribution: {len([n for n in final_news if 'edutopia' in n['url'] or 'timeshighereducation' in n['url']])} international, {len([n for n in final_news if 'thehindu' in n['url'] or 'indiatoday' in n['url'] or 'indianexpress' in n['url'] or 'timesexpress' in n['url']])} Indian")
+    logger.info("Final news distribution: %s international, %s Indian", len([n for n in final_news if 'edutopia' in n['url'] or 'timeshighereducation' in n['url']]), len([n for n in final_news if 'thehindu' in n['url'] or 'indiatoday' in n['url'] or 'indianexpress' in n['url'] or 'timesexpress' in n['url']]))
     
     # Log final article details for debugging
     for idx, article in enumerate(final_news):
         source_type = "International" if ('edutopia' in article['url'] or 'timeshighereducation' in article['url']) else "Indian"
-        logger.info(f"Final Article {idx+1} ({source_type}): {article['title'][:40]} | Image: {article['image'][:60]}")
+        logger.info("Final Article %s (%s): %s | Image: %s", idx + 1, source_type, article['title'][:40], article['image'][:60])
     
     return final_news[:12]  # Return up to 12 articles with balanced sources
 
@@ -519,7 +519,7 @@ def get_educational_news():
             from .fallback_data import get_fallback_educational_news
             return get_fallback_educational_news()[:12]
     except Exception as e:
-        logger.error(f"Error in get_educational_news: {e}")
+        logger.error("Error in get_educational_news: %s", e)
         from .fallback_data import get_fallback_educational_news
         return get_fallback_educational_news()[:12]
 
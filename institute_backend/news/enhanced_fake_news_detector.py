@@ -71,7 +71,7 @@ class EnhancedFakeNewsDetector:
             
             # Check if files exist
             if not os.path.exists(vectorizer_path) or not os.path.exists(model_path):
-                logger.error(f"Enhanced model files not found in {self.model_path}")
+                logger.error("Enhanced model files not found in %s", self.model_path)
                 return False
             
             # Load vectorizer
@@ -87,7 +87,7 @@ class EnhancedFakeNewsDetector:
             return True
             
         except Exception as e:
-            logger.error(f"Error loading enhanced model: {e}")
+            logger.error("Error loading enhanced model: %s", e)
             self.model_loaded = False
             return False
     
@@ -129,11 +129,11 @@ class EnhancedFakeNewsDetector:
             label = "Real" if prediction == 1 else "Fake"
             confidence = max(probabilities)
             
-            logger.info(f"Prediction: {label} (Confidence: {confidence:.3f})")
+            logger.info("Prediction: %s (Confidence: %.3f)", label, confidence)
             return label, confidence
             
         except Exception as e:
-            logger.error(f"Error during prediction: {e}")
+            logger.error("Error during prediction: %s", e)
             return "Error", 0.0
     
     def get_model_info(self):
@@ -159,7 +159,7 @@ class EnhancedFakeNewsDetector:
                     "vectorizer_features": self.vectorizer.get_feature_names_out().shape[0] if hasattr(self.vectorizer, 'get_feature_names_out') else 'Unknown'
                 }
         except Exception as e:
-            logger.error(f"Error getting model info: {e}")
+            logger.error("Error getting model info: %s", e)
             return {"status": "error", "error": str(e)}
 
 # Global instance for Django integration
@@ -86,7 +86,7 @@ def educational_news_api(request):
             return response
             
     except Exception as e:
-        logger.error(f"Error in educational_news_api: {e}")
+        logger.error("Error in educational_news_api: %s", e)
         
         # Emergency fallback
         try:
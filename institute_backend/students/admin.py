@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import AdmissionInquiry, StudentMark
+from .models import AdmissionInquiry, StudentMark, StudentRiskState
 
 # Register your models here.
 
@@ -56,3 +56,14 @@ class StudentMarkAdmin(admin.ModelAdmin):
     
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('student', 'subject')
+
+
+@admin.register(StudentRiskState)
+class StudentRiskStateAdmin(admin.ModelAdmin):
+    list_display = ['student', 'attendance_rate', 'marks_average', 'marks_trend', 'low_attendance', 'marks_at_risk', 'flagged_at']
+    list_filter = ['low_attendance', 'marks_at_risk']
+    search_fields = ['student__name', 'student__roll_id']
+    readonly_fields = [field.name for field in StudentRiskState._meta.fields]
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('student')
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from students.risk import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every student's at-risk state from recent attendance and exam marks without "
+        "sending alerts. Run after writes that bypassed signals; the migration seeds it on deploy."
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt risk state for {count} students in {time.perf_counter() - started:.1f}s.'
+        ))
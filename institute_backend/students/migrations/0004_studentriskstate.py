@@ -0,0 +1,131 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:09
+
+import datetime
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Sum
+from django.utils import timezone
+
+# Same smoothing, minimums and replay windows as students.risk
+ATTENDANCE_ALPHA = 2 / (20 + 1)
+MARKS_ALPHA = 2 / (4 + 1)
+MIN_ATTENDANCE_DAYS = 5
+MIN_EXAMS = 2
+REPLAY_DAYS = 180
+REPLAY_EXAMS = 20
+CHUNK_SIZE = 500
+
+
+def ewma(average, count, value, alpha):
+    return value if count == 0 else average + alpha * (value - average)
+
+
+def seed_risk_states(apps, schema_editor):
+    """
+    Build each student's risk state from their recent attendance and exams,
+    as rebuild_risk_state does, so the running averages start from history
+    and already flagged students are listed from this migration on. No
+    alerts are sent.
+    """
+    Student = apps.get_model('accounts', 'Student')
+    Attendance = apps.get_model('attendance', 'Attendance')
+    Marks = apps.get_model('marks', 'Marks')
+    StudentRiskState = apps.get_model('students', 'StudentRiskState')
+    attendance_threshold = getattr(settings, 'RISK_ATTENDANCE_THRESHOLD', 75.0)
+    marks_threshold = getattr(settings, 'RISK_MARKS_THRESHOLD', 40.0)
+    marks_drop = getattr(settings, 'RISK_MARKS_DROP', 10.0)
+    now = timezone.now()
+
+    student_ids = sorted(Student.objects.values_list('id', flat=True))
+    for start in range(0, len(student_ids), CHUNK_SIZE):
+        chunk = student_ids[start:start + CHUNK_SIZE]
+        states = {student_id: StudentRiskState(student_id=student_id) for student_id in chunk}
+
+        days = Attendance.objects.filter(student_id__in=chunk)
+        latest = days.order_by('-date').values_list('date', flat=True).first()
+        if latest:
+            rows = (days.filter(date__gte=latest - datetime.timedelta(days=REPLAY_DAYS))
+                    .order_by('student_id', 'date').values_list('student_id', 'date', 'present'))
+            for student_id, day, present in rows:
+                state = states[student_id]
+                state.attendance_rate_before = state.attendance_rate
+                state.attendance_rate = ewma(state.attendance_rate, state.attendance_days,
+                                             100.0 if present else 0.0, ATTENDANCE_ALPHA)
+                state.attendance_days += 1
+                state.last_attendance_date = day
+
+        exams = {}
+        rows = (
+            Marks.objects.filter(student_id__in=chunk).order_by('exam__exam_date', 'exam_id')
+            .values('student_id', 'exam_id', 'exam__exam_date')
+            .annotate(obtained=Sum('marks_obtained'), total=Sum('total_marks'))
+        )
+        for row in rows:
+            total = float(row['total'] or 0)
+            percentage = float(row['obtained']) / total * 100 if total > 0 else 0.0
+            exams.setdefault(row['student_id'], []).append((row['exam_id'], row['exam__exam_date'], percentage))
+        for student_id, recent in exams.items():
+            state = states[student_id]
+            for exam_id, exam_date, percentage in recent[-REPLAY_EXAMS:]:
+                before = state.marks_average
+                state.marks_average_before = before
+                state.marks_trend_before = state.marks_trend
+                count = state.exam_count
+                state.marks_average = ewma(before, count, percentage, MARKS_ALPHA)
+                state.marks_trend = (ewma(state.marks_trend_before, count - 1, percentage - before, MARKS_ALPHA)
+                                     if count else 0.0)
+                state.exam_count += 1
+                state.last_exam_id = exam_id
+                state.last_exam_date = exam_date
+
+        observed = [state for state in states.values() if state.attendance_days or state.exam_count]
+        for state in observed:
+            state.low_attendance = (state.attendance_days >= MIN_ATTENDANCE_DAYS
+                                    and state.attendance_rate < attendance_threshold)
+            state.marks_at_risk = state.exam_count >= MIN_EXAMS and (
+                state.marks_average < marks_threshold or state.marks_trend <= -marks_drop
+            )
+            state.flagged_at = now if state.low_attendance or state.marks_at_risk else None
+        StudentRiskState.objects.bulk_create(observed, batch_size=CHUNK_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_adminuser'),
+        ('attendance', '0001_initial'),
+        ('marks', '0004_unifiedmark'),
+        ('students', '0003_studentmark'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentRiskState',
+            fields=[
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='risk_state', serialize=False, to='accounts.student')),
+                ('attendance_rate', models.FloatField(default=0)),
+                ('attendance_rate_before', models.FloatField(default=0)),
+                ('attendance_days', models.PositiveIntegerField(default=0)),
+                ('last_attendance_date', models.DateField(blank=True, null=True)),
+                ('marks_average', models.FloatField(default=0)),
+                ('marks_average_before', models.FloatField(default=0)),
+                ('marks_trend', models.FloatField(default=0)),
+                ('marks_trend_before', models.FloatField(default=0)),
+                ('exam_count', models.PositiveIntegerField(default=0)),
+                ('last_exam_date', models.DateField(blank=True, null=True)),
+                ('low_attendance', models.BooleanField(default=False)),
+                ('marks_at_risk', models.BooleanField(default=False)),
+                ('flagged_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('last_exam', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='marks.exam')),
+            ],
+            options={
+                'verbose_name': 'Student Risk State',
+                'verbose_name_plural': 'Student Risk States',
+                'indexes': [models.Index(fields=['low_attendance', 'attendance_rate'], name='students_st_low_att_991410_idx'), models.Index(fields=['marks_at_risk', 'marks_average'], name='students_st_marks_a_bd0970_idx')],
+            },
+        ),
+        migrations.RunPython(seed_risk_states, migrations.RunPython.noop),
+    ]
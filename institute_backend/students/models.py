@@ -110,3 +110,44 @@ class StudentMark(models.Model):
             return 'D'
         else:
             return 'F'
+
+
+class StudentRiskState(models.Model):
+    """
+    Rolling attendance and marks indicators per student, kept up to date by
+    students.risk on every attendance or exam marks write. Rates are
+    exponentially weighted moving averages in percent; the *_before fields
+    hold the average as it was before the latest observation, so a rewrite
+    of the latest day or exam can be applied in place.
+    """
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, primary_key=True, related_name='risk_state')
+    attendance_rate = models.FloatField(default=0)
+    attendance_rate_before = models.FloatField(default=0)
+    attendance_days = models.PositiveIntegerField(default=0)
+    last_attendance_date = models.DateField(null=True, blank=True)
+    marks_average = models.FloatField(default=0)
+    marks_average_before = models.FloatField(default=0)
+    marks_trend = models.FloatField(default=0)
+    marks_trend_before = models.FloatField(default=0)
+    exam_count = models.PositiveIntegerField(default=0)
+    last_exam = models.ForeignKey('marks.Exam', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_exam_date = models.DateField(null=True, blank=True)
+    low_attendance = models.BooleanField(default=False)
+    marks_at_risk = models.BooleanField(default=False)
+    flagged_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Student Risk State'
+        verbose_name_plural = 'Student Risk States'
+        indexes = [
+            models.Index(fields=['low_attendance', 'attendance_rate']),
+            models.Index(fields=['marks_at_risk', 'marks_average']),
+        ]
+    
+    def __str__(self):
+        return f"{self.student_id}: attendance {self.attendance_rate:.1f}%, marks {self.marks_average:.1f}%"
+    
+    @property
+    def at_risk(self):
+        return self.low_attendance or self.marks_at_risk
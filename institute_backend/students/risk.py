@@ -0,0 +1,379 @@
+"""
+Incremental at-risk detection for attendance and exam marks.
+
+Every attendance write (attendance_changed) and exam marks write
+(marks_changed) folds the affected days or exams into StudentRiskState: an
+exponentially weighted moving average of daily attendance, one of overall
+exam percentages, and a smoothed trend of each exam against the average
+before it. Appending a newer day or exam, or rewriting the latest one, is
+O(1) per student; only back-dated corrections and deletes replay a bounded
+window of recent history. Flags use a recovery margin so a student hovering
+at a threshold is not alerted on every write.
+
+When a student newly crosses a threshold, a "risk_alert" frame is pushed to
+the staff-only alerts group (chat.consumers.STAFF_ALERTS_GROUP) once the
+write commits. Alerts never go through the student's chat room; flagged
+students stay listed for admins by the at-risk endpoint.
+"""
+import datetime
+import logging
+import threading
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.dispatch import receiver
+from django.utils import timezone
+
+from accounts.models import Student
+from attendance.models import Attendance
+from attendance.signals import attendance_changed
+from chat.consumers import STAFF_ALERTS_GROUP
+from chat.encoding import frame_event
+from marks.models import Marks
+from marks.signals import marks_changed
+from .models import StudentRiskState
+
+logger = logging.getLogger(__name__)
+
+# Smoothing over roughly the last 20 school days and the last 4 exams
+ATTENDANCE_ALPHA = 2 / (20 + 1)
+MARKS_ALPHA = 2 / (4 + 1)
+# Observations needed before a student can be flagged
+MIN_ATTENDANCE_DAYS = 5
+MIN_EXAMS = 2
+# Points past the threshold a flagged student must recover before the flag clears
+RECOVERY_MARGIN = 5.0
+# History replayed when a back-dated write or a delete invalidates the running averages
+REPLAY_DAYS = 180
+REPLAY_EXAMS = 20
+# Keeps IN (...) lists well under SQLite's bound parameter limit
+CHUNK_SIZE = 500
+
+ALERT_SENDER_NAME = 'Risk monitor'
+
+ATTENDANCE_FIELDS = ['attendance_rate', 'attendance_rate_before', 'attendance_days', 'last_attendance_date']
+MARKS_FIELDS = ['marks_average', 'marks_average_before', 'marks_trend', 'marks_trend_before',
+                'exam_count', 'last_exam', 'last_exam_date']
+FLAG_FIELDS = ['low_attendance', 'marks_at_risk', 'flagged_at', 'updated_at']
+
+
+def attendance_threshold():
+    return getattr(settings, 'RISK_ATTENDANCE_THRESHOLD', 75.0)
+
+
+def marks_threshold():
+    return getattr(settings, 'RISK_MARKS_THRESHOLD', 40.0)
+
+
+def marks_drop():
+    return getattr(settings, 'RISK_MARKS_DROP', 10.0)
+
+
+def ewma(average, count, value, alpha):
+    """Fold value into an average of count observations"""
+    return value if count == 0 else average + alpha * (value - average)
+
+
+def _as_date(value):
+    return datetime.date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _chunks(ids):
+    ids = sorted(ids)
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield ids[start:start + CHUNK_SIZE]
+
+
+def load_states(student_ids, create=True):
+    """{student_id: StudentRiskState}, with unsaved blank states for students without one"""
+    states = StudentRiskState.objects.in_bulk(student_ids)
+    if create:
+        for student_id in student_ids:
+            if student_id not in states:
+                states[student_id] = StudentRiskState(student_id=student_id)
+    return states
+
+
+def save_states(states, fields):
+    now = timezone.now()
+    new, existing = [], []
+    for state in states:
+        if state._state.adding and not (state.attendance_days or state.exam_count):
+            # Nothing observed yet (e.g. a student without marks in a touched exam)
+            continue
+        state.updated_at = now
+        (new if state._state.adding else existing).append(state)
+    StudentRiskState.objects.bulk_create(new, batch_size=CHUNK_SIZE)
+    if existing:
+        StudentRiskState.objects.bulk_update(existing, fields + FLAG_FIELDS, batch_size=CHUNK_SIZE)
+
+
+def add_day(state, day, present):
+    """Fold one attendance day into state. False if it predates the latest day and needs a replay"""
+    value = 100.0 if present else 0.0
+    last = state.last_attendance_date
+    if last is None or day > last:
+        state.attendance_rate_before = state.attendance_rate
+        state.attendance_rate = ewma(state.attendance_rate, state.attendance_days, value, ATTENDANCE_ALPHA)
+        state.attendance_days += 1
+        state.last_attendance_date = day
+    elif day == last:
+        # The latest day was rewritten: reapply it to the average before it
+        state.attendance_rate = ewma(state.attendance_rate_before, state.attendance_days - 1, value,
+                                     ATTENDANCE_ALPHA)
+    else:
+        return False
+    return True
+
+
+def add_exam(state, exam_id, exam_date, percentage):
+    """Fold one exam's overall percentage into state. False if it predates the latest exam"""
+    if state.last_exam_id == exam_id:
+        # Another subject or a corrected mark for the latest exam
+        count = state.exam_count - 1
+    elif state.last_exam_date is None or (exam_date, exam_id) > (state.last_exam_date, state.last_exam_id or 0):
+        state.marks_average_before = state.marks_average
+        state.marks_trend_before = state.marks_trend
+        count = state.exam_count
+        state.exam_count += 1
+        state.last_exam_id = exam_id
+        state.last_exam_date = exam_date
+    else:
+        return False
+    before = state.marks_average_before
+    state.marks_average = ewma(before, count, percentage, MARKS_ALPHA)
+    # The trend averages each exam's distance from the average before it
+    state.marks_trend = ewma(state.marks_trend_before, count - 1, percentage - before, MARKS_ALPHA) if count else 0.0
+    return True
+
+
+def reset_attendance(state):
+    for field in ATTENDANCE_FIELDS:
+        setattr(state, field, StudentRiskState._meta.get_field(field).get_default())
+
+
+def reset_marks(state):
+    for field in MARKS_FIELDS:
+        setattr(state, field, StudentRiskState._meta.get_field(field).get_default())
+    state.last_exam_id = None
+
+
+def evaluate(state):
+    """Recompute the flags and return the kinds ('attendance', 'marks') newly raised"""
+    raised = []
+    margin = RECOVERY_MARGIN if state.low_attendance else 0.0
+    low_attendance = (state.attendance_days >= MIN_ATTENDANCE_DAYS
+                      and state.attendance_rate < attendance_threshold() + margin)
+    margin = RECOVERY_MARGIN if state.marks_at_risk else 0.0
+    marks_at_risk = state.exam_count >= MIN_EXAMS and (
+        state.marks_average < marks_threshold() + margin or state.marks_trend <= -marks_drop() + margin
+    )
+    if low_attendance and not state.low_attendance:
+        raised.append('attendance')
+    if marks_at_risk and not state.marks_at_risk:
+        raised.append('marks')
+    state.low_attendance = low_attendance
+    state.marks_at_risk = marks_at_risk
+    if raised:
+        state.flagged_at = timezone.now()
+    elif not (low_attendance or marks_at_risk):
+        state.flagged_at = None
+    return raised
+
+
+def replay_attendance(states, since):
+    """Rebuild the attendance averages of states from their days on or after since"""
+    by_student = {state.student_id: state for state in states}
+    for state in states:
+        reset_attendance(state)
+    rows = (
+        Attendance.objects.filter(student_id__in=by_student, date__gte=since)
+        .order_by('student_id', 'date').values_list('student_id', 'date', 'present')
+    )
+    for student_id, day, present in rows:
+        add_day(by_student[student_id], day, present)
+
+
+def exam_percentages(queryset):
+    """(student_id, exam_id, exam_date, percentage) per student and exam, oldest exam first"""
+    rows = (
+        queryset.order_by('exam__exam_date', 'exam_id')
+        .values('student_id', 'exam_id', 'exam__exam_date')
+        .annotate(obtained=Sum('marks_obtained'), total=Sum('total_marks'))
+    )
+    for row in rows:
+        total = float(row['total'] or 0)
+        percentage = float(row['obtained']) / total * 100 if total > 0 else 0.0
+        yield row['student_id'], row['exam_id'], row['exam__exam_date'], percentage
+
+
+def replay_marks(states):
+    """Rebuild the marks averages of states from their most recent REPLAY_EXAMS exams"""
+    by_student = {state.student_id: state for state in states}
+    for state in states:
+        reset_marks(state)
+    recent = {}
+    for student_id, exam_id, exam_date, percentage in exam_percentages(
+        Marks.objects.filter(student_id__in=by_student)
+    ):
+        recent.setdefault(student_id, []).append((exam_id, exam_date, percentage))
+    for student_id, exams in recent.items():
+        for exam_id, exam_date, percentage in exams[-REPLAY_EXAMS:]:
+            add_exam(by_student[student_id], exam_id, exam_date, percentage)
+
+
+def queue_alerts(states_and_kinds):
+    """Post the alerts once the surrounding transaction commits"""
+    alerts = [(state.student_id, kind, alert_text(state, kind)) for state, kind in states_and_kinds]
+    if alerts:
+        transaction.on_commit(lambda: send_alerts(alerts), robust=True)
+
+
+def alert_text(state, kind):
+    if kind == 'attendance':
+        return (f'Attendance alert: recent attendance is {state.attendance_rate:.1f}%, '
+                f'below the {attendance_threshold():g}% threshold.')
+    return (f'Marks alert: recent exams average {state.marks_average:.1f}% '
+            f'with a trend of {state.marks_trend:+.1f} points per exam.')
+
+
+def send_alerts(alerts):
+    """
+    Push each (student_id, kind, text) alert to the admins connected to the
+    staff alerts group. Students never receive them.
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    student_ids = {student_id for student_id, _, _ in alerts}
+    names = dict(Student.objects.filter(id__in=student_ids).values_list('id', 'name'))
+    now = timezone.now().isoformat()
+    sent = 0
+    for student_id, kind, text in alerts:
+        if student_id not in names:
+            continue
+        try:
+            async_to_sync(channel_layer.group_send)(STAFF_ALERTS_GROUP, frame_event('risk_alert', alert={
+                'student_id': student_id,
+                'student_name': names[student_id],
+                'kind': kind,
+                'sender_name': ALERT_SENDER_NAME,
+                'content': f'{names[student_id]}: {text}',
+                'timestamp': now,
+            }))
+            sent += 1
+        except Exception:
+            logger.exception('Failed to push risk alert', extra={'student_id': student_id})
+    logger.info('Sent risk alerts', extra={'alert_count': sent})
+
+
+@receiver(attendance_changed)
+def update_attendance_risk(sender, student_ids, dates, **kwargs):
+    dates = {_as_date(day) for day in dates}
+    if not student_ids or not dates:
+        return
+    first, last = min(dates), max(dates)
+    raised = []
+    with transaction.atomic(savepoint=False):
+        for chunk in _chunks(student_ids):
+            states = load_states(chunk)
+            seen = set()
+            replay = set()
+            rows = (
+                Attendance.objects.filter(student_id__in=chunk, date__gte=first, date__lte=last)
+                .order_by('student_id', 'date').values_list('student_id', 'date', 'present')
+            )
+            for student_id, day, present in rows:
+                if day in dates:
+                    seen.add((student_id, day))
+                    if not add_day(states[student_id], day, present):
+                        replay.add(student_id)
+            # A day up to the latest one that no longer exists was deleted
+            for student_id in chunk:
+                latest = states[student_id].last_attendance_date
+                if latest and any(day <= latest and (student_id, day) not in seen for day in dates):
+                    replay.add(student_id)
+            if replay:
+                replayed = [states[student_id] for student_id in replay]
+                since = min(state.last_attendance_date or first for state in replayed)
+                replay_attendance(replayed, min(since, first) - datetime.timedelta(days=REPLAY_DAYS))
+            for state in states.values():
+                raised.extend((state, kind) for kind in evaluate(state))
+            save_states(states.values(), ATTENDANCE_FIELDS)
+    queue_alerts(raised)
+
+
+_pending = threading.local()
+
+
+def _pending_replays():
+    if not hasattr(_pending, 'student_ids'):
+        _pending.student_ids = set()
+    return _pending.student_ids
+
+
+def flush_pending_replays():
+    """Replay the marks of students whose marks were deleted, once per transaction"""
+    pending = _pending_replays()
+    student_ids = sorted(pending)
+    pending.clear()
+    raised = []
+    with transaction.atomic():
+        for chunk in _chunks(student_ids):
+            states = load_states(chunk, create=False)
+            replay_marks(list(states.values()))
+            for state in states.values():
+                raised.extend((state, kind) for kind in evaluate(state))
+            save_states(states.values(), MARKS_FIELDS)
+        queue_alerts(raised)
+
+
+@receiver(marks_changed)
+def update_marks_risk(sender, exam_ids, student_ids, deleted=False, **kwargs):
+    if not exam_ids or not student_ids:
+        return
+    if deleted:
+        # A delete can arrive as several signals (one per exam or student in a
+        # cascade), so replay each student once after the transaction commits
+        _pending_replays().update(student_ids)
+        transaction.on_commit(flush_pending_replays, robust=True)
+        return
+    raised = []
+    with transaction.atomic(savepoint=False):
+        for chunk in _chunks(student_ids):
+            states = load_states(chunk)
+            replay = set()
+            for student_id, exam_id, exam_date, percentage in exam_percentages(
+                Marks.objects.filter(exam_id__in=exam_ids, student_id__in=chunk)
+            ):
+                if not add_exam(states[student_id], exam_id, exam_date, percentage):
+                    replay.add(student_id)
+            if replay:
+                replay_marks([states[student_id] for student_id in replay])
+            for state in states.values():
+                raised.extend((state, kind) for kind in evaluate(state))
+            save_states(states.values(), MARKS_FIELDS)
+    queue_alerts(raised)
+
+
+def rebuild(students=None):
+    """Recompute every state (or those of a student queryset) from history without alerting. Returns the count"""
+    student_ids = list((students if students is not None else Student.objects.all()).values_list('id', flat=True))
+    count = 0
+    with transaction.atomic():
+        for chunk in _chunks(student_ids):
+            StudentRiskState.objects.filter(student_id__in=chunk).delete()
+            states = load_states(chunk)
+            latest = Attendance.objects.filter(student_id__in=chunk).order_by('-date').values_list('date', flat=True).first()
+            if latest:
+                replay_attendance(list(states.values()), latest - datetime.timedelta(days=REPLAY_DAYS))
+            replay_marks(list(states.values()))
+            observed = [s for s in states.values() if s.attendance_days or s.exam_count]
+            for state in observed:
+                evaluate(state)
+            save_states(observed, ATTENDANCE_FIELDS + MARKS_FIELDS)
+            count += len(observed)
+    return count
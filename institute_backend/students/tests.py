@@ -1,3 +1,166 @@
+import asyncio
+import json
 from django.test import TestCase
+from django.urls import reverse
+from datetime import date, timedelta
+from decimal import Decimal
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from accounts.models import Class, Student, Subject
+from attendance.models import Attendance
+from chat.consumers import STAFF_ALERTS_GROUP
+from chat.models import ChatMessage, ChatRoom
+from marks.models import Exam, Marks
+from .models import StudentRiskState
+from . import risk
 
-# Create your tests here.
+
+class StudentRiskTest(TestCase):
+    """Test cases for the incremental at-risk engine and its alerts"""
+
+    def setUp(self):
+        """A class with two students and two subjects"""
+        self.channel_layer = get_channel_layer()
+        self.alerts_channel = async_to_sync(self.channel_layer.new_channel)()
+        async_to_sync(self.channel_layer.group_add)(STAFF_ALERTS_GROUP, self.alerts_channel)
+        self.test_class = Class.objects.create(name="Risk 11A", grade_level=11)
+        self.student = Student.objects.create(name="Risk Student", email="risk@example.com",
+                                              password="password123", roll_id="RSK1", student_class=self.test_class)
+        self.other = Student.objects.create(name="Steady Student", email="steady@example.com",
+                                            password="password123", roll_id="RSK2", student_class=self.test_class)
+        self.subjects = [
+            Subject.objects.create(name=f"Risk Subject {i}", code=f"RSK{i}", grade_levels="11")
+            for i in range(2)
+        ]
+        self.start = date(2025, 1, 6)
+
+    def tearDown(self):
+        """Leave the staff alerts group"""
+        async_to_sync(self.channel_layer.group_discard)(STAFF_ALERTS_GROUP, self.alerts_channel)
+
+    def received_alerts(self):
+        """The risk_alert frames pushed to the staff alerts group so far"""
+        async def drain():
+            events = []
+            while True:
+                try:
+                    events.append(await asyncio.wait_for(self.channel_layer.receive(self.alerts_channel), 0.05))
+                except asyncio.TimeoutError:
+                    return events
+        return [json.loads(event['text'])['alert'] for event in async_to_sync(drain)()
+                if event['type'] == 'risk_alert']
+
+    def record_days(self, student, pattern, start=None):
+        """One Attendance row per character of pattern ('P' or 'A') on consecutive days"""
+        start = start or self.start
+        for offset, mark in enumerate(pattern):
+            Attendance.objects.create(student=student, date=start + timedelta(days=offset), present=mark == 'P')
+
+    def record_exam(self, name, exam_date, scores):
+        """An exam with the given marks out of 100 per subject for self.student"""
+        exam = Exam.objects.create(name=name, exam_date=exam_date, student_class=self.test_class)
+        for subject, score in zip(self.subjects, scores):
+            Marks.objects.create(student=self.student, exam=exam, subject=subject,
+                                 marks_obtained=Decimal(score), total_marks=Decimal('100'))
+        return exam
+
+    def state(self, student=None):
+        return StudentRiskState.objects.get(student=student or self.student)
+
+    def test_low_attendance_raises_one_alert(self):
+        """Crossing the attendance threshold flags the student and alerts staff once"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.record_days(self.student, 'P' * 10 + 'AA')
+        self.assertFalse(self.state().low_attendance)
+        self.assertEqual(self.received_alerts(), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.record_days(self.student, 'AA', start=self.start + timedelta(days=12))
+        state = self.state()
+        self.assertTrue(state.low_attendance)
+        self.assertLess(state.attendance_rate, 75)
+        self.assertIsNotNone(state.flagged_at)
+
+        [alert] = self.received_alerts()
+        self.assertEqual((alert['student_id'], alert['kind']), (self.student.id, 'attendance'))
+        self.assertIn('Risk Student', alert['content'])
+
+    def test_rewrites_and_backfills_match_a_rebuild(self):
+        """Rewriting the latest day, back-dated writes and deletes agree with a full replay"""
+        self.record_days(self.student, 'PPAPPPAPPP')
+        latest = Attendance.objects.get(student=self.student, date=self.start + timedelta(days=9))
+        latest.present = False
+        latest.save()
+        self.assertEqual(self.state().attendance_days, 10)
+        Attendance.objects.create(student=self.student, date=self.start - timedelta(days=1), present=False)
+        Attendance.objects.filter(student=self.student, date=self.start + timedelta(days=5)).delete()
+        incremental = self.state()
+
+        risk.rebuild()
+        rebuilt = self.state()
+        self.assertEqual(incremental.attendance_days, rebuilt.attendance_days)
+        self.assertEqual(rebuilt.attendance_days, 10)
+        self.assertAlmostEqual(incremental.attendance_rate, rebuilt.attendance_rate)
+        self.assertAlmostEqual(incremental.attendance_rate_before, rebuilt.attendance_rate_before)
+
+    def test_falling_marks_are_flagged(self):
+        """A sharp drop between exams flags marks even above the average threshold"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.record_exam("Risk Unit 1", date(2025, 1, 10), [85, 75])
+        state = self.state()
+        self.assertEqual((state.exam_count, round(state.marks_average, 2)), (1, 80.0))
+        self.assertFalse(state.marks_at_risk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            exam = self.record_exam("Risk Unit 2", date(2025, 2, 10), [60, 60])
+        state = self.state()
+        self.assertEqual(state.exam_count, 2)
+        self.assertEqual(state.last_exam_id, exam.id)
+        self.assertAlmostEqual(state.marks_trend, -20.0)
+        self.assertTrue(state.marks_at_risk)
+        [alert] = self.received_alerts()
+        self.assertEqual(alert['kind'], 'marks')
+        self.assertIn('Marks alert', alert['content'])
+
+    def test_deleting_an_exam_replays_marks(self):
+        """Marks deleted with their exam are replayed out of the state after commit"""
+        self.record_exam("Risk Unit 1", date(2025, 1, 10), [85, 75])
+        exam = self.record_exam("Risk Unit 2", date(2025, 2, 10), [60, 60])
+        with self.captureOnCommitCallbacks(execute=True):
+            exam.delete()
+        state = self.state()
+        self.assertEqual(state.exam_count, 1)
+        self.assertAlmostEqual(state.marks_average, 80.0)
+        self.assertFalse(state.marks_at_risk)
+
+    def test_alerts_stay_out_of_the_student_room(self):
+        """Alerts reach staff only: nothing is posted to or pushed through the student's chat room"""
+        room = ChatRoom.objects.create(student=self.student, recipient_type='admin')
+        room_channel = async_to_sync(self.channel_layer.new_channel)()
+        async_to_sync(self.channel_layer.group_add)(room.room_name, room_channel)
+
+        self.record_days(self.student, 'P' * 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.record_days(self.student, 'AAA', start=self.start + timedelta(days=4))
+        self.assertEqual(len(self.received_alerts()), 1)
+        self.assertFalse(ChatMessage.objects.exists())
+        self.assertEqual(ChatRoom.objects.get(), room)
+        with self.assertRaises(asyncio.TimeoutError):
+            async_to_sync(asyncio.wait_for)(self.channel_layer.receive(room_channel), 0.05)
+
+    def test_at_risk_endpoint(self):
+        """Only flagged students are listed, optionally filtered by kind, and only to admins"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.record_days(self.student, 'PPAAAAA')
+            self.record_days(self.other, 'PPPPPPP')
+        url = reverse('get_at_risk_students')
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+        session = self.client.session
+        session['admin_authenticated'] = True
+        session.save()
+        data = self.client.get(url).json()
+        self.assertEqual([s['rollId'] for s in data['students']], ['RSK1'])
+        self.assertTrue(data['students'][0]['lowAttendance'])
+        self.assertEqual(self.client.get(url, {'kind': 'marks'}).json()['count'], 0)
+        self.assertEqual(self.client.get(url, {'kind': 'other'}).status_code, 400)
@@ -5,4 +5,5 @@ urlpatterns = [
     path('admission-inquiry/', views.create_admission_inquiry, name='create_admission_inquiry'),
     path('admin/inquiries/', views.get_admission_inquiries, name='get_admission_inquiries'),
     path('admin/inquiries/<int:inquiry_id>/status/', views.update_inquiry_status, name='update_inquiry_status'),
+    path('admin/at-risk/', views.get_at_risk_students, name='get_at_risk_students'),
 ]
\ No newline at end of file
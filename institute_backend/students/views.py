@@ -7,10 +7,12 @@ from django.views import View
 from django.core.validators import validate_email
 from django.core.exceptions import ValidationError
 from django.utils import timezone
+from django.db.models import Q
 from datetime import timedelta
 import json
 import re
-from .models import AdmissionInquiry
+from institute_backend.views import is_admin_request
+from .models import AdmissionInquiry, StudentRiskState
 
 # Create your views here.
 
@@ -200,4 +202,60 @@ def update_inquiry_status(request, inquiry_id):
         return JsonResponse({
             'success': False,
             'message': f'Failed to update status: {str(e)}'
-        }, status=400)
\ No newline at end of file
+        }, status=400)
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def get_at_risk_students(request):
+    """Students currently flagged for low attendance or falling marks, most recently flagged first. Admins only."""
+    if not is_admin_request(request):
+        return JsonResponse({
+            'success': False,
+            'message': 'Admin authentication required'
+        }, status=401)
+    try:
+        kind = request.GET.get('kind')
+        states = StudentRiskState.objects.select_related('student__student_class')
+        
+        if kind == 'attendance':
+            states = states.filter(low_attendance=True)
+        elif kind == 'marks':
+            states = states.filter(marks_at_risk=True)
+        elif kind:
+            return JsonResponse({
+                'success': False,
+                'message': 'kind must be attendance or marks'
+            }, status=400)
+        else:
+            states = states.filter(Q(low_attendance=True) | Q(marks_at_risk=True))
+        
+        students_data = []
+        for state in states.order_by('-flagged_at', 'student_id'):
+            student = state.student
+            students_data.append({
+                'id': student.id,
+                'name': student.name,
+                'rollId': student.roll_id,
+                'class': student.student_class.name if student.student_class else None,
+                'lowAttendance': state.low_attendance,
+                'marksAtRisk': state.marks_at_risk,
+                'attendanceRate': round(state.attendance_rate, 2),
+                'attendanceDays': state.attendance_days,
+                'lastAttendanceDate': state.last_attendance_date.isoformat() if state.last_attendance_date else None,
+                'marksAverage': round(state.marks_average, 2),
+                'marksTrend': round(state.marks_trend, 2),
+                'examCount': state.exam_count,
+                'flaggedAt': state.flagged_at.isoformat() if state.flagged_at else None
+            })
+        
+        return JsonResponse({
+            'success': True,
+            'students': students_data,
+            'count': len(students_data)
+        })
+        
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Failed to fetch at-risk students: {str(e)}'
+        }, status=400)